@@ -12,13 +12,17 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 
+from apps.common.columnar import Columns, columnar_renderers, wants_columnar
+from apps.common.conditional import conditional_get, etag_matches
+from apps.common.db_routing import replica_reads
+from core.renderers import list_response
+
 from . import selectors
 from .selectors import _CLASS_FK_ID  # reuse detected class FK field
-from .serializers import ExitEventSerializer, StudentBriefSerializer
+from .serializers import ExitEventSerializer
 from .services.attendance import bulk_save_attendance
+from .services.wing_timetable import get_wing_timetable, timetable_version, wing_timetable_etag
 from .services.word_table import render_table_docx
-from .timing import resolve_lesson_time
-from django.db.models import Count, Q
 from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
 
 logger = logging.getLogger(__name__)
@@ -27,6 +31,22 @@ logger = logging.getLogger(__name__)
 from apps.common.date_utils import parse_date_or_error  # type: ignore
 
 
+# Row fields of history-strict (also the column order of its ?format=columnar)
+HISTORY_ROW_FIELDS = ("date", "student_id", "student_name", "status", "note", "period_number", "subject_name")
+
+# Models whose version counters drive the ETags of read endpoints (see apps.common.conditional)
+TIMETABLE_MODELS = (
+    "school.timetableentry",
+    "school.periodtemplate",
+    "school.templateslot",
+    "school.class",
+    "school.subject",
+    "school.staff",
+    "school.term",
+)
+TEACHER_CLASSES_MODELS = ("school.teachingassignment", "school.class", "school.staff", "auth.user")
+
+
 def _parse_date_or_400(dt_str: str | None):
     """Parse UI (DD/MM/YYYY) or ISO (YYYY-MM-DD) date.
     If empty, return today's date in the configured local timezone.
@@ -40,6 +60,19 @@ def _parse_date_or_400(dt_str: str | None):
     return dt, None
 
 
+def _int_ids_or_400(values: list, field: str = "ids"):
+    """Validate a list of record/batch ids. Returns (ids, None) or (None, Response(400))."""
+    ids = []
+    for v in values:
+        if isinstance(v, bool):
+            return None, Response({"detail": f"{field} must contain integer ids"}, status=400)
+        try:
+            ids.append(int(v))
+        except (TypeError, ValueError):
+            return None, Response({"detail": f"{field} must contain integer ids"}, status=400)
+    return ids, None
+
+
 def _parse_range_or_400(from_str: str | None, to_str: str | None):
     """Parse a (from, to) date range accepting UI (DD/MM/YYYY) and ISO (YYYY-MM-DD).
     Defaults: to=today, from=to-6 days. Returns (from_date, to_date) or (None, Response(400)).
@@ -64,13 +97,13 @@ def _parse_range_or_400(from_str: str | None, to_str: str | None):
     return (from_dt, to_dt), None
 
 
-def _filter_by_teacher_subjects(qs, user, class_id):
-    """Filter attendance queryset based on teacher's assignments.
+def _teacher_subject_scope(user, class_id):
+    """Resolve the teacher restriction applied to class attendance.
     Teacher must satisfy TWO conditions:
       1. Teaches this classroom (class_id)
       2. Teaches the subject for this classroom
-    Superusers and wing supervisors see all records.
-    Returns: filtered queryset
+    Returns None when the user sees everything (superuser, wing supervisor, non-staff),
+    otherwise (staff_id, [subject_ids]) — an empty subject list means no access to any record.
     """
     from school.models import Staff, TeachingAssignment  # type: ignore
 
@@ -84,7 +117,7 @@ def _filter_by_teacher_subjects(qs, user, class_id):
 
     # Superusers and wing supervisors see everything
     if is_super or is_wing:
-        return qs
+        return None
 
     # Get current teacher (staff)
     staff = None
@@ -95,22 +128,30 @@ def _filter_by_teacher_subjects(qs, user, class_id):
 
     # If no staff found, return unfiltered (shouldn't happen due to access control)
     if not staff:
-        return qs
+        return None
 
     # Get valid (teacher, classroom, subject) combinations from TeachingAssignment
     # This ensures BOTH conditions: teacher teaches classroom AND teaches subject to that classroom
     valid_assignments = TeachingAssignment.objects.filter(teacher_id=staff.id, classroom_id=class_id).values_list(
         "subject_id", flat=True
     )
+    return staff.id, list(valid_assignments)
 
-    if valid_assignments:
-        # Filter by: records created by this teacher AND for subjects they teach to this classroom
-        qs = qs.filter(teacher_id=staff.id, subject_id__in=list(valid_assignments))
-    else:
-        # Teacher doesn't teach this classroom, return empty queryset
-        qs = qs.none()
 
-    return qs
+def _filter_by_teacher_subjects(qs, user, class_id):
+    """Filter attendance queryset based on teacher's assignments (see _teacher_subject_scope).
+    Superusers and wing supervisors see all records.
+    Returns: filtered queryset
+    """
+    scope = _teacher_subject_scope(user, class_id)
+    if scope is None:
+        return qs
+    teacher_id, subject_ids = scope
+    if subject_ids:
+        # Filter by: records created by this teacher AND for subjects they teach to this classroom
+        return qs.filter(teacher_id=teacher_id, subject_id__in=subject_ids)
+    # Teacher doesn't teach this classroom, return empty queryset
+    return qs.none()
 
 
 class AttendanceViewSetBase(viewsets.ViewSet):
@@ -141,9 +182,10 @@ class AttendanceViewSetBase(viewsets.ViewSet):
         # Enforce access: teachers can only load students for their own classes
         if not self._user_has_access_to_class(request.user, class_id):
             raise PermissionDenied(detail="not allowed for this class")
-        qs = selectors.get_students_for_class_on_date(class_id, dt)
-        data = StudentBriefSerializer(qs, many=True).data
-        return Response({"students": data, "date": dt.isoformat(), "class_id": class_id})
+        # Versioned per-class snapshot (services/rosters): a cache read on repeated opens
+        from .services.rosters import roster_payload
+
+        return Response({"students": roster_payload(class_id), "date": dt.isoformat(), "class_id": class_id})
 
     @action(detail=False, methods=["get"], url_path="records")
     def list_records(self, request: Request) -> Response:
@@ -258,6 +300,7 @@ class AttendanceViewSetBase(viewsets.ViewSet):
         )
 
     @action(detail=False, methods=["get"], url_path="history-export")
+    @replica_reads
     def history_export(self, request: Request) -> HttpResponse:
         """Export attendance history for a class within a date range.
         Query params: class_id (int, required), from (YYYY-MM-DD), to (YYYY-MM-DD), format(optional): csv|xlsx
@@ -593,9 +636,9 @@ class AttendanceViewSetBase(viewsets.ViewSet):
 
     @action(detail=False, methods=["post"], url_path="submit")
     def submit_for_review(self, request: Request) -> Response:
-        """Mark all attendance records for the given class/date (and optional period)
-        as submitted without closing them. Records remain editable until a wing supervisor approves.
-        Submission is indicated by a '[SUBMITTED @ ts]' tag in note and keeping locked=False.
+        """Submit the attendance of a class/date (and optional period) to the wing supervisor.
+        Each (class, date, period) becomes an AttendanceSubmission batch in 'submitted' state; the records
+        stay editable (locked=False) until a wing supervisor approves.
         Payload: { class_id:int, date:YYYY-MM-DD, period_number?:int|null }
         """
         payload = request.data or {}
@@ -610,40 +653,39 @@ class AttendanceViewSetBase(viewsets.ViewSet):
         if not self._user_has_access_to_class(request.user, class_id):
             return Response({"detail": "not allowed for this class"}, status=403)
         try:
-            from django.utils import timezone
+            from django.db import transaction
+            from django.db.models import Case, Value, When
             from school.models import AttendanceRecord, Term  # type: ignore
 
+            from .services.submissions import submit_batches
+
             # resolve term best-effort similar to services
             term = Term.objects.filter(start_date__lte=dt, end_date__gte=dt).order_by("-start_date").first()
             if not term:
                 term = Term.objects.order_by("-start_date").first()
-            qs = AttendanceRecord.objects.filter(classroom_id=class_id, date=dt, term=term)
-            if period_number:
-                qs = qs.filter(period_number=period_number)
-            now = timezone.now().strftime("%Y-%m-%d %H:%M")
-            tag = f"[SUBMITTED @ {now}]"
-            submitted = 0
-            for r in qs:
-                note = (getattr(r, "note", "") or "").strip()
-                # Avoid duplicate tag
-                if "[SUBMITTED" not in note:
-                    r.note = f"{tag} {note}".strip()[:300]
-                # Keep open/editable until supervisor approval
-                r.locked = False
-                # Ensure source reflects teacher submission unless already supervisor
-                if getattr(r, "source", "teacher") != "supervisor":
-                    r.source = "teacher"
-                try:
-                    r.save(update_fields=["note", "locked", "source", "updated_at"])
-                    submitted += 1
-                except Exception:
-                    continue
+            with transaction.atomic():
+                periods = submit_batches(
+                    class_id,
+                    dt,
+                    term=term,
+                    periods=[period_number] if period_number else None,
+                    user=request.user,
+                )
+                # Keep open/editable until supervisor approval; source reflects the teacher submission
+                submitted = AttendanceRecord.objects.filter(
+                    classroom_id=class_id, date=dt, term=term, period_number__in=periods
+                ).update(
+                    locked=False,
+                    source=Case(When(source="supervisor", then=Value("supervisor")), default=Value("teacher")),
+                    updated_at=timezone.now(),
+                )
             return Response(
                 {
                     "submitted": int(submitted),
                     "class_id": class_id,
                     "date": dt.isoformat(),
                     "period_number": period_number,
+                    "periods": periods,
                 }
             )
         except Exception as e:
@@ -678,9 +720,10 @@ class AttendanceViewSet(viewsets.ViewSet):
         # Enforce access: teachers can only load students for their own classes
         if not self._user_has_access_to_class(request.user, class_id):
             raise PermissionDenied(detail="not allowed for this class")
-        qs = selectors.get_students_for_class_on_date(class_id, dt)
-        data = StudentBriefSerializer(qs, many=True).data
-        return Response({"students": data, "date": dt.isoformat(), "class_id": class_id})
+        # Versioned per-class snapshot (services/rosters): a cache read on repeated opens
+        from .services.rosters import roster_payload
+
+        return Response({"students": roster_payload(class_id), "date": dt.isoformat(), "class_id": class_id})
 
     @action(detail=False, methods=["get"], url_path="records")
     def list_records(self, request: Request) -> Response:
@@ -755,46 +798,29 @@ class AttendanceViewSet(viewsets.ViewSet):
         if page_size < 1:
             page_size = 1
 
-        # Query optimized with select_related to avoid N+1 on student and class
-        from school.models import AttendanceRecord  # type: ignore
-
-        qs = AttendanceRecord.objects.filter(
-            **{_CLASS_FK_ID: class_id}, date__gte=dt_from, date__lte=dt_to
-        ).select_related("student", "subject")
-
-        # Filter by teacher's subjects (teachers only see their own subjects)
-        qs = _filter_by_teacher_subjects(qs, request.user, class_id)
-
-        qs = qs.order_by("date", "student_id")
+        # Live + archived rows (teachers only see their own subjects); names resolved per page
+        qs = selectors.get_attendance_history(
+            class_id, dt_from, dt_to, teacher_scope=_teacher_subject_scope(request.user, class_id)
+        )
         total = qs.count()
         start = (page - 1) * page_size
         end = start + page_size
-        page_qs = qs[start:end]
-        results = [
-            {
-                "date": r.date.isoformat(),
-                "student_id": r.student_id,
-                "student_name": getattr(getattr(r, "student", None), "full_name", None),
-                "status": r.status,
-                "note": getattr(r, "note", None),
-                "period_number": getattr(r, "period_number", None),
-                "subject_name": getattr(getattr(r, "subject", None), "name_ar", None),
-            }
-            for r in page_qs
-        ]
-        return Response(
-            {
-                "count": total,
-                "page": page,
-                "page_size": page_size,
-                "from": dt_from.isoformat(),
-                "to": dt_to.isoformat(),
-                "class_id": class_id,
-                "results": results,
-            }
-        )
+        page_rows = selectors.attach_history_names(list(qs[start:end]))
+        rows = [(r["date"].isoformat(), *(r[f] for f in HISTORY_ROW_FIELDS[1:])) for r in page_rows]
+        meta = {
+            "page": page,
+            "page_size": page_size,
+            "from": dt_from.isoformat(),
+            "to": dt_to.isoformat(),
+            "class_id": class_id,
+        }
+        if wants_columnar(request):
+            # count = rows of this page, total = all matching rows
+            return Response(Columns(HISTORY_ROW_FIELDS, rows).payload(total=total, **meta))
+        return Response({"count": total, **meta, "results": [dict(zip(HISTORY_ROW_FIELDS, row)) for row in rows]})
 
     @action(detail=False, methods=["get"], url_path="history-export")
+    @replica_reads
     def history_export(self, request: Request) -> HttpResponse:
         """Export attendance history for a class within a date range.
         Query params: class_id (int, required), from (YYYY-MM-DD), to (YYYY-MM-DD), format(optional): csv|xlsx
@@ -826,17 +852,14 @@ class AttendanceViewSet(viewsets.ViewSet):
         # Cap range to 60 days to avoid heavy exports in dev
         if (dt_to - dt_from).days > 60:
             return Response({"detail": "date range too large; max 60 days"}, status=400)  # type: ignore[return-value]
-        # Build queryset
-        from school.models import AttendanceRecord  # type: ignore
-
-        qs = AttendanceRecord.objects.filter(
-            **{_CLASS_FK_ID: class_id}, date__gte=dt_from, date__lte=dt_to
-        ).select_related("student", "subject")
-
-        # Filter by teacher's subjects (teachers only see their own subjects)
-        qs = _filter_by_teacher_subjects(qs, request.user, class_id)
-
-        qs = qs.order_by("date", "student_id")
+        # Live + archived rows (teachers only see their own subjects); range is capped above
+        rows = selectors.attach_history_names(
+            list(
+                selectors.get_attendance_history(
+                    class_id, dt_from, dt_to, teacher_scope=_teacher_subject_scope(request.user, class_id)
+                )
+            )
+        )
         export_format = (request.query_params.get("format") or "xlsx").lower()
         if export_format == "xlsx":
             # Generate an Excel workbook to guarantee correct Arabic rendering
@@ -864,18 +887,16 @@ class AttendanceViewSet(viewsets.ViewSet):
                 ]
                 ws.append(headers)
                 # Stream rows to reduce memory/time; avoid per-cell styling loops
-                for r in qs.iterator(chunk_size=1000):
-                    student_name = getattr(getattr(r, "student", None), "full_name", None)
-                    subject_name = getattr(getattr(r, "subject", None), "name_ar", None)
+                for r in rows:
                     ws.append(
                         [
-                            r.date.isoformat(),
-                            r.student_id,
-                            student_name or "",
-                            getattr(r, "period_number", "") or "",
-                            subject_name or "",
-                            r.status,
-                            getattr(r, "note", "") or "",
+                            r["date"].isoformat(),
+                            r["student_id"],
+                            r["student_name"] or "",
+                            r["period_number"] or "",
+                            r["subject_name"] or "",
+                            r["status"],
+                            r["note"] or "",
                         ]
                     )
                 # Freeze header row
@@ -927,18 +948,16 @@ class AttendanceViewSet(viewsets.ViewSet):
                 "note/ملاحظة",
             ]
         )
-        for r in qs.iterator(chunk_size=1000):
-            student_name = getattr(getattr(r, "student", None), "full_name", None)
-            subject_name = getattr(getattr(r, "subject", None), "name_ar", None)
+        for r in rows:
             writer.writerow(
                 [
-                    r.date.isoformat(),
-                    r.student_id,
-                    student_name or "",
-                    getattr(r, "period_number", "") or "",
-                    subject_name or "",
-                    r.status,
-                    getattr(r, "note", "") or "",
+                    r["date"].isoformat(),
+                    r["student_id"],
+                    r["student_name"] or "",
+                    r["period_number"] or "",
+                    r["subject_name"] or "",
+                    r["status"],
+                    r["note"] or "",
                 ]
             )
         return resp
@@ -994,6 +1013,7 @@ class AttendanceViewSet(viewsets.ViewSet):
         return Response({"date": dt.isoformat(), "periods": periods})
 
     @action(detail=False, methods=["get"], url_path="timetable/teacher/weekly")
+    @conditional_get(*TIMETABLE_MODELS)
     def teacher_timetable_weekly(self, request: Request) -> Response:
         """Return weekly timetable grid for the authenticated teacher."""
         from school.models import Staff  # type: ignore
@@ -1016,6 +1036,7 @@ class AttendanceViewSet(viewsets.ViewSet):
         return Response(grid)
 
     @action(detail=False, methods=["get"], url_path="teacher/classes")
+    @conditional_get(*TEACHER_CLASSES_MODELS)
     def teacher_classes(self, request: Request) -> Response:
         """
         Return classes taught by the authenticated teacher based on TeachingAssignment.
@@ -1148,6 +1169,7 @@ class AttendanceViewSet(viewsets.ViewSet):
 
 class AttendanceViewSetV2(AttendanceViewSet):
     @action(detail=False, methods=["get"], url_path="teacher/classes")
+    @conditional_get(*TEACHER_CLASSES_MODELS)
     def teacher_classes(self, request: Request) -> Response:
         """
         V2 override: Return classes taught by the authenticated teacher.
@@ -1223,7 +1245,7 @@ class AttendanceViewSetV2(AttendanceViewSet):
         classes = [{"id": row["classroom_id"], "name": row.get("classroom__name")} for row in qs]
         return Response({"classes": classes})
 
-    @action(detail=False, methods=["get"], url_path="history-strict")
+    @action(detail=False, methods=["get"], url_path="history-strict", renderer_classes=columnar_renderers())
     def list_history_strict(self, request: Request) -> Response:
         """Strict history: in addition to classroom filter, ensure student's current class matches.
         Same shape as /history but guarantees results only from the selected class.
@@ -1263,46 +1285,30 @@ class AttendanceViewSetV2(AttendanceViewSet):
             page_size = 200
         if page_size < 1:
             page_size = 1
-        # Query
-        from school.models import AttendanceRecord  # type: ignore
-
-        qs = (
-            AttendanceRecord.objects.filter(**{_CLASS_FK_ID: class_id}, date__gte=dt_from, date__lte=dt_to)
-            .filter(student__class_fk_id=class_id)
-            .select_related("student", "subject")
+        # Live + archived rows of students currently in this class (teachers only see their own subjects)
+        qs = selectors.get_attendance_history(
+            class_id,
+            dt_from,
+            dt_to,
+            teacher_scope=_teacher_subject_scope(request.user, class_id),
+            current_class_only=True,
         )
-
-        # Filter by teacher's subjects (teachers only see their own subjects)
-        qs = _filter_by_teacher_subjects(qs, request.user, class_id)
-
-        qs = qs.order_by("date", "student_id")
         total = qs.count()
         start = (page - 1) * page_size
         end = start + page_size
-        page_qs = qs[start:end]
-        results = [
-            {
-                "date": r.date.isoformat(),
-                "student_id": r.student_id,
-                "student_name": getattr(getattr(r, "student", None), "full_name", None),
-                "status": r.status,
-                "note": getattr(r, "note", None),
-                "period_number": getattr(r, "period_number", None),
-                "subject_name": getattr(getattr(r, "subject", None), "name_ar", None),
-            }
-            for r in page_qs
-        ]
-        return Response(
-            {
-                "count": total,
-                "page": page,
-                "page_size": page_size,
-                "from": dt_from.isoformat(),
-                "to": dt_to.isoformat(),
-                "class_id": class_id,
-                "results": results,
-            }
-        )
+        page_rows = selectors.attach_history_names(list(qs[start:end]))
+        rows = [(r["date"].isoformat(), *(r[f] for f in HISTORY_ROW_FIELDS[1:])) for r in page_rows]
+        meta = {
+            "page": page,
+            "page_size": page_size,
+            "from": dt_from.isoformat(),
+            "to": dt_to.isoformat(),
+            "class_id": class_id,
+        }
+        if wants_columnar(request):
+            # count = rows of this page, total = all matching rows
+            return Response(Columns(HISTORY_ROW_FIELDS, rows).payload(total=total, **meta))
+        return Response({"count": total, **meta, "results": [dict(zip(HISTORY_ROW_FIELDS, row)) for row in rows]})
 
     @action(detail=False, methods=["get"], url_path="records")
     def list_records(self, request: Request) -> Response:  # type: ignore[override]
@@ -1366,7 +1372,7 @@ class WingSupervisorViewSet(viewsets.ViewSet):
     """APIs for Wing Supervisors: overview KPIs and missing attendance entries for today (or a given date).
     Scopes data to the wings supervised by the current user. Superusers see all wings.
     Also exposes a minimal approvals workflow over teacher-submitted attendance, where
-    submission is modeled by the `locked` flag on AttendanceRecord.
+    submission is modeled by AttendanceSubmission batches (one per class/date/period).
 
     Additionally, exposes a daily aggregated absence status per student (الحالة العامة اليومية)
     using the same first-two-periods policy used by alerts.
@@ -1397,6 +1403,7 @@ class WingSupervisorViewSet(viewsets.ViewSet):
         return staff, wing_ids
 
     @action(detail=False, methods=["get"], url_path="me")
+    @conditional_get("auth.user", "auth.group", "school.staff", "school.wing")
     def me(self, request: Request) -> Response:
         """Return current Wing Supervisor context: roles, staff, supervised wings, and primary wing details.
         This augments the previous diagnostic payload with `primary_wing` fields used in page headers.
@@ -1916,11 +1923,13 @@ class WingSupervisorViewSet(viewsets.ViewSet):
             bucket = None  # type: ignore
 
         # Prefer explicit date if provided; otherwise use range
-        dt, err = _parse_date_or_400(request.query_params.get("date"))
-        if dt is not None and not err:
-            return gb, bucket, dt, None, None
-        rng = _parse_range_or_400(request.query_params.get("from"), request.query_params.get("to"))
-        if isinstance(rng, tuple):
+        # (_parse_date_or_400 defaults to today, which would shadow from/to when date is absent)
+        if request.query_params.get("date") or not (request.query_params.get("from") or request.query_params.get("to")):
+            dt, err = _parse_date_or_400(request.query_params.get("date"))
+            if dt is not None and not err:
+                return gb, bucket, dt, None, None
+        rng, _err = _parse_range_or_400(request.query_params.get("from"), request.query_params.get("to"))
+        if rng is not None:
             return gb, bucket, None, rng[0], rng[1]
         # Fallback to today if parsing failed
         return gb, bucket, timezone.localdate(), None, None
@@ -1942,14 +1951,11 @@ class WingSupervisorViewSet(viewsets.ViewSet):
                 wing_ids = []
         return list(wing_ids or [])
 
-    @action(detail=False, methods=["get"], url_path="reports/classes")
-    def reports_classes(self, request: Request) -> Response:
-        """حساب تقرير الحضور/الغياب لكل صف ضمن أجنحة المستخدم (يومي/أسبوعي/شهري).
-        الاستجابة: عناصر تحتوي مفاتيح مثل: class_id, class_name, wing_id, date_bucket, total_students,
-        absent_total, absent_excused, absent_unexcused, absent_pending(0 حاليًا), present, present_pct, absent_pct
+    def _report_data(self, request: Request):
+        """صلاحيات + نطاق الأجنحة + التجميع الزمني، ثم تشغيل محرك التقارير (services.reports).
+        Returns (group_by, ReportData) or (group_by, None) when the user has no wing in scope.
         """
-        from school.models import AttendanceRecord, Class, Student, Term  # type: ignore
-        from discipline.models import Absence  # type: ignore
+        from .services import reports
 
         # صلاحيات عرض التقارير
         user = request.user
@@ -1960,533 +1966,73 @@ class WingSupervisorViewSet(viewsets.ViewSet):
         ):
             raise PermissionDenied("صلاحية غير كافية لعرض التقارير")
 
-        gb, bucket, single_dt, from_dt, to_dt = self._parse_grouping(request)
+        gb, _bucket, single_dt, from_dt, to_dt = self._parse_grouping(request)
         wing_ids = self._visible_wing_ids(request)
         if not wing_ids and not getattr(request.user, "is_superuser", False):
-            return Response({"items": []})
-
-        # Scope classes by wing permissions and build a proper map including wing_id
-        class_q = Class.objects.all()
-        if hasattr(Class, "wing_id"):
-            class_q = class_q.filter(wing_id__in=wing_ids) if wing_ids else class_q.none()
-            class_map = {cid: (name, wid) for cid, name, wid in class_q.values_list("id", "name", "wing_id")}
-        else:
-            class_map = {cid: (name, None) for cid, name in class_q.values_list("id", "name")}
-        class_ids = list(class_map.keys())
-
-        # Total students per class (active only if field exists)
-        stu_q = Student.objects.filter(class_fk_id__in=class_ids)
-        try:
-            stu_q = stu_q.filter(is_active=True)
-        except Exception:
-            try:
-                stu_q = stu_q.filter(active=True)
-            except Exception:
-                pass
-        totals = {cid: cnt for cid, cnt in stu_q.values_list("class_fk_id").annotate(cnt=Count("id"))}
-
-        # Attendance records scoped to date or range and classes
-        rec_qs = AttendanceRecord.objects.all()
-        if single_dt is not None:
-            rec_qs = rec_qs.filter(date=single_dt)
-        else:
-            rec_qs = rec_qs.filter(date__gte=from_dt, date__lte=to_dt)
-        # Source gating (supervisor-approved) if field exists
-        try:
-            rec_qs = rec_qs.filter(source="supervisor")
-        except Exception:
-            pass
-        if class_ids:
-            rec_qs = rec_qs.filter(**{f"{_CLASS_FK_ID}__in": class_ids})
-
-        # Term grouping special handling
-        term_mode = gb == "term"
+            return gb, None
         include_pending = (request.query_params.get("include_pending") or "").strip().lower() in {"1", "true", "yes"}
-        items = []
-        if term_mode:
-            # Build term buckets intersecting the requested date(s)
-            if single_dt is not None:
-                term_q = Term.objects.filter(start_date__lte=single_dt, end_date__gte=single_dt)
-            else:
-                term_q = Term.objects.filter(end_date__gte=from_dt, start_date__lte=to_dt)
-            terms = list(term_q.order_by("start_date").values("id", "name", "start_date", "end_date"))
-            for t in terms:
-                t_from = t["start_date"]
-                t_to = t["end_date"]
-                t_rec = rec_qs.filter(date__gte=t_from, date__lte=t_to)
-                base_vals = t_rec.values(_CLASS_FK_ID)
-                agg = base_vals.annotate(
-                    absent_excused=Count("student_id", filter=Q(status="excused"), distinct=True),
-                    absent_unexcused=Count("student_id", filter=Q(status__in=["absent", "runaway"]), distinct=True),
-                )
-                # حساب الأعذار المعلّقة إن طُلب
-                pending_map: dict[int, int] = {}
-                if include_pending:
-                    pending_statuses = [
-                        "PENDING_JUSTIFICATION",
-                        "UNDER_REVIEW",
-                        "NEEDS_CORRECTION",
-                    ]
-                    pend_qs = (
-                        Absence.objects.filter(date__gte=t_from, date__lte=t_to, student__class_fk_id__in=class_ids)
-                        .filter(excuse_requests__status__in=pending_statuses)
-                        .values("student__class_fk_id")
-                        .annotate(pending=Count("student_id", distinct=True))
-                    )
-                    for r in pend_qs:
-                        pending_map[int(r.get("student__class_fk_id") or 0)] = int(r.get("pending") or 0)
-
-                for row in agg[:100000]:
-                    cid = row.get(_CLASS_FK_ID)
-                    if cid not in class_map:
-                        continue
-                    cls_name, wing_id = class_map[cid]
-                    total_students = int(totals.get(cid, 0))
-                    exc = int(row.get("absent_excused") or 0)
-                    unx = int(row.get("absent_unexcused") or 0)
-                    abs_total = exc + unx
-                    present = max(total_students - abs_total, 0)
-                    present_pct = float(round((present / total_students) * 100, 2)) if total_students else 0.0
-                    absent_pct = float(round((abs_total / total_students) * 100, 2)) if total_students else 0.0
-                    date_bucket = f"{t['name']}"
-                    pending = int(pending_map.get(int(cid or 0), 0)) if include_pending else 0
-                    items.append(
-                        {
-                            "class_id": cid,
-                            "class_name": cls_name,
-                            "wing_id": wing_id,
-                            "date_bucket": date_bucket,
-                            "total_students": total_students,
-                            "absent_total": abs_total,
-                            "absent_excused": exc,
-                            "absent_unexcused": unx,
-                            "absent_pending": pending,
-                            "present": present,
-                            "present_pct": present_pct,
-                            "absent_pct": absent_pct,
-                        }
-                    )
-        else:
-            # Instantiate the truncation expression once, do NOT call it again like bucket_expr("date")
-            bucket_expr = bucket("date")
-            base_vals = rec_qs.values(_CLASS_FK_ID, bucket_expr)
-            agg = base_vals.annotate(
-                absent_excused=Count("student_id", filter=Q(status="excused"), distinct=True),
-                absent_unexcused=Count("student_id", filter=Q(status__in=["absent", "runaway"]), distinct=True),
-            )
-            # خريطة الأعذار المعلّقة لكل (class_id, bucket)
-            pending_map: dict[tuple[int, str], int] = {}
-            if include_pending:
-                pending_statuses = [
-                    "PENDING_JUSTIFICATION",
-                    "UNDER_REVIEW",
-                    "NEEDS_CORRECTION",
-                ]
-                abs_q = Absence.objects.filter(student__class_fk_id__in=class_ids)
-                if single_dt is not None:
-                    abs_q = abs_q.filter(date=single_dt)
-                else:
-                    abs_q = abs_q.filter(date__gte=from_dt, date__lte=to_dt)
-                pend_vals = (
-                    abs_q.filter(excuse_requests__status__in=pending_statuses)
-                    .values("student__class_fk_id", bucket_expr)
-                    .annotate(pending=Count("student_id", distinct=True))
-                )
-                for r in pend_vals:
-                    cid = int(r.get("student__class_fk_id") or 0)
-                    db = r.get("date__trunc") or r.get("date__week") or r.get("date__month")
-                    try:
-                        db_s = db.isoformat()
-                    except Exception:
-                        db_s = str(db)
-                    pending_map[(cid, db_s)] = int(r.get("pending") or 0)
-            for row in agg[:100000]:  # safety cap
-                cid = row.get(_CLASS_FK_ID)
-                if cid not in class_map:
-                    continue
-                cls_name, wing_id = class_map[cid]
-                total_students = int(totals.get(cid, 0))
-                exc = int(row.get("absent_excused") or 0)
-                unx = int(row.get("absent_unexcused") or 0)
-                abs_total = exc + unx
-                present = max(total_students - abs_total, 0)
-                present_pct = float(round((present / total_students) * 100, 2)) if total_students else 0.0
-                absent_pct = float(round((abs_total / total_students) * 100, 2)) if total_students else 0.0
-                date_bucket = row.get("date__trunc") or row.get("date__week") or row.get("date__month")
-                # Normalize bucket to ISO string (YYYY-MM-DD)
-                try:
-                    date_bucket = date_bucket.isoformat()
-                except Exception:
-                    date_bucket = str(date_bucket)
-                pending = int(pending_map.get((int(cid or 0), str(date_bucket)), 0)) if include_pending else 0
-                items.append(
-                    {
-                        "class_id": cid,
-                        "class_name": cls_name,
-                        "wing_id": wing_id,
-                        "date_bucket": date_bucket,
-                        "total_students": total_students,
-                        "absent_total": abs_total,
-                        "absent_excused": exc,
-                        "absent_unexcused": unx,
-                        "absent_pending": pending,
-                        "present": present,
-                        "present_pct": present_pct,
-                        "absent_pct": absent_pct,
-                    }
-                )
-        # Stable ordering by bucket then class
-        items.sort(key=lambda x: (x.get("date_bucket") or "", str(x.get("class_name") or "")))
-        return Response({"items": items, "group_by": gb})
-
-    @action(detail=False, methods=["get"], url_path="reports/wings")
-    def reports_wings(self, request: Request) -> Response:
-        """تقرير الحضور/الغياب مجمّعًا على مستوى الجناح (يومي/أسبوعي/شهري) ضمن صلاحيات المستخدم."""
-        from school.models import AttendanceRecord, Class, Student, Term  # type: ignore
-        from discipline.models import Absence  # type: ignore
+        data = reports.collect(
+            wing_ids=wing_ids,
+            group_by=gb,
+            single_dt=single_dt,
+            from_dt=from_dt,
+            to_dt=to_dt,
+            include_pending=include_pending,
+        )
+        return gb, data
 
-        # صلاحيات
-        user = request.user
-        if not (
-            getattr(user, "is_superuser", False)
-            or getattr(user, "is_staff", False)
-            or user.has_perm("attendance.report_view")
-        ):
-            raise PermissionDenied("صلاحية غير كافية لعرض التقارير")
+    @action(detail=False, methods=["get"], url_path="reports/classes", renderer_classes=columnar_renderers())
+    @replica_reads
+    def reports_classes(self, request: Request) -> Response:
+        """حساب تقرير الحضور/الغياب لكل صف ضمن أجنحة المستخدم (يومي/أسبوعي/شهري/فصلي).
+        الاستجابة: عناصر تحتوي مفاتيح مثل: class_id, class_name, wing_id, date_bucket, total_students,
+        absent_total, absent_excused, absent_unexcused, absent_pending (مع include_pending=1), present, present_pct, absent_pct
+        """
+        from .services.reports import CLASS_FIELDS, class_tuples
 
-        gb, bucket, single_dt, from_dt, to_dt = self._parse_grouping(request)
-        wing_ids = self._visible_wing_ids(request)
-        if not wing_ids and not getattr(request.user, "is_superuser", False):
+        gb, data = self._report_data(request)
+        if wants_columnar(request):
+            return Response(Columns(CLASS_FIELDS, class_tuples(data) if data is not None else []).payload(group_by=gb))
+        if data is None:
             return Response({"items": []})
+        return list_response(
+            request, {"group_by": gb}, "items", class_tuples(data), transform=lambda t: dict(zip(CLASS_FIELDS, t))
+        )
 
-        # Student totals per wing (based on class membership)
-        cls_q = Class.objects.all()
-        if hasattr(Class, "wing_id"):
-            cls_q = cls_q.filter(wing_id__in=wing_ids) if wing_ids else cls_q.none()
-        class_ids_by_wing: dict[int, list[int]] = {}
-        for cid, wid in cls_q.values_list("id", "wing_id"):
-            class_ids_by_wing.setdefault(int(wid or 0), []).append(int(cid))
-
-        stu_q = Student.objects.filter(class_fk_id__in=[c for ids in class_ids_by_wing.values() for c in ids])
-        try:
-            stu_q = stu_q.filter(is_active=True)
-        except Exception:
-            try:
-                stu_q = stu_q.filter(active=True)
-            except Exception:
-                pass
-        totals_by_wing: dict[int, int] = {}
-        for wid, cnt in stu_q.values_list("class_fk__wing_id").annotate(cnt=Count("id")):
-            totals_by_wing[int(wid or 0)] = int(cnt or 0)
-
-        rec_qs = AttendanceRecord.objects.all()
-        if single_dt is not None:
-            rec_qs = rec_qs.filter(date=single_dt)
-        else:
-            rec_qs = rec_qs.filter(date__gte=from_dt, date__lte=to_dt)
-        try:
-            rec_qs = rec_qs.filter(source="supervisor")
-        except Exception:
-            pass
-        if class_ids_by_wing:
-            rec_qs = rec_qs.filter(**{f"{_CLASS_FK_ID}__in": [c for ids in class_ids_by_wing.values() for c in ids]})
+    @action(detail=False, methods=["get"], url_path="reports/wings", renderer_classes=columnar_renderers())
+    @replica_reads
+    def reports_wings(self, request: Request) -> Response:
+        """تقرير الحضور/الغياب مجمّعًا على مستوى الجناح (يومي/أسبوعي/شهري/فصلي) ضمن صلاحيات المستخدم."""
+        from .services.reports import WING_FIELDS, wing_tuples
 
-        include_pending = (request.query_params.get("include_pending") or "").strip().lower() in {"1", "true", "yes"}
-        items = []
-        if gb == "term":
-            if single_dt is not None:
-                term_q = Term.objects.filter(start_date__lte=single_dt, end_date__gte=single_dt)
-            else:
-                term_q = Term.objects.filter(end_date__gte=from_dt, start_date__lte=to_dt)
-            terms = list(term_q.order_by("start_date").values("id", "name", "start_date", "end_date"))
-            for t in terms:
-                t_from = t["start_date"]
-                t_to = t["end_date"]
-                t_rec = rec_qs.filter(date__gte=t_from, date__lte=t_to)
-                vals = t_rec.values(f"{_CLASS_FK_ID}__wing_id")
-                agg = vals.annotate(
-                    absent_excused=Count("student_id", filter=Q(status="excused"), distinct=True),
-                    absent_unexcused=Count("student_id", filter=Q(status__in=["absent", "runaway"]), distinct=True),
-                )
-                # pending per wing during term
-                pending_map: dict[int, int] = {}
-                if include_pending:
-                    pending_statuses = [
-                        "PENDING_JUSTIFICATION",
-                        "UNDER_REVIEW",
-                        "NEEDS_CORRECTION",
-                    ]
-                    pend_vals = (
-                        Absence.objects.filter(
-                            date__gte=t_from,
-                            date__lte=t_to,
-                            student__class_fk__wing_id__in=list(class_ids_by_wing.keys()),
-                        )
-                        .filter(excuse_requests__status__in=pending_statuses)
-                        .values("student__class_fk__wing_id")
-                        .annotate(pending=Count("student_id", distinct=True))
-                    )
-                    for r in pend_vals:
-                        widk = int(r.get("student__class_fk__wing_id") or 0)
-                        pending_map[widk] = int(r.get("pending") or 0)
-
-                for row in agg[:100000]:
-                    wid = int(row.get(f"{_CLASS_FK_ID}__wing_id") or 0)
-                    total_students = int(totals_by_wing.get(wid, 0))
-                    exc = int(row.get("absent_excused") or 0)
-                    unx = int(row.get("absent_unexcused") or 0)
-                    abs_total = exc + unx
-                    present = max(total_students - abs_total, 0)
-                    present_pct = float(round((present / total_students) * 100, 2)) if total_students else 0.0
-                    absent_pct = float(round((abs_total / total_students) * 100, 2)) if total_students else 0.0
-                    pending = int(pending_map.get(wid, 0)) if include_pending else 0
-                    items.append(
-                        {
-                            "wing_id": wid,
-                            "date_bucket": f"{t['name']}",
-                            "total_students": total_students,
-                            "absent_total": abs_total,
-                            "absent_excused": exc,
-                            "absent_unexcused": unx,
-                            "absent_pending": pending,
-                            "present": present,
-                            "present_pct": present_pct,
-                            "absent_pct": absent_pct,
-                        }
-                    )
-        else:
-            bucket_expr = bucket("date")
-            # Attach wing via Class relation
-            vals = rec_qs.values(f"{_CLASS_FK_ID}__wing_id", bucket_expr)
-            agg = vals.annotate(
-                absent_excused=Count("student_id", filter=Q(status="excused"), distinct=True),
-                absent_unexcused=Count("student_id", filter=Q(status__in=["absent", "runaway"]), distinct=True),
-            )
-            # pending map per (wing_id, bucket)
-            pending_map: dict[tuple[int, str], int] = {}
-            if include_pending:
-                pending_statuses = [
-                    "PENDING_JUSTIFICATION",
-                    "UNDER_REVIEW",
-                    "NEEDS_CORRECTION",
-                ]
-                abs_q = Absence.objects.filter(student__class_fk__wing_id__in=list(class_ids_by_wing.keys()))
-                if single_dt is not None:
-                    abs_q = abs_q.filter(date=single_dt)
-                else:
-                    abs_q = abs_q.filter(date__gte=from_dt, date__lte=to_dt)
-                pend_vals = (
-                    abs_q.filter(excuse_requests__status__in=pending_statuses)
-                    .values("student__class_fk__wing_id", bucket_expr)
-                    .annotate(pending=Count("student_id", distinct=True))
-                )
-                for r in pend_vals:
-                    widk = int(r.get("student__class_fk__wing_id") or 0)
-                    db = r.get("date__trunc") or r.get("date__week") or r.get("date__month")
-                    try:
-                        db_s = db.isoformat()
-                    except Exception:
-                        db_s = str(db)
-                    pending_map[(widk, db_s)] = int(r.get("pending") or 0)
-            for row in agg[:100000]:
-                wid = int(row.get(f"{_CLASS_FK_ID}__wing_id") or 0)
-                total_students = int(totals_by_wing.get(wid, 0))
-                exc = int(row.get("absent_excused") or 0)
-                unx = int(row.get("absent_unexcused") or 0)
-                abs_total = exc + unx
-                present = max(total_students - abs_total, 0)
-                present_pct = float(round((present / total_students) * 100, 2)) if total_students else 0.0
-                absent_pct = float(round((abs_total / total_students) * 100, 2)) if total_students else 0.0
-                date_bucket = row.get("date__trunc") or row.get("date__week") or row.get("date__month")
-                try:
-                    date_bucket = date_bucket.isoformat()
-                except Exception:
-                    date_bucket = str(date_bucket)
-                pending = int(pending_map.get((wid, str(date_bucket)), 0)) if include_pending else 0
-                items.append(
-                    {
-                        "wing_id": wid,
-                        "date_bucket": date_bucket,
-                        "total_students": total_students,
-                        "absent_total": abs_total,
-                        "absent_excused": exc,
-                        "absent_unexcused": unx,
-                        "absent_pending": pending,
-                        "present": present,
-                        "present_pct": present_pct,
-                        "absent_pct": absent_pct,
-                    }
-                )
-        items.sort(key=lambda x: (x.get("date_bucket") or "", int(x.get("wing_id") or 0)))
-        return Response({"items": items, "group_by": gb})
+        gb, data = self._report_data(request)
+        if wants_columnar(request):
+            return Response(Columns(WING_FIELDS, wing_tuples(data) if data is not None else []).payload(group_by=gb))
+        if data is None:
+            return Response({"items": []})
+        return list_response(
+            request, {"group_by": gb}, "items", wing_tuples(data), transform=lambda t: dict(zip(WING_FIELDS, t))
+        )
 
-    @action(detail=False, methods=["get"], url_path="reports/school")
+    @action(detail=False, methods=["get"], url_path="reports/school", renderer_classes=columnar_renderers())
+    @replica_reads
     def reports_school(self, request: Request) -> Response:
         """تقرير الحضور/الغياب للمدرسة كاملة (ضمن نطاق أجنحة المستخدم) بحسب التجميع الزمني."""
-        from school.models import AttendanceRecord, Class, Student, Term  # type: ignore
-        from discipline.models import Absence  # type: ignore
-
-        # صلاحيات
-        user = request.user
-        if not (
-            getattr(user, "is_superuser", False)
-            or getattr(user, "is_staff", False)
-            or user.has_perm("attendance.report_view")
-        ):
-            raise PermissionDenied("صلاحية غير كافية لعرض التقارير")
+        from .services.reports import SCHOOL_FIELDS, school_tuples
 
-        gb, bucket, single_dt, from_dt, to_dt = self._parse_grouping(request)
-        wing_ids = self._visible_wing_ids(request)
-        if not wing_ids and not getattr(request.user, "is_superuser", False):
-            return Response({"items": []})
-
-        # Resolve class IDs within allowed wings
-        cls_q = Class.objects.all()
-        if hasattr(Class, "wing_id"):
-            cls_q = cls_q.filter(wing_id__in=wing_ids) if wing_ids else cls_q.none()
-        class_ids = list(cls_q.values_list("id", flat=True))
-
-        # Total students across allowed wings
-        stu_q = Student.objects.filter(class_fk_id__in=class_ids)
-        try:
-            stu_q = stu_q.filter(is_active=True)
-        except Exception:
-            try:
-                stu_q = stu_q.filter(active=True)
-            except Exception:
-                pass
-        total_students = int(stu_q.count())
-
-        rec_qs = AttendanceRecord.objects.all()
-        if single_dt is not None:
-            rec_qs = rec_qs.filter(date=single_dt)
-        else:
-            rec_qs = rec_qs.filter(date__gte=from_dt, date__lte=to_dt)
-        try:
-            rec_qs = rec_qs.filter(source="supervisor")
-        except Exception:
-            pass
-        if class_ids:
-            rec_qs = rec_qs.filter(**{f"{_CLASS_FK_ID}__in": class_ids})
-
-        include_pending = (request.query_params.get("include_pending") or "").strip().lower() in {"1", "true", "yes"}
-        items = []
-        if gb == "term":
-            if single_dt is not None:
-                term_q = Term.objects.filter(start_date__lte=single_dt, end_date__gte=single_dt)
-            else:
-                term_q = Term.objects.filter(end_date__gte=from_dt, start_date__lte=to_dt)
-            terms = list(term_q.order_by("start_date").values("id", "name", "start_date", "end_date"))
-            for t in terms:
-                t_from = t["start_date"]
-                t_to = t["end_date"]
-                t_rec = rec_qs.filter(date__gte=t_from, date__lte=t_to)
-                vals = t_rec.values("date")  # dummy
-                agg = vals.annotate(
-                    absent_excused=Count("student_id", filter=Q(status="excused"), distinct=True),
-                    absent_unexcused=Count("student_id", filter=Q(status__in=["absent", "runaway"]), distinct=True),
-                )
-                # Single row per term (aggregate over all)
-                exc = 0
-                unx = 0
-                # Pending map (single number per term for school)
-                pending = 0
-                if include_pending:
-                    pending_statuses = [
-                        "PENDING_JUSTIFICATION",
-                        "UNDER_REVIEW",
-                        "NEEDS_CORRECTION",
-                    ]
-                    pend_q = (
-                        Absence.objects.filter(student__class_fk_id__in=class_ids, date__gte=t_from, date__lte=t_to)
-                        .filter(excuse_requests__status__in=pending_statuses)
-                        .values("student_id")
-                        .distinct()
-                    )
-                    pending = int(pend_q.count())
-
-                for row in agg[:1]:
-                    exc = int(row.get("absent_excused") or 0)
-                    unx = int(row.get("absent_unexcused") or 0)
-                    abs_total = exc + unx
-                    present = max(total_students - abs_total, 0)
-                    present_pct = float(round((present / total_students) * 100, 2)) if total_students else 0.0
-                    absent_pct = float(round((abs_total / total_students) * 100, 2)) if total_students else 0.0
-                    items.append(
-                        {
-                            "date_bucket": f"{t['name']}",
-                            "total_students": total_students,
-                            "absent_total": abs_total,
-                            "absent_excused": exc,
-                            "absent_unexcused": unx,
-                            "absent_pending": pending,
-                            "present": present,
-                            "present_pct": present_pct,
-                            "absent_pct": absent_pct,
-                        }
-                    )
-        else:
-            bucket_expr = bucket("date")
-            vals = rec_qs.values(bucket_expr)
-            agg = vals.annotate(
-                absent_excused=Count("student_id", filter=Q(status="excused"), distinct=True),
-                absent_unexcused=Count("student_id", filter=Q(status__in=["absent", "runaway"]), distinct=True),
+        gb, data = self._report_data(request)
+        if wants_columnar(request):
+            return Response(
+                Columns(SCHOOL_FIELDS, school_tuples(data) if data is not None else []).payload(group_by=gb)
             )
-            # pending per bucket for school
-            pending_map: dict[str, int] = {}
-            if include_pending:
-                pending_statuses = [
-                    "PENDING_JUSTIFICATION",
-                    "UNDER_REVIEW",
-                    "NEEDS_CORRECTION",
-                ]
-                abs_q = Absence.objects.filter(student__class_fk_id__in=class_ids)
-                if single_dt is not None:
-                    abs_q = abs_q.filter(date=single_dt)
-                else:
-                    abs_q = abs_q.filter(date__gte=from_dt, date__lte=to_dt)
-                pend_vals = (
-                    abs_q.filter(excuse_requests__status__in=pending_statuses)
-                    .values(bucket_expr)
-                    .annotate(pending=Count("student_id", distinct=True))
-                )
-                for r in pend_vals:
-                    db = r.get("date__trunc") or r.get("date__week") or r.get("date__month")
-                    try:
-                        db_s = db.isoformat()
-                    except Exception:
-                        db_s = str(db)
-                    pending_map[db_s] = int(r.get("pending") or 0)
-            for row in agg[:100000]:
-                exc = int(row.get("absent_excused") or 0)
-                unx = int(row.get("absent_unexcused") or 0)
-                abs_total = exc + unx
-                present = max(total_students - abs_total, 0)
-                present_pct = float(round((present / total_students) * 100, 2)) if total_students else 0.0
-                absent_pct = float(round((abs_total / total_students) * 100, 2)) if total_students else 0.0
-                date_bucket = row.get("date__trunc") or row.get("date__week") or row.get("date__month")
-                try:
-                    date_bucket = date_bucket.isoformat()
-                except Exception:
-                    date_bucket = str(date_bucket)
-                pending = int(pending_map.get(str(date_bucket), 0)) if include_pending else 0
-                items.append(
-                    {
-                        "date_bucket": date_bucket,
-                        "total_students": total_students,
-                        "absent_total": abs_total,
-                        "absent_excused": exc,
-                        "absent_unexcused": unx,
-                        "absent_pending": pending,
-                        "present": present,
-                        "present_pct": present_pct,
-                        "absent_pct": absent_pct,
-                    }
-                )
-        items.sort(key=lambda x: (x.get("date_bucket") or "",))
-        return Response({"items": items, "group_by": gb})
+        if data is None:
+            return Response({"items": []})
+        return list_response(
+            request, {"group_by": gb}, "items", school_tuples(data), transform=lambda t: dict(zip(SCHOOL_FIELDS, t))
+        )
 
     @action(detail=False, methods=["get"], url_path="reports/terms")
+    @replica_reads
     def reports_terms(self, request: Request) -> Response:
         """إرجاع حدود الفصول الدراسية (Terms) لخيارات التجميع الفصلي."""
         try:
@@ -2516,11 +2062,12 @@ class WingSupervisorViewSet(viewsets.ViewSet):
         except Exception as e:
             return Response({"detail": f"failed: {e}"}, status=500)
 
-    @action(detail=False, methods=["get"], url_path="daily-absences")
+    @action(detail=False, methods=["get"], url_path="daily-absences", renderer_classes=columnar_renderers())
     def daily_absences(self, request: Request) -> Response:
         """Return general daily absence status per student for the supervisor's wing(s).
-        Uses first-two-periods rule consistent with Absence Alerts policy.
-        Query params: date=YYYY-MM-DD (default today), class_id?:int
+        Uses first-two-periods rule consistent with Absence Alerts policy, read from the materialized
+        daily states (school.AttendanceDaily, see services/daily_states).
+        Query params: date=YYYY-MM-DD (default today), class_id?:int, wing_id?:int
         Response shape:
         {
             date: str,
@@ -2531,7 +2078,23 @@ class WingSupervisorViewSet(viewsets.ViewSet):
             ]
         }
         """
-        from school.models import AttendanceRecord, Term, AttendancePolicy, SchoolHoliday  # type: ignore
+        from .services.daily_states import DAILY_FIELDS
+
+        found = self._daily_absence_rows(request)
+        if isinstance(found, Response):
+            return found
+        dt, rows = found
+        counts = {"excused": 0, "unexcused": 0, "none": 0}
+        for row in rows:
+            counts[row[-1]] = counts.get(row[-1], 0) + 1
+        if wants_columnar(request):
+            return Response(Columns(DAILY_FIELDS, rows).payload(date=dt.isoformat(), counts=counts))
+        envelope = {"date": dt.isoformat(), "counts": counts}
+        return list_response(request, envelope, "items", rows, transform=lambda row: dict(zip(DAILY_FIELDS, row)))
+
+    def _daily_absence_rows(self, request: Request):
+        """(date, DAILY_FIELDS tuples) of daily-absences and its exports, or an error Response."""
+        from school.models import SchoolHoliday  # type: ignore
 
         dt, err = _parse_date_or_400(request.query_params.get("date"))
         if err:
@@ -2556,111 +2119,22 @@ class WingSupervisorViewSet(viewsets.ViewSet):
                 wing_ids = [wing_id_int]
             else:
                 wing_ids = []
-        if not wing_ids and not getattr(request.user, "is_superuser", False):
-            return Response(
-                {
-                    "date": dt.isoformat(),
-                    "counts": {"excused": 0, "unexcused": 0, "none": 0},
-                    "items": [],
-                }
-            )
-
-        # Holiday check
-        try:
-            if SchoolHoliday.objects.filter(date=dt).exists():
-                return Response(
-                    {
-                        "date": dt.isoformat(),
-                        "counts": {"excused": 0, "unexcused": 0, "none": 0},
-                        "items": [],
-                    }
-                )
-        except Exception:
-            pass
 
-        # Determine policy for the date
-        try:
-            term = Term.objects.filter(start_date__lte=dt, end_date__gte=dt).order_by("-start_date").first()
-            pol = AttendancePolicy.objects.filter(term=term).order_by("-id").first() if term else None
-            first_two = set((pol.first_two_periods_numbers or [1, 2])) if pol else {1, 2}
-            working_days = set(pol.working_days or [1, 2, 3, 4, 5]) if pol else {1, 2, 3, 4, 5}
-        except Exception:
-            first_two = {1, 2}
-            working_days = {1, 2, 3, 4, 5}
+        # Daily states are materialized per student/date when periods are saved: one indexed read
+        # (ordered by priority: unexcused, excused, none; then by class and name)
+        from .services.daily_states import daily_absence_tuples
 
-        # Fetch first-two-periods records for the date and supervised wings
-        qs = (
-            AttendanceRecord.objects.filter(date=dt, period_number__in=list(first_two))
-            .select_related("student", "classroom")
-            .order_by("classroom_id", "student_id", "period_number")
-        )
-        if class_id_int:
-            qs = qs.filter(classroom_id=class_id_int)
-        if wing_ids and not getattr(request.user, "is_superuser", False):
+        rows = []
+        if wing_ids or getattr(request.user, "is_superuser", False):
+            # Holiday check (SchoolHoliday stores start..end ranges)
             try:
-                qs = qs.filter(classroom__wing_id__in=wing_ids)
+                is_holiday = SchoolHoliday.objects.filter(start__lte=dt, end__gte=dt).exists()
             except Exception:
-                pass
-
-        per_student: dict[int, dict] = {}
-        # Map period numbers to p1/p2 labels deterministically
-        map_slots = {}
-        p_sorted = sorted(first_two)
-        if len(p_sorted) >= 1:
-            map_slots[p_sorted[0]] = "p1"
-        if len(p_sorted) >= 2:
-            map_slots[p_sorted[1]] = "p2"
-
-        for r in qs[:10000]:  # safety cap
-            sid = r.student_id
-            if sid not in per_student:
-                per_student[sid] = {
-                    "student_id": sid,
-                    "student_name": getattr(getattr(r, "student", None), "full_name", None),
-                    "class_id": getattr(r, "classroom_id", None),
-                    "class_name": getattr(getattr(r, "classroom", None), "name", None),
-                    "p1": None,
-                    "p2": None,
-                }
-            key = map_slots.get(getattr(r, "period_number", None))
-            if key:
-                per_student[sid][key] = getattr(r, "status", None)
-
-        # Classify according to policy
-        UNEXCUSED = {"absent", "runaway"}
-        EXCUSED = {"excused"}
-        NEUTRAL = {"present", "late", "left_early"}
-
-        items = []
-        counts = {"excused": 0, "unexcused": 0, "none": 0}
-        for rec in per_student.values():
-            s1 = rec.get("p1")
-            s2 = rec.get("p2")
-            # If working day filter can be applied via any row's day_of_week, but rows already limited to date.
-            state = "none"
-            if s1 is not None and s2 is not None:
-                if s1 in NEUTRAL or s2 in NEUTRAL:
-                    state = "none"
-                elif (s1 in UNEXCUSED) or (s2 in UNEXCUSED):
-                    state = "unexcused"
-                elif (s1 in EXCUSED) and (s2 in EXCUSED):
-                    state = "excused"
-                else:
-                    state = "none"
-            rec_out = {**rec, "state": state}
-            items.append(rec_out)
-            counts[state] = counts.get(state, 0) + 1
-
-        # Sort with priority: unexcused, excused, none; then by class and name
-        prio = {"unexcused": 0, "excused": 1, "none": 2}
-        items.sort(
-            key=lambda x: (
-                prio.get(x.get("state"), 9),
-                x.get("class_name") or "",
-                x.get("student_name") or "",
-            )
-        )
-        return Response({"date": dt.isoformat(), "counts": counts, "items": items})
+                is_holiday = False
+            if not is_holiday:
+                scope = wing_ids if (wing_id_int or not getattr(request.user, "is_superuser", False)) else None
+                rows = daily_absence_tuples(dt, wing_ids=scope, class_id=class_id_int)
+        return dt, rows
 
     @action(detail=False, methods=["get"], url_path="daily-absences/export")
     def daily_absences_export(self, request: Request) -> HttpResponse:
@@ -2670,11 +2144,13 @@ class WingSupervisorViewSet(viewsets.ViewSet):
         Allowed keys: student_id, student_name, class_id, class_name, p1, p2, state.
         """
         # Reuse the logic from daily_absences to build items
-        resp_json = self.daily_absences(request).data  # type: ignore
-        # If daily_absences returned a DRF Response with error status, forward as is
-        if isinstance(resp_json, Response):
-            return resp_json  # type: ignore
-        items = resp_json.get("items", []) if isinstance(resp_json, dict) else []
+        from .services.daily_states import DAILY_FIELDS
+
+        found = self._daily_absence_rows(request)
+        # Errors (bad date...) are forwarded as is
+        if isinstance(found, Response):
+            return found  # type: ignore
+        items = [dict(zip(DAILY_FIELDS, row)) for row in found[1]]
         # Build CSV
         import io
 
@@ -2709,17 +2185,19 @@ class WingSupervisorViewSet(viewsets.ViewSet):
         bom = "\ufeff"
         content = (bom + csv_text).encode("utf-8")
         resp = HttpResponse(content, content_type="text/csv; charset=utf-8")
-        dt_str = resp_json.get("date") if isinstance(resp_json, dict) else timezone.localdate().isoformat()
+        dt_str = found[0].isoformat()
         resp["Content-Disposition"] = f"attachment; filename=wing-daily-absences-{dt_str}.csv"
         return resp
 
     @action(detail=False, methods=["get"], url_path=r"daily-absences/export\.docx")
     def daily_absences_export_docx(self, request: Request) -> HttpResponse:
         """Export the general daily absence classification as Word (DOCX)."""
-        resp_json = self.daily_absences(request).data  # type: ignore
-        if isinstance(resp_json, Response):
-            return resp_json  # type: ignore
-        items = resp_json.get("items", []) if isinstance(resp_json, dict) else []
+        from .services.daily_states import DAILY_FIELDS
+
+        found = self._daily_absence_rows(request)
+        if isinstance(found, Response):
+            return found  # type: ignore
+        items = [dict(zip(DAILY_FIELDS, row)) for row in found[1]]
         headers = ["الطالب", "الصف", "ح1", "ح2", "الحالة"]
         rows = []
         for it in items:
@@ -2738,14 +2216,15 @@ class WingSupervisorViewSet(viewsets.ViewSet):
             content,
             content_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         )
-        dt_str = resp_json.get("date") if isinstance(resp_json, dict) else timezone.localdate().isoformat()
+        dt_str = found[0].isoformat()
         resp["Content-Disposition"] = f"attachment; filename=wing-daily-absences-{dt_str}.docx"
         return resp
 
     @action(detail=False, methods=["get"], url_path="pending")
     def pending(self, request: Request) -> Response:
-        """List submitted attendance items awaiting supervisor decision.
-        Submission is indicated by a '[SUBMITTED @ ts]' tag in note OR legacy locked=True without supervisor source.
+        """List submitted attendance awaiting supervisor decision.
+        Pending work is the 'submitted' AttendanceSubmission batches of the day (indexed on status/date), returned
+        with per-batch counts under `batches`; `items` lists their records not yet approved.
         Results are scoped to the wings supervised by the current user (or all if superuser).
         Query params: date=YYYY-MM-DD (default today), class_id?:int
         """
@@ -2759,24 +2238,14 @@ class WingSupervisorViewSet(viewsets.ViewSet):
             class_id_int = None
         staff, wing_ids = self._get_staff_and_wing_ids(request.user)
         if not wing_ids and not getattr(request.user, "is_superuser", False):
-            return Response({"date": dt.isoformat(), "count": 0, "items": []})
+            return Response({"date": dt.isoformat(), "count": 0, "items": [], "batches": []})
         try:
-            from django.db.models import Q
-            from school.models import AttendanceRecord  # type: ignore
+            from .services.submissions import pending_batches
 
-            qs = (
-                AttendanceRecord.objects.filter(date=dt)
-                .select_related("student", "classroom", "subject", "teacher")
-                .order_by("classroom_id", "period_number", "student_id")
-            )
-            # Pending criteria: marked submitted in note OR legacy locked but not yet approved by supervisor
-            qs = qs.filter(Q(note__icontains="[SUBMITTED") | (Q(locked=True) & ~Q(source="supervisor")))
-            if class_id_int:
-                qs = qs.filter(classroom_id=class_id_int)
-            if wing_ids and not getattr(request.user, "is_superuser", False):
-                qs = qs.filter(classroom__wing_id__in=wing_ids)
+            scope = None if getattr(request.user, "is_superuser", False) else wing_ids
+            pending = pending_batches(dt, class_id=class_id_int, wing_ids=scope)
             items = []
-            for r in qs[:2000]:  # safety cap
+            for r in pending["records"][:2000]:  # safety cap
                 items.append(
                     {
                         "id": r.id,
@@ -2791,62 +2260,60 @@ class WingSupervisorViewSet(viewsets.ViewSet):
                         "teacher_name": getattr(getattr(r, "teacher", None), "full_name", None),
                     }
                 )
-            return Response({"date": dt.isoformat(), "count": len(items), "items": items})
+            return Response(
+                {"date": dt.isoformat(), "count": len(items), "items": items, "batches": pending["batches"]}
+            )
         except Exception as e:
             return Response({"detail": f"failed: {e}"}, status=500)
 
     @action(detail=False, methods=["post"], url_path="decide")
     def approvals_decide(self, request: Request) -> Response:
-        """Approve or reject a batch of attendance records by IDs.
-        Payload: { action: 'approve'|'reject', ids: number[], comment?: string }
-        Approve keeps records locked and annotates note; reject unlocks records for teacher correction.
+        """Approve or reject submitted attendance.
+        Payload: { action: 'approve'|'reject', batch_ids?: number[], ids?: number[], comment?: string }
+        batch_ids decide whole AttendanceSubmission batches; ids decide individual records (a rejection returns
+        their batches to the teacher). Approve locks records as supervisor-confirmed; reject unlocks them for
+        correction. Both run as set-based updates; `results` gives the outcome per requested id
+        (approved|rejected|skipped), for batch_ids when given, else for ids.
         """
         payload = request.data or {}
         action = (payload.get("action") or "").strip().lower()
         ids = payload.get("ids") or []
+        batch_ids = payload.get("batch_ids") or []
         if action not in ("approve", "reject"):
             return Response({"detail": "action must be approve|reject"}, status=400)
-        if not isinstance(ids, list) or not ids:
-            return Response({"detail": "ids must be a non-empty list"}, status=400)
+        if not isinstance(ids, list) or not isinstance(batch_ids, list) or not (ids or batch_ids):
+            return Response({"detail": "ids or batch_ids must be a non-empty list"}, status=400)
+        ids, err = _int_ids_or_400(ids)
+        if err:
+            return err
+        batch_ids, err = _int_ids_or_400(batch_ids, "batch_ids")
+        if err:
+            return err
         comment = (payload.get("comment") or "").strip()
         staff, wing_ids = self._get_staff_and_wing_ids(request.user)
         if not wing_ids and not getattr(request.user, "is_superuser", False):
             return Response({"detail": "no wing scope"}, status=403)
         try:
-            from django.utils import timezone
-            from school.models import AttendanceRecord  # type: ignore
+            from .services.submissions import decide_batches
 
-            now = timezone.now().strftime("%Y-%m-%d %H:%M")
             reviewer = getattr(staff, "full_name", None) or getattr(request.user, "username", "")
-            prefix = "APPROVED" if action == "approve" else "REJECTED"
-            updated = 0
-            qs = AttendanceRecord.objects.filter(id__in=ids)
-            if wing_ids and not getattr(request.user, "is_superuser", False):
-                qs = qs.filter(classroom__wing_id__in=wing_ids)
-            import re
-
-            submitted_re = re.compile(r"\[SUBMITTED[^\]]*\]\s*", re.IGNORECASE)
-            for r in qs:
-                raw_note = (getattr(r, "note", "") or "").strip()
-                # Strip any previous submission markers to avoid lingering in pending
-                cleaned_note = submitted_re.sub("", raw_note).strip()
-                tag = f"[{prefix} by {reviewer} @ {now}]"
-                new_note = f"{tag} {comment} | {cleaned_note}".strip().strip("|")[:300]
-                r.note = new_note
-                if action == "reject":
-                    r.locked = False  # allow teacher to edit and resubmit
-                    # Keep source as teacher for rejected items
-                    if getattr(r, "source", "teacher") != "supervisor":
-                        r.source = "teacher"
-                else:
-                    r.locked = True  # close on approval
-                    r.source = "supervisor"
-                try:
-                    r.save(update_fields=["note", "locked", "source", "updated_at"])
-                    updated += 1
-                except Exception:
-                    continue
-            return Response({"updated": updated, "action": action})
+            result = decide_batches(
+                action,
+                batch_ids=batch_ids or None,
+                record_ids=ids,
+                wing_ids=None if getattr(request.user, "is_superuser", False) else wing_ids,
+                user=request.user,
+                reviewer=reviewer,
+                comment=comment,
+            )
+            return Response(
+                {
+                    "updated": result["updated"],
+                    "batches": result["batches"],
+                    "action": action,
+                    "results": result["results"],
+                }
+            )
         except Exception as e:
             return Response({"detail": f"failed: {e}"}, status=500)
 
@@ -2859,7 +2326,8 @@ class WingSupervisorViewSet(viewsets.ViewSet):
           - comment?: string
           - evidence: file (optional, jpg/png/jpeg/webp/pdf, <= 5MB)
           - evidence_note?: string (optional)
-        Only records within the supervisor's wing(s) are affected.
+        Only records within the supervisor's wing(s) are affected; `results` gives the outcome per requested id
+        (excused|skipped). Runs as one set-based update (services/excuses.py).
         """
         payload = request.data or {}
         ids = payload.get("ids") or []
@@ -2873,69 +2341,43 @@ class WingSupervisorViewSet(viewsets.ViewSet):
                 ids = []
         if not isinstance(ids, list) or not ids:
             return Response({"detail": "ids must be a non-empty list"}, status=400)
+        ids, err = _int_ids_or_400(ids)
+        if err:
+            return err
         comment = (payload.get("comment") or "").strip()
         evidence_note = (payload.get("evidence_note") or "").strip()
         staff, wing_ids = self._get_staff_and_wing_ids(request.user)
         if not wing_ids and not getattr(request.user, "is_superuser", False):
             return Response({"detail": "no wing scope"}, status=403)
-        try:
-            from django.utils import timezone
-            from school.models import AttendanceRecord  # type: ignore
-            from apps.attendance.models import AttendanceEvidence  # type: ignore
-
-            now = timezone.now().strftime("%Y-%m-%d %H:%M")
-            reviewer = getattr(staff, "full_name", None) or getattr(request.user, "username", "")
-            updated = 0
-            evidence_file = request.FILES.get("evidence")
-            saved_evidence = []
-            # Validate file if present
-            if evidence_file is not None:
-                allowed = {"image/jpeg", "image/png", "image/webp", "application/pdf"}
-                ctype = getattr(evidence_file, "content_type", "") or ""
-                size = getattr(evidence_file, "size", 0) or 0
-                if ctype not in allowed:
-                    return Response({"detail": "unsupported evidence content-type"}, status=400)
-                if size > 5 * 1024 * 1024:
-                    return Response({"detail": "evidence file too large (max 5MB)"}, status=400)
-
-            qs = AttendanceRecord.objects.filter(id__in=ids)
-            if wing_ids and not getattr(request.user, "is_superuser", False):
-                qs = qs.filter(classroom__wing_id__in=wing_ids)
-            for r in qs:
-                r.status = "excused"
-                tag = f"[EXCUSED by {reviewer} @ {now}]"
-                raw_note = (getattr(r, "note", "") or "").strip()
-                new_note = f"{tag} {comment} | {raw_note}".strip().strip("|")[:300]
-                r.note = new_note
-                r.locked = True
-                r.source = "supervisor"
-                try:
-                    r.save(update_fields=["status", "note", "locked", "source", "updated_at"])
-                    updated += 1
-                except Exception:
-                    continue
-                # Save evidence (duplicate file per record if multiple ids are provided)
-                if evidence_file is not None:
-                    try:
-                        ev = AttendanceEvidence(
-                            record=r,
-                            file=evidence_file,
-                            content_type=getattr(evidence_file, "content_type", "") or "",
-                            original_name=getattr(evidence_file, "name", "") or "",
-                            note=evidence_note[:300],
-                            uploaded_by=getattr(request, "user", None),
-                        )
-                        ev.save()
-                        saved_evidence.append({"record": r.id, "evidence_id": ev.id})
-                    except Exception:
-                        # Evidence failure should not rollback status change; continue
-                        pass
+        evidence_file = request.FILES.get("evidence")
+        # Validate file if present
+        if evidence_file is not None:
+            allowed = {"image/jpeg", "image/png", "image/webp", "application/pdf"}
+            ctype = getattr(evidence_file, "content_type", "") or ""
+            size = getattr(evidence_file, "size", 0) or 0
+            if ctype not in allowed:
+                return Response({"detail": "unsupported evidence content-type"}, status=400)
+            if size > 5 * 1024 * 1024:
+                return Response({"detail": "evidence file too large (max 5MB)"}, status=400)
+        try:
+            from .services.excuses import excuse_records
+
+            result = excuse_records(
+                ids,
+                wing_ids=None if getattr(request.user, "is_superuser", False) else wing_ids,
+                reviewer=getattr(staff, "full_name", None) or getattr(request.user, "username", ""),
+                comment=comment,
+                evidence_file=evidence_file,
+                evidence_note=evidence_note,
+                user=request.user,
+            )
             return Response(
                 {
-                    "updated": updated,
+                    "updated": result["updated"],
                     "action": "set_excused",
-                    "evidence_saved": len(saved_evidence),
-                    "evidence": saved_evidence,
+                    "results": result["results"],
+                    "evidence_saved": len(result["evidence"]),
+                    "evidence": result["evidence"],
                 }
             )
         except Exception as e:
@@ -3232,14 +2674,11 @@ class WingSupervisorViewSet(viewsets.ViewSet):
         """Return wing timetable. Supports ?wing_id, ?date=YYYY-MM-DD, and ?mode=daily|weekly (default daily).
         Data is scoped to the current user's supervised wings unless superuser.
         Includes a lightweight meta object to explain empty states (diagnostics only).
+        The grid is served from services.wing_timetable (cached per timetable version) with a weak
+        ETag; If-None-Match answers 304 without rebuilding anything.
         """
         try:
-            from school.models import Class, Term, TimetableEntry  # type: ignore
-
-            try:
-                from backend.common.day_utils import iso_to_school_dow
-            except Exception:
-                from common.day_utils import iso_to_school_dow  # type: ignore
+            from school.models import Term  # type: ignore
         except Exception:
             return Response({"days": {}, "date": None, "items": [], "meta": {"error": "import_failed"}})
 
@@ -3272,958 +2711,20 @@ class WingSupervisorViewSet(viewsets.ViewSet):
         if mode not in {"daily", "weekly"}:
             mode = "daily"
 
-        # Resolve classes of this wing
-        class_ids = list(Class.objects.filter(wing_id=wing_id).values_list("id", flat=True))
-        if not class_ids:
-            meta["reason"] = "no_classes"
-            return Response({"date": dt.isoformat() if dt else None, "days": {}, "items": [], "meta": meta})
-
-        # Subject color helper
-        def subject_color(subj_id: int) -> str:
-            try:
-                h = (int(subj_id) * 47) % 360
-                return f"hsl({h}, 60%, 85%)"
-            except Exception:
-                return "#eef5ff"
-
-        # Shared helpers to resolve per-class period times with Thursday-specific precedence
-        times_cache: dict[tuple[int, str | None], dict[int, tuple]] = {}
-        times_cache_wing: dict[tuple[int, int], dict[int, tuple]] = {}
-        times_cache_class: dict[tuple[int, int], dict[int, tuple]] = {}
-
-        def _times_for(day: int, scope: str | None):
-            key = (int(day), scope or None)
-            if key in times_cache:
-                return times_cache[key]
-            try:
-                from school.models import PeriodTemplate, TemplateSlot  # type: ignore
-
-                base_qs = PeriodTemplate.objects.filter(day_of_week=day)
-                tpl_ids: list[int] = []
-                if scope:
-                    tpl_ids = list(base_qs.filter(scope__iexact=scope).values_list("id", flat=True))
-                if not tpl_ids:
-                    tpl_ids = list(base_qs.values_list("id", flat=True))
-                slots_map: dict[int, tuple] = {}
-                if tpl_ids:
-                    slots = (
-                        TemplateSlot.objects.filter(template_id__in=tpl_ids, kind="lesson")
-                        .exclude(number__isnull=True)
-                        .order_by("number", "start_time")
-                    )
-                    for s in slots:
-                        slots_map[int(s.number)] = (s.start_time, s.end_time)
-                times_cache[key] = slots_map
-                return slots_map
-            except Exception:
-                times_cache[key] = {}
-                return {}
-
-        def _times_for_by_wing(day: int, wing_id_val: int):
-            key = (int(day), int(wing_id_val))
-            if key in times_cache_wing:
-                return times_cache_wing[key]
-            try:
-                from school.models import PeriodTemplate, TemplateSlot  # type: ignore
-
-                tpl_ids = list(
-                    PeriodTemplate.objects.filter(day_of_week=day, wings__id=wing_id_val).values_list("id", flat=True)
-                )
-                slots_map: dict[int, tuple] = {}
-                if tpl_ids:
-                    slots = (
-                        TemplateSlot.objects.filter(template_id__in=tpl_ids, kind="lesson")
-                        .exclude(number__isnull=True)
-                        .order_by("number", "start_time")
-                    )
-                    for s in slots:
-                        slots_map[int(s.number)] = (s.start_time, s.end_time)
-                times_cache_wing[key] = slots_map
-                return slots_map
-            except Exception:
-                times_cache_wing[key] = {}
-                return {}
-
-        def _times_for_by_class(day: int, class_id_val: int):
-            key = (int(day), int(class_id_val))
-            if key in times_cache_class:
-                return times_cache_class[key]
-            try:
-                from school.models import PeriodTemplate, TemplateSlot  # type: ignore
-
-                tpl_ids = list(
-                    PeriodTemplate.objects.filter(day_of_week=day, classes__id=class_id_val).values_list(
-                        "id", flat=True
-                    )
-                )
-                slots_map: dict[int, tuple] = {}
-                if tpl_ids:
-                    slots = (
-                        TemplateSlot.objects.filter(template_id__in=tpl_ids, kind="lesson")
-                        .exclude(number__isnull=True)
-                        .order_by("number", "start_time")
-                    )
-                    for s in slots:
-                        slots_map[int(s.number)] = (s.start_time, s.end_time)
-                times_cache_class[key] = slots_map
-                return slots_map
-            except Exception:
-                times_cache_class[key] = {}
-                return {}
-
-        def _infer_wing_no(cls) -> int | None:
-            try:
-                w = getattr(cls, "wing", None)
-                if w and getattr(w, "id", None):
-                    return int(w.id)
-                grade = int(getattr(cls, "grade", 0) or 0)
-                sec_raw = str(getattr(cls, "section", "") or "").strip()
-                sec = None
-                import re
-
-                m = re.match(r"^(\d+)", sec_raw)
-                if m:
-                    sec = int(m.group(1))
-                else:
-                    name = str(getattr(cls, "name", "") or "")
-                    m2 = re.search(r"^(\d+)[\-\./](\d+)", name.strip())
-                    if m2:
-                        grade = grade or int(m2.group(1))
-                        sec = int(m2.group(2))
-                if not grade or sec is None:
-                    return None
-                if grade == 7 and 1 <= sec <= 5:
-                    return 1
-                if grade == 8 and 1 <= sec <= 4:
-                    return 2
-                if grade == 9 and sec == 1:
-                    return 2
-                if grade == 9 and 2 <= sec <= 4:
-                    return 3
-                if grade == 10 and 1 <= sec <= 2:
-                    return 3
-                if grade == 10 and 3 <= sec <= 4:
-                    return 4
-                if grade == 11 and 1 <= sec <= 3:
-                    return 4
-                if grade == 11 and sec == 4:
-                    return 5
-                if grade == 12 and 1 <= sec <= 4:
-                    return 5
-                return None
-            except Exception:
-                return None
-
-        def _wing_floor_from_no(wing_no: int | None) -> str | None:
-            if wing_no is None:
-                return None
-            return "ground" if wing_no in (1, 2) else ("upper" if wing_no in (3, 4, 5) else None)
-
-        if mode == "weekly":
-            # Build period time maps per school day using PeriodTemplate/TemplateSlot with priority:
-            # classes (in this wing) -> Thursday grade-based (secondary/grade9) -> wings (M2M) -> floor (ground/upper) -> generic.
-            # Then apply upper special-case for Sun–Wed.
-            times_per_day: dict[int, dict[int, tuple]] = {d: {} for d in range(1, 8)}
-            period_times: dict[int, tuple] = {}
-            try:
-                from school.models import PeriodTemplate, TemplateSlot, Wing, Class  # type: ignore
-
-                # Floor-based scoping disabled per policy (day + class only)
-                floor_scope = None
-
-                # Pre-compute Thursday grade-based presence within this wing
-                has_secondary = False
-                has_grade9_2_4 = False
-                try:
-                    cls_list = list(Class.objects.filter(id__in=class_ids).only("grade", "section", "name"))
-                    import re
-
-                    for cls in cls_list:
-                        try:
-                            g = int(getattr(cls, "grade", 0) or 0)
-                        except Exception:
-                            g = 0
-                        sec_val = None
-                        try:
-                            sec_raw = str(getattr(cls, "section", "") or "").strip()
-                            msec = re.match(r"^(\d+)", sec_raw)
-                            if msec:
-                                sec_val = int(msec.group(1))
-                            else:
-                                nm = str(getattr(cls, "name", "") or "")
-                                m2 = re.search(r"^(\d+)[\-\./](\d+)", nm.strip())
-                                if m2:
-                                    if not g:
-                                        g = int(m2.group(1))
-                                    sec_val = int(m2.group(2))
-                        except Exception:
-                            pass
-                        if g >= 10:
-                            has_secondary = True
-                        if g == 9 and sec_val is not None and 2 <= int(sec_val) <= 4:
-                            has_grade9_2_4 = True
-                        if has_secondary and has_grade9_2_4:
-                            break
-                except Exception:
-                    pass
-
-                # Cache templates by day for each strategy
-                for sd in range(1, 8):  # Sun..Sat
-                    tpl_ids: list[int] = []
-                    # 1) Any template bound directly to one of the wing's classes
-                    if class_ids:
-                        tpl_ids = list(
-                            PeriodTemplate.objects.filter(day_of_week=sd, classes__id__in=class_ids)
-                            .distinct()
-                            .values_list("id", flat=True)
-                        )
-                    # 2) Skip Thursday grade-based overrides per new policy (day+class only)
-                    # 3) Skip floor-based selection per new policy (day+class only)
-                    # (no-op)
-                    # 4) Generic day templates as last resort
-                    if not tpl_ids:
-                        tpl_ids = list(PeriodTemplate.objects.filter(day_of_week=sd).values_list("id", flat=True))
-
-                    # Build slots map
-                    td: dict[int, tuple] = {}
-                    if tpl_ids:
-                        slots = (
-                            TemplateSlot.objects.filter(template_id__in=tpl_ids, kind="lesson")
-                            .exclude(number__isnull=True)
-                            .order_by("number", "start_time")
-                        )
-                        for s in slots:
-                            td[int(s.number)] = (s.start_time, s.end_time)
-
-                    # Upper-floor special-case removed per policy
-
-                    if td:
-                        times_per_day[sd] = td
-
-                # Representative period_times (preserve existing field for backward compatibility)
-                for d in range(1, 8):
-                    if times_per_day.get(d):
-                        period_times = dict(times_per_day[d])
-                        break
-            except Exception:
-                pass
-
-            # Build columns_by_day and slot_meta_by_day using PeriodTemplate/TemplateSlot including recess/prayer
-            columns_by_day: dict[str, list[str]] = {str(i): [] for i in range(1, 8)}
-            slot_meta_by_day: dict[str, dict[str, dict[str, object]]] = {str(i): {} for i in range(1, 8)}
-            try:
-                from school.models import PeriodTemplate, TemplateSlot, Wing  # type: ignore
-
-                # Floor-based scoping disabled per policy
-                floor_scope2 = None
-
-                for sd in range(1, 8):
-                    tpl_qs = PeriodTemplate.objects.filter(day_of_week=sd)
-                    tpl_ids2: list[int] = []
-                    # Priority: templates bound directly to any class in this wing
-                    if class_ids:
-                        tpl_ids2 = list(
-                            tpl_qs.filter(classes__id__in=class_ids).distinct().values_list("id", flat=True)
-                        )
-                    # Thursday representative grade-based templates (for headers) before wing/floor
-                    if not tpl_ids2 and sd == 5:
-                        # Detect presence of secondary or grade9(2..4) classes in this wing
-                        has_sec = False
-                        has_g9_2_4 = False
-                        try:
-                            from school.models import Class  # type: ignore
-                            import re
-
-                            for cls in Class.objects.filter(id__in=class_ids).only("grade", "section", "name"):
-                                try:
-                                    g = int(getattr(cls, "grade", 0) or 0)
-                                except Exception:
-                                    g = 0
-                                sec_val = None
-                                try:
-                                    sec_raw = str(getattr(cls, "section", "") or "").strip()
-                                    msec = re.match(r"^(\d+)", sec_raw)
-                                    if msec:
-                                        sec_val = int(msec.group(1))
-                                    else:
-                                        nm = str(getattr(cls, "name", "") or "")
-                                        m2 = re.search(r"^(\d+)[\-\./](\d+)", nm.strip())
-                                        if m2:
-                                            if not g:
-                                                g = int(m2.group(1))
-                                            sec_val = int(m2.group(2))
-                                except Exception:
-                                    pass
-                                if g >= 10:
-                                    has_sec = True
-                                if g == 9 and sec_val is not None and 2 <= int(sec_val) <= 4:
-                                    has_g9_2_4 = True
-                                if has_sec and has_g9_2_4:
-                                    break
-                        except Exception:
-                            pass
-                        if has_sec:
-                            tpl_ids2 = list(tpl_qs.filter(scope__iexact="secondary").values_list("id", flat=True))
-                        elif has_g9_2_4:
-                            tpl_ids2 = list(tpl_qs.filter(scope__iexact="grade9").values_list("id", flat=True))
-                    # Then by floor scope
-                    if not tpl_ids2 and floor_scope2:
-                        tpl_ids2 = list(tpl_qs.filter(scope__iexact=floor_scope2).values_list("id", flat=True))
-                    # Finally any template for the day
-                    if not tpl_ids2:
-                        tpl_ids2 = list(tpl_qs.values_list("id", flat=True))
-                    if not tpl_ids2:
-                        continue
-                    slots_all = TemplateSlot.objects.filter(template_id__in=tpl_ids2).order_by("start_time", "number")
-                    tokens: list[str] = []
-                    used_lessons: set[int] = set()
-                    kind_counters: dict[str, int] = {}
-                    used_non_lesson: set[str] = set()
-                    for s in slots_all:
-                        kind = (getattr(s, "kind", "lesson") or "lesson").strip().lower()
-                        if kind == "lesson":
-                            try:
-                                num = int(getattr(s, "number", 0) or 0)
-                            except Exception:
-                                num = 0
-                            if num and num not in used_lessons:
-                                tokens.append(f"P{num}")
-                                used_lessons.add(num)
-                        else:
-                            # Normalize and ensure at most one column per non-lesson kind per day
-                            if kind == "break":
-                                kind = "recess"
-                            if kind in used_non_lesson:
-                                continue
-                            used_non_lesson.add(kind)
-                            cnt = 1
-                            kind_counters[kind] = cnt
-                            tok = f"{kind.upper()}-{cnt}"
-                            # Save meta with Arabic label
-                            try:
-                                lbl_map = {
-                                    "recess": "استراحة",
-                                    "break": "استراحة",
-                                    "prayer": "الصلاة",
-                                }
-                                label = lbl_map.get(kind, kind)
-                                slot_meta_by_day[str(sd)][tok] = {
-                                    "kind": kind,
-                                    "label": label,
-                                    "start_time": getattr(s, "start_time", None),
-                                    "end_time": getattr(s, "end_time", None),
-                                }
-                            except Exception:
-                                pass
-                            tokens.append(tok)
-                    if tokens:
-                        columns_by_day[str(sd)] = tokens
-            except Exception:
-                pass
-
-            # Build week days structure including Fri/Sat (may remain empty)
-            days = {i: [] for i in [1, 2, 3, 4, 5, 6, 7]}
-            qs = (
-                TimetableEntry.objects.filter(classroom_id__in=class_ids, term=term)
-                .select_related("classroom", "subject", "teacher")
-                .order_by("day_of_week", "period_number", "classroom__name")
-            )
-            for e in qs:
-                if e.day_of_week not in days:
-                    continue
-                # Resolve per-entry times using centralized resolver (day+class only)
-                cls = e.classroom
-                st_et = resolve_lesson_time(cls=cls, day=int(e.day_of_week), period_number=int(e.period_number))
-                # Generic fallback for that day (preserve previous behavior)
-                if not st_et:
-                    st_et = times_per_day.get(int(e.day_of_week), {}).get(int(e.period_number)) or period_times.get(
-                        int(e.period_number)
-                    )
-                days[e.day_of_week].append(
-                    {
-                        "class_id": e.classroom_id,
-                        "class_name": getattr(e.classroom, "name", None),
-                        "period_number": e.period_number,
-                        "subject_id": e.subject_id,
-                        "subject_name": getattr(e.subject, "name_ar", None) or getattr(e.subject, "name", None),
-                        "teacher_id": e.teacher_id,
-                        "teacher_name": getattr(e.teacher, "full_name", None),
-                        "color": subject_color(e.subject_id),
-                        **({"start_time": st_et[0], "end_time": st_et[1]} if st_et else {}),
-                    }
-                )
-            # Convert keys to strings for JSON stability and expose per-day period times
-            meta["period_times_by_day"] = {
-                str(d): {int(k): v for k, v in (times_per_day.get(d) or {}).items()} for d in range(1, 8)
-            }
-            meta["period_times"] = {int(k): v for k, v in period_times.items()} if period_times else {}
-            meta["columns_by_day"] = columns_by_day
-            meta["slot_meta_by_day"] = slot_meta_by_day
-            # Add grouped meta for Wing 3 Thursday (weekly)
-            try:
-                # Wing 3 Thursday grouped meta removed per policy (day + class only)
-                pass
-            except Exception:
-                pass
-            return Response(
-                {
-                    "mode": "weekly",
-                    "term_id": getattr(term, "id", None),
-                    "wing_id": wing_id,
-                    "days": {str(k): v for k, v in days.items()},
-                    "meta": meta,
-                }
-            )
-
-        # Daily mode
-        dow = iso_to_school_dow(dt)
-        # Build period times for all school days using priority: classes -> Thursday grade-based -> wings -> floor -> generic
-        period_times_by_day: dict[int, dict[int, tuple]] = {d: {} for d in range(1, 8)}
-        try:
-            from school.models import PeriodTemplate, TemplateSlot, Class  # type: ignore
-
-            # Determine if this wing contains secondary (>=10) or 9-2..9-4 classes
-            has_secondary = False
-            has_grade9_2_4 = False
-            try:
-                cls_list = list(Class.objects.filter(id__in=class_ids).only("grade", "section", "name"))
-                import re
-
-                for cls in cls_list:
-                    try:
-                        g = int(getattr(cls, "grade", 0) or 0)
-                    except Exception:
-                        g = 0
-                    sec_val = None
-                    try:
-                        sec_raw = str(getattr(cls, "section", "") or "").strip()
-                        msec = re.match(r"^(\d+)", sec_raw)
-                        if msec:
-                            sec_val = int(msec.group(1))
-                        else:
-                            nm = str(getattr(cls, "name", "") or "")
-                            m2 = re.search(r"^(\d+)[\-\./](\d+)", nm.strip())
-                            if m2:
-                                if not g:
-                                    g = int(m2.group(1))
-                                sec_val = int(m2.group(2))
-                    except Exception:
-                        pass
-                    if g >= 10:
-                        has_secondary = True
-                    if g == 9 and sec_val is not None and 2 <= int(sec_val) <= 4:
-                        has_grade9_2_4 = True
-                    if has_secondary and has_grade9_2_4:
-                        break
-            except Exception:
-                pass
-
-            for sd in range(1, 8):
-                tpl_ids: list[int] = []
-                # 1) templates bound directly to any class in this wing
-                if class_ids:
-                    tpl_ids = list(
-                        PeriodTemplate.objects.filter(day_of_week=sd, classes__id__in=class_ids)
-                        .distinct()
-                        .values_list("id", flat=True)
-                    )
-                # 2) Thursday grade-based representative template for headers
-                if not tpl_ids and sd == 5:
-                    if has_secondary:
-                        tpl_ids = list(
-                            PeriodTemplate.objects.filter(day_of_week=5, scope__iexact="secondary").values_list(
-                                "id", flat=True
-                            )
-                        )
-                    elif has_grade9_2_4:
-                        tpl_ids = list(
-                            PeriodTemplate.objects.filter(day_of_week=5, scope__iexact="grade9").values_list(
-                                "id", flat=True
-                            )
-                        )
-                # 3) generic for the day
-                if not tpl_ids:
-                    tpl_ids = list(PeriodTemplate.objects.filter(day_of_week=sd).values_list("id", flat=True))
-
-                td: dict[int, tuple] = {}
-                if tpl_ids:
-                    slots = (
-                        TemplateSlot.objects.filter(template_id__in=tpl_ids, kind="lesson")
-                        .exclude(number__isnull=True)
-                        .order_by("number", "start_time")
-                    )
-                    for s in slots:
-                        td[int(s.number)] = (s.start_time, s.end_time)
-
-                if td:
-                    period_times_by_day[sd] = td
-
-            # Fallback: use first non-empty day's map when selected day is empty
-            fallback_map = None
-            for d2 in range(1, 8):
-                if period_times_by_day.get(d2):
-                    fallback_map = period_times_by_day[d2]
-                    break
-            if fallback_map and not period_times_by_day.get(dow):
-                period_times_by_day[dow] = fallback_map
-        except Exception:
-            pass
-        period_times = period_times_by_day.get(dow, {})
-        # Upper-floor special-case removed per new policy
-
-        # Build columns (including non-lesson slots) and slot metadata for the selected day
-        columns: list[str] = []
-        slot_meta: dict[str, dict[str, object]] = {}
-        non_lesson_times_by_class: dict[int, dict[str, tuple]] = {}
-        try:
-            from school.models import PeriodTemplate, TemplateSlot, Wing  # type: ignore
-
-            wing_obj3 = Wing.objects.filter(id=wing_id).first()
-            floor_raw3 = (getattr(wing_obj3, "floor", None) or "").strip().lower()
-
-            def _norm_floor3(val: str | None) -> str | None:
-                if not val:
-                    return None
-                m = {
-                    "أرضي": "ground",
-                    "ارضى": "ground",
-                    "ارضي": "ground",
-                    "الدور الارضي": "ground",
-                    "الأرضي": "ground",
-                    "علوي": "upper",
-                    "الدور العلوي": "upper",
-                }
-                v = str(val).strip().lower()
-                return m.get(v, v)
-
-            floor_scope3 = _norm_floor3(floor_raw3)
-            tpl_qs = PeriodTemplate.objects.filter(day_of_week=dow)
-            tpl_ids3: list[int] = []
-            # Priority: templates bound directly to any class in this wing
-            if class_ids:
-                tpl_ids3 = list(tpl_qs.filter(classes__id__in=class_ids).distinct().values_list("id", flat=True))
-            # On Thursday for Wing 3, prefer grade-based representative templates before wing/floor/generic
-            if not tpl_ids3 and dow == 5 and int(wing_id) == 3:
-                try:
-                    if "has_secondary" in locals() and has_secondary:
-                        tpl_ids3 = list(tpl_qs.filter(scope__iexact="secondary").values_list("id", flat=True))
-                    elif "has_grade9_2_4" in locals() and has_grade9_2_4:
-                        tpl_ids3 = list(tpl_qs.filter(scope__iexact="grade9").values_list("id", flat=True))
-                except Exception:
-                    pass
-            # Then by floor scope
-            if not tpl_ids3 and floor_scope3:
-                tpl_ids3 = list(tpl_qs.filter(scope__iexact=floor_scope3).values_list("id", flat=True))
-            # Finally any template for the day
-            if not tpl_ids3:
-                tpl_ids3 = list(tpl_qs.values_list("id", flat=True))
-            if tpl_ids3:
-                slots_all = TemplateSlot.objects.filter(template_id__in=tpl_ids3).order_by("start_time", "number")
-                used_lessons: set[int] = set()
-                kind_counters: dict[str, int] = {}
-                used_non_lesson_kinds: set[str] = set()
-                for s in slots_all:
-                    kind = (getattr(s, "kind", "lesson") or "lesson").strip().lower()
-                    if kind == "lesson":
-                        try:
-                            num = int(getattr(s, "number", 0) or 0)
-                        except Exception:
-                            num = 0
-                        if num and num not in used_lessons:
-                            columns.append(f"P{num}")
-                            used_lessons.add(num)
-                    else:
-                        # Normalize alias
-                        if kind == "break":
-                            kind = "recess"
-                        # Allow only a single column per non-lesson kind (e.g., one RECESS and one PRAYER)
-                        if kind in used_non_lesson_kinds:
-                            continue
-                        used_non_lesson_kinds.add(kind)
-                        cnt = kind_counters.get(kind, 0) + 1
-                        kind_counters[kind] = cnt
-                        tok = f"{kind.upper()}-{cnt}"
-                        columns.append(tok)
-                        try:
-                            lbl_map = {"recess": "استراحة", "break": "استراحة", "prayer": "الصلاة"}
-                            label = lbl_map.get(kind, kind)
-                            slot_meta[tok] = {
-                                "kind": kind,
-                                "label": label,
-                                "start_time": getattr(s, "start_time", None),
-                                "end_time": getattr(s, "end_time", None),
-                            }
-                        except Exception:
-                            pass
-        except Exception:
-            pass
-        # Fallback for daily columns: reuse first day (Sun–Thu) that has any slots if selected day lacks columns
-        if not columns:
-            try:
-                from school.models import PeriodTemplate, TemplateSlot, Wing  # type: ignore
-
-                # Floor-based fallback removed: templates are selected only by (day, classes) -> generic
-                def _tpl_ids_for_day(day: int) -> list[int]:
-                    base = PeriodTemplate.objects.filter(day_of_week=day)
-                    ids: list[int] = []
-                    if class_ids:
-                        ids = list(base.filter(classes__id__in=class_ids).distinct().values_list("id", flat=True))
-                    if not ids:
-                        ids = list(base.values_list("id", flat=True))
-                    return ids
-
-                for dday in (1, 2, 3, 4, 5):
-                    if dday == dow:
-                        continue
-                    ids = _tpl_ids_for_day(dday)
-                    if not ids:
-                        continue
-                    slots_all = TemplateSlot.objects.filter(template_id__in=ids).order_by("start_time", "number")
-                    used_lessons: set[int] = set()
-                    kind_counters: dict[str, int] = {}
-                    used_non_lesson_kinds: set[str] = set()
-                    tmp_columns: list[str] = []
-                    tmp_meta: dict[str, dict[str, object]] = {}
-                    for s in slots_all:
-                        kind = (getattr(s, "kind", "lesson") or "lesson").strip().lower()
-                        if kind == "lesson":
-                            try:
-                                num = int(getattr(s, "number", 0) or 0)
-                            except Exception:
-                                num = 0
-                            if num and num not in used_lessons:
-                                tmp_columns.append(f"P{num}")
-                                used_lessons.add(num)
-                        else:
-                            # Normalize aliases and prevent duplicates per non-lesson kind
-                            if kind == "break":
-                                kind = "recess"
-                            if kind in used_non_lesson_kinds:
-                                continue
-                            used_non_lesson_kinds.add(kind)
-                            cnt = 1
-                            kind_counters[kind] = cnt
-                            tok = f"{kind.upper()}-{cnt}"
-                            tmp_columns.append(tok)
-                            try:
-                                lbl_map = {
-                                    "recess": "استراحة",
-                                    "break": "استراحة",
-                                    "prayer": "الصلاة",
-                                }
-                                label = lbl_map.get(kind, kind)
-                                tmp_meta[tok] = {
-                                    "kind": kind,
-                                    "label": label,
-                                    "start_time": getattr(s, "start_time", None),
-                                    "end_time": getattr(s, "end_time", None),
-                                }
-                            except Exception:
-                                pass
-                    if tmp_columns:
-                        columns = tmp_columns
-                        slot_meta = tmp_meta
-                        break
-            except Exception:
-                pass
-
-        # Compute per-class non-lesson times (recess/prayer) for selected day using priority: class -> wing -> floor -> generic
-        try:
-            from school.models import PeriodTemplate, TemplateSlot, Wing, Class  # type: ignore
-
-            wing_obj5 = Wing.objects.filter(id=wing_id).first()
-            floor_raw5 = (getattr(wing_obj5, "floor", None) or "").strip().lower()
-
-            def _norm_floor5(val: str | None) -> str | None:
-                if not val:
-                    return None
-                m = {
-                    "أرضي": "ground",
-                    "ارضى": "ground",
-                    "ارضي": "ground",
-                    "الدور الارضي": "ground",
-                    "الأرضي": "ground",
-                    "علوي": "upper",
-                    "الدور العلوي": "upper",
-                }
-                v = str(val).strip().lower()
-                return m.get(v, v)
-
-            floor_scope5 = _norm_floor5(floor_raw5)
-
-            for cid in class_ids:
-                kinds: dict[str, tuple] = {}
-                base = PeriodTemplate.objects.filter(day_of_week=dow)
-                ids: list[int] = []
-                # direct class binding
-                ids = list(base.filter(classes__id=cid).distinct().values_list("id", flat=True))
-                if not ids and floor_scope5:
-                    ids = list(base.filter(scope__iexact=floor_scope5).values_list("id", flat=True))
-                if not ids:
-                    ids = list(base.values_list("id", flat=True))
-                if ids:
-                    slots = (
-                        TemplateSlot.objects.filter(template_id__in=ids).exclude(kind="lesson").order_by("start_time")
-                    )
-                    for s in slots:
-                        k = (getattr(s, "kind", "") or "").strip().lower()
-                        if k == "break":
-                            k = "recess"
-                        if k in ("recess", "prayer") and k not in kinds:
-                            kinds[k] = (
-                                getattr(s, "start_time", None),
-                                getattr(s, "end_time", None),
-                            )
-                if kinds:
-                    non_lesson_times_by_class[int(cid)] = kinds
-        except Exception:
-            pass
-
-        qs = (
-            TimetableEntry.objects.filter(classroom_id__in=class_ids, day_of_week=dow, term=term)
-            .select_related("classroom", "subject", "teacher")
-            .order_by("period_number", "classroom__name")
-        )
-        items = []
-        for e in qs:
-            # Resolve per-entry times using centralized resolver (day+class only)
-            cls = e.classroom
-            st_et = resolve_lesson_time(cls=cls, day=int(dow), period_number=int(e.period_number))
-            if not st_et:
-                st_et = period_times.get(int(e.period_number))
-            items.append(
-                {
-                    "class_id": e.classroom_id,
-                    "class_name": getattr(e.classroom, "name", None),
-                    "period_number": e.period_number,
-                    "subject_id": e.subject_id,
-                    "subject_name": getattr(e.subject, "name_ar", None) or getattr(e.subject, "name", None),
-                    "teacher_id": e.teacher_id,
-                    "teacher_name": getattr(e.teacher, "full_name", None),
-                    "color": subject_color(e.subject_id),
-                    **({"start_time": st_et[0], "end_time": st_et[1]} if st_et else {}),
-                }
-            )
-        if not items:
-            meta["reason"] = "no_entries_today"
-        # Expose both the effective map and all-day maps for the UI
-        meta["period_times_by_day"] = {
-            str(d): {int(k): v for k, v in (period_times_by_day.get(d) or {}).items()} for d in range(1, 8)
-        }
-        meta["period_times"] = {int(k): v for k, v in period_times.items()} if period_times else {}
-        # New: columns and slot meta for the selected day
-        if columns:
-            meta["columns"] = columns
-        if slot_meta:
-            meta["slot_meta"] = slot_meta
-        if non_lesson_times_by_class:
-            # Normalize keys to int and kinds to lowercase for frontend consumption
-            meta["non_lesson_times_by_class"] = {
-                int(cid): {str(k).lower(): v for k, v in kinds.items()}
-                for cid, kinds in non_lesson_times_by_class.items()
-            }
-        # Add grouped meta for Wing 3 Thursday (daily)
-        try:
-            if int(wing_id) == 3 and (mode == "weekly" or int(dow) == 5):
-                from school.models import PeriodTemplate, TemplateSlot  # type: ignore
-
-                grp_periods: dict[str, dict[str, dict[int, tuple]]] = {}
-                grp_columns: dict[str, dict[str, list[str]]] = {}
-                grp_slot_meta: dict[str, dict[str, dict[str, dict[str, object]]]] = {}
-
-                def build_group(scope_code: str, key: str):
-                    tpls = list(
-                        PeriodTemplate.objects.filter(day_of_week=5, scope__iexact=scope_code).values_list(
-                            "id", flat=True
-                        )
-                    )
-                    pt_map: dict[int, tuple] = {}
-                    cols: list[str] = []
-                    smeta: dict[str, dict[str, object]] = {}
-                    if tpls:
-                        slots = TemplateSlot.objects.filter(template_id__in=tpls).order_by("start_time", "number")
-                        used_lessons: set[int] = set()
-                        kind_counters: dict[str, int] = {}
-                        used_non_lesson: set[str] = set()
-                        for s in slots:
-                            kind = (getattr(s, "kind", "lesson") or "lesson").strip().lower()
-                            if kind == "lesson":
-                                try:
-                                    num = int(getattr(s, "number", 0) or 0)
-                                except Exception:
-                                    num = 0
-                                if num:
-                                    pt_map[int(num)] = (
-                                        getattr(s, "start_time", None),
-                                        getattr(s, "end_time", None),
-                                    )
-                                    if num not in used_lessons:
-                                        cols.append(f"P{num}")
-                                        used_lessons.add(num)
-                            else:
-                                if kind == "break":
-                                    kind = "recess"
-                                if kind in used_non_lesson:
-                                    continue
-                                used_non_lesson.add(kind)
-                                cnt = kind_counters.get(kind, 0) + 1
-                                kind_counters[kind] = cnt
-                                tok = f"{kind.upper()}-{cnt}"
-                                cols.append(tok)
-                                try:
-                                    lbl_map = {
-                                        "recess": "استراحة",
-                                        "break": "استراحة",
-                                        "prayer": "الصلاة",
-                                    }
-                                    label = lbl_map.get(kind, kind)
-                                    smeta[tok] = {
-                                        "kind": kind,
-                                        "label": label,
-                                        "start_time": getattr(s, "start_time", None),
-                                        "end_time": getattr(s, "end_time", None),
-                                    }
-                                except Exception:
-                                    pass
-                    grp_periods[key] = {"5": pt_map}
-                    grp_columns[key] = {"5": cols}
-                    grp_slot_meta[key] = {"5": smeta}
-
-                def build_from_template_id(tpl_id: int, key: str):
-                    pt_map: dict[int, tuple] = {}
-                    cols: list[str] = []
-                    smeta: dict[str, dict[str, object]] = {}
-                    try:
-                        slots = TemplateSlot.objects.filter(template_id=tpl_id).order_by("start_time", "number")
-                        used_lessons: set[int] = set()
-                        kind_counters: dict[str, int] = {}
-                        used_non_lesson: set[str] = set()
-                        for s in slots:
-                            kind = (getattr(s, "kind", "lesson") or "lesson").strip().lower()
-                            if kind == "lesson":
-                                try:
-                                    num = int(getattr(s, "number", 0) or 0)
-                                except Exception:
-                                    num = 0
-                                if num:
-                                    pt_map[int(num)] = (
-                                        getattr(s, "start_time", None),
-                                        getattr(s, "end_time", None),
-                                    )
-                                    if num not in used_lessons:
-                                        cols.append(f"P{num}")
-                                        used_lessons.add(num)
-                            else:
-                                if kind == "break":
-                                    kind = "recess"
-                                if kind in used_non_lesson:
-                                    continue
-                                used_non_lesson.add(kind)
-                                cnt = kind_counters.get(kind, 0) + 1
-                                kind_counters[kind] = cnt
-                                # Standardize first occurrence without numeric suffix for compatibility
-                                tok = f"{kind.upper()}" if cnt == 1 else f"{kind.upper()}-{cnt}"
-                                cols.append(tok)
-                                try:
-                                    lbl_map = {
-                                        "recess": "استراحة",
-                                        "break": "استراحة",
-                                        "prayer": "الصلاة",
-                                    }
-                                    label = lbl_map.get(kind, kind)
-                                    smeta[tok] = {
-                                        "kind": kind,
-                                        "label": label,
-                                        "start_time": getattr(s, "start_time", None),
-                                        "end_time": getattr(s, "end_time", None),
-                                    }
-                                except Exception:
-                                    pass
-                    except Exception:
-                        pass
-                    # Post-process Thursday (5) for Wing 3 Grade 9 group to ensure RECESS between P3 and P4
-                    try:
-                        if key == "grade9_2_4":
-                            # Find any RECESS token in built columns and place it after P3 (before P4)
-                            recess_idx = next(
-                                (i for i, t in enumerate(cols) if str(t).upper().startswith("RECESS")),
-                                None,
-                            )
-                            if recess_idx is not None:
-                                try:
-                                    p3_idx = cols.index("P3")
-                                except ValueError:
-                                    p3_idx = None  # type: ignore
-                                try:
-                                    p4_idx = cols.index("P4")
-                                except ValueError:
-                                    p4_idx = None  # type: ignore
-                                if p3_idx is not None and p4_idx is not None and recess_idx != p3_idx + 1:
-                                    tok = cols.pop(recess_idx)
-                                    if recess_idx < p3_idx:
-                                        p3_idx -= 1
-                                    cols.insert(p3_idx + 1, tok)
-                            # Enforce canonical order matching Template #4: P1,P2,P3,RECESS,P4,P5,P6,PRAYER (when available)
-                            desired: list[str] = []
-                            for n in (1, 2, 3):
-                                if f"P{n}" in cols:
-                                    desired.append(f"P{n}")
-                            # Prefer unsuffixed RECESS if present in meta; else first matching token
-                            if any(str(t).upper().startswith("RECESS") for t in cols):
-                                tok_rec = (
-                                    "RECESS"
-                                    if "RECESS" in smeta
-                                    else next(
-                                        (t for t in cols if str(t).upper().startswith("RECESS")),
-                                        None,
-                                    )
-                                )
-                                if tok_rec:
-                                    desired.append(tok_rec)  # type: ignore
-                            for n in (4, 5, 6, 7):
-                                if f"P{n}" in cols:
-                                    desired.append(f"P{n}")
-                            if any(str(t).upper().startswith("PRAYER") for t in cols):
-                                tok_pr = (
-                                    "PRAYER"
-                                    if "PRAYER" in smeta
-                                    else next(
-                                        (t for t in cols if str(t).upper().startswith("PRAYER")),
-                                        None,
-                                    )
-                                )
-                                if tok_pr and tok_pr not in desired:
-                                    desired.append(tok_pr)  # type: ignore
-                            # Deduplicate while preserving order
-                            seen: set[str] = set()
-                            cols = [t for t in desired if not (t in seen or seen.add(t))]
-                    except Exception:
-                        pass
-                    grp_periods[key] = {"5": pt_map}
-                    grp_columns[key] = {"5": cols}
-                    grp_slot_meta[key] = {"5": smeta}
-
-                build_group("secondary", "secondary")
-                # Force Grade 9 (2-4) Thursday to use PeriodTemplate ID=4 as requested
-                build_from_template_id(4, "grade9_2_4")
-                meta["grouped_by"] = "wing3_thursday"
-                meta["groups"] = ["secondary", "grade9_2_4"]
-                meta["group_period_times_by_day"] = grp_periods
-                meta["group_columns_by_day"] = grp_columns
-                meta["group_slot_meta_by_day"] = grp_slot_meta
-        except Exception:
-            pass
-        return Response(
-            {
-                "mode": mode,
-                "date": dt.isoformat(),
-                "dow": dow,
-                "term_id": getattr(term, "id", None),
-                "wing_id": wing_id,
-                "items": items,
-                "meta": meta,
-            }
-        )
+        version = timetable_version()
+        etag = wing_timetable_etag(version, term.id, wing_id, mode, dt, len(allowed_wings))
+        if etag_matches(request, etag):
+            resp = Response(status=304)
+        else:
+            payload = get_wing_timetable(wing_id, term, dt, mode, version=version)
+            body = dict(payload)
+            if "date" in body:
+                body["date"] = dt.isoformat() if dt else None
+            body["meta"] = {**meta, **(payload.get("meta") or {})}
+            resp = Response(body)
+        resp["ETag"] = etag
+        resp["Cache-Control"] = "private, no-cache"
+        return resp
 
 
 class ExitEventViewSet(viewsets.ModelViewSet):
@@ -9,14 +9,37 @@ from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.request import Request
 from rest_framework.response import Response
-import hashlib
-from pathlib import Path
 
 from school.models import Student, AcademicYear, Wing  # type: ignore
+from school.storage import blob_digest
 from .models_alerts import AbsenceAlert, AlertNumberSequence, AbsenceAlertDocument
 from .serializers_alerts import AbsenceAlertSerializer
 from .services.absence_days import compute_absence_days
-from .services.word_renderer import render_alert_docx, current_template_info
+from .services.docx_cache import RenderedDocx, get_alert_docx
+
+
+def _alert_docx_filename(alert: AbsenceAlert) -> str:
+    return f"absence-alert-{alert.academic_year}-{alert.number}.docx"
+
+
+def _alert_docx_display_name(doc: AbsenceAlertDocument) -> str:
+    """Content-addressed files have hash names; show the alert-based name instead."""
+    if blob_digest(doc.file.name):
+        return _alert_docx_filename(doc.alert)
+    return doc.file.name.split("/")[-1]
+
+
+def _persist_alert_docx(alert: AbsenceAlert, rendered: RenderedDocx, user) -> AbsenceAlertDocument:
+    """Archive rendered DOCX bytes. Identical renders share one stored blob (sha256 filled on save)."""
+    doc = AbsenceAlertDocument(
+        alert=alert,
+        created_by=user,
+        size=len(rendered.content),
+        template_name=rendered.template_path,
+        template_hash=rendered.template_hash,
+    )
+    doc.file.save(_alert_docx_filename(alert), ContentFile(rendered.content), save=True)
+    return doc
 
 
 class IsWingSupervisorOrAdmin(permissions.BasePermission):
@@ -38,6 +61,15 @@ class IsWingSupervisorOrAdmin(permissions.BasePermission):
         return False
 
 
+def _can_manage_wing(user, wing_id: int) -> bool:
+    if getattr(user, "is_superuser", False):
+        return True
+    from school.models import Staff  # type: ignore
+
+    staff = Staff.objects.filter(user_id=user.id).first()
+    return bool(staff) and Wing.objects.filter(id=wing_id, supervisor_id=staff.id).exists()
+
+
 class AbsenceAlertViewSet(viewsets.ModelViewSet):
     queryset = AbsenceAlert.objects.all().order_by("-created_at")
     serializer_class = AbsenceAlertSerializer
@@ -181,68 +213,87 @@ class AbsenceAlertViewSet(viewsets.ModelViewSet):
     def docx(self, request: Request, pk=None):
         alert = self.get_object()
         try:
-            content = render_alert_docx(alert)
+            rendered = get_alert_docx(alert)
         except FileNotFoundError as e:
             return Response({"detail": str(e)}, status=404)
         except Exception as e:
             return Response({"detail": f"تعذر توليد الملف: {e}"}, status=500)
-        fname = f"absence-alert-{alert.academic_year}-{alert.number}.docx"
+        fname = _alert_docx_filename(alert)
         # Optional persist=1 to archive the generated file as the latest version
         if request.query_params.get("persist") in ("1", "true", "yes"):  # archive
-            sha = hashlib.sha256(content).hexdigest()
-            from .services.word_renderer import TEMPLATE_PATH, FALLBACK_TEMPLATE_PATH
-
-            tpath = TEMPLATE_PATH if Path(TEMPLATE_PATH).exists() else FALLBACK_TEMPLATE_PATH
-            thash = hashlib.sha256(Path(tpath).read_bytes()).hexdigest() if Path(tpath).exists() else ""
-            doc = AbsenceAlertDocument.objects.create(
-                alert=alert,
-                created_by=request.user,
-                size=len(content),
-                sha256=sha,
-                template_name=str(tpath),
-                template_hash=thash,
-            )
-            # Save file content into FileField
-            doc.file.save(fname, ContentFile(content), save=True)
+            _persist_alert_docx(alert, rendered, request.user)
         resp = HttpResponse(
-            content,
+            rendered.content,
             content_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
         )
-        # Diagnostics: expose which template path/hash were used
-        try:
-            tpath, thash = current_template_info()
-            resp["X-Docx-Template-Path"] = tpath
-            if thash:
-                resp["X-Docx-Template-Hash"] = thash
-        except Exception:
-            pass
+        # Diagnostics: expose which template path/hash were used and whether the render was cached
+        resp["X-Docx-Template-Path"] = rendered.template_path
+        if rendered.template_hash:
+            resp["X-Docx-Template-Hash"] = rendered.template_hash
+        resp["X-Docx-Cache"] = "hit" if rendered.cached else "miss"
         resp["Content-Disposition"] = f'attachment; filename="{fname}"'
         return resp
 
+    @action(detail=False, methods=["post"], url_path="bulk-issue")
+    def bulk_issue(self, request: Request):
+        """Issue alerts for every student of a wing in one job.
+
+        Body: wing, period_start, period_end (DD/MM/YYYY or YYYY-MM-DD), optional min_unexcused (default 1),
+        prerender (bool) and sync (bool, run inline instead of enqueueing).
+        """
+        data = request.data
+        try:
+            wing_id = int(data.get("wing"))
+        except (TypeError, ValueError):
+            return Response({"detail": "wing مطلوب"}, status=400)
+        if not _can_manage_wing(request.user, wing_id):
+            return Response({"detail": "لا يمكنك إنشاء تنبيهات خارج جناحك"}, status=403)
+        start_date = parse_ui_or_iso_date(data.get("period_start"))
+        end_date = parse_ui_or_iso_date(data.get("period_end"))
+        if start_date is None or end_date is None:
+            return Response({"detail": "تواريخ غير صالحة (يرجى استخدام DD/MM/YYYY أو YYYY-MM-DD)"}, status=400)
+        if start_date > end_date:
+            return Response({"detail": "نطاق التواريخ غير صحيح"}, status=400)
+        try:
+            min_unexcused = int(data.get("min_unexcused", 1))
+        except (TypeError, ValueError):
+            return Response({"detail": "min_unexcused غير صالح"}, status=400)
+        if min_unexcused < 1:
+            return Response({"detail": "min_unexcused يجب أن يكون 1 أو أكثر"}, status=400)
+        prerender = str(data.get("prerender", "")).lower() in ("1", "true", "yes")
+        opts = {"user_id": request.user.id, "min_unexcused": min_unexcused, "prerender": prerender}
+
+        if str(data.get("sync", "")).lower() not in ("1", "true", "yes"):
+            try:
+                import django_rq
+
+                from .tasks.jobs_rq import enqueue_issue_wing_alerts
+
+                job = enqueue_issue_wing_alerts(
+                    django_rq.get_queue("default"), wing_id, start_date.isoformat(), end_date.isoformat(), **opts
+                )
+                return Response({"queued": True, "job_id": job.id}, status=202)
+            except Exception:
+                pass  # queue unavailable -> run inline
+        from .services.bulk_alerts import issue_wing_alerts
+
+        try:
+            # Inline: pre-render serially in the request, the process pool is for the RQ job
+            summary = issue_wing_alerts(wing_id, start_date, end_date, prerender_workers=1, **opts)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=400)
+        return Response({"queued": False, "summary": summary}, status=201 if summary["created"] else 200)
+
     @action(detail=True, methods=["post"], url_path="docx/save")
     def docx_save(self, request: Request, pk=None):
         alert = self.get_object()
         try:
-            content = render_alert_docx(alert)
+            rendered = get_alert_docx(alert)
         except FileNotFoundError as e:
             return Response({"detail": str(e)}, status=404)
         except Exception as e:
             return Response({"detail": f"تعذر توليد الملف: {e}"}, status=500)
-        sha = hashlib.sha256(content).hexdigest()
-        from .services.word_renderer import TEMPLATE_PATH, FALLBACK_TEMPLATE_PATH
-
-        tpath = TEMPLATE_PATH if Path(TEMPLATE_PATH).exists() else FALLBACK_TEMPLATE_PATH
-        thash = hashlib.sha256(Path(tpath).read_bytes()).hexdigest() if Path(tpath).exists() else ""
-        fname = f"absence-alert-{alert.academic_year}-{alert.number}.docx"
-        doc = AbsenceAlertDocument.objects.create(
-            alert=alert,
-            created_by=request.user,
-            size=len(content),
-            sha256=sha,
-            template_name=str(tpath),
-            template_hash=thash,
-        )
-        doc.file.save(fname, ContentFile(content), save=True)
+        doc = _persist_alert_docx(alert, rendered, request.user)
         return Response(
             {
                 "id": doc.id,
@@ -254,6 +305,32 @@ class AbsenceAlertViewSet(viewsets.ModelViewSet):
             status=201,
         )
 
+    @action(detail=False, methods=["post"], url_path="docx/prerender")
+    def docx_prerender(self, request: Request):
+        """Pre-render (warm the cache for) all alerts of a wing with the given status (default: issued).
+
+        Enqueued as an RQ job; when the queue is unavailable the rendering runs inline, serially
+        (no process pool inside the web worker).
+        """
+        try:
+            wing_id = int(request.data.get("wing") or request.query_params.get("wing"))
+        except (TypeError, ValueError):
+            return Response({"detail": "wing مطلوب"}, status=400)
+        status_q = str(request.data.get("status") or request.query_params.get("status") or "issued")
+        if not _can_manage_wing(request.user, wing_id):
+            return Response({"detail": "لا يمكنك الوصول لتنبيهات خارج جناحك"}, status=403)
+        try:
+            import django_rq
+
+            from .tasks.jobs_rq import enqueue_prerender_wing_alerts
+
+            job = enqueue_prerender_wing_alerts(django_rq.get_queue("default"), wing_id, status=status_q)
+            return Response({"queued": True, "job_id": job.id}, status=202)
+        except Exception:
+            from .services.docx_cache import prerender_wing_alerts
+
+            return Response({"queued": False, "summary": prerender_wing_alerts(wing_id, status=status_q, workers=1)})
+
     @action(detail=True, methods=["get"], url_path="docx/latest")
     def docx_latest(self, request: Request, pk=None):
         alert = self.get_object()
@@ -261,7 +338,7 @@ class AbsenceAlertViewSet(viewsets.ModelViewSet):
         if not doc or not doc.file:
             return Response({"detail": "لا يوجد ملف محفوظ لهذا التنبيه"}, status=404)
         response = FileResponse(doc.file.open("rb"), content_type=doc.mime)
-        response["Content-Disposition"] = f'attachment; filename="{doc.file.name.split('/')[-1]}"'
+        response["Content-Disposition"] = f'attachment; filename="{_alert_docx_display_name(doc)}"'
         return response
 
     @action(detail=True, methods=["get"], url_path="docx/list")
@@ -270,7 +347,7 @@ class AbsenceAlertViewSet(viewsets.ModelViewSet):
         items = [
             {
                 "id": d.id,
-                "name": d.file.name.split("/")[-1] if d.file else None,
+                "name": _alert_docx_display_name(d) if d.file else None,
                 "size": d.size,
                 "sha256": d.sha256,
                 "template_name": d.template_name,
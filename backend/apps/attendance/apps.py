@@ -6,3 +6,31 @@ class AttendanceConfig(AppConfig):
     name = "apps.attendance"
     label = "attendance"
     verbose_name = "Attendance"
+
+    def ready(self):
+        from apps.common.conditional import track_models
+
+        from .services.daily_states import connect_daily_state_signals
+        from .services.rosters import connect_roster_signals
+        from .services.wing_timetable import connect_timetable_signals
+
+        connect_timetable_signals()
+        connect_daily_state_signals()
+        connect_roster_signals()
+        # Version counters behind the ETags of the teacher/wing read endpoints
+        track_models(
+            [
+                "school.TimetableEntry",
+                "school.PeriodTemplate",
+                "school.TemplateSlot",
+                "school.Class",
+                "school.Subject",
+                "school.Staff",
+                "school.Term",
+                "school.Wing",
+                "school.TeachingAssignment",
+                "auth.User",
+                "auth.Group",
+            ],
+            m2m=[("auth.User", "groups"), ("school.PeriodTemplate", "classes"), ("school.PeriodTemplate", "wings")],
+        )
@@ -9,7 +9,7 @@ from django.utils import timezone
 
 class Command(BaseCommand):
     help = (
-        "تحويل الغياب الجزئي إلى غياب يوم كامل عندما يكون الطالب غائبًا في الحصتين الأولى والثانية.\n"
+        "تحويل الغياب الجزئي إلى غياب يوم كامل عندما يكون الطالب غائبًا بدون عذر في الحصتين الأوليين (حسب سياسة الحضور).\n"
         "Idempotent: لن يُنشأ أكثر من سجل لليوم الكامل لنفس الطالب/التاريخ.\n"
         "الاستخدام: python manage.py attendance_finalize_day --date=YYYY-MM-DD"
     )
@@ -22,7 +22,7 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        from school.models import AttendanceRecord  # type: ignore
+        from school.models import AttendanceDaily  # type: ignore
         from discipline.models import Absence  # type: ignore
 
         # Resolve target date
@@ -38,20 +38,14 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.NOTICE(f"Finalizing attendance for date: {target_date.isoformat()}"))
 
-        # Find students absent in both first and second periods
-        qs = AttendanceRecord.objects.filter(date=target_date, status="absent")
-        # Some schemas may name the period field differently; use period_number when available
-        try:
-            p1 = qs.filter(period_number=1).values_list("student_id", flat=True)
-            p2 = qs.filter(period_number=2).values_list("student_id", flat=True)
-        except Exception:
-            # If period_number doesn't exist, nothing to do
-            self.stdout.write(self.style.WARNING("لم يتم العثور على الحقل period_number؛ لا يمكن تطبيق قاعدة الحصتين."))
-            return 0
-
-        s1 = set(int(x) for x in p1)
-        s2 = set(int(x) for x in p2)
-        candidates = sorted(s1.intersection(s2))
+        # الطلاب ذوو الحالة اليومية "غياب بدون عذر" وفق قاعدة الحصتين الأوليين (الملخص اليومي المحسوب مسبقًا)
+        candidates = sorted(
+            set(
+                AttendanceDaily.objects.filter(date=target_date, state=AttendanceDaily.State.UNEXCUSED).values_list(
+                    "student_id", flat=True
+                )
+            )
+        )
 
         created = 0
         existed = 0
@@ -64,7 +58,7 @@ class Command(BaseCommand):
                         "type": "FULL_DAY",
                         "status": "UNEXCUSED",
                         "source": "ATTENDANCE_SYSTEM",
-                        "notes": "Auto-finalized: absent in periods 1 and 2",
+                        "notes": "Auto-finalized: unexcused absence in the first two periods",
                     },
                 )
                 if was_created:
@@ -0,0 +1,150 @@
+"""
+Benchmark of the API JSON encoders on synthetic Arabic payloads (no database needed).
+
+Payloads (N items each):
+  incidents  list of incident-like dicts: UUID ids, aware datetimes, dates, Decimal points, Arabic narrative
+  timetable  wing timetable-like dict: {day: {period: [entries...]}}
+  reports    report rows (class/bucket aggregates)
+
+Encoders:
+  drf        rest_framework.renderers.JSONRenderer (the former default)
+  fast       core.renderers.FastJSONRenderer (orjson when installed, stdlib fallback)
+  stream     core.renderers.iter_json_list (list payloads only), chunks consumed one by one
+
+For each run the best wall time of --repeat runs, the body size and the peak traced memory
+(tracemalloc, one extra run) are reported.
+
+Usage:
+  python manage.py bench_json_encoding
+  python manage.py bench_json_encoding --sizes 1000,20000 --repeat 5 --format json
+"""
+
+import datetime as _dt
+import json
+import time
+import tracemalloc
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+
+def _incidents(n: int) -> List[Dict[str, Any]]:
+    base = timezone.now()
+    return [
+        {
+            "id": uuid.UUID(int=i + 1),
+            "student_name": f"الطالب رقم {i}",
+            "violation": {"code": f"V-{i % 40}", "category": "سلوك", "points": Decimal("2.50")},
+            "narrative": "تأخر الطالب عن الحصة الأولى دون عذر مقبول وتم إبلاغ ولي الأمر",
+            "occurred_at": base - _dt.timedelta(minutes=i),
+            "date": (base - _dt.timedelta(days=i % 90)).date(),
+            "status": ("open", "under_review", "closed")[i % 3],
+        }
+        for i in range(n)
+    ]
+
+
+def _timetable(n: int) -> Dict[str, Any]:
+    days = {}
+    for i in range(n):
+        day = days.setdefault(str(i % 5 + 1), {})
+        day.setdefault(str(i % 7 + 1), []).append(
+            {"class_name": f"الصف {i % 12 + 1}", "subject_name": "الرياضيات", "teacher_name": f"المعلم {i % 60}"}
+        )
+    return {"days": days, "meta": {"wing_id": 1, "generated_at": timezone.now()}}
+
+
+def _reports(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "class_id": i % 40,
+            "class_name": f"الصف {i % 40}",
+            "date_bucket": (_dt.date(2024, 9, 1) + _dt.timedelta(days=i // 40)).isoformat(),
+            "absent_total": i % 7,
+            "present_pct": 91.25,
+        }
+        for i in range(n)
+    ]
+
+
+PAYLOADS: Dict[str, Callable[[int], Any]] = {"incidents": _incidents, "timetable": _timetable, "reports": _reports}
+
+
+def _encoders() -> Dict[str, Callable[[Any], int]]:
+    from rest_framework.renderers import JSONRenderer
+
+    from core.renderers import FastJSONRenderer, iter_json_list
+
+    def _stream(data) -> int:
+        if not isinstance(data, list):
+            return -1
+        return sum(len(chunk) for chunk in iter_json_list({}, "results", data))
+
+    return {
+        "drf": lambda data: len(JSONRenderer().render({"results": data})),
+        "fast": lambda data: len(FastJSONRenderer().render({"results": data})),
+        "stream": _stream,
+    }
+
+
+def _measure(fn: Callable[[Any], int], data: Any, repeat: int) -> Dict[str, Any]:
+    best = None
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = fn(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        fn(data)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"ms": round((best or 0) * 1000, 2), "bytes": size, "peak_kb": peak // 1024}
+
+
+def _run(sizes: List[int], repeat: int = 3) -> Dict[str, Any]:
+    from apps.common import fastjson
+
+    results: Dict[str, Any] = {"encoder": "orjson" if fastjson.HAS_ORJSON else "stdlib", "rows": []}
+    encoders = _encoders()
+    for name, build in PAYLOADS.items():
+        for n in sizes:
+            data = build(n)
+            for enc, fn in encoders.items():
+                if enc == "stream" and not isinstance(data, list):
+                    continue
+                results["rows"].append({"payload": name, "items": n, "encoder": enc, **_measure(fn, data, repeat)})
+    return results
+
+
+class Command(BaseCommand):
+    help = "Benchmark DRF JSONRenderer vs the project FastJSONRenderer and streaming list encoding"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,20000", help="Comma separated item counts")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per payload (best time is reported)")
+        parser.add_argument("--format", choices=["text", "json"], default="text")
+
+    def handle(self, *args, **opts):
+        try:
+            sizes = [int(x) for x in str(opts["sizes"]).split(",") if x.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be comma separated integers")
+        if not sizes or min(sizes) < 1 or opts["repeat"] < 1:
+            raise CommandError("--sizes and --repeat must be positive")
+        results = _run(sizes, repeat=opts["repeat"])
+
+        if opts["format"] == "json":
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"fast encoder: {results['encoder']}")
+        self.stdout.write(f"{'payload':<11}{'items':>8}{'encoder':>9}{'ms':>10}{'KB':>9}{'peak KB':>10}")
+        for r in results["rows"]:
+            self.stdout.write(
+                f"{r['payload']:<11}{r['items']:>8}{r['encoder']:>9}{r['ms']:>10}{r['bytes'] // 1024:>9}{r['peak_kb']:>10}"
+            )
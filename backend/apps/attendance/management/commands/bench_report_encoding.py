@@ -0,0 +1,106 @@
+"""
+Benchmark of the report response encodings: dict rows + DRF JSONRenderer (default) against the
+columnar mode (?format=columnar: tuples transposed into parallel arrays + apps.common.fastjson).
+
+No database is needed: for each size N a synthetic ReportData with N (class, day) aggregates
+(Arabic class names, 40 classes per day) is built in memory, then both paths build and encode the
+/wing/reports/classes payload. The command reports the best wall time of --repeat runs and the
+encoded size of each path, and which JSON encoder the columnar path used (orjson or stdlib).
+
+Usage:
+  python manage.py bench_report_encoding
+  python manage.py bench_report_encoding --sizes 1000,10000,50000 --repeat 5 --format json
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+
+CLASSES_PER_DAY = 40
+
+
+def _report_data(n: int):
+    from ...services.reports import ReportData
+
+    data = ReportData(group_by="day")
+    data.classes = {cid: (f"الصف {cid // 4 + 7}-{cid % 4 + 1}", cid % 3 + 1) for cid in range(1, CLASSES_PER_DAY + 1)}
+    data.students = {cid: 25 + cid % 7 for cid in data.classes}
+    day = _dt.date(2024, 9, 1)
+    for i in range(n):
+        cid = i % CLASSES_PER_DAY + 1
+        bucket = (day + _dt.timedelta(days=i // CLASSES_PER_DAY)).isoformat()
+        data.counts[(cid, bucket)] = (i % 3, i % 5)
+    return data
+
+
+def _dict_path(data) -> bytes:
+    from rest_framework.renderers import JSONRenderer
+
+    from ...services.reports import class_rows
+
+    return JSONRenderer().render({"items": class_rows(data), "group_by": data.group_by})
+
+
+def _columnar_path(data) -> bytes:
+    from apps.common.columnar import ColumnarRenderer, Columns
+
+    from ...services.reports import CLASS_FIELDS, class_tuples
+
+    return ColumnarRenderer().render(Columns(CLASS_FIELDS, class_tuples(data)).payload(group_by=data.group_by))
+
+
+def _measure(fn: Callable[[Any], bytes], data, repeat: int) -> Dict[str, Any]:
+    best = None
+    body = b""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {"ms": round((best or 0) * 1000, 2), "bytes": len(body)}
+
+
+def _run(sizes: List[int], repeat: int = 3) -> Dict[str, Any]:
+    from apps.common import fastjson
+
+    results: Dict[str, Any] = {"encoder": "orjson" if fastjson.HAS_ORJSON else "stdlib", "rows": []}
+    for n in sizes:
+        data = _report_data(n)
+        results["rows"].append(
+            {"rows": n, "dict": _measure(_dict_path, data, repeat), "columnar": _measure(_columnar_path, data, repeat)}
+        )
+    return results
+
+
+class Command(BaseCommand):
+    help = "Benchmark dict vs columnar encoding of the class report rows (time and payload size)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,50000", help="Comma separated row counts")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per size (best time is reported)")
+        parser.add_argument("--format", choices=["text", "json"], default="text")
+
+    def handle(self, *args, **opts):
+        try:
+            sizes = [int(x) for x in str(opts["sizes"]).split(",") if x.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be comma separated integers")
+        if not sizes or min(sizes) < 1 or opts["repeat"] < 1:
+            raise CommandError("--sizes and --repeat must be positive")
+        results = _run(sizes, repeat=opts["repeat"])
+
+        if opts["format"] == "json":
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"columnar encoder: {results['encoder']}")
+        self.stdout.write(f"{'rows':>8}{'dict ms':>10}{'dict KB':>10}{'col ms':>10}{'col KB':>10}")
+        for r in results["rows"]:
+            d, c = r["dict"], r["columnar"]
+            self.stdout.write(
+                f"{r['rows']:>8}{d['ms']:>10}{d['bytes'] // 1024:>10}{c['ms']:>10}{c['bytes'] // 1024:>10}"
+            )
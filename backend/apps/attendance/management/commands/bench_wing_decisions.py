@@ -0,0 +1,146 @@
+"""
+Benchmark for the wing supervisor decisions (approvals decide / set-excused) as the id count grows.
+
+For each size N a throwaway class with N submitted attendance records (one day, six periods per
+student) is created inside a transaction that is rolled back at the end; the set-based
+decide_batches() and excuse_records() run on all N ids and the command reports their queries
+and wall time. With --per-row the former record-by-record save() loop is measured as well.
+
+Usage:
+  python manage.py bench_wing_decisions
+  python manage.py bench_wing_decisions --sizes 10,100,1000,5000 --per-row --format json
+"""
+
+from __future__ import annotations
+
+import datetime as _dt
+import json
+import time
+from typing import Any, Callable, Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+PERIODS = 6
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _seed(n: int) -> Dict[str, Any]:
+    from school.models import AcademicYear, AttendanceRecord, Class, Staff, Student, Subject, Term, Wing  # type: ignore
+
+    from ...services.submissions import submit_batches
+
+    day = _dt.date(2000, 1, 2)
+    year = AcademicYear.objects.create(name=f"bench-{n}", start_date=day, end_date=day + _dt.timedelta(days=90))
+    term = Term.objects.create(
+        name=f"bench-{n}", academic_year=year, start_date=day, end_date=day + _dt.timedelta(days=90)
+    )
+    wing = Wing.objects.create(name=f"bench-{n}")
+    classroom = Class.objects.create(name=f"bench-{n}", grade=12, wing=wing)
+    subject = Subject.objects.create(name_ar=f"bench-{n}")
+    teacher = Staff.objects.create(full_name=f"bench-{n}")
+    students = Student.objects.bulk_create(
+        [
+            Student(full_name=f"bench {i}", sid=f"bench-{n}-{i}", class_fk=classroom)
+            for i in range((n + PERIODS - 1) // PERIODS)
+        ]
+    )
+    records = AttendanceRecord.objects.bulk_create(
+        [
+            AttendanceRecord(
+                student=students[i // PERIODS],
+                classroom=classroom,
+                subject=subject,
+                teacher=teacher,
+                term=term,
+                date=day,
+                day_of_week=1,
+                period_number=i % PERIODS + 1,
+                start_time=_dt.time(8, 0),
+                end_time=_dt.time(8, 45),
+                status="absent",
+                locked=True,
+            )
+            for i in range(n)
+        ]
+    )
+    submit_batches(classroom.id, day, term=term, periods=range(1, PERIODS + 1), user=None)
+    return {"ids": [r.id for r in records], "wing_ids": [wing.id]}
+
+
+def _per_row_excuse(ids: List[int], wing_ids: List[int]) -> None:
+    """The former set_excused loop: one SELECT, then one save() per record."""
+    from school.models import AttendanceRecord  # type: ignore
+
+    from ...services.daily_states import deferred_daily_refresh
+
+    with deferred_daily_refresh():
+        for r in AttendanceRecord.objects.filter(id__in=ids, classroom__wing_id__in=wing_ids):
+            r.status = "excused"
+            r.note = f"[EXCUSED by bench] | {r.note}"[:300]
+            r.locked = True
+            r.source = "supervisor"
+            r.save(update_fields=["status", "note", "locked", "source", "updated_at"])
+
+
+def _scenarios(per_row: bool) -> Dict[str, Callable[[List[int], List[int]], Any]]:
+    from ...services.excuses import excuse_records
+    from ...services.submissions import decide_batches
+
+    out: Dict[str, Callable[[List[int], List[int]], Any]] = {
+        "approve": lambda ids, wings: decide_batches("approve", record_ids=ids, wing_ids=wings, reviewer="bench"),
+        "set_excused": lambda ids, wings: excuse_records(ids, wing_ids=wings, reviewer="bench"),
+    }
+    if per_row:
+        out["set_excused_per_row"] = _per_row_excuse
+    return out
+
+
+def _measure(n: int, name: str, fn: Callable[[List[int], List[int]], Any]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {}
+    try:
+        with transaction.atomic():
+            seeded = _seed(n)
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                fn(seeded["ids"], seeded["wing_ids"])
+                elapsed = time.perf_counter() - started
+            result = {"ids": n, "queries": len(ctx.captured_queries), "ms": round(elapsed * 1000, 1)}
+            raise _Rollback
+    except _Rollback:
+        pass
+    return result
+
+
+def _run(sizes: List[int], per_row: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    return {name: [_measure(n, name, fn) for n in sizes] for name, fn in _scenarios(per_row).items()}
+
+
+class Command(BaseCommand):
+    help = "Benchmark queries/time of the wing approve and set-excused decisions for growing id counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10,100,1000,5000", help="Comma separated id counts")
+        parser.add_argument("--per-row", action="store_true", help="Also measure the former per-record save loop")
+        parser.add_argument("--format", choices=["text", "json"], default="text")
+
+    def handle(self, *args, **opts):
+        try:
+            sizes = [int(x) for x in str(opts["sizes"]).split(",") if x.strip()]
+        except ValueError:
+            raise CommandError("--sizes must be comma separated integers")
+        if not sizes or min(sizes) < 1:
+            raise CommandError("--sizes must be positive")
+        results = _run(sizes, per_row=opts["per_row"])
+
+        if opts["format"] == "json":
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'scenario':<22}{'ids':>8}{'queries':>10}{'ms':>10}")
+        for name, rows in results.items():
+            for r in rows:
+                self.stdout.write(f"{name:<22}{r['ids']:>8}{r['queries']:>10}{r['ms']:>10}")
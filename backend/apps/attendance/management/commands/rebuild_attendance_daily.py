@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from datetime import date as _date
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "إعادة بناء الملخص اليومي للحضور (AttendanceDaily: حالة الحصتين الأوليين لكل طالب/يوم) من سجلات الحضور.\n"
+        "التعبئة الأولى تتم بالترحيل school.0050؛ يُستخدم الأمر بعد تعديل first_two_periods_numbers في سياسة الحضور.\n"
+        "الاستخدام: python manage.py rebuild_attendance_daily [--from=YYYY-MM-DD] [--to=YYYY-MM-DD] [--class-id=N]"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="from_str", help="بداية المدى (YYYY-MM-DD). الافتراضي: كل السجلات.")
+        parser.add_argument("--to", dest="to_str", help="نهاية المدى (YYYY-MM-DD).")
+        parser.add_argument("--class-id", dest="class_id", type=int, default=None, help="حصر إعادة البناء في صف واحد")
+
+    def handle(self, *args, **options):
+        from school.models import AttendanceRecord  # type: ignore
+
+        from ...services.daily_states import refresh_daily_states
+
+        qs = AttendanceRecord.objects.all()
+        for key, lookup in (("from_str", "date__gte"), ("to_str", "date__lte")):
+            raw = (options.get(key) or "").strip()
+            if raw:
+                try:
+                    qs = qs.filter(**{lookup: _date.fromisoformat(raw[:10])})
+                except ValueError:
+                    raise CommandError("صيغة التاريخ غير صحيحة. استخدم YYYY-MM-DD.")
+        if options.get("class_id"):
+            qs = qs.filter(classroom_id=options["class_id"])
+
+        pairs = qs.order_by("date", "classroom_id").values_list("classroom_id", "date").distinct()
+        days = rows = 0
+        for class_id, dt in pairs.iterator(chunk_size=2000):
+            rows += refresh_daily_states(class_id, dt)
+            days += 1
+        self.stdout.write(self.style.SUCCESS(f"تمت إعادة بناء {days} يوم/صف ({rows} ملخص طالب يومي)."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:26
+
+import apps.attendance.models_alerts
+import school.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("attendance", "0004_rename_absence_year_number_idx_attendance__academi_ba51e9_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="absencealertdocument",
+            name="file",
+            field=school.storage.ContentAddressedFileField(
+                digest_field="sha256",
+                storage=school.storage.get_blob_storage,
+                upload_to=apps.attendance.models_alerts._docx_upload_to,
+            ),
+        ),
+    ]
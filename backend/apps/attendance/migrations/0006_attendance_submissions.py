@@ -0,0 +1,116 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:05
+
+import re
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+_SUBMITTED_RE = re.compile(r"\[SUBMITTED[^\]]*\]\s*", re.IGNORECASE)
+
+
+def backfill_submissions(apps, schema_editor):
+    """Turn the open legacy submissions ([SUBMITTED] note tag on unlocked records) into batches.
+
+    Locked records without a supervisor source were also listed as pending by the old queue, but
+    they are history (every past day of a locked class) and are left as they are rather than
+    flooding the approval queue. The note tags are stripped from every record with bulk_update.
+    """
+    AttendanceRecord = apps.get_model("school", "AttendanceRecord")
+    AttendanceSubmission = apps.get_model("attendance", "AttendanceSubmission")
+    tagged_qs = AttendanceRecord.objects.filter(note__icontains="[SUBMITTED")
+    batches = {}
+    tagged = []
+    for rid, class_id, dt, period, term_id, note, locked, updated_at in tagged_qs.values_list(
+        "id", "classroom_id", "date", "period_number", "term_id", "note", "locked", "updated_at"
+    ).iterator():
+        key = (class_id, dt, period)
+        if not locked and key not in batches:
+            batches[key] = AttendanceSubmission(
+                classroom_id=class_id,
+                date=dt,
+                period_number=period,
+                term_id=term_id,
+                submitted_at=updated_at or timezone.now(),
+            )
+        tagged.append(AttendanceRecord(pk=rid, note=_SUBMITTED_RE.sub("", note or "").strip()))
+    AttendanceSubmission.objects.bulk_create(list(batches.values()), batch_size=500, ignore_conflicts=True)
+    AttendanceRecord.objects.bulk_update(tagged, ["note"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("attendance", "0005_alter_absencealertdocument_file"),
+        ("school", "0047_partition_attendance_archive"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttendanceSubmission",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("date", models.DateField()),
+                ("period_number", models.PositiveSmallIntegerField()),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("submitted", "بانتظار الاعتماد"), ("approved", "معتمد"), ("rejected", "مرفوض")],
+                        default="submitted",
+                        max_length=10,
+                    ),
+                ),
+                ("submitted_at", models.DateTimeField()),
+                ("decided_at", models.DateTimeField(blank=True, null=True)),
+                ("comment", models.CharField(blank=True, default="", max_length=300)),
+                (
+                    "classroom",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance_submissions",
+                        to="school.class",
+                    ),
+                ),
+                (
+                    "decided_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="attendance_submission_decisions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "submitted_by",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="attendance_submissions",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "term",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="school.term",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "دفعة اعتماد حضور",
+                "verbose_name_plural": "دفعات اعتماد الحضور",
+                "indexes": [models.Index(fields=["status", "date"], name="att_submission_status_idx")],
+                "constraints": [
+                    models.UniqueConstraint(fields=("classroom", "date", "period_number"), name="att_submission_uniq")
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_submissions, migrations.RunPython.noop),
+    ]
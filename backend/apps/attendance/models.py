@@ -32,3 +32,50 @@ class AttendanceEvidence(models.Model):
         verbose_name = "مستند إثبات حضور"
         verbose_name_plural = "مستندات إثبات الحضور"
         indexes = [models.Index(fields=["record", "uploaded_at"], name="evidence_rec_upl_idx")]
+
+
+class AttendanceSubmission(models.Model):
+    """دفعة اعتماد: تسليم المعلم لسجلات صف/يوم/حصة إلى مشرف الجناح.
+
+    حالة الاعتماد تُحفظ هنا بدل وسم [SUBMITTED] داخل ملاحظة كل سجل، فيصبح عرض المعلّق
+    بحثًا مفهرسًا على (status, date) ويتم الاعتماد/الرفض بتحديث واحد للدفعة وسجلاتها.
+    """
+
+    class Status(models.TextChoices):
+        SUBMITTED = "submitted", "بانتظار الاعتماد"
+        APPROVED = "approved", "معتمد"
+        REJECTED = "rejected", "مرفوض"
+
+    classroom = models.ForeignKey("school.Class", on_delete=models.CASCADE, related_name="attendance_submissions")
+    date = models.DateField()
+    period_number = models.PositiveSmallIntegerField()
+    term = models.ForeignKey("school.Term", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.SUBMITTED)
+    submitted_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="attendance_submissions",
+    )
+    submitted_at = models.DateTimeField()
+    decided_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="attendance_submission_decisions",
+    )
+    decided_at = models.DateTimeField(null=True, blank=True)
+    comment = models.CharField(max_length=300, blank=True, default="")
+
+    class Meta:
+        verbose_name = "دفعة اعتماد حضور"
+        verbose_name_plural = "دفعات اعتماد الحضور"
+        constraints = [
+            models.UniqueConstraint(fields=["classroom", "date", "period_number"], name="att_submission_uniq"),
+        ]
+        indexes = [models.Index(fields=["status", "date"], name="att_submission_status_idx")]
+
+    def __str__(self) -> str:
+        return f"{self.classroom_id} {self.date} P{self.period_number} ({self.status})"
@@ -3,6 +3,8 @@ from django.conf import settings
 from django.db import models, transaction
 from django.utils import timezone
 
+from school.storage import ContentAddressedFileField
+
 
 class AlertNumberSequence(models.Model):
     academic_year = models.CharField(max_length=20, unique=True)
@@ -14,11 +16,19 @@ class AlertNumberSequence(models.Model):
 
     @classmethod
     def next_number(cls, year_name: str) -> int:
+        return cls.reserve_block(year_name, 1)
+
+    @classmethod
+    def reserve_block(cls, year_name: str, count: int) -> int:
+        """Reserve `count` consecutive numbers with a single locked increment; returns the first one."""
+        if count < 1:
+            raise ValueError("count must be >= 1")
         with transaction.atomic():
             seq, _ = cls.objects.select_for_update().get_or_create(academic_year=year_name, defaults={"last_number": 0})
-            seq.last_number += 1
+            first = seq.last_number + 1
+            seq.last_number += count
             seq.save(update_fields=["last_number"])
-            return seq.last_number
+            return first
 
 
 class AbsenceAlert(models.Model):
@@ -83,7 +93,7 @@ def _docx_upload_to(instance: "AbsenceAlertDocument", filename: str) -> str:
 
 class AbsenceAlertDocument(models.Model):
     alert = models.ForeignKey(AbsenceAlert, on_delete=models.CASCADE, related_name="documents")
-    file = models.FileField(upload_to=_docx_upload_to)
+    file = ContentAddressedFileField(upload_to=_docx_upload_to, digest_field="sha256")
     size = models.PositiveIntegerField(default=0)
     mime = models.CharField(
         max_length=100,
@@ -1,8 +1,17 @@
 from datetime import date as _date
 from typing import Any, Dict, List
 
-from django.db.models import Count, Q, QuerySet
-from school.models import AttendanceRecord, Class, ExitEvent, Student, Term, TimetableEntry  # type: ignore
+from django.db.models import Count, Q, QuerySet, Value
+from school.models import (  # type: ignore
+    AttendanceRecord,
+    AttendanceRecordArchive,
+    Class,
+    ExitEvent,
+    Student,
+    Subject,
+    Term,
+    TimetableEntry,
+)
 
 try:
     from backend.common.day_utils import iso_to_school_dow
@@ -55,6 +64,56 @@ def get_attendance_records(class_id: int, dt: _date, period_number: int | None =
     return qs
 
 
+# Columns shared by AttendanceRecord and AttendanceRecordArchive (the archive keeps plain *_id columns)
+HISTORY_FIELDS = ("date", "student_id", "period_number", "subject_id", "teacher_id", "status", "note")
+
+
+def get_attendance_history(
+    class_id: int,
+    dt_from: _date,
+    dt_to: _date,
+    *,
+    teacher_scope: tuple[int, List[int]] | None = None,
+    current_class_only: bool = False,
+    include_archive: bool = True,
+) -> QuerySet:
+    """
+    Class attendance between dt_from and dt_to from the live table and the archive, as one ordered
+    values() queryset (UNION ALL). Rows are dicts with HISTORY_FIELDS + 'archived'.
+    teacher_scope: optional (teacher_id, subject_ids) restriction; an empty subject list yields no rows.
+    current_class_only: keep only students whose current class is class_id (history-strict).
+    On PostgreSQL the archive is partitioned by month (school.partitioning), so the date range prunes
+    the archive to the months it touches.
+    """
+    live = AttendanceRecord.objects.filter(**{_CLASS_FK_ID: class_id}, date__gte=dt_from, date__lte=dt_to)
+    archive = AttendanceRecordArchive.objects.filter(classroom_id=class_id, date__gte=dt_from, date__lte=dt_to)
+    if teacher_scope is not None:
+        teacher_id, subject_ids = teacher_scope
+        live = live.filter(teacher_id=teacher_id, subject_id__in=list(subject_ids))
+        archive = archive.filter(teacher_id=teacher_id, subject_id__in=list(subject_ids))
+    if current_class_only:
+        roster = Student.objects.filter(class_fk_id=class_id).values("id")
+        live = live.filter(student_id__in=roster)
+        archive = archive.filter(student_id__in=roster)
+    live = live.annotate(archived=Value(False)).values(*HISTORY_FIELDS, "archived")
+    if include_archive:
+        archive = archive.annotate(archived=Value(True)).values(*HISTORY_FIELDS, "archived")
+        live = live.union(archive, all=True)
+    return live.order_by("date", "student_id", "period_number")
+
+
+def attach_history_names(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Add student_name/subject_name to history rows (one query per table, archive rows have no FKs)."""
+    student_ids = {r["student_id"] for r in rows}
+    subject_ids = {r["subject_id"] for r in rows if r.get("subject_id")}
+    students = dict(Student.objects.filter(id__in=student_ids).values_list("id", "full_name")) if rows else {}
+    subjects = dict(Subject.objects.filter(id__in=subject_ids).values_list("id", "name_ar")) if subject_ids else {}
+    for r in rows:
+        r["student_name"] = students.get(r["student_id"])
+        r["subject_name"] = subjects.get(r.get("subject_id"))
+    return rows
+
+
 def get_summary(
     *,
     scope: str,
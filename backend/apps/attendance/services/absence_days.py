@@ -1,10 +1,15 @@
 from __future__ import annotations
 import datetime as dt
 from collections import defaultdict
-from typing import Tuple
+from typing import Iterable, Tuple
 
 
-from school.models import AttendanceRecord, AttendancePolicy, Term, SchoolHoliday  # type: ignore
+from school.models import AttendanceDaily, AttendancePolicy, Term, SchoolHoliday  # type: ignore
+
+try:
+    from backend.common.day_utils import iso_to_school_dow
+except Exception:
+    from common.day_utils import iso_to_school_dow  # type: ignore
 
 # Policy mappings
 UNEXCUSED = {"absent", "runaway"}
@@ -20,62 +25,85 @@ def _policy_for_date(d: dt.date) -> AttendancePolicy | None:
 
 
 def _holidays_between(start: dt.date, end: dt.date) -> set[dt.date]:
-    return set(SchoolHoliday.objects.filter(date__range=[start, end]).values_list("date", flat=True))
+    # SchoolHoliday stores ranges (start..end); expand the overlapping part into individual days
+    days: set[dt.date] = set()
+    for h_start, h_end in SchoolHoliday.objects.filter(start__lte=end, end__gte=start).values_list("start", "end"):
+        cur = max(h_start, start)
+        while cur <= min(h_end, end):
+            days.add(cur)
+            cur += dt.timedelta(days=1)
+    return days
+
+
+def _policy_settings(start_date: dt.date, end_date: dt.date) -> tuple[set[int], set[int]]:
+    """Return (first_two_periods, working_days) from the policy covering the range."""
+    pol = _policy_for_date(start_date) or _policy_for_date(end_date)
+    first_two = set((pol.first_two_periods_numbers or [1, 2])) if pol else {1, 2}
+    working_days = set(pol.working_days or [1, 2, 3, 4, 5]) if pol else {1, 2, 3, 4, 5}
+    return first_two, working_days
+
+
+def first_two_state(statuses: Iterable[str | None]) -> str:
+    """Daily state from the statuses of the first two periods (None = not recorded).
+
+    The single place of the rule; school.AttendanceDaily stores its result per student per date.
+    - 'none' unless every period has a status within {excused, unexcused} (not neutral/missing)
+    - 'unexcused' if any of them is unexcused, 'excused' if all of them are excused
+    """
+    statuses = list(statuses)
+    if not statuses or any(s is None or s in NEUTRAL for s in statuses):
+        return "none"
+    if any(s in UNEXCUSED for s in statuses):
+        return "unexcused"
+    if all(s in EXCUSED for s in statuses):
+        return "excused"
+    return "none"
 
 
 def compute_absence_days(student_id: int, start_date: dt.date, end_date: dt.date) -> Tuple[int, int]:
     """Compute full-day absences within [start_date, end_date] based on first-two-periods rule.
 
-    Rules:
+    Rules (see first_two_state):
     - Count a full day only if both first two periods have status within {excused, unexcused} (not neutral/none).
     - If any of the two is unexcused => day counts as unexcused.
     - If both are excused => day counts as excused.
-    - Ignore holidays and non-working days (if day_of_week available in rows and not in working_days).
+    - Ignore holidays and non-working days.
     """
     if not start_date or not end_date or start_date > end_date:
         return 0, 0
+    return compute_absence_days_bulk([student_id], start_date, end_date).get(student_id, (0, 0))
 
-    # Determine policy reference (use start or end date whichever available)
-    pol = _policy_for_date(start_date) or _policy_for_date(end_date)
-    first_two = set((pol.first_two_periods_numbers or [1, 2])) if pol else {1, 2}
-    working_days = set(pol.working_days or [1, 2, 3, 4, 5]) if pol else {1, 2, 3, 4, 5}
 
-    holidays = _holidays_between(start_date, end_date)
+def compute_absence_days_bulk(
+    student_ids: Iterable[int], start_date: dt.date, end_date: dt.date
+) -> dict[int, Tuple[int, int]]:
+    """Same rules as compute_absence_days for many students at once.
 
-    rows = AttendanceRecord.objects.filter(
-        student_id=student_id, date__range=[start_date, end_date], period_number__in=list(first_two)
-    ).values("date", "period_number", "status", "day_of_week")
+    Working days and holidays are resolved once and the materialized daily states
+    (school.AttendanceDaily) of all students are read in a single query. Returns {student_id: (excused_days, unexcused_days)} for every requested id.
+    """
+    ids = list(dict.fromkeys(int(i) for i in student_ids))
+    if not ids or not start_date or not end_date or start_date > end_date:
+        return {sid: (0, 0) for sid in ids}
 
-    per_day: dict[dt.date, dict[int, str | None]] = defaultdict(lambda: {n: None for n in first_two})
-    day_of_week_map: dict[dt.date, int] = {}
-    for r in rows:
-        per_day[r["date"]][r["period_number"]] = r["status"]
-        day_of_week_map[r["date"]] = r["day_of_week"]
+    _first_two, working_days = _policy_settings(start_date, end_date)
+    holidays = _holidays_between(start_date, end_date)
 
-    excused_days = 0
-    unexcused_days = 0
+    # Daily states are materialized when attendance is saved (services/daily_states)
+    rows = AttendanceDaily.objects.filter(
+        student_id__in=ids, date__range=[start_date, end_date], state__in=["excused", "unexcused"]
+    ).values_list("student_id", "date", "state")
 
-    cur = start_date
-    one_day = dt.timedelta(days=1)
-    while cur <= end_date:
-        if cur in holidays:
-            cur += one_day
-            continue
-        dow = day_of_week_map.get(cur)
-        if dow is not None and dow not in working_days:
-            cur += one_day
+    days: dict[int, dict[dt.date, str]] = defaultdict(dict)
+    for sid, day, state in rows.iterator(chunk_size=5000):
+        if day in holidays or iso_to_school_dow(day) not in working_days:
             continue
-        p = per_day.get(cur)
-        if p:
-            statuses = [p.get(n) for n in first_two]
-            # Ensure both are from {excused, unexcused}
-            if any(s is None or s in NEUTRAL for s in statuses):
-                cur += one_day
-                continue
-            if any(s in UNEXCUSED for s in statuses):
-                unexcused_days += 1
-            elif all(s in EXCUSED for s in statuses):
-                excused_days += 1
-        cur += one_day
-
-    return excused_days, unexcused_days
+        # Overlapping terms may give two rows for one day; unexcused wins
+        if days[sid].get(day) != "unexcused":
+            days[sid][day] = state
+
+    out: dict[int, Tuple[int, int]] = {}
+    for sid in ids:
+        states = list(days.get(sid, {}).values())
+        out[sid] = (states.count("excused"), states.count("unexcused"))
+    return out
@@ -8,9 +8,12 @@ from typing import Any, Dict, Iterable, List, Optional
 from django.db import transaction
 from django.utils import timezone
 from school.models import AttendanceRecord, Staff, TimetableEntry  # type: ignore
+from school.services.late_events import reconcile_late_events  # type: ignore
 
 from ..models import AttendanceStatus
-from ..selectors import _current_term  # reuse existing helper
+from .daily_states import deferred_daily_refresh
+from .rosters import inactive_student_ids
+from ..selectors import _CLASS_FK_ID, _current_term  # reuse existing helpers
 
 try:
     from backend.common.day_utils import iso_to_school_dow
@@ -18,20 +21,6 @@ except Exception:
     from common.day_utils import iso_to_school_dow  # type: ignore
 
 
-def _class_fk_id_field() -> str:
-    try:
-        AttendanceRecord._meta.get_field("classroom")  # type: ignore[attr-defined]
-        return "classroom_id"
-    except Exception:
-        pass
-    try:
-        AttendanceRecord._meta.get_field("class")  # type: ignore[attr-defined]
-        return "class_id"
-    except Exception:
-        pass
-    return "classroom_id"
-
-
 def _map_iso_to_school_day(iso: int) -> Optional[int]:
     """Map ISO weekday (Mon=1..Sun=7) to school day (Sun=1..Sat=7).
     Returns None for non-working days (Fri=6, Sat=7 in school format).
@@ -68,6 +57,7 @@ def _period_times_for_day(school_day: int) -> Dict[int, tuple]:
         return {}
 
 
+@deferred_daily_refresh()
 @transaction.atomic
 def bulk_save_attendance(
     *,
@@ -86,7 +76,8 @@ def bulk_save_attendance(
       - On ambiguity (multiple matches) or no match, raise ValueError with a clear message.
     """
     saved: list[AttendanceRecord] = []
-    fk = _class_fk_id_field()
+    late_hints: dict[int, int] = {}
+    fk = _CLASS_FK_ID  # resolved once at import
     model_fields = {f.name for f in AttendanceRecord._meta.get_fields()}
 
     # Derive teacher (Staff) from actor_user_id if possible
@@ -171,19 +162,17 @@ def bulk_save_attendance(
     end_time = st_et[1] if st_et else _time(0, 0)
 
     # Pre-validate: ensure all targeted students are active; otherwise block the whole operation
+    target_ids = [int(p.get("student_id")) for p in records if p.get("student_id") is not None]
     try:
-        from school.models import Student  # type: ignore
-
-        target_ids = [int(p.get("student_id")) for p in records if p.get("student_id") is not None]
-        if target_ids:
-            inactive_ids = set(Student.objects.filter(id__in=target_ids, active=False).values_list("id", flat=True))
-            if inactive_ids:
-                # Arabic message: inactive students cannot be acted upon
-                ids_str = ", ".join(str(i) for i in sorted(inactive_ids))
-                raise ValueError(f"لا يمكن إجراء أي إجراء على طالب غير فعال. المعرفات غير الفعالة: {ids_str}")
+        # Cached class roster (services/rosters); students outside the class are checked in the DB
+        inactive_ids = inactive_student_ids(class_id, target_ids) if target_ids else set()
     except Exception:
         # If Student model unavailable, proceed (defensive)
-        pass
+        inactive_ids = set()
+    if inactive_ids:
+        # Arabic message: inactive students cannot be acted upon
+        ids_str = ", ".join(str(i) for i in sorted(inactive_ids))
+        raise ValueError(f"لا يمكن إجراء أي إجراء على طالب غير فعال. المعرفات غير الفعالة: {ids_str}")
 
     for payload in records:
         student_id = int(payload["student_id"])  # DB pk
@@ -262,21 +251,7 @@ def bulk_save_attendance(
         except Exception:
             prev = None
 
-        # Preserve submission marker if present on previous version to keep items pending until supervisor decision
-        try:
-            prev_note = (getattr(prev, "note", "") or "").strip() if prev is not None else ""
-            has_submitted_tag = "[SUBMITTED" in prev_note
-        except Exception:
-            prev_note = ""
-            has_submitted_tag = False
-        if has_submitted_tag and "note" in model_fields:
-            # If new note is missing or empty, keep previous note (to retain [SUBMITTED] tag)
-            if (note is None) or (str(note).strip() == ""):
-                defaults.pop("note", None)
-            else:
-                # Ensure the marker stays in the note if teacher typed a new note
-                if "[SUBMITTED" not in str(defaults.get("note", "")):
-                    defaults["note"] = f"{prev_note}"
+        # Submission state lives in AttendanceSubmission batches, so the teacher's note is saved as typed
         if "updated_at" in model_fields:
             defaults["updated_at"] = timezone.now()
         if actor_user_id and ("updated_by" in model_fields or "updated_by_id" in model_fields):
@@ -356,13 +331,12 @@ def bulk_save_attendance(
             **lookup,
             defaults=defaults,
         )
-        # Handle lateness event creation
+        # Measure lateness against the period start (late event itself is reconciled after the loop)
         try:
             if str(status) == "late":
                 from datetime import datetime as _dt
 
                 from django.utils.timezone import get_current_timezone, make_aware
-                from school.models import AttendanceLateEvent, Class, Student, Subject  # type: ignore
 
                 # Compute late seconds based on server time vs period start
                 tz = get_current_timezone()
@@ -376,57 +350,13 @@ def bulk_save_attendance(
                     obj.save(update_fields=["late_minutes", "updated_at"])
                 except Exception:
                     pass
-                # Format mm:ss (cap at 59:59 display if needed)
-                mm = max(0, (late_seconds // 60))
-                ss = max(0, (late_seconds % 60))
-                late_mmss = f"{mm:02d}:{ss:02d}"
-                # Resolve context
-                student_fk = getattr(obj, "student", None)
-                classroom_fk = getattr(obj, "classroom", None)
-                subject_fk = getattr(obj, "subject", None)
-                teacher_fk = getattr(obj, "teacher", None)
-                # Fallback by ids if relations not loaded
-                if student_fk is None:
-                    try:
-                        student_fk = Student.objects.get(id=student_id)
-                    except Exception:
-                        student_fk = None
-                if classroom_fk is None:
-                    try:
-                        classroom_fk = Class.objects.get(id=class_id)
-                    except Exception:
-                        classroom_fk = None
-                if subject_fk is None and getattr(obj, "subject_id", None):
-                    try:
-                        subject_fk = Subject.objects.get(id=getattr(obj, "subject_id"))
-                    except Exception:
-                        subject_fk = None
-                # Create event
-                try:
-                    AttendanceLateEvent.objects.create(
-                        attendance_record=obj,
-                        student=student_fk,
-                        classroom=classroom_fk,
-                        subject=subject_fk,
-                        teacher=teacher_fk,
-                        recorded_by_id=actor_user_id,
-                        date=dt,
-                        day_of_week=defaults.get("day_of_week")
-                        or getattr(obj, "day_of_week", 0)
-                        or iso_to_school_dow(dt),
-                        period_number=(
-                            int(period_number) if period_number else int(getattr(obj, "period_number", 1) or 1)
-                        ),
-                        start_time=start_time,
-                        late_seconds=late_seconds,
-                        late_mmss=late_mmss,
-                        note=note or "",
-                    )
-                except Exception:
-                    # Do not block bulk save if event creation fails
-                    pass
+                # Keep second-level precision for the late event (applied by the reconciler below)
+                late_hints[obj.id] = late_seconds
         except Exception:
             # Do not block bulk save on any unexpected error
             pass
         saved.append(obj)
+
+    # Late events for the whole batch in one pass (replaces the per-save signal)
+    reconcile_late_events([o.id for o in saved], recorded_by_id=actor_user_id, late_seconds=late_hints)
     return saved
@@ -0,0 +1,144 @@
+"""Bulk issuance of absence alerts for a whole wing.
+
+Term-end runs used to call AbsenceAlertViewSet.create once per student, each taking its own
+AlertNumberSequence row lock. Here absence days are computed for every student of the wing with
+one attendance query, a contiguous block of numbers is reserved with a single locked increment and
+the alerts are inserted with bulk_create. Pre-rendering the DOCX files is optional and delegated to
+docx_cache.prerender_alerts (process pool).
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from typing import Any, Dict
+
+from django.db import transaction
+from django.utils import timezone
+
+from school.models import AcademicYear, Student  # type: ignore
+
+from ..models_alerts import AbsenceAlert, AlertNumberSequence
+from .absence_days import compute_absence_days_bulk
+
+
+def current_academic_year() -> AcademicYear | None:
+    cy = AcademicYear.objects.filter(is_current=True).first()
+    if cy:
+        return cy
+    today = timezone.localdate()
+    return AcademicYear.objects.filter(start_date__lte=today, end_date__gte=today).first()
+
+
+def _week_bounds(start_date: dt.date) -> tuple[dt.date, dt.date]:
+    """Sun→Thu school week covering start_date (same idempotency window as single create)."""
+    days_to_sunday = (start_date.weekday() + 1) % 7
+    week_start = start_date - dt.timedelta(days=days_to_sunday)
+    return week_start, week_start + dt.timedelta(days=4)
+
+
+def issue_wing_alerts(
+    wing_id: int,
+    start_date: dt.date,
+    end_date: dt.date,
+    *,
+    user_id: int,
+    min_unexcused: int = 1,
+    prerender: bool = False,
+    prerender_workers: int | None = None,
+) -> Dict[str, Any]:
+    """Issue alerts for every active student of a wing whose unexcused days reach min_unexcused.
+
+    Students that already have an alert in the same week (same rule as the single create endpoint)
+    are skipped; the check is repeated under the year's AlertNumberSequence row lock so concurrent
+    runs cannot both issue an alert for the same student. min_unexcused must be >= 1. Returns a
+    summary dict suitable for job.meta. prerender_workers is passed to prerender_alerts
+    (None = ABSENCE_ALERT_PRERENDER_WORKERS; 1 = serial, for inline HTTP runs).
+    """
+    if start_date > end_date:
+        raise ValueError("نطاق التواريخ غير صحيح")
+    if min_unexcused < 1:
+        raise ValueError("min_unexcused يجب أن يكون 1 أو أكثر")
+    cy = current_academic_year()
+    if not cy:
+        raise ValueError("لم يتم تعريف العام الدراسي الحالي")
+
+    students = list(
+        Student.objects.filter(class_fk__wing_id=wing_id, active=True)
+        .select_related("class_fk")
+        .order_by("class_fk__name", "full_name", "id")
+    )
+    week_start, week_end = _week_bounds(start_date)
+
+    def already_alerted(student_ids: list[int]) -> set[int]:
+        return set(
+            AbsenceAlert.objects.filter(
+                student_id__in=student_ids,
+                wing_id=wing_id,
+                period_end__gte=week_start,
+                period_start__lte=week_end,
+            ).values_list("student_id", flat=True)
+        )
+
+    existing = already_alerted([s.id for s in students])
+    days = compute_absence_days_bulk([s.id for s in students if s.id not in existing], start_date, end_date)
+
+    eligible = [s for s in students if s.id in days and days[s.id][1] >= min_unexcused]
+    below_threshold = len(days) - len(eligible)
+    created_ids: list[int] = []
+    alerts: list[AbsenceAlert] = []
+    if eligible:
+        with transaction.atomic():
+            # Serialize issuers of the year on the sequence row, then re-check: a concurrent run may
+            # have issued alerts for some of these students since the first read
+            AlertNumberSequence.objects.select_for_update().get_or_create(
+                academic_year=cy.name, defaults={"last_number": 0}
+            )
+            taken = already_alerted([s.id for s in eligible])
+            existing |= taken
+            eligible = [s for s in eligible if s.id not in taken]
+            if eligible:
+                first = AlertNumberSequence.reserve_block(cy.name, len(eligible))
+                alerts = [
+                    AbsenceAlert(
+                        number=first + i,
+                        academic_year=cy.name,
+                        student_id=s.id,
+                        class_name=(s.class_fk.name if s.class_fk_id else ""),
+                        parent_name=(s.parent_name or "")[:100],
+                        parent_mobile=(s.parent_phone or "")[:30],
+                        period_start=start_date,
+                        period_end=end_date,
+                        excused_days=days[s.id][0],
+                        unexcused_days=days[s.id][1],
+                        status="issued",
+                        created_by_id=user_id,
+                        wing_id=wing_id,
+                    )
+                    for i, s in enumerate(eligible)
+                ]
+                AbsenceAlert.objects.bulk_create(alerts, batch_size=500)
+    if alerts:
+        # Primary keys are not returned by bulk_create on every backend; look them up by number
+        created_ids = list(
+            AbsenceAlert.objects.filter(
+                academic_year=cy.name, number__gte=alerts[0].number, number__lte=alerts[-1].number
+            ).values_list("id", flat=True)
+        )
+
+    summary: Dict[str, Any] = {
+        "wing_id": wing_id,
+        "academic_year": cy.name,
+        "students": len(students),
+        "skipped_existing": len(existing),
+        "below_threshold": below_threshold,
+        "created": len(created_ids),
+        "numbers": [alerts[0].number, alerts[-1].number] if alerts else [],
+    }
+    if prerender and created_ids:
+        from .docx_cache import prerender_alerts
+
+        try:
+            summary["prerender"] = prerender_alerts(created_ids, workers=prerender_workers)
+        except Exception as e:  # rendering must never undo issuance
+            summary["prerender"] = {"error": str(e)}
+    return summary
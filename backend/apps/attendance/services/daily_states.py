@@ -0,0 +1,250 @@
+"""Materialized daily absence state (school.AttendanceDaily): one row per student per date.
+
+The "first two periods" rule (absence_days.first_two_state) used to be re-evaluated from the raw
+AttendanceRecord rows by the wing daily-absences view, its CSV/DOCX exports, the absence-days
+counter and attendance_finalize_day. It is now applied once, when attendance is written:
+
+- refresh_daily_states(class_id, date) rebuilds the rows of one class-day from its records
+  (p1/p2 statuses, state, period counters) in one read and one upsert;
+- a post_save receiver on AttendanceRecord refreshes the class-day of the saved row;
+  inside deferred_daily_refresh() the class-days are collected and refreshed once on exit, so a
+  bulk save of 30 students costs one refresh, not 30;
+- writers that bypass signals (QuerySet.update) call refresh_for_records() themselves. Bulk
+  deletions (purge/cleanup commands) delete the AttendanceDaily rows of their range directly;
+  no post_delete receiver is connected so they keep Django's fast delete.
+
+Readers (daily_absence_rows, compute_absence_days_bulk) then do a single indexed read on
+(date, wing) / (student, date). After changing AttendancePolicy.first_two_periods_numbers run
+`manage.py rebuild_attendance_daily` for the affected range. Existing records are backfilled by
+migration school.0050_backfill_attendance_daily (a frozen copy of refresh_daily_states).
+"""
+
+from __future__ import annotations
+
+import contextlib
+import datetime as _dt
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+
+from .absence_days import first_two_state
+
+ClassDay = Tuple[int, _dt.date]
+
+_deferred: ContextVar[Optional[Set[ClassDay]]] = ContextVar("daily_state_deferred", default=None)
+
+_COUNTERS = {
+    "present": "present_periods",
+    "late": "present_periods",
+    "left_early": "present_periods",
+    "absent": "absent_periods",
+    "runaway": "runaway_periods",
+    "excused": "excused_periods",
+}
+
+
+def _first_two_by_term(term_ids: Iterable[int]) -> Dict[int, List[int]]:
+    """Period numbers of the first two periods per term (latest AttendancePolicy; default 1, 2)."""
+    from school.models import AttendancePolicy  # type: ignore
+
+    out: Dict[int, List[int]] = {}
+    for term_id, numbers in (
+        AttendancePolicy.objects.filter(term_id__in=list(term_ids))
+        .order_by("term_id", "-id")
+        .values_list("term_id", "first_two_periods_numbers")
+    ):
+        if term_id not in out:
+            out[term_id] = sorted(numbers or [1, 2])[:2]
+    return out
+
+
+def refresh_daily_states(class_id: int, dt: _dt.date) -> int:
+    """Rebuild the AttendanceDaily rows of one class-day; returns the number of rows kept."""
+    from school.models import AttendanceDaily, AttendanceRecord, Class  # type: ignore
+
+    records = list(
+        AttendanceRecord.objects.filter(classroom_id=class_id, date=dt).values_list(
+            "student_id", "term_id", "period_number", "status", "late_minutes", "early_minutes", "locked"
+        )
+    )
+    per_student: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    for sid, term_id, period, status, late, early, locked in records:
+        row = per_student.setdefault(
+            (sid, term_id),
+            {"periods": {}, "late": 0, "early": 0, "locked": True, **{f: 0 for f in set(_COUNTERS.values())}},
+        )
+        row["periods"][period] = status
+        row["late"] += int(late or 0)
+        row["early"] += int(early or 0)
+        row["locked"] = row["locked"] and bool(locked)
+        counter = _COUNTERS.get(status)
+        if counter:
+            row[counter] += 1
+
+    slots = _first_two_by_term({term_id for _sid, term_id in per_student})
+    wing_id = Class.objects.filter(id=class_id).values_list("wing_id", flat=True).first()
+    objs = []
+    for (sid, term_id), row in per_student.items():
+        first_two = slots.get(term_id, [1, 2])
+        statuses = [row["periods"].get(n) for n in first_two]
+        state = first_two_state(statuses)
+        objs.append(
+            AttendanceDaily(
+                student_id=sid,
+                date=dt,
+                term_id=term_id,
+                school_class_id=class_id,
+                wing_id=wing_id,
+                present_periods=row["present_periods"],
+                absent_periods=row["absent_periods"],
+                runaway_periods=row["runaway_periods"],
+                excused_periods=row["excused_periods"],
+                late_minutes=row["late"],
+                early_minutes=row["early"],
+                p1_status=statuses[0] or "",
+                p2_status=(statuses[1] if len(statuses) > 1 else None) or "",
+                state=state,
+                daily_absent_unexcused=state == "unexcused",
+                daily_excused=state == "excused",
+                daily_excused_partial=bool(row["excused_periods"]) and state != "excused",
+                locked=row["locked"],
+            )
+        )
+
+    with transaction.atomic():
+        stale = AttendanceDaily.objects.filter(school_class_id=class_id, date=dt)
+        if per_student:
+            stale = stale.exclude(student_id__in={sid for sid, _term in per_student})
+        stale.delete()
+        if objs:
+            AttendanceDaily.objects.bulk_create(
+                objs,
+                update_conflicts=True,
+                unique_fields=["student", "date", "term"],
+                update_fields=[
+                    "school_class",
+                    "wing",
+                    "present_periods",
+                    "absent_periods",
+                    "runaway_periods",
+                    "excused_periods",
+                    "late_minutes",
+                    "early_minutes",
+                    "p1_status",
+                    "p2_status",
+                    "state",
+                    "daily_absent_unexcused",
+                    "daily_excused",
+                    "daily_excused_partial",
+                    "locked",
+                ],
+            )
+    return len(objs)
+
+
+def refresh_for_pairs(pairs: Iterable[ClassDay]) -> int:
+    """Refresh several class-days (or queue them when inside deferred_daily_refresh)."""
+    pairs = set((int(c), d) for c, d in pairs if c and d)
+    pending = _deferred.get()
+    if pending is not None:
+        pending.update(pairs)
+        return 0
+    return sum(refresh_daily_states(c, d) for c, d in sorted(pairs))
+
+
+def refresh_for_records(records) -> int:
+    """Refresh the class-days touched by an AttendanceRecord queryset (one DISTINCT read)."""
+    return refresh_for_pairs(records.order_by().values_list("classroom_id", "date").distinct())
+
+
+@contextlib.contextmanager
+def deferred_daily_refresh():
+    """Collect the class-days written inside the block and refresh each of them once on exit."""
+    if _deferred.get() is not None:
+        yield
+        return
+    pending: Set[ClassDay] = set()
+    token = _deferred.set(pending)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    try:
+        refresh_for_pairs(pending)
+    except Exception:
+        # لا نُفشل حفظ الحضور بسبب الملخص اليومي؛ يعاد بناؤه بأمر rebuild_attendance_daily
+        pass
+
+
+DAILY_FIELDS = ("student_id", "student_name", "class_id", "class_name", "p1", "p2", "state")
+_STATE_PRIORITY = {"unexcused": 0, "excused": 1, "none": 2}
+
+
+def daily_absence_tuples(
+    dt: _dt.date, *, wing_ids: Optional[List[int]] = None, class_id: Optional[int] = None
+) -> List[Tuple[Any, ...]]:
+    """Students of the day with a first-two-periods record, read from AttendanceDaily (one query).
+
+    Rows follow DAILY_FIELDS, ordered unexcused, excused, none then by class and student name.
+    wing_ids=None means every wing.
+    """
+    from school.models import AttendanceDaily  # type: ignore
+
+    qs = AttendanceDaily.objects.filter(date=dt).exclude(p1_status="", p2_status="")
+    if wing_ids is not None:
+        qs = qs.filter(wing_id__in=wing_ids)
+    if class_id:
+        qs = qs.filter(school_class_id=class_id)
+    fields = (
+        "student_id",
+        "student__full_name",
+        "school_class_id",
+        "school_class__name",
+        "p1_status",
+        "p2_status",
+        "state",
+    )
+    rows = qs.values_list(*fields)[:10000]  # safety cap
+    items: Dict[int, Tuple[Any, ...]] = {}
+    for sid, name, cid, cname, p1, p2, state in rows:
+        items[sid] = (sid, name, cid, cname, p1 or None, p2 or None, state)
+    return sorted(items.values(), key=lambda r: (_STATE_PRIORITY.get(r[6], 9), r[3] or "", r[1] or ""))
+
+
+def daily_absence_rows(
+    dt: _dt.date, *, wing_ids: Optional[List[int]] = None, class_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    return [dict(zip(DAILY_FIELDS, t)) for t in daily_absence_tuples(dt, wing_ids=wing_ids, class_id=class_id)]
+
+
+def _on_record_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        refresh_for_pairs([(instance.classroom_id, instance.date)])
+    except Exception:
+        # لا نُفشل حفظ الحضور بسبب الملخص اليومي؛ يعاد بناؤه بأمر rebuild_attendance_daily
+        pass
+
+
+def _on_class_change(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from school.models import AttendanceDaily  # type: ignore
+
+    # نقل الصف إلى جناح آخر: حدّث الجناح المخزّن في الملخصات اليومية
+    AttendanceDaily.objects.filter(school_class_id=instance.pk).exclude(wing_id=instance.wing_id).update(
+        wing_id=instance.wing_id
+    )
+
+
+def connect_daily_state_signals() -> None:
+    from django.apps import apps as _apps
+    from django.db.models.signals import post_save
+
+    record = _apps.get_model("school", "AttendanceRecord")
+    post_save.connect(_on_record_change, sender=record, dispatch_uid="daily_state_record_save", weak=False)
+    post_save.connect(
+        _on_class_change, sender=_apps.get_model("school", "Class"), dispatch_uid="daily_state_class_save", weak=False
+    )
@@ -0,0 +1,163 @@
+"""Render cache for absence-alert DOCX files.
+
+Preview (GET docx) and archive (POST docx/save) share the same rendered bytes, keyed by
+(alert id, alert.updated_at, template fingerprint, header mode, render date). The render date is
+part of the key because the template prints {{ today }}; without it a cached file would carry a
+stale date.
+
+The template fingerprint is the sha256 of the resolved template file, memoized on (path, mtime,
+size) so previews no longer re-read and re-hash the template on every request.
+
+prerender_alerts() warms the cache for many alerts at once using a process pool (rendering and the
+header/RTL post-processing are CPU-bound python-docx work).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.utils import timezone
+
+from . import word_renderer
+
+# (path, mtime_ns, size) -> sha256
+_FINGERPRINTS: dict[tuple[str, int, int], str] = {}
+
+
+@dataclass(frozen=True)
+class RenderedDocx:
+    content: bytes
+    template_path: str
+    template_hash: str
+    cached: bool
+
+
+def _cache():
+    alias = getattr(settings, "ABSENCE_ALERT_DOCX_CACHE", "default") or "default"
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def _timeout() -> int:
+    return int(getattr(settings, "ABSENCE_ALERT_DOCX_CACHE_TIMEOUT", 86400) or 86400)
+
+
+def template_fingerprint(template_path: str | None = None) -> tuple[str, str]:
+    """Return (resolved_path, sha256) of the template, hashing the file only when it changes."""
+    tpath = word_renderer.resolve_template_path(template_path)
+    try:
+        st = Path(tpath).stat()
+    except OSError:
+        return str(tpath), ""
+    memo_key = (str(tpath), st.st_mtime_ns, st.st_size)
+    digest = _FINGERPRINTS.get(memo_key)
+    if digest is None:
+        digest = hashlib.sha256(Path(tpath).read_bytes()).hexdigest()
+        _FINGERPRINTS.clear()
+        _FINGERPRINTS[memo_key] = digest
+    return str(tpath), digest
+
+
+def alert_docx_cache_key(alert, template_hash: str) -> str:
+    updated = getattr(alert, "updated_at", None)
+    stamp = int(updated.timestamp() * 1_000_000) if updated else 0
+    mode = (os.environ.get("ABS_DOCX_HEADER_MODE", "none") or "none").lower().strip()
+    today = timezone.localdate().strftime("%Y%m%d")
+    return f"abs_alert_docx:{alert.pk}:{stamp}:{template_hash[:16]}:{mode}:{today}"
+
+
+def get_alert_docx(alert, template_path: str | None = None) -> RenderedDocx:
+    """Return rendered DOCX bytes for an alert, rendering only on a cache miss.
+
+    Raises FileNotFoundError when no template is available (same as render_alert_docx).
+    """
+    tpath, thash = template_fingerprint(template_path)
+    key = alert_docx_cache_key(alert, thash)
+    cache = _cache()
+    content = cache.get(key)
+    if content is not None:
+        return RenderedDocx(content, tpath, thash, True)
+    content = word_renderer.render_alert_docx(alert, template_path=tpath)
+    cache.set(key, content, _timeout())
+    return RenderedDocx(content, tpath, thash, False)
+
+
+def _worker_init():  # pragma: no cover - runs in child processes
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _render_chunk(alert_ids: list[int], template_path: str) -> list[tuple[int, bytes]]:
+    from ..models_alerts import AbsenceAlert
+
+    out: list[tuple[int, bytes]] = []
+    for alert in AbsenceAlert.objects.select_related("student", "created_by").filter(id__in=alert_ids):
+        try:
+            out.append((alert.id, word_renderer.render_alert_docx(alert, template_path=template_path)))
+        except Exception:
+            continue
+    return out
+
+
+def prerender_alerts(alert_ids: Iterable[int], *, workers: int | None = None, chunk_size: int = 20) -> dict:
+    """Warm the render cache for the given alerts; already-cached alerts are skipped.
+
+    Rendering runs in a process pool when more than one worker is requested; workers return bytes
+    and the parent process writes them to the cache with a single set_many.
+    """
+    from django.db import connections
+
+    from ..models_alerts import AbsenceAlert
+
+    tpath, thash = template_fingerprint()
+    cache = _cache()
+    alerts = list(AbsenceAlert.objects.filter(id__in=list(alert_ids)).only("id", "updated_at"))
+    keys = {a.id: alert_docx_cache_key(a, thash) for a in alerts}
+    present = cache.get_many(list(keys.values()))
+    todo = [aid for aid, key in keys.items() if key not in present]
+    if workers is None:
+        workers = int(getattr(settings, "ABSENCE_ALERT_PRERENDER_WORKERS", 0) or 0) or min(4, os.cpu_count() or 1)
+    chunks = [todo[i : i + chunk_size] for i in range(0, len(todo), chunk_size)]
+
+    rendered: list[tuple[int, bytes]] = []
+    if workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            rendered.extend(_render_chunk(chunk, tpath))
+    else:
+        # Children must open their own DB connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_worker_init) as pool:
+            for part in pool.map(_render_chunk, chunks, [tpath] * len(chunks)):
+                rendered.extend(part)
+
+    if rendered:
+        cache.set_many({keys[aid]: content for aid, content in rendered}, _timeout())
+    return {
+        "total": len(alerts),
+        "already_cached": len(alerts) - len(todo),
+        "rendered": len(rendered),
+        "failed": len(todo) - len(rendered),
+        "template_hash": thash,
+    }
+
+
+def prerender_wing_alerts(wing_id: int, *, status: str = "issued", workers: int | None = None) -> dict:
+    """Pre-render every alert of a wing with the given status (default: issued)."""
+    from ..models_alerts import AbsenceAlert
+
+    ids = list(AbsenceAlert.objects.filter(wing_id=wing_id, status=status).values_list("id", flat=True))
+    summary = prerender_alerts(ids, workers=workers)
+    summary["wing_id"] = wing_id
+    return summary
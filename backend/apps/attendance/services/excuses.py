@@ -0,0 +1,96 @@
+"""Supervisor excuse marking (WingSupervisorViewSet.set_excused) as set-based updates.
+
+set_excused used to load the records and save() them one by one, then save one evidence row (and
+one copy of the uploaded file) per record. excuse_records() now costs a fixed number of queries
+whatever the number of ids:
+
+- one read of the in-scope ids (the per-record outcome),
+- one UPDATE building the '[EXCUSED by ...] <comment> | <previous note>' annotation in SQL,
+- one pass over the dependent late events and one refresh per class-day of the daily states,
+- with evidence: the file is stored once and the other evidence rows point at the same file
+  (one INSERT for all of them).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Case, Value, When
+from django.db.models.functions import Concat, Left
+from django.utils import timezone
+from school.models import AttendanceRecord  # type: ignore
+from school.services.late_events import reconcile_late_events  # type: ignore
+
+from ..models import AttendanceEvidence
+from .daily_states import refresh_for_pairs
+
+EXCUSED = "excused"
+SKIPPED = "skipped"
+
+
+def excuse_records(
+    record_ids: Iterable[int],
+    *,
+    wing_ids: Optional[Iterable[int]] = None,
+    reviewer: str = "",
+    comment: str = "",
+    evidence_file=None,
+    evidence_note: str = "",
+    user=None,
+) -> Dict[str, Any]:
+    """Mark records as excused/locked/supervisor in one UPDATE; wing_ids=None means every wing.
+
+    Returns {"updated", "results": [{"id", "outcome": "excused"|"skipped"}], "evidence": [...]}
+    with one result per requested id, in request order.
+    """
+    requested = list(dict.fromkeys(int(i) for i in record_ids))
+    qs = AttendanceRecord.objects.filter(id__in=requested)
+    if wing_ids is not None:
+        qs = qs.filter(classroom__wing_id__in=list(wing_ids))
+    found = list(qs.values_list("id", "classroom_id", "date"))
+    ids = [rid for rid, _c, _d in found]
+
+    tag = f"[EXCUSED by {reviewer} @ {timezone.now().strftime('%Y-%m-%d %H:%M')}] {comment}".strip()
+    # Same annotation the per-record loop wrote: '<tag> | <previous note>' capped to the field size
+    note = Left(Case(When(note="", then=Value(tag)), default=Concat(Value(f"{tag} | "), "note")), 300)
+
+    evidence: List[Dict[str, int]] = []
+    with transaction.atomic():
+        updated = (
+            AttendanceRecord.objects.filter(id__in=ids).update(
+                status=EXCUSED, note=note, locked=True, source="supervisor", updated_at=timezone.now()
+            )
+            if ids
+            else 0
+        )
+        if evidence_file is not None and ids:
+            try:
+                with transaction.atomic():
+                    evidence = _attach_evidence(ids, evidence_file, evidence_note, user)
+            except Exception:
+                # Evidence failure should not rollback the status change
+                evidence = []
+        # Excused records no longer carry late events; drop them in one pass
+        reconcile_late_events(ids)
+        refresh_for_pairs((c, d) for _rid, c, d in found)
+
+    done = set(ids)
+    results = [{"id": rid, "outcome": EXCUSED if rid in done else SKIPPED} for rid in requested]
+    return {"updated": int(updated), "results": results, "evidence": evidence}
+
+
+def _attach_evidence(ids: List[int], evidence_file, note: str, user) -> List[Dict[str, int]]:
+    """Store the uploaded file once and point one evidence row per record at it."""
+    meta = {
+        "content_type": getattr(evidence_file, "content_type", "") or "",
+        "original_name": getattr(evidence_file, "name", "") or "",
+        "note": (note or "")[:300],
+        "uploaded_by": user if getattr(user, "pk", None) else None,
+    }
+    first = AttendanceEvidence(record_id=ids[0], file=evidence_file, **meta)
+    first.save()
+    rest = AttendanceEvidence.objects.bulk_create(
+        [AttendanceEvidence(record_id=rid, file=first.file.name, **meta) for rid in ids[1:]]
+    )
+    return [{"record": ev.record_id, "evidence_id": ev.id} for ev in [first, *rest]]
@@ -0,0 +1,243 @@
+"""Attendance reports engine (class / wing / school rows per day, week, month or term bucket).
+
+The three /wing/reports/* endpoints share one flow:
+
+1. classes in scope (one query) and active students per class (one query)
+2. supervisor-approved records aggregated per (class, bucket) in ONE grouped query; day/week/month
+   buckets use TruncDay/TruncWeek/TruncMonth, term buckets a CASE over the term date ranges
+   (the terms are read once) instead of one aggregation per term
+3. optionally the pending excuse requests per (class, bucket), also in one grouped query
+
+Wing and school rows are rolled up in memory from the class rows, so each endpoint costs the
+same small number of queries whatever the number of buckets.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date as _date
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+
+GROUP_BY = ("day", "week", "month", "term")
+PENDING_EXCUSE_STATUSES = ("PENDING_JUSTIFICATION", "UNDER_REVIEW", "NEEDS_CORRECTION")
+UNEXCUSED_STATUSES = ("absent", "runaway")
+
+_TRUNC = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+
+Bucket = str
+ClassKey = Tuple[int, Bucket]
+
+
+@dataclass
+class ReportData:
+    """Per-class aggregates of one report request (input of the class/wing/school rows)."""
+
+    group_by: str
+    classes: Dict[int, Tuple[str, Optional[int]]] = field(default_factory=dict)  # id -> (name, wing_id)
+    students: Dict[int, int] = field(default_factory=dict)  # class_id -> active students
+    counts: Dict[ClassKey, Tuple[int, int]] = field(default_factory=dict)  # (class, bucket) -> (excused, unexcused)
+    pending: Dict[ClassKey, int] = field(default_factory=dict)
+    include_pending: bool = False
+
+
+def _bucket_expr(group_by: str, terms: List[Dict[str, Any]], field_name: str = "date"):
+    if group_by != "term":
+        return _TRUNC[group_by](field_name)
+    # date -> term name; terms are ordered by start_date so overlaps resolve to the earlier term
+    whens = [
+        When(**{f"{field_name}__gte": t["start_date"], f"{field_name}__lte": t["end_date"]}, then=Value(t["name"]))
+        for t in terms
+    ]
+    return Case(*whens, default=Value(None), output_field=CharField())
+
+
+def _bucket_key(value) -> Bucket:
+    if value is None:
+        return ""
+    try:
+        return value.isoformat()
+    except AttributeError:
+        return str(value)
+
+
+def _date_filter(single_dt: Optional[_date], from_dt: Optional[_date], to_dt: Optional[_date]) -> Q:
+    if single_dt is not None:
+        return Q(date=single_dt)
+    return Q(date__gte=from_dt, date__lte=to_dt)
+
+
+def collect(
+    *,
+    wing_ids: Optional[List[int]],
+    group_by: str = "day",
+    single_dt: Optional[_date] = None,
+    from_dt: Optional[_date] = None,
+    to_dt: Optional[_date] = None,
+    include_pending: bool = False,
+) -> ReportData:
+    """Run the report queries for the classes of `wing_ids` (None = every class)."""
+    from discipline.models import Absence  # type: ignore
+    from school.models import AttendanceRecord, Class, Student, Term  # type: ignore
+
+    group_by = group_by if group_by in GROUP_BY else "day"
+    data = ReportData(group_by=group_by, include_pending=include_pending)
+
+    cls_q = Class.objects.all()
+    if wing_ids is not None:
+        cls_q = cls_q.filter(wing_id__in=wing_ids)
+    data.classes = {cid: (name, wid) for cid, name, wid in cls_q.values_list("id", "name", "wing_id")}
+    class_ids = list(data.classes)
+    if not class_ids:
+        return data
+
+    data.students = dict(
+        Student.objects.filter(class_fk_id__in=class_ids, active=True)
+        .values_list("class_fk_id")
+        .annotate(n=Count("id"))
+        .values_list("class_fk_id", "n")
+    )
+
+    dates = _date_filter(single_dt, from_dt, to_dt)
+    terms: List[Dict[str, Any]] = []
+    if group_by == "term":
+        if single_dt is not None:
+            term_q = Term.objects.filter(start_date__lte=single_dt, end_date__gte=single_dt)
+        else:
+            term_q = Term.objects.filter(end_date__gte=from_dt, start_date__lte=to_dt)
+        terms = list(term_q.order_by("start_date").values("name", "start_date", "end_date"))
+        if not terms:
+            return data
+
+    rows = (
+        AttendanceRecord.objects.filter(dates, classroom_id__in=class_ids, source="supervisor")
+        .annotate(bucket=_bucket_expr(group_by, terms))
+        .exclude(bucket=None)
+        .values("classroom_id", "bucket")
+        .annotate(
+            excused=Count("student_id", filter=Q(status="excused"), distinct=True),
+            unexcused=Count("student_id", filter=Q(status__in=UNEXCUSED_STATUSES), distinct=True),
+        )
+        .order_by()
+    )
+    for r in rows:
+        data.counts[(r["classroom_id"], _bucket_key(r["bucket"]))] = (int(r["excused"]), int(r["unexcused"]))
+
+    if include_pending:
+        pend = (
+            Absence.objects.filter(dates, student__class_fk_id__in=class_ids)
+            .filter(excuse_requests__status__in=PENDING_EXCUSE_STATUSES)
+            .annotate(bucket=_bucket_expr(group_by, terms))
+            .exclude(bucket=None)
+            .values("student__class_fk_id", "bucket")
+            .annotate(n=Count("student_id", distinct=True))
+            .order_by()
+        )
+        for r in pend:
+            data.pending[(r["student__class_fk_id"], _bucket_key(r["bucket"]))] = int(r["n"])
+    return data
+
+
+ROW_FIELDS = (
+    "total_students",
+    "absent_total",
+    "absent_excused",
+    "absent_unexcused",
+    "absent_pending",
+    "present",
+    "present_pct",
+    "absent_pct",
+)
+CLASS_FIELDS = ("class_id", "class_name", "wing_id", "date_bucket", *ROW_FIELDS)
+WING_FIELDS = ("wing_id", "date_bucket", *ROW_FIELDS)
+SCHOOL_FIELDS = ("date_bucket", *ROW_FIELDS)
+
+
+def _row(total_students: int, excused: int, unexcused: int, pending: int) -> Tuple[Any, ...]:
+    """The ROW_FIELDS values of one report row."""
+    absent = excused + unexcused
+    present = max(total_students - absent, 0)
+    return (
+        total_students,
+        absent,
+        excused,
+        unexcused,
+        pending,
+        present,
+        float(round(present / total_students * 100, 2)) if total_students else 0.0,
+        float(round(absent / total_students * 100, 2)) if total_students else 0.0,
+    )
+
+
+# Rows are built as tuples (the columnar mode transposes them as-is); *_rows() zip them into dicts.
+
+
+def class_tuples(data: ReportData) -> List[Tuple[Any, ...]]:
+    """CLASS_FIELDS rows ordered by (date_bucket, class_name)."""
+    items = []
+    for (cid, bucket), (exc, unx) in data.counts.items():
+        name, wing_id = data.classes.get(cid, (None, None))
+        items.append(
+            (
+                cid,
+                name,
+                wing_id,
+                bucket,
+                *_row(int(data.students.get(cid, 0)), exc, unx, data.pending.get((cid, bucket), 0)),
+            )
+        )
+    items.sort(key=lambda x: (x[3], str(x[1] or "")))
+    return items
+
+
+def wing_tuples(data: ReportData) -> List[Tuple[Any, ...]]:
+    """Class rows summed per (wing, bucket); students per wing count every class of the wing."""
+    wing_of = {cid: int(wid or 0) for cid, (_name, wid) in data.classes.items()}
+    students: Dict[int, int] = defaultdict(int)
+    for cid, n in data.students.items():
+        students[wing_of.get(cid, 0)] += int(n)
+    sums: Dict[Tuple[int, Bucket], List[int]] = {}
+    for (cid, bucket), (exc, unx) in data.counts.items():
+        acc = sums.setdefault((wing_of.get(cid, 0), bucket), [0, 0, 0])
+        acc[0] += exc
+        acc[1] += unx
+    for (cid, bucket), n in data.pending.items():
+        key = (wing_of.get(cid, 0), bucket)
+        if key in sums:
+            sums[key][2] += n
+    items = [
+        (wid, bucket, *_row(students.get(wid, 0), exc, unx, pend)) for (wid, bucket), (exc, unx, pend) in sums.items()
+    ]
+    items.sort(key=lambda x: (x[1], x[0]))
+    return items
+
+
+def school_tuples(data: ReportData) -> List[Tuple[Any, ...]]:
+    """Class rows summed per bucket over the whole scope."""
+    total = sum(int(n) for n in data.students.values())
+    sums: Dict[Bucket, List[int]] = {}
+    for (_cid, bucket), (exc, unx) in data.counts.items():
+        acc = sums.setdefault(bucket, [0, 0, 0])
+        acc[0] += exc
+        acc[1] += unx
+    for (_cid, bucket), n in data.pending.items():
+        if bucket in sums:
+            sums[bucket][2] += n
+    items = [(bucket, *_row(total, exc, unx, pend)) for bucket, (exc, unx, pend) in sums.items()]
+    items.sort(key=lambda x: x[0])
+    return items
+
+
+def class_rows(data: ReportData) -> List[Dict[str, Any]]:
+    return [dict(zip(CLASS_FIELDS, t)) for t in class_tuples(data)]
+
+
+def wing_rows(data: ReportData) -> List[Dict[str, Any]]:
+    return [dict(zip(WING_FIELDS, t)) for t in wing_tuples(data)]
+
+
+def school_rows(data: ReportData) -> List[Dict[str, Any]]:
+    return [dict(zip(SCHOOL_FIELDS, t)) for t in school_tuples(data)]
@@ -0,0 +1,113 @@
+"""Versioned class roster snapshots for the attendance entry screens.
+
+Teachers open the same class roster several times a day (GET attendance/students) and every
+bulk save re-checks the inactive students. get_class_roster() keeps a compact snapshot per class
+in the cache:
+
+    [(id, full_name, sid, active), ...]   ordered by full_name
+
+keyed by a per-class version counter. Student post_save/post_delete receivers bump the version
+of the student's class (and of the previous class when a student moves), so a stale roster is
+never served; the old snapshot simply expires.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+
+RosterRow = Tuple[int, str, str, bool]
+
+VERSION_PREFIX = "roster:v:"
+KEY_PREFIX = "roster:"
+
+
+def _cache():
+    alias = getattr(settings, "ROSTER_CACHE", "default") or "default"
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def _timeout() -> int:
+    return int(getattr(settings, "ROSTER_CACHE_TIMEOUT", 86400) or 86400)
+
+
+def roster_version(class_id: int) -> int:
+    # Seeded from the clock so a cache flush never revives a roster cached under an older counter
+    cache = _cache()
+    key = f"{VERSION_PREFIX}{int(class_id)}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return int(version)
+
+
+def bump_roster_version(class_id) -> None:
+    if not class_id:
+        return
+    cache = _cache()
+    try:
+        cache.incr(f"{VERSION_PREFIX}{int(class_id)}")
+    except ValueError:
+        roster_version(class_id)
+
+
+def get_class_roster(class_id: int) -> List[RosterRow]:
+    """All students of the class (active and inactive), from the cache when the version matches."""
+    cache = _cache()
+    key = f"{KEY_PREFIX}{int(class_id)}:{roster_version(class_id)}"
+    rows = cache.get(key)
+    if rows is None:
+        from school.models import Student  # type: ignore
+
+        rows = [
+            (sid, name, code, bool(active))
+            for sid, name, code, active in Student.objects.filter(class_fk_id=class_id)
+            .order_by("full_name")
+            .values_list("id", "full_name", "sid", "active")
+        ]
+        cache.set(key, rows, _timeout())
+    return rows
+
+
+def roster_payload(class_id: int) -> List[Dict[str, Any]]:
+    """The roster in the StudentBriefSerializer shape (id, sid, full_name, class_fk_id, active)."""
+    return [
+        {"id": sid, "sid": code, "full_name": name, "class_fk_id": class_id, "active": active}
+        for sid, name, code, active in get_class_roster(class_id)
+    ]
+
+
+def inactive_student_ids(class_id: int, student_ids: Iterable[int]) -> set[int]:
+    """Inactive students among student_ids; ids outside the class roster are checked in the DB."""
+    wanted = {int(i) for i in student_ids}
+    roster = {sid: active for sid, _name, _code, active in get_class_roster(class_id)}
+    inactive = {sid for sid in wanted if roster.get(sid) is False}
+    others = wanted - set(roster)
+    if others:
+        from school.models import Student  # type: ignore
+
+        inactive.update(Student.objects.filter(id__in=others, active=False).values_list("id", flat=True))
+    return inactive
+
+
+def _on_student_change(sender, instance, **kwargs):
+    bump_roster_version(getattr(instance, "class_fk_id", None))
+    old = getattr(instance, "_old_class_fk_id", None)
+    if old != getattr(instance, "class_fk_id", None):
+        bump_roster_version(old)
+
+
+def connect_roster_signals() -> None:
+    from django.apps import apps as _apps
+    from django.db.models.signals import post_delete, post_save
+
+    student = _apps.get_model("school", "Student")
+    post_save.connect(_on_student_change, sender=student, dispatch_uid="roster_student_save", weak=False)
+    post_delete.connect(_on_student_change, sender=student, dispatch_uid="roster_student_delete", weak=False)
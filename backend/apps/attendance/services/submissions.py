@@ -0,0 +1,239 @@
+"""Submission/approval batches of attendance (AttendanceSubmission).
+
+A teacher submits a class/date (optionally one period); every (class, date, period) becomes one
+batch row. Wing supervisors list pending batches through the (status, date) index and approve or
+reject them with set-based UPDATEs on the batches and on the records they cover, instead of
+scanning notes for a '[SUBMITTED]' tag and saving records one by one.
+"""
+
+from __future__ import annotations
+
+from datetime import date as _date
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.db.models import Case, Count, Exists, OuterRef, Q, Value, When
+from django.db.models.functions import Concat, Left
+from django.utils import timezone
+from school.models import AttendanceRecord  # type: ignore
+
+from ..models import AttendanceSubmission
+from .daily_states import refresh_for_pairs, refresh_for_records
+
+SUBMITTED = AttendanceSubmission.Status.SUBMITTED
+APPROVED = AttendanceSubmission.Status.APPROVED
+REJECTED = AttendanceSubmission.Status.REJECTED
+
+# A record approved by a supervisor is closed; the rest of a submitted batch is still pending
+_APPROVED_RECORD = Q(locked=True, source="supervisor")
+
+
+def _covered_by(batches) -> Exists:
+    """Exists() matching an AttendanceRecord to one of the given batches."""
+    return Exists(
+        batches.filter(
+            classroom_id=OuterRef("classroom_id"),
+            date=OuterRef("date"),
+            period_number=OuterRef("period_number"),
+        )
+    )
+
+
+def _scoped(qs, wing_ids: Optional[Iterable[int]], prefix: str = "classroom__"):
+    if wing_ids is not None:
+        qs = qs.filter(**{f"{prefix}wing_id__in": list(wing_ids)})
+    return qs
+
+
+def submit_batches(
+    class_id: int,
+    dt: _date,
+    *,
+    term=None,
+    periods: Optional[Iterable[int]] = None,
+    user=None,
+) -> List[int]:
+    """Open (or re-open) the batches of a class/date and return their period numbers.
+
+    Without `periods` every period that has records that day is submitted. A re-submission of an
+    approved/rejected batch returns it to 'submitted' and clears the previous decision.
+    """
+    records = AttendanceRecord.objects.filter(classroom_id=class_id, date=dt)
+    if term is not None:
+        records = records.filter(term=term)
+    if periods is not None:
+        records = records.filter(period_number__in=list(periods))
+    found = sorted(set(records.values_list("period_number", flat=True)))
+    if not found:
+        return []
+    now = timezone.now()
+    AttendanceSubmission.objects.bulk_create(
+        [
+            AttendanceSubmission(
+                classroom_id=class_id,
+                date=dt,
+                period_number=p,
+                term=term,
+                status=SUBMITTED,
+                submitted_by=user if getattr(user, "pk", None) else None,
+                submitted_at=now,
+                decided_by=None,
+                decided_at=None,
+                comment="",
+            )
+            for p in found
+        ],
+        update_conflicts=True,
+        unique_fields=["classroom", "date", "period_number"],
+        update_fields=["term", "status", "submitted_by", "submitted_at", "decided_by", "decided_at", "comment"],
+    )
+    return found
+
+
+def pending_batches(
+    dt: _date, *, class_id: Optional[int] = None, wing_ids: Optional[Iterable[int]] = None
+) -> Dict[str, Any]:
+    """Submitted batches of a day with per-batch record counts, plus the records still to decide.
+
+    Returns {"batches": [...], "records": QuerySet}; wing_ids=None means no wing scoping.
+    """
+    batches = AttendanceSubmission.objects.filter(status=SUBMITTED, date=dt)
+    if class_id:
+        batches = batches.filter(classroom_id=class_id)
+    batches = _scoped(batches, wing_ids)
+
+    counts = {
+        (row["classroom_id"], row["period_number"]): row
+        for row in AttendanceRecord.objects.filter(date=dt)
+        .filter(_covered_by(batches))
+        .values("classroom_id", "period_number")
+        .annotate(
+            total=Count("id"),
+            absent=Count("id", filter=Q(status="absent")),
+            late=Count("id", filter=Q(status="late")),
+            excused=Count("id", filter=Q(status="excused")),
+            approved=Count("id", filter=_APPROVED_RECORD),
+        )
+    }
+    out: List[Dict[str, Any]] = []
+    for b in batches.select_related("classroom", "submitted_by").order_by("classroom_id", "period_number"):
+        c = counts.get((b.classroom_id, b.period_number), {})
+        total = int(c.get("total", 0))
+        out.append(
+            {
+                "id": b.id,
+                "class_id": b.classroom_id,
+                "class_name": getattr(b.classroom, "name", None),
+                "date": b.date.isoformat(),
+                "period_number": b.period_number,
+                "status": b.status,
+                "submitted_by": getattr(b.submitted_by, "username", None),
+                "submitted_at": timezone.localtime(b.submitted_at).isoformat() if b.submitted_at else None,
+                "total": total,
+                "absent": int(c.get("absent", 0)),
+                "late": int(c.get("late", 0)),
+                "excused": int(c.get("excused", 0)),
+                "pending": total - int(c.get("approved", 0)),
+            }
+        )
+    records = (
+        AttendanceRecord.objects.filter(date=dt)
+        .filter(_covered_by(batches))
+        .exclude(_APPROVED_RECORD)
+        .select_related("student", "classroom", "subject", "teacher")
+        .order_by("classroom_id", "period_number", "student_id")
+    )
+    return {"batches": out, "records": records}
+
+
+def decide_batches(
+    action: str,
+    *,
+    batch_ids: Optional[Iterable[int]] = None,
+    record_ids: Optional[Iterable[int]] = None,
+    wing_ids: Optional[Iterable[int]] = None,
+    user=None,
+    reviewer: str = "",
+    comment: str = "",
+) -> Dict[str, Any]:
+    """Approve or reject with one UPDATE on the batches and one on their records.
+
+    batch_ids decide whole batches. record_ids (the per-row approvals page) decide those records;
+    a rejection returns their whole batches to the teacher, an approval closes a batch once none of
+    its records is left undecided. Returns {"updated": records, "batches": batches, "results": [...]}
+    where results gives the outcome (approved|rejected|skipped) of every requested batch id, or of
+    every requested record id when deciding records.
+    """
+    if action not in ("approve", "reject"):
+        raise ValueError("action must be approve|reject")
+    now = timezone.now()
+    prefix = "APPROVED" if action == "approve" else "REJECTED"
+    tag = f"[{prefix} by {reviewer} @ {timezone.localtime(now).strftime('%Y-%m-%d %H:%M')}] {comment}".strip()
+    # Same annotation the per-record loop wrote: '<tag> | <previous note>' capped to the field size
+    note = Left(
+        Case(
+            When(note="", then=Value(tag)),
+            default=Concat(Value(f"{tag} | "), "note"),
+        ),
+        300,
+    )
+    if action == "approve":
+        changes = {"locked": True, "source": "supervisor"}
+    else:
+        # Unlock for teacher correction; a supervisor-entered record keeps its source
+        changes = {
+            "locked": False,
+            "source": Case(When(source="supervisor", then=Value("supervisor")), default=Value("teacher")),
+        }
+
+    open_batches = _scoped(AttendanceSubmission.objects.filter(status=SUBMITTED), wing_ids)
+    if batch_ids is not None:
+        target_ids = list(open_batches.filter(id__in=list(batch_ids)).values_list("id", flat=True))
+        records = AttendanceRecord.objects.filter(_covered_by(AttendanceSubmission.objects.filter(id__in=target_ids)))
+    else:
+        records = _scoped(AttendanceRecord.objects.filter(id__in=list(record_ids or [])), wing_ids)
+        target_ids = list(
+            open_batches.filter(
+                Exists(
+                    records.filter(
+                        classroom_id=OuterRef("classroom_id"),
+                        date=OuterRef("date"),
+                        period_number=OuterRef("period_number"),
+                    )
+                )
+            ).values_list("id", flat=True)
+        )
+
+    if batch_ids is not None:
+        requested, decided_ids = list(dict.fromkeys(int(i) for i in batch_ids)), set(target_ids)
+    else:
+        found = list(records.values_list("id", "classroom_id", "date"))
+        requested, decided_ids = list(dict.fromkeys(int(i) for i in record_ids or [])), {r[0] for r in found}
+
+    with transaction.atomic():
+        updated = records.update(note=note, updated_at=now, **changes)
+        if batch_ids is not None:
+            refresh_for_records(records)
+        else:
+            refresh_for_pairs((c, d) for _rid, c, d in found)
+        closing = AttendanceSubmission.objects.filter(id__in=target_ids)
+        if action == "approve" and batch_ids is None:
+            # Partially approved batches stay pending for the remaining records
+            closing = closing.exclude(
+                Exists(
+                    AttendanceRecord.objects.filter(
+                        classroom_id=OuterRef("classroom_id"),
+                        date=OuterRef("date"),
+                        period_number=OuterRef("period_number"),
+                    ).exclude(_APPROVED_RECORD)
+                )
+            )
+        decided = closing.update(
+            status=APPROVED if action == "approve" else REJECTED,
+            decided_by=user if getattr(user, "pk", None) else None,
+            decided_at=now,
+            comment=comment[:300],
+        )
+    outcome = str(APPROVED if action == "approve" else REJECTED)
+    results = [{"id": i, "outcome": outcome if i in decided_ids else "skipped"} for i in requested]
+    return {"updated": int(updated), "batches": int(decided), "results": results}
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+try:
+    # Available when running inside RQ worker
+    from rq import get_current_job  # type: ignore
+except Exception:  # pragma: no cover - safe fallback when not in worker
+
+    def get_current_job():  # type: ignore
+        return None
+
+
+def process_prerender_wing_alerts(wing_id: int, *, status: str = "issued") -> Dict[str, Any]:
+    """Worker job: pre-render the DOCX of every alert in a wing into the render cache.
+
+    Also stores the summary into job.meta for easy retrieval from status pages.
+    """
+    from apps.attendance.services.docx_cache import prerender_wing_alerts
+
+    summary = prerender_wing_alerts(wing_id, status=status)
+    job = get_current_job()
+    if job is not None:
+        job.meta = job.meta or {}
+        job.meta["summary"] = summary
+        job.save_meta()
+    return summary
+
+
+def enqueue_prerender_wing_alerts(queue, wing_id: int, *, status: str = "issued"):
+    """Enqueue the pre-render job on the provided RQ queue and return the job object."""
+    return queue.enqueue(process_prerender_wing_alerts, wing_id, status=status, job_timeout=1800)
+
+
+def process_issue_wing_alerts(
+    wing_id: int,
+    start_iso: str,
+    end_iso: str,
+    *,
+    user_id: int,
+    min_unexcused: int = 1,
+    prerender: bool = False,
+) -> Dict[str, Any]:
+    """Worker job: issue absence alerts for a whole wing (see services.bulk_alerts)."""
+    import datetime as dt
+
+    from apps.attendance.services.bulk_alerts import issue_wing_alerts
+
+    summary = issue_wing_alerts(
+        wing_id,
+        dt.date.fromisoformat(start_iso),
+        dt.date.fromisoformat(end_iso),
+        user_id=user_id,
+        min_unexcused=min_unexcused,
+        prerender=prerender,
+    )
+    job = get_current_job()
+    if job is not None:
+        job.meta = job.meta or {}
+        job.meta["summary"] = summary
+        job.save_meta()
+    return summary
+
+
+def enqueue_issue_wing_alerts(
+    queue,
+    wing_id: int,
+    start_iso: str,
+    end_iso: str,
+    *,
+    user_id: int,
+    min_unexcused: int = 1,
+    prerender: bool = False,
+):
+    """Enqueue the bulk issuance job on the provided RQ queue and return the job object."""
+    return queue.enqueue(
+        process_issue_wing_alerts,
+        wing_id,
+        start_iso,
+        end_iso,
+        user_id=user_id,
+        min_unexcused=min_unexcused,
+        prerender=prerender,
+        job_timeout=1800,
+    )
+
+
+def process_prewarm_wing_timetables(wing_ids=None) -> Dict[str, Any]:
+    """Worker job: rebuild the cached wing timetable grids after a timetable/template edit."""
+    from apps.attendance.services.wing_timetable import prewarm_wing_timetables
+
+    summary = prewarm_wing_timetables(wing_ids)
+    job = get_current_job()
+    if job is not None:
+        job.meta = job.meta or {}
+        job.meta["summary"] = summary
+        job.save_meta()
+    return summary
+
+
+def enqueue_prewarm_wing_timetables(queue, wing_ids=None):
+    """Enqueue the wing timetable rebuild on the provided RQ queue and return the job object."""
+    return queue.enqueue(process_prewarm_wing_timetables, wing_ids, job_timeout=600)
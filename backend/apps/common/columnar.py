@@ -0,0 +1,74 @@
+"""Columnar response mode (?format=columnar) for the large report/history endpoints.
+
+Instead of one JSON object per row (the field names repeated in every row), a columnar response
+carries the field names once and one parallel array per field:
+
+    {"fields": ["class_id", "absent_total", ...],
+     "columns": {"class_id": [3, 4, ...], "absent_total": [5, 0, ...]},
+     "count": 2, ...extra keys of the endpoint (date, from/to, page...)}
+
+Row i is {f: columns[f][i] for f in fields}. The rows are produced as tuples by the services and
+transposed once with zip(); the payload is encoded with apps.common.fastjson (orjson when
+installed), which together cut the encoding time and payload size of the big lists.
+
+Usage:
+    @action(detail=False, methods=["get"], url_path="reports/classes", renderer_classes=columnar_renderers())
+    def reports_classes(self, request):
+        ...
+        if wants_columnar(request):
+            return Response(Columns(FIELDS, tuples).payload(date=...))
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+from . import fastjson, request_metrics
+
+FORMAT = "columnar"
+
+
+class Columns:
+    """Rows given as tuples (in `fields` order), stored column-wise."""
+
+    __slots__ = ("fields", "columns", "count")
+
+    def __init__(self, fields: Sequence[str], rows: Iterable[Tuple[Any, ...]]):
+        self.fields = tuple(fields)
+        rows = list(rows)
+        self.count = len(rows)
+        transposed = list(zip(*rows)) if rows else [() for _ in self.fields]
+        self.columns: Dict[str, List[Any]] = {f: list(col) for f, col in zip(self.fields, transposed)}
+
+    def payload(self, **extra: Any) -> Dict[str, Any]:
+        return {"fields": list(self.fields), "columns": self.columns, "count": self.count, **extra}
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Back to the row-per-dict shape (tests, exports)."""
+        cols = [self.columns[f] for f in self.fields]
+        return [dict(zip(self.fields, values)) for values in zip(*cols)]
+
+
+class ColumnarRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = FORMAT
+    charset = None  # bytes are UTF-8 JSON
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with request_metrics.timed("render_ms"):
+            return fastjson.dumps(data)
+
+
+def wants_columnar(request) -> bool:
+    renderer = getattr(request, "accepted_renderer", None)
+    return getattr(renderer, "format", None) == FORMAT
+
+
+def columnar_renderers() -> list:
+    """Renderer classes of an action offering ?format=columnar next to the project defaults."""
+    return [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarRenderer]
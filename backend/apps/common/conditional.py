@@ -0,0 +1,175 @@
+"""Conditional GET (ETag / If-None-Match) for read-heavy DRF endpoints.
+
+ETags are derived from per-model version counters kept in the cache, not from the rendered body:
+the counters of the models an endpoint reads are fetched with one cache.get_many, hashed with the
+user and the query string, and compared with If-None-Match before the view runs. An unchanged
+resource therefore answers 304 without executing any of its queries.
+
+Counters are bumped by post_save/post_delete (and m2m_changed) receivers registered with
+track_models() from the AppConfig.ready() of the app owning the endpoints, so every process that
+writes (web, RQ workers, management commands) keeps them current.
+
+Usage:
+    @action(...)
+    @conditional_get("school.timetableentry", "school.staff")
+    def teacher_timetable_weekly(self, request): ...
+
+    class ViolationViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+        conditional_models = ("discipline.violation", "discipline.behaviorlevel")
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import time
+from typing import Callable, Iterable, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework.response import Response
+
+_KEY_PREFIX = "mver:"
+
+
+def _cache():
+    alias = getattr(settings, "CONDITIONAL_GET_CACHE", "default") or "default"
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def _label(model_or_label) -> str:
+    if isinstance(model_or_label, str):
+        return model_or_label.lower()
+    return model_or_label._meta.label_lower
+
+
+def model_versions(labels: Iterable[str]) -> list[int]:
+    """Current counters for the given model labels (missing counters are seeded from the clock)."""
+    labels = [_label(lb) for lb in labels]
+    cache = _cache()
+    keys = [_KEY_PREFIX + lb for lb in labels]
+    found = cache.get_many(keys)
+    missing = [k for k in keys if k not in found]
+    if missing:
+        # Clock seed: a flushed cache never hands out a counter that matches an old ETag
+        seed = int(time.time() * 1000)
+        for k in missing:
+            cache.add(k, seed, None)
+        found.update(cache.get_many(missing))
+    return [int(found.get(k) or 0) for k in keys]
+
+
+def bump_model_version(model_or_label) -> None:
+    key = _KEY_PREFIX + _label(model_or_label)
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+
+
+def _on_save(sender, update_fields=None, **kwargs) -> None:
+    # Login only touches last_login; it must not invalidate user-scoped payloads
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    bump_model_version(sender)
+
+
+def _on_delete(sender, **kwargs) -> None:
+    bump_model_version(sender)
+
+
+def _on_m2m(sender, instance=None, model=None, action="", **kwargs) -> None:
+    if not action.startswith("post_"):
+        return
+    if instance is not None:
+        bump_model_version(type(instance))
+    if model is not None:
+        bump_model_version(model)
+
+
+def track_models(labels: Iterable[str], *, m2m: Iterable[tuple[str, str]] = ()) -> None:
+    """Connect version receivers for models ("app.Model") and m2m fields (("app.Model", "field"))."""
+    from django.apps import apps as _apps
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    for label in labels:
+        model = _apps.get_model(label)
+        uid = f"mver_{model._meta.label_lower}"
+        post_save.connect(_on_save, sender=model, dispatch_uid=uid + "_save", weak=False)
+        post_delete.connect(_on_delete, sender=model, dispatch_uid=uid + "_delete", weak=False)
+    for label, field in m2m:
+        through = getattr(_apps.get_model(label), field).through
+        m2m_changed.connect(_on_m2m, sender=through, dispatch_uid=f"mver_{_label(label)}_{field}", weak=False)
+
+
+def etag_matches(request, etag: str) -> bool:
+    """Weak comparison of If-None-Match (RFC 9110)."""
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    if not header:
+        return False
+    tags = parse_etags(header)
+    target = etag[2:] if etag.startswith("W/") else etag
+    return "*" in tags or any((t[2:] if t.startswith("W/") else t) == target for t in tags)
+
+
+def versions_etag(request, labels: Sequence[str], *, per_user: bool = True, extra: Iterable = ()) -> str:
+    parts = [request.path, request.META.get("QUERY_STRING", ""), getattr(request, "accepted_media_type", "") or ""]
+    if per_user:
+        parts.append(str(getattr(getattr(request, "user", None), "pk", "") or ""))
+    parts.extend(str(v) for v in model_versions(labels))
+    parts.extend(str(x) for x in extra)
+    digest = hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _finish(response, etag: str):
+    if getattr(response, "status_code", None) == 200 and not response.has_header("ETag"):
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_get(*labels: str, per_user: bool = True, extra: Optional[Callable[..., Iterable]] = None) -> Callable:
+    """Decorator for ViewSet actions: 304 when none of `labels` changed since the client's ETag.
+
+    extra(request) may return additional values the payload depends on (e.g. today's date).
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return func(self, request, *args, **kwargs)
+            etag = versions_etag(request, labels, per_user=per_user, extra=extra(request) if extra else ())
+            if etag_matches(request, etag):
+                resp = Response(status=304)
+                resp["ETag"] = etag
+                return resp
+            return _finish(func(self, request, *args, **kwargs), etag)
+
+        return wrapper
+
+    return decorator
+
+
+class ConditionalGetMixin:
+    """list/retrieve of a (ReadOnly)ModelViewSet answer 304 while `conditional_models` are unchanged."""
+
+    conditional_models: Sequence[str] = ()
+    conditional_per_user: bool = False
+
+    def _conditional(self, method, request, *args, **kwargs):
+        labels = tuple(self.conditional_models) or (self.get_queryset().model._meta.label_lower,)
+        return conditional_get(*labels, per_user=self.conditional_per_user)(method)(self, request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list.__func__, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve.__func__, request, *args, **kwargs)
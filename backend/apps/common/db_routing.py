@@ -0,0 +1,169 @@
+"""Read-replica routing for report/export traffic.
+
+Reports and exports are heavy read-only scans that used to share the primary with the morning
+attendance writes. Views (or selectors) decorated with @replica_reads run their ORM reads on
+DATABASE_REPLICA_ALIAS; everything else, and every write, stays on the primary.
+
+Read-your-writes:
+- once the current request has written (ReplicaRouter.db_for_write), its later reads go to the
+  primary;
+- outside a request (RQ jobs, management commands) there is no per-request reset, so a write pins
+  the reads of the current context to the primary for DATABASE_REPLICA_STICKY_S seconds only,
+  instead of for the rest of the process;
+- ReplicaStickinessMiddleware pins a user who wrote to the primary for DATABASE_REPLICA_STICKY_S
+  seconds (cache key), so a report opened right after saving attendance does not miss the rows
+  the replica has not replayed yet.
+
+Without a configured replica alias the decorator is a no-op and reads fall back to the primary.
+"""
+
+from __future__ import annotations
+
+import functools
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+_read_alias: ContextVar[Optional[str]] = ContextVar("db_read_alias", default=None)
+# time.monotonic() of the last write (0 = none); ReplicaStickinessMiddleware marks the request scope
+_wrote: ContextVar[float] = ContextVar("db_wrote_at", default=0.0)
+_in_request: ContextVar[bool] = ContextVar("db_in_request", default=False)
+
+STICKY_PREFIX = "db:sticky:"
+
+
+def replica_alias() -> Optional[str]:
+    """The configured replica alias, or None when there is no usable replica."""
+    alias = getattr(settings, "DATABASE_REPLICA_ALIAS", None)
+    if alias and alias != "default" and alias in settings.DATABASES:
+        return alias
+    return None
+
+
+def _sticky_ttl() -> int:
+    return int(getattr(settings, "DATABASE_REPLICA_STICKY_S", 10) or 0)
+
+
+def _user_id(request) -> Optional[int]:
+    user = getattr(request, "user", None)
+    if user is not None and getattr(user, "is_authenticated", False):
+        return getattr(user, "pk", None)
+    return None
+
+
+def _has_written() -> bool:
+    """A write pins reads for the rest of the request, or for the sticky window outside one."""
+    wrote_at = _wrote.get()
+    if not wrote_at:
+        return False
+    return _in_request.get() or time.monotonic() - wrote_at < _sticky_ttl()
+
+
+def is_pinned_to_primary(request=None) -> bool:
+    """True when reads must see the primary: this request wrote, or its user wrote recently."""
+    if _has_written():
+        return True
+    uid = _user_id(request) if request is not None else None
+    if uid is None or _sticky_ttl() <= 0:
+        return False
+    try:
+        return bool(cache.get(f"{STICKY_PREFIX}{uid}"))
+    except Exception:
+        return False
+
+
+def pin_user_to_primary(user_id: int) -> None:
+    ttl = _sticky_ttl()
+    if ttl > 0:
+        try:
+            cache.set(f"{STICKY_PREFIX}{user_id}", 1, ttl)
+        except Exception:
+            pass
+
+
+def reset_routing_state() -> None:
+    """Forget the write marker of the previous request (the middleware calls this per request)."""
+    _wrote.set(0.0)
+    _read_alias.set(None)
+
+
+def _find_request(args) -> Any:
+    for a in args:
+        if hasattr(a, "META") and hasattr(a, "method"):
+            return a
+    return None
+
+
+def replica_reads(func):
+    """Run the decorated view/selector's reads on the replica (see module docstring).
+
+    Works on function views, viewset actions (self, request, ...) and plain selectors; when no
+    request is among the arguments only the in-request write marker is honoured.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        alias = replica_alias()
+        if alias is None or is_pinned_to_primary(_find_request(args)):
+            return func(*args, **kwargs)
+        token = _read_alias.set(alias)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """DATABASE_ROUTERS entry: replica reads inside @replica_reads, primary for everything else."""
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or _has_written():
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(time.monotonic())
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replica rows are the primary's rows
+        dbs = {"default", replica_alias()}
+        if obj1._state.db in dbs and obj2._state.db in dbs:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is fed by replication, never migrated directly
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """Reset the per-request write marker and pin users who wrote to the primary for a while.
+
+    Placed after AuthenticationMiddleware; DRF copies its authenticated user onto the Django
+    request, so token-authenticated writers are pinned as well.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_routing_state()
+        token = _in_request.set(True)
+        try:
+            response = self.get_response(request)
+        finally:
+            _in_request.reset(token)
+        if _wrote.get() and replica_alias() is not None:
+            uid = _user_id(request)
+            if uid is not None:
+                pin_user_to_primary(uid)
+        return response
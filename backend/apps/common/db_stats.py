@@ -0,0 +1,78 @@
+"""Database connection reuse statistics (see DB_CONN_MODE in core.settings_base).
+
+connection_stats() is what the `healthcheck` command and the /healthz/db diagnostics endpoint
+report: the configured mode/role, how many times this process opened a connection (counted on
+the connection_created signal) and, in pool mode, the psycopg_pool counters.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Dict
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_lock = threading.Lock()
+# alias -> connections opened by this process (pool checkouts included)
+_connects: Dict[str, int] = {}
+_started = time.monotonic()
+
+
+def _on_connect(sender, connection, **kwargs):
+    with _lock:
+        _connects[connection.alias] = _connects.get(connection.alias, 0) + 1
+
+
+def connect_db_stats_signals() -> None:
+    connection_created.connect(_on_connect, dispatch_uid="db_stats_connects", weak=False)
+
+
+def connects(alias: str = "default") -> int:
+    return _connects.get(alias, 0)
+
+
+def pool_of(alias: str = "default"):
+    """The psycopg_pool.ConnectionPool behind the alias, or None when not pooling."""
+    conn = connections[alias]
+    if not conn.settings_dict.get("OPTIONS", {}).get("pool"):
+        return None
+    try:
+        return conn.pool
+    except Exception:
+        return None
+
+
+def connection_stats(alias: str = "default") -> Dict[str, Any]:
+    conn = connections[alias]
+    sd = conn.settings_dict
+    pool = pool_of(alias)
+    if pool is not None:
+        mode = "pool"
+    elif sd.get("CONN_MAX_AGE"):
+        mode = "persistent"
+    else:
+        mode = "off"
+    uptime = max(time.monotonic() - _started, 1e-6)
+    out: Dict[str, Any] = {
+        "alias": alias,
+        "vendor": conn.vendor,
+        "mode": mode,
+        "configured_mode": getattr(settings, "DB_CONN_MODE", None),
+        "role": getattr(settings, "DB_ROLE", None),
+        "pid": os.getpid(),
+        "conn_max_age": sd.get("CONN_MAX_AGE"),
+        "health_checks": bool(sd.get("CONN_HEALTH_CHECKS")),
+        "connects": connects(alias),
+        "connects_per_min": round(connects(alias) * 60.0 / uptime, 2),
+        "pool": None,
+    }
+    if pool is not None:
+        try:
+            out["pool"] = {**sd["OPTIONS"]["pool"], **pool.get_stats()}
+        except Exception as e:  # pragma: no cover
+            out["pool"] = {"error": str(e)}
+    return out
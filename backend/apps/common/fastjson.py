@@ -0,0 +1,42 @@
+"""JSON encoding for large API payloads: orjson when installed, the stdlib otherwise.
+
+dumps() returns UTF-8 bytes (Arabic text is not \\u-escaped) and handles the same extra types as
+DRF's JSONEncoder: dates/datetimes, Decimal, UUID, lazy translation strings, sets, QuerySets and
+objects exposing tolist(). Both paths produce equivalent JSON; orjson is simply several times
+faster on the big report/history lists.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from rest_framework.utils.encoders import JSONEncoder as _DRFEncoder
+
+try:  # optional dependency
+    import orjson  # type: ignore
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None  # type: ignore
+
+HAS_ORJSON = orjson is not None
+
+_STDLIB = _DRFEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _default(obj: Any) -> Any:
+    # Types orjson does not know natively; DRF's encoder covers Decimal, lazy strings, QuerySets...
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return _STDLIB.default(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z)
+    return _STDLIB.encode(obj).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,417 @@
+"""Per-request instrumentation: query/cache/serializer/render timings, sampled for slow-endpoint reports.
+
+core.middleware_metrics.RequestMetricsMiddleware opens a RequestMetrics for every request (kept
+in a contextvar) and, for a sampled request whose URL resolved to a view, records one compact
+sample:
+
+    {"ts", "rid", "view", "method", "status", "ms", "db_q", "db_ms", "cache_hits", "cache_misses",
+     "ser_ms", "render_ms", "bytes"}
+
+Where the numbers come from:
+  - DB: an execute_wrapper on every configured connection (replica included)
+  - cache: get/get_many of the configured cache backend classes, patched once by install()
+  - serializers: the DRF Serializer/ListSerializer .data properties (outermost call only)
+  - render: timed("render_ms") blocks in core.renderers / apps.common.columnar; for streamed
+    bodies (core.renderers.list_response, exports) the time spent producing the chunks, measured
+    by the middleware while the body is sent (ser_ms stays 0 there)
+
+Sinks (REQUEST_METRICS_SINK):
+  cache   ring buffer of REQUEST_METRICS_BUFFER_SIZE slots in the REQUEST_METRICS_CACHE cache
+          (shared by every process when the cache is Redis), read back newest first READ_BATCH
+          slots at a time until a batch is entirely older than the window
+  stream  Redis stream REQUEST_METRICS_STREAM (XADD with an approximate MAXLEN), on the RQ connection
+  off     nothing is recorded
+
+The request id (X-Request-ID header when valid, else a new one) is echoed in the response and
+copied into TaskLog.request_id (and the traceparent trace id into TaskLog.trace_id) for rows
+created while the request runs. endpoint_summary() reads the samples back for the
+`slow_endpoints` command and the admin page.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import json
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+
+KEY_PREFIX = "reqm:"
+CURSOR_KEY = "reqm:cursor"
+READ_BATCH = 500
+
+_current: contextvars.ContextVar[Optional["RequestMetrics"]] = contextvars.ContextVar("request_metrics", default=None)
+_REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._-]{8,64}$")
+_TRACEPARENT_RE = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-[0-9a-f]{16}-[0-9a-f]{2}$")
+_MISSING = object()
+
+
+class RequestMetrics:
+    __slots__ = (
+        "request_id",
+        "trace_id",
+        "started",
+        "db_q",
+        "db_ms",
+        "cache_hits",
+        "cache_misses",
+        "ser_ms",
+        "render_ms",
+        "_in_cache",
+        "_in_serializer",
+    )
+
+    def __init__(self, request_id: str, trace_id: str = ""):
+        self.request_id = request_id
+        self.trace_id = trace_id
+        self.started = time.perf_counter()
+        self.db_q = 0
+        self.db_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.ser_ms = 0.0
+        self.render_ms = 0.0
+        # > 0 inside an instrumented call: get_many -> get, nested serializer .data
+        self._in_cache = 0
+        self._in_serializer = 0
+
+    def sample(self, *, view: str, method: str, status: int, size: Optional[int]) -> Dict[str, Any]:
+        return {
+            "ts": round(time.time(), 3),
+            "rid": self.request_id,
+            "view": view,
+            "method": method,
+            "status": status,
+            "ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "db_q": self.db_q,
+            "db_ms": round(self.db_ms, 2),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "ser_ms": round(self.ser_ms, 2),
+            "render_ms": round(self.render_ms, 2),
+            "bytes": size,
+        }
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+def current_request_id() -> str:
+    metrics = _current.get()
+    return metrics.request_id if metrics is not None else ""
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "REQUEST_METRICS_ENABLED", True))
+
+
+def request_ids_from_headers(headers) -> tuple[str, str]:
+    """(request id, trace id): a well-formed incoming X-Request-ID is kept, else a new id is made."""
+    rid = (headers.get("X-Request-ID") or "").strip()
+    if not _REQUEST_ID_RE.match(rid):
+        rid = uuid.uuid4().hex
+    match = _TRACEPARENT_RE.match((headers.get("traceparent") or "").strip())
+    return rid, match.group(1) if match else ""
+
+
+def begin(request_id: str, trace_id: str = ""):
+    """Start collecting for the current request; returns the token for end()."""
+    return _current.set(RequestMetrics(request_id, trace_id))
+
+
+def end(token) -> None:
+    _current.reset(token)
+
+
+@contextlib.contextmanager
+def timed(field_name: str):
+    """Add the wall time of the block (ms) to a RequestMetrics field of the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(metrics, field_name, getattr(metrics, field_name) + (time.perf_counter() - started) * 1000)
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_q += 1
+        metrics.db_ms += (time.perf_counter() - started) * 1000
+
+
+@contextlib.contextmanager
+def track_queries():
+    """Count/time the queries of every configured DB alias while the block runs."""
+    from django.db import connections
+
+    with contextlib.ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(_db_wrapper))
+        yield
+
+
+# --- one-time patches (install) ---------------------------------------------------------------
+
+
+def _patch_cache_backend(cls) -> None:
+    if cls.__dict__.get("_reqm_patched"):
+        return
+    orig_get, orig_get_many = cls.get, cls.get_many
+
+    def get(self, key, default=None, version=None):
+        metrics = _current.get()
+        if metrics is None or metrics._in_cache:
+            return orig_get(self, key, default, version)
+        metrics._in_cache += 1
+        try:
+            value = orig_get(self, key, _MISSING, version)
+        finally:
+            metrics._in_cache -= 1
+        if value is _MISSING:
+            metrics.cache_misses += 1
+            return default
+        metrics.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None):
+        metrics = _current.get()
+        if metrics is None or metrics._in_cache:
+            return orig_get_many(self, keys, version)
+        keys = list(keys)
+        metrics._in_cache += 1
+        try:
+            found = orig_get_many(self, keys, version)
+        finally:
+            metrics._in_cache -= 1
+        metrics.cache_hits += len(found)
+        metrics.cache_misses += len(keys) - len(found)
+        return found
+
+    cls.get, cls.get_many = get, get_many
+    cls._reqm_patched = True
+
+
+def _patch_serializer_data(cls) -> None:
+    prop = cls.__dict__.get("data")
+    if prop is None or getattr(prop.fget, "_reqm_patched", False):
+        return
+    fget = prop.fget
+
+    def data(self):
+        metrics = _current.get()
+        if metrics is None or metrics._in_serializer:
+            return fget(self)
+        metrics._in_serializer += 1
+        started = time.perf_counter()
+        try:
+            return fget(self)
+        finally:
+            metrics._in_serializer -= 1
+            metrics.ser_ms += (time.perf_counter() - started) * 1000
+
+    data._reqm_patched = True
+    cls.data = property(data)
+
+
+def install() -> None:
+    """Patch the cache backends and DRF serializers once per process (AppConfig.ready)."""
+    if not enabled():
+        return
+    for alias in getattr(settings, "CACHES", {}):
+        try:
+            _patch_cache_backend(type(caches[alias]))
+        except Exception:
+            continue
+    from rest_framework import serializers
+
+    _patch_serializer_data(serializers.Serializer)
+    _patch_serializer_data(serializers.ListSerializer)
+
+
+def _fill_task_ids(sender, instance, raw=False, **kwargs):
+    metrics = _current.get()
+    if raw or metrics is None:
+        return
+    if not instance.request_id:
+        instance.request_id = metrics.request_id
+    if not instance.trace_id and metrics.trace_id:
+        instance.trace_id = metrics.trace_id
+
+
+def connect_request_id_signals() -> None:
+    from django.apps import apps as _apps
+    from django.db.models.signals import pre_save
+
+    pre_save.connect(
+        _fill_task_ids, sender=_apps.get_model("school", "TaskLog"), dispatch_uid="tasklog_request_id", weak=False
+    )
+
+
+# --- sinks ------------------------------------------------------------------------------------
+
+
+def _sink() -> str:
+    return str(getattr(settings, "REQUEST_METRICS_SINK", "cache") or "off").lower()
+
+
+def _cache():
+    alias = getattr(settings, "REQUEST_METRICS_CACHE", "default") or "default"
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def _buffer_size() -> int:
+    return max(int(getattr(settings, "REQUEST_METRICS_BUFFER_SIZE", 5000) or 5000), 1)
+
+
+def _stream_key() -> str:
+    return str(getattr(settings, "REQUEST_METRICS_STREAM", "reqmetrics") or "reqmetrics")
+
+
+def _redis():
+    import django_rq
+
+    return django_rq.get_connection("default")
+
+
+def should_sample() -> bool:
+    rate = float(getattr(settings, "REQUEST_METRICS_SAMPLE_RATE", 0.1) or 0.0)
+    return rate >= 1.0 or (rate > 0 and random.random() < rate)
+
+
+def record(sample: Dict[str, Any]) -> None:
+    """Store one sample in the configured sink; never raises."""
+    sink = _sink()
+    try:
+        if sink == "cache":
+            cache = _cache()
+            try:
+                cursor = cache.incr(CURSOR_KEY)
+            except ValueError:
+                cache.add(CURSOR_KEY, 0, None)
+                cursor = cache.incr(CURSOR_KEY)
+            cache.set(f"{KEY_PREFIX}{cursor % _buffer_size()}", sample, None)
+        elif sink == "stream":
+            _redis().xadd(
+                _stream_key(),
+                {"s": json.dumps(sample, ensure_ascii=False)},
+                maxlen=_buffer_size(),
+                approximate=True,
+            )
+    except Exception:
+        # لا نُفشل الطلب بسبب القياس
+        pass
+
+
+def recent_samples(window_minutes: float = 60) -> List[Dict[str, Any]]:
+    """Samples of the last window_minutes from the configured sink (oldest first)."""
+    since = time.time() - float(window_minutes) * 60
+    sink = _sink()
+    if sink == "cache":
+        samples = _ring_samples(since)
+    elif sink == "stream":
+        entries = _redis().xrange(_stream_key(), min=f"{int(since * 1000)}-0", max="+")
+        samples = []
+        for _id, fields in entries:
+            raw = fields.get(b"s") or fields.get("s")
+            try:
+                samples.append(json.loads(raw))
+            except Exception:
+                continue
+    else:
+        samples = []
+    samples.sort(key=lambda s: s.get("ts", 0))
+    return samples
+
+
+def _ring_samples(since: float) -> List[Dict[str, Any]]:
+    cache = _cache()
+    size = _buffer_size()
+    try:
+        cursor = int(cache.get(CURSOR_KEY) or 0)
+    except (TypeError, ValueError):
+        return []
+    count = min(cursor, size)
+    samples: List[Dict[str, Any]] = []
+    for start in range(0, count, READ_BATCH):
+        keys = [f"{KEY_PREFIX}{(cursor - i) % size}" for i in range(start, min(start + READ_BATCH, count))]
+        fresh = [s for s in cache.get_many(keys).values() if isinstance(s, dict) and s.get("ts", 0) >= since]
+        if not fresh:
+            break  # كل الدفعة أقدم من النافذة
+        samples.extend(fresh)
+    return samples
+
+
+# --- reports ----------------------------------------------------------------------------------
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(-(-pct * len(sorted_values) // 100)), 1)  # ceil(pct/100 * n)
+    return float(sorted_values[min(rank, len(sorted_values)) - 1])
+
+
+SORT_KEYS = ("p50", "p95", "p99", "count", "db_q", "bytes")
+
+
+def endpoint_summary(
+    samples: Iterable[Dict[str, Any]], *, min_count: int = 1, sort: str = "p95"
+) -> List[Dict[str, Any]]:
+    """Per (view, method): count, p50/p95/p99/max of the total time (ms) and the mean per-request costs."""
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for s in samples:
+        groups.setdefault((s.get("view") or "", s.get("method") or ""), []).append(s)
+    rows = []
+    for (view, method), items in groups.items():
+        if len(items) < min_count:
+            continue
+        n = len(items)
+        times = sorted(float(s.get("ms") or 0) for s in items)
+        rows.append(
+            {
+                "view": view,
+                "method": method,
+                "count": n,
+                "p50": _percentile(times, 50),
+                "p95": _percentile(times, 95),
+                "p99": _percentile(times, 99),
+                "max": times[-1],
+                "db_q": round(sum(s.get("db_q") or 0 for s in items) / n, 1),
+                "db_ms": round(sum(s.get("db_ms") or 0 for s in items) / n, 2),
+                "cache_hit_pct": _hit_pct(items),
+                "ser_ms": round(sum(s.get("ser_ms") or 0 for s in items) / n, 2),
+                "render_ms": round(sum(s.get("render_ms") or 0 for s in items) / n, 2),
+                "bytes": int(sum(s.get("bytes") or 0 for s in items) / n),
+                "errors": sum(1 for s in items if int(s.get("status") or 0) >= 500),
+            }
+        )
+    key = sort if sort in SORT_KEYS else "p95"
+    rows.sort(key=lambda r: (-r[key], r["view"]))
+    return rows
+
+
+def _hit_pct(items: List[Dict[str, Any]]) -> Optional[float]:
+    hits = sum(s.get("cache_hits") or 0 for s in items)
+    total = hits + sum(s.get("cache_misses") or 0 for s in items)
+    return round(hits / total * 100, 1) if total else None
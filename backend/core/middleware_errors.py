@@ -48,7 +48,8 @@ class DRFErrorEnvelopeMiddleware:
                         }
                     }
                     try:
-                        # Re-render the DRF Response so content reflects updated data
+                        # No-op for an already rendered Response: the body is encoded once (by the
+                        # FastJSONRenderer) and existing clients keep reading its {"detail"} shape
                         resp.render()
                     except Exception:
                         pass
@@ -57,11 +58,11 @@ class DRFErrorEnvelopeMiddleware:
             if status_code >= 400:
                 ctype = (resp.headers.get("Content-Type") or resp.get("Content-Type") or "").lower()
                 if "application/json" in ctype:
-                    import json
+                    from apps.common import fastjson
 
                     try:
-                        raw = resp.content.decode("utf-8") if hasattr(resp, "content") else None
-                        data = json.loads(raw) if raw else None
+                        raw = resp.content if hasattr(resp, "content") else None
+                        data = fastjson.loads(raw) if raw else None
                     except Exception:
                         data = None
                     if isinstance(data, dict) and ("error" not in data) and ("detail" in data or "message" in data):
@@ -81,7 +82,7 @@ class DRFErrorEnvelopeMiddleware:
                                 "details": data,
                             }
                         }
-                        resp.content = json.dumps(payload).encode("utf-8")
+                        resp.content = fastjson.dumps(payload)
                         resp.headers["Content-Type"] = "application/json"
                         return resp
         except Exception:
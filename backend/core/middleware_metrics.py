@@ -0,0 +1,113 @@
+import time
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, HttpRequest, HttpResponse
+
+from apps.common import request_metrics
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-request instrumentation (see apps.common.request_metrics):
+      - assigns a request id (incoming X-Request-ID when well-formed) echoed as X-Request-ID and
+        copied into TaskLog rows created during the request
+      - counts/times DB queries, cache hits/misses, serializer and render time
+      - records one sample per sampled request resolved to a view, for `slow_endpoints` and the
+        admin "endpoint performance" page
+
+    Placed first in MIDDLEWARE so the timing covers the whole middleware stack. Static/media
+    requests are not instrumented. Samples are written to the sink after the response has been
+    sent (response close), not on the request path. For streamed responses the size and the
+    chunk-producing time (added to render_ms: the JSON of core.renderers.list_response is encoded
+    there, after the view has returned) are counted while the body is sent.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+        # MEDIA_URL may be "/" here: only real sub-paths are skipped
+        self.skip_prefixes = tuple(
+            p
+            for p in (getattr(settings, "STATIC_URL", None), getattr(settings, "MEDIA_URL", None))
+            if p and p.strip("/")
+        )
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if not request_metrics.enabled() or (self.skip_prefixes and request.path.startswith(self.skip_prefixes)):
+            return self.get_response(request)
+        request_id, trace_id = request_metrics.request_ids_from_headers(request.headers)
+        request.request_id = request_id
+        token = request_metrics.begin(request_id, trace_id)
+        metrics = request_metrics.current()
+        try:
+            with request_metrics.track_queries():
+                response = self.get_response(request)
+        finally:
+            request_metrics.end(token)
+        response["X-Request-ID"] = request_id
+
+        match = getattr(request, "resolver_match", None)
+        view = (getattr(match, "view_name", None) or getattr(match, "_func_path", None)) if match else None
+        if not view or not request_metrics.should_sample():
+            return response
+
+        def _sample(size):
+            return metrics.sample(view=view, method=request.method, status=response.status_code, size=size)
+
+        if not getattr(response, "streaming", False):
+            sample = _sample(len(response.content))
+            response._resource_closers.append(lambda: request_metrics.record(sample))
+        elif isinstance(response, FileResponse):
+            # Keep the sendfile path untouched
+            length = response.get("Content-Length")
+            sample = _sample(int(length) if length and length.isdigit() else None)
+            response._resource_closers.append(lambda: request_metrics.record(sample))
+        else:
+            counter = _Counter(metrics, lambda size: request_metrics.record(_sample(size)))
+            if getattr(response, "is_async", False):
+                response.streaming_content = counter.aiter(response.streaming_content)
+            else:
+                response.streaming_content = counter.iter(response.streaming_content)
+        return response
+
+
+class _Counter:
+    """Counts the bytes of a streamed body and the time spent producing its chunks (render_ms)."""
+
+    def __init__(self, metrics, done):
+        self.metrics = metrics
+        self.done = done
+        self.size = 0
+
+    def _add(self, chunk, started):
+        self.metrics.render_ms += (time.perf_counter() - started) * 1000
+        self.size += len(chunk)
+
+    def iter(self, chunks):
+        it = iter(chunks)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    chunk = next(it)
+                except StopIteration:
+                    return
+                self._add(chunk, started)
+                yield chunk
+        finally:
+            self.done(self.size)
+
+    async def aiter(self, chunks):
+        it = aiter(chunks)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    chunk = await anext(it)
+                except StopAsyncIteration:
+                    return
+                self._add(chunk, started)
+                yield chunk
+        finally:
+            await sync_to_async(self.done)(self.size)
@@ -0,0 +1,113 @@
+"""
+Project JSON rendering for DRF (REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]).
+
+FastJSONRenderer encodes with apps.common.fastjson: orjson when installed (stdlib fallback), no
+\\u-escaping of Arabic text, and the same extra types as DRF's encoder (dates/datetimes, Decimal,
+UUID such as Incident ids, lazy strings). Requests asking for indentation
+(Accept: application/json; indent=2) still go through DRF's JSONRenderer.
+
+For large lists, list_response() streams the body: the envelope keys are written first, then the
+items are encoded STREAM_CHUNK at a time, so the process never holds the whole list of rows AND
+the whole encoded body at once. Small lists (under JSON_STREAM_THRESHOLD items) and non-JSON
+renderers (browsable API, ?format=columnar...) keep the regular Response path.
+
+Under ASGI (uvicorn core.asgi) the chunks are handed to Django as an async iterator, each chunk
+encoded in sync_to_async: a sync iterator there would be buffered whole by the handler (with a
+warning). The streamed response is still finalized by APIView.finalize_response (Vary, Allow and
+the other view headers); only the renderer step is replaced by iter_json_list.
+"""
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional, Union
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from apps.common import fastjson, request_metrics
+
+STREAM_CHUNK = 500
+
+
+class FastJSONRenderer(JSONRenderer):
+    charset = None  # bytes are UTF-8 JSON
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        with request_metrics.timed("render_ms"):
+            if self.get_indent(accepted_media_type or "", renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            return fastjson.dumps(data)
+
+
+def iter_json_list(
+    envelope: Dict[str, Any],
+    key: str,
+    items: Iterable[Any],
+    *,
+    transform: Optional[Callable[[Any], Any]] = None,
+    chunk_size: int = STREAM_CHUNK,
+) -> Iterator[bytes]:
+    """Yield {**envelope, key: [items...]} as JSON byte chunks (items encoded chunk_size at a time)."""
+    head = fastjson.dumps(envelope)[:-1]
+    yield head + (b"," if len(head) > 1 else b"") + fastjson.dumps(key) + b":["
+    first = True
+    chunk = []
+    for item in items:
+        chunk.append(transform(item) if transform is not None else item)
+        if len(chunk) >= chunk_size:
+            yield (b"" if first else b",") + fastjson.dumps(chunk)[1:-1]
+            first = False
+            chunk = []
+    if chunk:
+        yield (b"" if first else b",") + fastjson.dumps(chunk)[1:-1]
+    yield b"]}"
+
+
+async def aiter_chunks(chunks: Iterable[bytes]) -> AsyncIterator[bytes]:
+    """Async view of a sync chunk iterator; every next() (the encoding work) runs in sync_to_async."""
+    it = iter(chunks)
+    done = object()
+    step = sync_to_async(next)
+    while True:
+        chunk = await step(it, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    def __init__(self, chunks: Union[Iterable[bytes], AsyncIterator[bytes]], status: int = 200):
+        super().__init__(chunks, status=status, content_type="application/json")
+
+
+def _stream_threshold() -> int:
+    return int(getattr(settings, "JSON_STREAM_THRESHOLD", 2000) or 0)
+
+
+def list_response(
+    request,
+    envelope: Dict[str, Any],
+    key: str,
+    items: Any,
+    *,
+    transform: Optional[Callable[[Any], Any]] = None,
+):
+    """Response({**envelope, key: items}), streamed when the list is large and the client wants JSON.
+
+    items must already be loaded (a list): the body is produced after the view returns, outside
+    any DB routing context of the view (e.g. @replica_reads).
+    """
+    renderer = getattr(request, "accepted_renderer", None)
+    threshold = _stream_threshold()
+    if threshold and len(items) >= threshold and isinstance(renderer, FastJSONRenderer):
+        chunks = iter_json_list(envelope, key, items, transform=transform)
+        if isinstance(getattr(request, "_request", request), ASGIRequest):
+            return StreamingJSONResponse(aiter_chunks(chunks))
+        return StreamingJSONResponse(chunks)
+    if transform is not None:
+        items = [transform(item) for item in items]
+    return Response({**envelope, key: items})
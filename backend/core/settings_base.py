@@ -4,7 +4,9 @@ Common settings shared by all environments. Do not run this file directly;
 use settings_dev.py or settings_prod.py which import from here.
 """
 
+import importlib.util
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -49,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First: per-request query/cache/serializer timings, request ids (see apps.common.request_metrics)
+    "core.middleware_metrics.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     # Serve static files efficiently in development ASGI (and prod if desired)
@@ -59,6 +63,8 @@ MIDDLEWARE = [
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    # Per-request write marker + read-your-writes pinning for the read-replica router
+    "apps.common.db_routing.ReplicaStickinessMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     # Ensure DRF error responses are wrapped in the unified envelope even when views return Response({...}, status=403)
@@ -72,6 +78,8 @@ CORS_ALLOW_CREDENTIALS = True
 # Origins are defined per-environment:
 # - In development: see settings_dev.py (explicit localhost:5173 etc.)
 # - In production: see settings_prod.py (DJANGO_CORS_ALLOWED_ORIGINS)
+# The SPA reads the icon registry version from the manifest response to request pinned (immutable) sprite URLs
+CORS_EXPOSE_HEADERS = ["X-Icons-Version"]
 
 ROOT_URLCONF = "core.urls"
 
@@ -206,7 +214,95 @@ def _db_from_env() -> dict:
     }
 
 
-DATABASES = {"default": _db_from_env()}
+# ================= Database connection reuse =================
+def _pool_available() -> bool:
+    return bool(importlib.util.find_spec("psycopg") and importlib.util.find_spec("psycopg_pool"))
+
+
+# The web app runs under ASGI (uvicorn, core.asgi:application): sync views and ORM calls run in
+# asgiref worker threads, so a persistent connection is tied to a thread that Django does not close
+# at the end of the request and can leak. Django's guidance for ASGI is to disable persistent
+# connections and use the backend's pool instead.
+# DB_CONN_MODE:
+#   pool        -> psycopg 3 connection pool (Django OPTIONS["pool"]); requires psycopg + psycopg-pool.
+#                  Default when both are installed.
+#   off         -> connect/close on every request. Default otherwise, and what "pool" degrades to.
+#   persistent  -> one connection per thread kept for DB_CONN_MAX_AGE seconds, health-checked on reuse.
+#                  Only for sync processes (RQ workers, management commands), never for the ASGI server.
+# DB_ROLE sizes the pool per process kind: ASGI "web" server processes vs RQ "worker" processes
+# (auto-detected from `rqworker` on the command line when unset). DB_POOL_MIN_SIZE/DB_POOL_MAX_SIZE override.
+DB_CONN_MODE = (os.getenv("DB_CONN_MODE") or ("pool" if _pool_available() else "off")).strip().lower()
+DB_ROLE = (os.getenv("DB_ROLE") or ("worker" if any("rqworker" in a for a in sys.argv) else "web")).strip().lower()
+DB_POOL_SIZES = {"web": (2, 10), "worker": (1, 4)}
+
+
+def _db_connection_reuse(db: dict) -> dict:
+    """Apply DB_CONN_MODE to a DATABASES entry (PostgreSQL only)."""
+    if db.get("ENGINE") != "django.db.backends.postgresql":
+        return db
+    mode = DB_CONN_MODE
+    if mode == "pool" and not _pool_available():
+        # psycopg2 has no pool support in Django: degrade to connect-per-request (safe under ASGI)
+        mode = "off"
+    if mode == "pool":
+        min_default, max_default = DB_POOL_SIZES.get(DB_ROLE, DB_POOL_SIZES["web"])
+        max_size = int(os.getenv("DB_POOL_MAX_SIZE", "0") or 0) or max_default
+        db["OPTIONS"]["pool"] = {
+            "min_size": min(int(os.getenv("DB_POOL_MIN_SIZE", "0") or 0) or min_default, max_size),
+            "max_size": max_size,
+            # Seconds a request waits for a free connection before failing
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10") or 10),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300") or 300),
+            "name": f"sh_school-{DB_ROLE}",
+        }
+        # Django returns pooled connections on close(); persistent connections are not allowed with a pool
+        db["CONN_MAX_AGE"] = 0
+    elif mode == "persistent":
+        db["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60") or 0)
+        db["CONN_HEALTH_CHECKS"] = True
+    else:
+        db["CONN_MAX_AGE"] = 0
+    return db
+
+
+def _replica_from_env(primary: dict) -> dict | None:
+    """Optional read replica: DATABASE_REPLICA_URL, or DB_REPLICA_HOST (+ DB_REPLICA_PORT) on the primary's credentials."""
+    url = os.getenv("DATABASE_REPLICA_URL", "").strip()
+    host = os.getenv("DB_REPLICA_HOST", "").strip()
+    if not (url or host):
+        return None
+    replica = {**primary, "OPTIONS": {k: v for k, v in primary.get("OPTIONS", {}).items() if k != "pool"}}
+    if url:
+        u = urlparse(url)
+        if (u.scheme or "").lower() not in {"postgres", "postgresql", "postgis"}:
+            raise RuntimeError("DATABASE_REPLICA_URL must be a PostgreSQL URL.")
+        replica.update(
+            {
+                "NAME": u.path.lstrip("/") or primary["NAME"],
+                "USER": u.username or primary["USER"],
+                "PASSWORD": u.password or primary["PASSWORD"],
+                "HOST": u.hostname or primary["HOST"],
+                "PORT": str(u.port or primary["PORT"]),
+            }
+        )
+    else:
+        replica.update({"HOST": host, "PORT": str(os.getenv("DB_REPLICA_PORT") or primary["PORT"])})
+    # Tests run against the primary's test database
+    replica["TEST"] = {"MIRROR": "default"}
+    return replica
+
+
+DATABASES = {"default": _db_connection_reuse(_db_from_env())}
+_replica = _replica_from_env(DATABASES["default"])
+if _replica is not None:
+    DATABASES["replica"] = _db_connection_reuse(_replica)
+
+# Report/export views decorated with apps.common.db_routing.replica_reads read from this alias
+# (falls back to the primary when it is not configured). A user who just wrote stays on the
+# primary for DATABASE_REPLICA_STICKY_S seconds (read-your-writes).
+DATABASE_REPLICA_ALIAS = "replica" if "replica" in DATABASES else None
+DATABASE_REPLICA_STICKY_S = int(os.getenv("DATABASE_REPLICA_STICKY_S", "10") or 0)
+DATABASE_ROUTERS = ["apps.common.db_routing.ReplicaRouter"]
 
 
 # Password validation
@@ -266,6 +362,11 @@ REST_FRAMEWORK = {
         *(() if not DEBUG else ("rest_framework.authentication.SessionAuthentication",)),
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.DjangoModelPermissions",),
+    # orjson-backed JSON (stdlib fallback) for the large Arabic payloads; see core.renderers
+    "DEFAULT_RENDERER_CLASSES": (
+        "core.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_THROTTLE_CLASSES": (
         "rest_framework.throttling.UserRateThrottle",
         "rest_framework.throttling.AnonRateThrottle",
@@ -292,6 +393,19 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Lists with at least this many items are streamed by core.renderers.list_response (0 = never)
+JSON_STREAM_THRESHOLD = int(os.getenv("JSON_STREAM_THRESHOLD", "2000") or 0)
+
+# Request instrumentation (core.middleware_metrics): samples read by `slow_endpoints` and the admin page
+REQUEST_METRICS_ENABLED = os.getenv("REQUEST_METRICS_ENABLED", "true").lower() in {"1", "true", "yes", "on"}
+# Fraction of requests recorded (every request is still measured for X-Request-ID / TaskLog ids)
+REQUEST_METRICS_SAMPLE_RATE = float(os.getenv("REQUEST_METRICS_SAMPLE_RATE", "0.1") or 0)
+# cache = ring buffer in REQUEST_METRICS_CACHE, stream = Redis stream REQUEST_METRICS_STREAM, off
+REQUEST_METRICS_SINK = os.getenv("REQUEST_METRICS_SINK", "cache")
+REQUEST_METRICS_BUFFER_SIZE = int(os.getenv("REQUEST_METRICS_BUFFER_SIZE", "5000") or 5000)
+REQUEST_METRICS_CACHE = os.getenv("REQUEST_METRICS_CACHE", "default")
+REQUEST_METRICS_STREAM = os.getenv("REQUEST_METRICS_STREAM", "reqmetrics")
+
 # Global human-facing date/time formats for Django templates/admin (not affecting DRF JSON)
 # This ensures dates render as DD/MM/YYYY in server-rendered pages and admin.
 DATE_FORMAT = "d/m/Y"
@@ -425,3 +539,34 @@ DISCIPLINE_MATCH_MINE_BY_USERNAME = os.getenv("DISCIPLINE_MATCH_MINE_BY_USERNAME
     "yes",
     "on",
 }
+# Incident attachment delivery: optional web-server offload ("nginx" -> X-Accel-Redirect, "apache" -> X-Sendfile).
+# When empty, Django streams the file itself (with ETag/304 and HTTP Range support).
+DISCIPLINE_ATTACHMENT_SENDFILE = os.getenv("DISCIPLINE_ATTACHMENT_SENDFILE", "").strip().lower()
+# Internal nginx location mapped to MEDIA_ROOT (used only in nginx mode)
+DISCIPLINE_ATTACHMENT_ACCEL_PREFIX = os.getenv("DISCIPLINE_ATTACHMENT_ACCEL_PREFIX", "/protected-media/")
+# Coalesce download audit rows: at most one per (user, attachment) within this window (0 = audit every request)
+DISCIPLINE_ATTACHMENT_AUDIT_WINDOW_S = int(os.getenv("DISCIPLINE_ATTACHMENT_AUDIT_WINDOW_S", "900") or 0)
+
+# Absence-alert DOCX render cache (apps.attendance.services.docx_cache)
+ABSENCE_ALERT_DOCX_CACHE = os.getenv("ABSENCE_ALERT_DOCX_CACHE", "long_term")
+ABSENCE_ALERT_DOCX_CACHE_TIMEOUT = int(os.getenv("ABSENCE_ALERT_DOCX_CACHE_TIMEOUT", "86400") or 86400)
+# Process-pool size for bulk pre-rendering (0 = min(4, cpu_count))
+ABSENCE_ALERT_PRERENDER_WORKERS = int(os.getenv("ABSENCE_ALERT_PRERENDER_WORKERS", "0") or 0)
+# Cached committee candidate pool (discipline.committee_pool); invalidated by signals, TTL is a safety net
+DISCIPLINE_COMMITTEE_POOL_TTL_S = int(os.getenv("DISCIPLINE_COMMITTEE_POOL_TTL_S", "600") or 600)
+# Cached wing timetable grids (apps.attendance.services.wing_timetable); keyed by timetable version
+WING_TIMETABLE_CACHE = os.getenv("WING_TIMETABLE_CACHE", "long_term")
+WING_TIMETABLE_CACHE_TIMEOUT = int(os.getenv("WING_TIMETABLE_CACHE_TIMEOUT", "86400") or 86400)
+# Rebuild all wing grids in an RQ job after timetable/template edits (otherwise rebuilt lazily)
+WING_TIMETABLE_PREWARM = os.getenv("WING_TIMETABLE_PREWARM", "true").lower() in ("1", "true", "yes")
+# Class roster snapshots of the attendance entry screens (apps.attendance.services.rosters); per-class version
+ROSTER_CACHE = os.getenv("ROSTER_CACHE", "long_term")
+ROSTER_CACHE_TIMEOUT = int(os.getenv("ROSTER_CACHE_TIMEOUT", "86400") or 86400)
+# /api/me profile cache (school.services.me_profile): keyed by RBAC version; the TTL expires the keys
+# orphaned by each version bump
+ME_PROFILE_TTL_S = int(os.getenv("ME_PROFILE_TTL_S", "86400") or 86400)
+# Timetable OCR/PDF extraction (school.services.timetable_ocr): process-pool size (0 = min(4, CPUs))
+# and cache of extraction results keyed by the source file's SHA-256
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0") or 0) or None
+OCR_CACHE = os.getenv("OCR_CACHE", "long_term")
+OCR_CACHE_TTL_S = int(os.getenv("OCR_CACHE_TTL_S", str(7 * 24 * 3600)) or 0)
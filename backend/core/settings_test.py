@@ -5,8 +5,16 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": ":memory:",
-    }
+    },
+    # Second SQLite alias mirroring default: lets tests exercise the read-replica router
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": ":memory:",
+        "TEST": {"MIRROR": "default"},
+    },
 }
+# Routing to it is opt-in per test (settings.DATABASE_REPLICA_ALIAS = "replica")
+DATABASE_REPLICA_ALIAS = None
 
 # Speed up password hashing in tests
 PASSWORD_HASHERS = [
@@ -24,5 +32,8 @@ CACHES = {
     }
 }
 
+# No RQ worker in tests: wing timetable grids are rebuilt lazily
+WING_TIMETABLE_PREWARM = False
+
 # Emails are not actually sent during tests
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -60,6 +60,20 @@ def healthz(request):
         return HttpResponse(f"db: {e}", status=500, content_type="text/plain")
 
 
+def healthz_db(request):
+    """Database connection reuse diagnostics (mode, connects, pool stats) as JSON.
+
+    Allowed only when DEBUG=True or for authenticated staff users.
+    """
+    from django.http import JsonResponse
+
+    from apps.common.db_stats import connection_stats
+
+    if not (settings.DEBUG or getattr(getattr(request, "user", None), "is_staff", False)):
+        return HttpResponse(status=403)
+    return JsonResponse({alias: connection_stats(alias) for alias in settings.DATABASES})
+
+
 def favicon(request):
     svg = (
         "<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 16 16'>"
@@ -114,6 +128,7 @@ urlpatterns = [
     ),
     path("livez", livez, name="livez"),
     path("healthz", healthz, name="healthz"),
+    path("healthz/db", healthz_db, name="healthz-db"),
     path("sentry-test/", sentry_test, name="sentry-test"),
     # OpenAPI/Swagger docs (drf-spectacular)
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
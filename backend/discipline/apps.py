@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class DisciplineConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "discipline"
+
+    def ready(self):  # noqa: D401
+        # Keep the cached committee candidate pool in sync with its sources
+        from apps.common.conditional import track_models
+
+        from .committee_pool import connect_pool_signals
+
+        connect_pool_signals()
+        # ETags of the violation/behavior-level catalogs (ConditionalGetMixin)
+        track_models(["discipline.Violation", "discipline.BehaviorLevel"])
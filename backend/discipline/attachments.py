@@ -0,0 +1,194 @@
+"""Efficient delivery of incident attachments.
+
+- ETag مشتق من sha256 المخزّن مع المرفق، فيُعاد 304 عند تطابق If-None-Match دون فتح الملف.
+- دعم HTTP Range (طلب مدى واحد) للملفات الكبيرة/الممسوحة ضوئيًا مع If-Range.
+- وضع اختياري لتفويض الإرسال إلى خادم الويب عبر X-Accel-Redirect (nginx) أو X-Sendfile (apache).
+- دمج سجلات التدقيق: سجل واحد لكل (مستخدم، مرفق) خلال نافذة زمنية بدلًا من سجل لكل طلب.
+
+الإعدادات (اختيارية):
+  DISCIPLINE_ATTACHMENT_SENDFILE: "" | "nginx" | "apache"
+  DISCIPLINE_ATTACHMENT_ACCEL_PREFIX: بادئة الموقع الداخلي في nginx (افتراضي /protected-media/)
+  DISCIPLINE_ATTACHMENT_AUDIT_WINDOW_S: نافذة دمج سجلات التنزيل بالثواني (0 = سجل لكل طلب)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
+
+# قيمة خاصة تعني أن المدى المطلوب غير قابل للتلبية (416)
+UNSATISFIABLE = (-1, -1)
+
+
+def attachment_etag(att) -> str:
+    """ETag قوي من sha256 عند توفره، وإلا ETag ضعيف من المعرّف والحجم."""
+    digest = (getattr(att, "sha256", "") or "").strip()
+    if digest:
+        return quote_etag(digest)
+    return 'W/"%s-%s"' % (getattr(att, "pk", ""), getattr(att, "size", 0) or 0)
+
+
+def _opaque(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request, etag: str) -> bool:
+    """مقارنة ضعيفة لـ If-None-Match كما في RFC 9110."""
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    if not header:
+        return False
+    tags = parse_etags(header)
+    if "*" in tags:
+        return True
+    target = _opaque(etag)
+    return any(_opaque(t) == target for t in tags)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """حلّل ترويسة Range لطلب مدى واحد.
+
+    يعيد (start, end) شاملًا، أو None لتجاهل الترويسة (إرسال الملف كاملًا)،
+    أو UNSATISFIABLE عندما يقع المدى خارج حجم الملف.
+    الطلبات متعددة المديات تُتجاهل (مسموح وفق المواصفة) ويُرسل الملف كاملًا.
+    """
+    if not header or "," in header:
+        return None
+    m = _RANGE_RE.match(header)
+    if not m:
+        return None
+    first, last = m.group(1), m.group(2)
+    if not first and not last:
+        return None
+    if not first:
+        # suffix range: آخر N بايت
+        n = int(last)
+        if n <= 0 or size <= 0:
+            return UNSATISFIABLE
+        return (max(0, size - n), size - 1)
+    start = int(first)
+    if start >= size:
+        return UNSATISFIABLE
+    end = int(last) if last else size - 1
+    if end < start:
+        return None
+    return (start, min(end, size - 1))
+
+
+def _iter_range(f, start: int, length: int) -> Iterator[bytes]:
+    try:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        try:
+            f.close()
+        except Exception:
+            pass
+
+
+def _sendfile_mode() -> str:
+    mode = str(getattr(settings, "DISCIPLINE_ATTACHMENT_SENDFILE", "") or "").strip().lower()
+    if mode in {"nginx", "x-accel-redirect", "accel"}:
+        return "nginx"
+    if mode in {"apache", "x-sendfile", "sendfile"}:
+        return "apache"
+    return ""
+
+
+def _finalize(resp: HttpResponse, etag: str, filename: str, mime: str) -> HttpResponse:
+    resp["ETag"] = etag
+    resp["Accept-Ranges"] = "bytes"
+    resp["Content-Disposition"] = f'inline; filename="{filename}"'
+    # المحتوى محمي بالصلاحيات: لا يُخزَّن في وسطاء مشتركين، ويُعاد التحقق عبر ETag
+    patch_cache_control(resp, private=True, no_cache=True)
+    return resp
+
+
+def build_attachment_response(request, att) -> HttpResponse:
+    """بناء استجابة تنزيل المرفق (200/206/304/416) مع ETag ودعم Range.
+
+    يرمي OSError/ValueError إذا تعذّر فتح الملف ليتعامل معها المستدعي.
+    """
+    etag = attachment_etag(att)
+    f = att.file
+    meta = getattr(att, "meta", None) or {}
+    original = meta.get("original_name") if isinstance(meta, dict) else ""
+    filename = os.path.basename(str(original or "")) or os.path.basename(f.name or "") or f"attachment-{att.pk}"
+    mime = att.mime or "application/octet-stream"
+
+    if etag_matches(request, etag):
+        resp = HttpResponseNotModified()
+        resp["ETag"] = etag
+        patch_cache_control(resp, private=True, no_cache=True)
+        return resp
+
+    mode = _sendfile_mode()
+    if mode:
+        # خادم الويب يتولّى الإرسال (ويدعم Range بنفسه)
+        resp = HttpResponse(content_type=mime)
+        if mode == "nginx":
+            prefix = str(getattr(settings, "DISCIPLINE_ATTACHMENT_ACCEL_PREFIX", "/protected-media/") or "/")
+            resp["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + f.name.lstrip("/")
+        else:
+            resp["X-Sendfile"] = f.path
+        return _finalize(resp, etag, filename, mime)
+
+    size = f.size
+    rng = None
+    range_header = request.META.get("HTTP_RANGE", "")
+    if range_header:
+        if_range = request.META.get("HTTP_IF_RANGE", "").strip()
+        # If-Range يجب أن يطابق ETag القوي تمامًا وإلا يُرسل الملف كاملًا
+        if not if_range or (if_range == etag and not etag.startswith("W/")):
+            rng = parse_range(range_header, size)
+
+    if rng == UNSATISFIABLE:
+        resp = HttpResponse(status=416)
+        resp["Content-Range"] = f"bytes */{size}"
+        return _finalize(resp, etag, filename, mime)
+
+    f.open("rb")
+    if rng is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = rng
+        status_code = 206
+    length = max(0, end - start + 1)
+    resp = StreamingHttpResponse(_iter_range(f, start, length), status=status_code, content_type=mime)
+    resp["Content-Length"] = str(length)
+    if status_code == 206:
+        resp["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return _finalize(resp, etag, filename, mime)
+
+
+def should_audit_download(user_id, att_id) -> bool:
+    """يعيد True لأول تنزيل لكل (مستخدم، مرفق) خلال النافذة الزمنية فقط.
+
+    يعتمد على cache.add الذرّي؛ وعند تعذّر الكاش نفضّل التسجيل على الإهمال.
+    """
+    try:
+        window = int(getattr(settings, "DISCIPLINE_ATTACHMENT_AUDIT_WINDOW_S", 900) or 0)
+    except Exception:
+        window = 900
+    if window <= 0:
+        return True
+    try:
+        return bool(cache.add(f"disc:att_dl:{user_id}:{att_id}", 1, timeout=window))
+    except Exception:
+        return True
@@ -0,0 +1,284 @@
+"""مجمع مرشحي اللجنة السلوكية (Candidate pool) محسوب مسبقًا ومخزن في الكاش.
+
+committee_suggest / committee_candidates / committee_caps كانت تعيد بناء المجمع من جميع Staff
+المرتبطين بحساب مستخدم في كل طلب. هنا يُبنى المجمع مرة واحدة (3-4 استعلامات) ويحفظ في الكاش،
+ويُبطَل عند تغيّر Staff/User/Group أو اللجنة الدائمة أو تشكيلات لجان الوقائع أو انتقال حالة واقعة
+بين مفتوحة ومغلقة (لتحديث «الحِمل»).
+الاختيار الحتمي (stable hash) والاستبعادات تتم بعد ذلك في الذاكرة.
+
+quorum_for_incidents() تحسب النصاب والأغلبية لعدة وقائع باستعلام أعضاء واحد واستعلام أصوات واحد.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+POOL_CACHE_KEY = "disc:committee_pool:v1"
+
+# الأدوار التي يمكن أن يشغلها أي موظف مرتبط بحساب (لا تقييد بالمجموعات حاليًا)
+POOL_ROLES = ("chair", "member", "recorder")
+
+# الحالات التي لا تُحتسب لجانها ضمن الحِمل الحالي
+_INACTIVE_STATUSES = ("closed", "resolved")
+
+
+def _timeout() -> int:
+    return int(getattr(settings, "DISCIPLINE_COMMITTEE_POOL_TTL_S", 600) or 600)
+
+
+def build_candidate_pool() -> Dict[str, Any]:
+    """ابنِ المجمع من قاعدة البيانات: المرشحون بأسمائهم وأدوارهم وحِملهم الحالي + تشكيل اللجنة الدائمة."""
+    from django.apps import apps as _apps
+    from django.contrib.auth import get_user_model
+
+    from .models import IncidentCommittee, IncidentCommitteeMember, StandingCommittee, StandingCommitteeMember
+
+    Staff = _apps.get_model("school", "Staff")
+    User = get_user_model()
+
+    staff_rows = {
+        int(uid): (str(fn or ""), str(jt or ""), str(rl or ""))
+        for uid, fn, jt, rl in Staff.objects.exclude(user__isnull=True).values_list(
+            "user_id", "full_name", "job_title", "role"
+        )
+    }
+
+    # الحِمل: عدد لجان الوقائع المفتوحة التي يشارك فيها المستخدم (رئيس/مقرر/عضو)
+    load: Dict[int, int] = {}
+    active = ~Q(incident__status__in=_INACTIVE_STATUSES)
+    for field in ("chair_id", "recorder_id"):
+        rows = (
+            IncidentCommittee.objects.filter(active, **{f"{field}__isnull": False})
+            .values(field)
+            .annotate(n=Count("id"))
+            .values_list(field, "n")
+        )
+        for uid, n in rows:
+            load[int(uid)] = load.get(int(uid), 0) + int(n)
+    rows = (
+        IncidentCommitteeMember.objects.filter(~Q(committee__incident__status__in=_INACTIVE_STATUSES))
+        .values("user_id")
+        .annotate(n=Count("id"))
+        .values_list("user_id", "n")
+    )
+    for uid, n in rows:
+        load[int(uid)] = load.get(int(uid), 0) + int(n)
+
+    standing = StandingCommittee.objects.order_by("id").first()
+    standing_payload = {"id": None, "chair_id": None, "recorder_id": None, "member_ids": []}
+    if standing is not None:
+        standing_payload = {
+            "id": standing.id,
+            "chair_id": standing.chair_id,
+            "recorder_id": standing.recorder_id,
+            "member_ids": list(
+                StandingCommitteeMember.objects.filter(standing=standing)
+                .order_by("id")
+                .values_list("user_id", flat=True)
+            ),
+        }
+    standing_roles: Dict[int, str] = {uid: "member" for uid in standing_payload["member_ids"]}
+    if standing_payload["recorder_id"]:
+        standing_roles[standing_payload["recorder_id"]] = "recorder"
+    if standing_payload["chair_id"]:
+        standing_roles[standing_payload["chair_id"]] = "chair"
+
+    candidates: List[Dict[str, Any]] = []
+    users = User.objects.filter(id__in=list(staff_rows)).only("id", "username", "first_name", "last_name")
+    for u in users.order_by("id"):
+        staff_full, job_title, role = staff_rows.get(u.id, ("", "", ""))
+        candidates.append(
+            {
+                "id": u.id,
+                "username": u.username,
+                "first_name": u.first_name or "",
+                "last_name": u.last_name or "",
+                "full_name": u.get_full_name(),
+                "staff_full_name": staff_full or None,
+                "job_title": job_title,
+                "role": role,
+                "roles": list(POOL_ROLES),
+                "standing_role": standing_roles.get(u.id),
+                "load": load.get(u.id, 0),
+            }
+        )
+    return {"candidates": candidates, "standing": standing_payload}
+
+
+def get_candidate_pool() -> Dict[str, Any]:
+    pool = cache.get(POOL_CACHE_KEY)
+    if pool is None:
+        pool = build_candidate_pool()
+        cache.set(POOL_CACHE_KEY, pool, _timeout())
+    return pool
+
+
+def invalidate_candidate_pool(*args, **kwargs) -> None:
+    """Signal receiver: أي تغيير في المصادر يُسقط المجمع ليُبنى عند أول طلب."""
+    cache.delete(POOL_CACHE_KEY)
+
+
+def _invalidate_on_user_change(sender, instance=None, update_fields=None, **kwargs) -> None:
+    # last_login يُحدَّث مع كل تسجيل دخول ولا يؤثر على المجمع
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    invalidate_candidate_pool()
+
+
+def _remember_incident_status(sender, instance=None, raw=False, update_fields=None, **kwargs) -> None:
+    # الحالة السابقة تُقرأ فقط عند حفظ قد يغيّر الحالة
+    if raw or instance is None or instance.pk is None or (update_fields and "status" not in update_fields):
+        return
+    instance._pool_prev_status = sender.objects.filter(pk=instance.pk).values_list("status", flat=True).first()
+
+
+def _invalidate_on_incident_status(sender, instance=None, created=False, raw=False, **kwargs) -> None:
+    # الحِمل يحتسب لجان الوقائع غير المغلقة: يكفي الإبطال عند عبور الحالة بين مفتوحة ومغلقة
+    prev = instance.__dict__.pop("_pool_prev_status", None)
+    if raw or created or prev is None:
+        return
+    if (prev in _INACTIVE_STATUSES) != (instance.status in _INACTIVE_STATUSES):
+        invalidate_candidate_pool()
+
+
+def stable_key(incident_id: Any, user_id: Any) -> int:
+    """ترتيب حتمي بحسب SHA256(incident_id:user_id) (نفس خوارزمية stable_hash_v1)."""
+    raw = f"{incident_id}:{user_id}".encode("utf-8")
+    return int.from_bytes(hashlib.sha256(raw).digest(), "big")
+
+
+def candidate_search_text(c: Dict[str, Any]) -> str:
+    return " ".join(
+        [
+            c.get("staff_full_name") or "",
+            c.get("job_title") or "",
+            c.get("role") or "",
+            c.get("username") or "",
+            c.get("first_name") or "",
+            c.get("last_name") or "",
+        ]
+    ).lower()
+
+
+def summarize_votes(chair_id: Any, total_voters: int, votes: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """النصاب = نصف + 1 من (الأعضاء + الرئيس). الأغلبية البسيطة تحدد القرار، وصوت الرئيس يكسر التعادل."""
+    counts = {"approve": 0, "reject": 0, "return": 0}
+    by_user: Dict[int, str] = {}
+    chair_vote = None
+    for v in votes:
+        uid = int(v.get("voter_id")) if v.get("voter_id") is not None else None
+        decision = str(v.get("decision") or "").lower()
+        if decision not in counts:
+            continue
+        # آخر تصويت للمستخدم يغلب
+        if uid is not None:
+            by_user[uid] = decision
+        if chair_id is not None and uid == int(chair_id):
+            chair_vote = decision
+    for d in by_user.values():
+        counts[d] = counts.get(d, 0) + 1
+
+    quorum = max(1, (total_voters // 2) + 1) if total_voters else 0
+    participated = len(by_user)
+    maj_decision = None
+    top = sorted(counts.items(), key=lambda x: (-x[1], x[0]))[0]
+    ties = [k for k, c in counts.items() if c == top[1] and c > 0]
+    if len(ties) == 1:
+        maj_decision = top[0]
+    elif chair_vote in counts:
+        maj_decision = chair_vote
+    return {
+        "total_voters": total_voters,
+        "participated": participated,
+        "quorum": quorum,
+        "quorum_met": participated >= quorum if quorum else False,
+        "counts": counts,
+        "majority": maj_decision,
+        "chair_vote": chair_vote,
+    }
+
+
+def quorum_for_incidents(incidents: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """احسب النصاب لعدة وقائع: استعلام واحد للجان، واحد لعدد الأعضاء، وواحد للأصوات.
+
+    يعيد {str(incident_id): summary}. الوقائع التي لا تملك تشكيلًا في الجداول تعتمد committee_panel.
+    """
+    from .models import IncidentAuditLog, IncidentCommittee, IncidentCommitteeMember
+
+    incs = list(incidents)
+    ids = [i.id for i in incs]
+    if not ids:
+        return {}
+    committees = {
+        inc_id: (cid, chair_id)
+        for cid, inc_id, chair_id in IncidentCommittee.objects.filter(incident_id__in=ids).values_list(
+            "id", "incident_id", "chair_id"
+        )
+    }
+    member_counts = dict(
+        IncidentCommitteeMember.objects.filter(committee__incident_id__in=ids)
+        .values("committee_id")
+        .annotate(n=Count("id"))
+        .values_list("committee_id", "n")
+    )
+    votes: Dict[Any, List[Dict[str, Any]]] = {}
+    for inc_id, actor_id, meta in (
+        IncidentAuditLog.objects.filter(incident_id__in=ids, meta__action="committee_vote")
+        .order_by("at", "id")
+        .values_list("incident_id", "actor_id", "meta")
+    ):
+        votes.setdefault(inc_id, []).append({"voter_id": actor_id, "decision": (meta or {}).get("decision")})
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for inc in incs:
+        panel = getattr(inc, "committee_panel", None) or {}
+        chair_id = panel.get("chair_id")
+        total_voters = (1 if chair_id else 0) + len(list(panel.get("member_ids") or []))
+        if inc.id in committees:
+            cid, chair_id = committees[inc.id]
+            total_voters = 1 + int(member_counts.get(cid, 0))
+        out[str(inc.id)] = summarize_votes(chair_id, total_voters, votes.get(inc.id, []))
+    return out
+
+
+def connect_pool_signals() -> None:
+    from django.apps import apps as _apps
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group
+    from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+
+    User = get_user_model()
+    post_save.connect(_invalidate_on_user_change, sender=User, dispatch_uid="disc_committee_pool_user_save", weak=False)
+    post_delete.connect(
+        invalidate_candidate_pool, sender=User, dispatch_uid="disc_committee_pool_user_delete", weak=False
+    )
+    incident = _apps.get_model("discipline", "Incident")
+    pre_save.connect(
+        _remember_incident_status, sender=incident, dispatch_uid="disc_committee_pool_incident_pre", weak=False
+    )
+    post_save.connect(
+        _invalidate_on_incident_status, sender=incident, dispatch_uid="disc_committee_pool_incident_save", weak=False
+    )
+    senders = [
+        _apps.get_model("school", "Staff"),
+        Group,
+        _apps.get_model("discipline", "StandingCommittee"),
+        _apps.get_model("discipline", "StandingCommitteeMember"),
+        _apps.get_model("discipline", "IncidentCommittee"),
+        _apps.get_model("discipline", "IncidentCommitteeMember"),
+    ]
+    for sender in senders:
+        uid = f"disc_committee_pool_{sender._meta.label_lower}"
+        post_save.connect(invalidate_candidate_pool, sender=sender, dispatch_uid=uid + "_save", weak=False)
+        post_delete.connect(invalidate_candidate_pool, sender=sender, dispatch_uid=uid + "_delete", weak=False)
+    m2m_changed.connect(
+        invalidate_candidate_pool,
+        sender=User.groups.through,
+        dispatch_uid="disc_committee_pool_user_groups",
+        weak=False,
+    )
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:26
+
+import school.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("discipline", "0020_alter_incident_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="excuseattachment",
+            name="file",
+            field=school.storage.ContentAddressedFileField(
+                blank=True, digest_field="checksum", storage=school.storage.get_blob_storage, upload_to="excuses/%Y/%m/"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="incidentattachment",
+            name="file",
+            field=school.storage.ContentAddressedFileField(
+                digest_field="sha256", storage=school.storage.get_blob_storage, upload_to="incidents/%Y/%m/"
+            ),
+        ),
+    ]
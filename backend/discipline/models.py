@@ -5,6 +5,8 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+from school.storage import ContentAddressedFileField
+
 
 class BehaviorLevel(models.Model):
     code = models.PositiveSmallIntegerField(unique=True)
@@ -243,7 +245,8 @@ class IncidentAttachment(models.Model):
         help_text="إن كان المرفق يخص إجراء محدد فسيُربط هنا",
     )
     kind = models.CharField(max_length=32, choices=KIND_CHOICES, default="other")
-    file = models.FileField(upload_to="incidents/%Y/%m/")
+    # تخزين حسب المحتوى: الملف المتطابق يُحفظ مرة واحدة وتُملأ sha256 أثناء الحفظ المتدفق
+    file = ContentAddressedFileField(upload_to="incidents/%Y/%m/", digest_field="sha256")
     mime = models.CharField(max_length=64, blank=True)
     size = models.IntegerField(default=0)
     sha256 = models.CharField(max_length=64, blank=True)
@@ -541,6 +544,8 @@ class ExcuseAttachment(models.Model):
     excuse = models.ForeignKey(ExcuseRequest, on_delete=models.CASCADE, related_name="attachments")
     category = models.CharField(max_length=16, choices=CATEGORY_CHOICES, default="EXCUSE_DOC")
     url = models.CharField(max_length=512)
+    # رفع مباشر اختياري (بدل رابط خارجي) عبر التخزين حسب المحتوى؛ تُملأ checksum بـ sha256
+    file = ContentAddressedFileField(upload_to="excuses/%Y/%m/", blank=True, digest_field="checksum")
     checksum = models.CharField(max_length=128, blank=True)
     origin = models.CharField(max_length=16, blank=True, help_text="scan/photo/other")
     uploaded_by = models.ForeignKey(
@@ -22,11 +22,13 @@ from .models import Action
 from .serializers import ActionSerializer
 from .serializers import IncidentAttachmentSerializer
 from django.contrib.auth import get_user_model
-import hashlib
 from django.db.models import Q
-from django.http import FileResponse, HttpResponse
+from django.http import HttpResponse
 import json
 
+from apps.common.conditional import ConditionalGetMixin
+from apps.common.db_routing import replica_reads
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,11 +45,13 @@ class IsDisciplineRole(permissions.BasePermission):
         return user.has_perm("discipline.access")
 
 
-class ViolationViewSet(viewsets.ReadOnlyModelViewSet):
+class ViolationViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     # Defer 'policy' to avoid selecting a column that may not exist in
     # older databases (backward-compat for instances without this migration).
     queryset = Violation.objects.select_related("level").defer("policy").all()
     serializer_class = ViolationSerializer
+    # The catalog only changes from the admin: answer 304 until a violation/level is saved
+    conditional_models = ("discipline.violation", "discipline.behaviorlevel")
     # Allow any authenticated user (e.g., teachers) to load the catalog for forms
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
@@ -77,9 +81,10 @@ class ViolationViewSet(viewsets.ReadOnlyModelViewSet):
         return qs
 
 
-class BehaviorLevelViewSet(viewsets.ReadOnlyModelViewSet):
+class BehaviorLevelViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = BehaviorLevel.objects.all()
     serializer_class = BehaviorLevelSerializer
+    conditional_models = ("discipline.behaviorlevel",)
     # Allow any authenticated user to read behavior levels used by the catalog
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
@@ -305,7 +310,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
         يقبل Multipart form-data مع الحقل file بالإضافة إلى حقول اختيارية:
         - kind: pledge|pledge_signed|other (الافتراضي: pledge_signed إذا كان action.requires_guardian_signature أو action.doc_required)
         - meta: JSON كنص
-        - sha256: بصمة اختيارية، تُحتسب تلقائيًا إن لم تُرسل
+        - sha256: بصمة اختيارية؛ البصمة المعتمدة هي المحتسبة أثناء الحفظ في التخزين حسب المحتوى
 
         عند الرفع، إذا كان الإجراء يتطلب مستندًا doc_required=True ولم يكن doc_received_at مضبوطًا،
         فسيتم ضبطه على الآن.
@@ -358,34 +363,16 @@ class IncidentViewSet(viewsets.ModelViewSet):
             except Exception:
                 meta = {"_raw": meta_raw}
 
-        # Compute sha256 and size
-        sha = request.data.get("sha256") or ""
-        size_val = 0
         mime_val = getattr(upfile, "content_type", "") or ""
         try:
-            # read into hasher without exhausting memory
-            h = hashlib.sha256()
-            for chunk in upfile.chunks():
-                size_val += len(chunk)
-                h.update(chunk)
-            # Reset file pointer for storage backend save
-            upfile.seek(0)
-            if not sha:
-                sha = h.hexdigest()
-        except Exception:
-            sha = sha or ""
-            try:
-                size_val = upfile.size
-            except Exception:
-                size_val = 0
-
-        # Ensure the uploaded file pointer is reset after hashing so storage saves full content
-        try:
-            upfile.seek(0)
+            size_val = int(upfile.size or 0)
         except Exception:
-            pass
+            size_val = 0
+        if isinstance(meta, dict):
+            meta.setdefault("original_name", getattr(upfile, "name", "") or "")
 
-        # Save IncidentAttachment
+        # Save IncidentAttachment; the content-addressed storage hashes the upload in a single
+        # streaming pass and fills sha256 (a client-supplied sha256 is superseded by the stored digest).
         att = IncidentAttachment(
             incident=incident,
             action=act,
@@ -393,7 +380,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
             file=upfile,
             mime=mime_val,
             size=size_val,
-            sha256=sha,
+            sha256=request.data.get("sha256") or "",
             created_by=request.user,
             meta=meta,
         )
@@ -674,7 +661,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
             if severity <= 2:
                 try:
                     from school.models import Staff, TeachingAssignment  # type: ignore
-                    from apps.attendance import selectors  # type: ignore
+                    from apps.attendance.services.rosters import get_class_roster  # type: ignore
 
                     staff = Staff.objects.filter(user_id=user.id).first()
                     if staff:
@@ -688,8 +675,8 @@ class IncidentViewSet(viewsets.ModelViewSet):
                         allowed = False
                         for cid in classroom_ids:
                             try:
-                                qs = selectors.get_students_for_class_on_date(int(cid), dt.date())
-                                if qs.filter(id=student_id).exists():
+                                roster = get_class_roster(int(cid))
+                                if any(row[0] == int(student_id) for row in roster):
                                     allowed = True
                                     break
                             except Exception as e:
@@ -1823,6 +1810,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=["get"], url_path="admin-export")
+    @replica_reads
     def admin_export(self, request):
         """تصدير/تحميل بيانات الوقائع كما تظهر في لوحة الإدارة.
 
@@ -2361,6 +2349,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
         return Response(data)
 
     @action(detail=False, methods=["get"], url_path="overview")  # /incidents/overview/?days=7|30
+    @replica_reads
     def overview(self, request):
         """نظرة عامة سريعة (overview) لاستخدامات المشرفين: إجماليات بالحالة وبالشدة، أكثر المخالفات تكرارًا،
         ومؤشرات تجاوز مهلة المراجعة/الإشعار. هذا يختلف عن /summary/ الموثّق والذي يعيد { total, by_status, by_severity } فقط.
@@ -2452,7 +2441,6 @@ class IncidentViewSet(viewsets.ModelViewSet):
 
         from datetime import datetime, timedelta
         from django.utils import timezone as _tz
-        from .models import StandingCommittee
 
         now = _tz.now()
         try:
@@ -2571,47 +2559,37 @@ class IncidentViewSet(viewsets.ModelViewSet):
         ]
 
         # ============ Standing committee ============
+        # من المجمع المخزن في الكاش بدل استعلامين لكل عضو
         standing_payload = None
         try:
-            standing = StandingCommittee.objects.order_by("id").first()
-            if standing:
-                # احضر الأعضاء
-                from .models import StandingCommitteeMember
-
-                member_ids = list(
-                    StandingCommitteeMember.objects.filter(standing=standing).values_list("user_id", flat=True)
-                )
+            from .committee_pool import get_candidate_pool
+
+            pool = get_candidate_pool()
+            sc = pool["standing"]
+            if sc.get("id") is not None:
+                by_id = {c["id"]: c for c in pool["candidates"]}
+                missing = {uid for uid in [sc.get("chair_id"), sc.get("recorder_id"), *sc["member_ids"]] if uid}
+                missing -= set(by_id)
+                if missing:
+                    # أعضاء بلا سجل Staff: حمّلهم باستعلام واحد
+                    for u in get_user_model().objects.filter(id__in=missing):
+                        by_id[u.id] = {"id": u.id, "username": u.username, "full_name": u.get_full_name()}
 
                 def user_obj(uid):
-                    u = get_user_model().objects.filter(id=uid).first()
-                    if not u:
+                    c = by_id.get(uid)
+                    if not c:
                         return None
-                    # Staff.full_name
-                    staff_full = None
-                    try:
-                        from school.models import Staff  # type: ignore
-
-                        staff_full = (
-                            Staff.objects.filter(user_id=u.id)
-                            .only("full_name")
-                            .values_list("full_name", flat=True)
-                            .first()
-                        ) or None
-                    except Exception:
-                        pass
-                    full_name = u.get_full_name() if hasattr(u, "get_full_name") else None
-                    return {"id": u.id, "username": u.username, "full_name": full_name, "staff_full_name": staff_full}
+                    return {
+                        "id": c["id"],
+                        "username": c["username"],
+                        "full_name": c.get("full_name"),
+                        "staff_full_name": c.get("staff_full_name"),
+                    }
 
                 standing_payload = {
-                    "chair": (
-                        user_obj(getattr(standing, "chair_id", None)) if getattr(standing, "chair_id", None) else None
-                    ),
-                    "recorder": (
-                        user_obj(getattr(standing, "recorder_id", None))
-                        if getattr(standing, "recorder_id", None)
-                        else None
-                    ),
-                    "members": [user_obj(uid) for uid in member_ids if uid],
+                    "chair": user_obj(sc["chair_id"]) if sc.get("chair_id") else None,
+                    "recorder": user_obj(sc["recorder_id"]) if sc.get("recorder_id") else None,
+                    "members": [user_obj(uid) for uid in sc["member_ids"] if uid],
                 }
         except Exception:
             standing_payload = None
@@ -2657,9 +2635,19 @@ class IncidentViewSet(viewsets.ModelViewSet):
         need_sched_items = [
             inc_basic_payload(i) for i in need_scheduling_qs.order_by("-occurred_at", "-created_at")[:5]
         ]
-        scheduled_pending_items = [
-            inc_basic_payload(i) for i in scheduled_pending_qs.order_by("-occurred_at", "-created_at")[:5]
-        ]
+        scheduled_pending = list(scheduled_pending_qs.order_by("-occurred_at", "-created_at")[:5])
+        # حالة النصاب لكل الوقائع المعروضة دفعة واحدة (استعلام أعضاء واحد + استعلام أصوات واحد)
+        try:
+            from .committee_pool import quorum_for_incidents
+
+            quorum_by_inc = quorum_for_incidents(scheduled_pending)
+        except Exception:
+            quorum_by_inc = {}
+        scheduled_pending_items = []
+        for i in scheduled_pending:
+            item = inc_basic_payload(i)
+            item["quorum"] = quorum_by_inc.get(str(i.id))
+            scheduled_pending_items.append(item)
 
         queues = {
             "need_scheduling": need_sched_items,
@@ -2810,19 +2798,15 @@ class IncidentViewSet(viewsets.ModelViewSet):
                 {"detail": "صيغة ملف غير مدعومة. المسموح: PDF, JPG, PNG."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Compute sha256
-        h = hashlib.sha256()
-        for chunk in up.chunks():
-            h.update(chunk)
-        digest = h.hexdigest()
-
+        # sha256 is computed by the content-addressed storage while streaming the upload to disk
+        if isinstance(meta_obj, dict):
+            meta_obj.setdefault("original_name", getattr(up, "name", "") or "")
         att = IncidentAttachment.objects.create(
             incident=inc,
             kind=kind if kind in {k for k, _ in IncidentAttachment.KIND_CHOICES} else "other",
             file=up,
             mime=mime,
             size=getattr(up, "size", 0) or 0,
-            sha256=digest,
             created_by=user,
             meta=meta_obj,
         )
@@ -2856,7 +2840,13 @@ class IncidentViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["get"], url_path=r"attachments/(?P<att_id>[^/.]+)/download")
     def attachment_download(self, request, pk=None, att_id: str = ""):
-        """Download an attachment file for the incident."""
+        """Download an attachment file for the incident.
+
+        يدعم ETag (من sha256) مع If-None-Match → 304، وطلبات Range للملفات الكبيرة،
+        ووضع X-Accel-Redirect/X-Sendfile الاختياري. سجل التدقيق مدموج لكل مستخدم/مرفق ضمن نافذة زمنية.
+        """
+        from .attachments import build_attachment_response, should_audit_download
+
         inc = self.get_object()
         user = request.user
         # permission
@@ -2874,26 +2864,18 @@ class IncidentViewSet(viewsets.ModelViewSet):
         if not att:
             return Response({"detail": "المرفق غير موجود."}, status=status.HTTP_404_NOT_FOUND)
         try:
-            f = att.file
-            f.open("rb")  # type: ignore
-            resp = FileResponse(f, content_type=(att.mime or "application/octet-stream"))
-            resp["Content-Disposition"] = f'inline; filename="{f.name.split('/')[-1]}"'
+            resp = build_attachment_response(request, att)
         except Exception:
             return Response({"detail": "تعذّر فتح الملف."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Audit best-effort
-        try:
-            IncidentAuditLog.objects.create(
-                incident=inc,
-                action="update",
-                actor=user,
-                from_status=inc.status,
-                to_status=inc.status,
+        # Audit best-effort (coalesced: one row per user/attachment per window)
+        if resp.status_code in (200, 206, 304) and should_audit_download(getattr(user, "id", None), att.id):
+            self._audit(
+                inc,
+                "update",
                 note=f"تنزيل مرفق ({att.kind})",
                 meta={"action": "attachment_download", "attachment_id": att.id},
             )
-        except Exception:
-            pass
         return resp
 
     @action(detail=True, methods=["get"], url_path="pledge/preview")
@@ -3119,7 +3101,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
         الضوابط:
           - يسمح بالوصول لمن يمتلك incident_committee_schedule أو incident_committee_decide أو للموظفين (is_staff/superuser).
           - استبعاد تضارب المصالح الشائع: مُبلِّغ الواقعة + أي معرف ضمن exclude.
-          - مصادر الاختيار: جميع موظفي المدرسة (جميع Staff المرتبطين بحساب مستخدم User). برمجيًا نأخذ كل Staff.user غير الفارغ.
+          - مصادر الاختيار: جميع موظفي المدرسة (جميع Staff المرتبطين بحساب مستخدم User) من المجمع المخزن في الكاش.
 
         المخرجات:
           {
@@ -3128,7 +3110,6 @@ class IncidentViewSet(viewsets.ModelViewSet):
             algorithm: "stable_hash_v1"
           }
         """
-        User = get_user_model()
         inc = self.get_object()
         user = request.user
         # إذن الوصول
@@ -3162,98 +3143,45 @@ class IncidentViewSet(viewsets.ModelViewSet):
         except Exception:
             pass
 
-        def full_name(u):
-            try:
-                fn = u.get_full_name()
-                return (
-                    fn
-                    if fn
-                    else (getattr(u, "first_name", "") or getattr(u, "last_name", "") or getattr(u, "username", ""))
-                )
-            except Exception:
-                return getattr(u, "username", "")
+        # المجمع محسوب مسبقًا ومخزن في الكاش (discipline.committee_pool)؛ الاختيار يتم في الذاكرة
+        from .committee_pool import get_candidate_pool, stable_key
+
+        pool = get_candidate_pool()
+        base = [c for c in pool["candidates"] if c["id"] not in exclude_ids]
 
         def stable_sort(candidates):
             """رتّب المرشحين ترتيبًا حتميًا بحسب SHA256(incident_id:user_id)."""
-            key_base = str(inc.id)
-
-            def key_fn(u):
-                raw = f"{key_base}:{getattr(u, 'id', 0)}".encode("utf-8")
-                return int.from_bytes(hashlib.sha256(raw).digest(), "big")
-
-            return sorted(candidates, key=key_fn)
-
-        # بناء مجمع الرئيس: لم نعد نستخدم مجموعات؛ المصدر هو جميع الموظفين (Staff->User)
+            return sorted(candidates, key=lambda c: stable_key(inc.id, c["id"]))
 
-        # مجمع المرشحين: جميع موظفي المدرسة (كل Staff لديهم user مرتبط)
-        try:
-            from django.apps import apps as _apps
-
-            Staff = _apps.get_model("school", "Staff")
-            user_ids = list(Staff.objects.exclude(user__isnull=True).values_list("user_id", flat=True))
-            base_qs = User.objects.filter(id__in=user_ids)
-        except Exception:
-            base_qs = User.objects.all()
-
-        # لا نقيّد التشكيل بعضوية مجموعة، لكن يمكن للمؤسسة لاحقًا تفضيل أعضاء المجموعة عبر ترتيب إضافي.
-        chair_qs = base_qs
-        member_qs = base_qs
-        recorder_qs = base_qs
-
-        # استبعاد المعرفات غير المسموح بها
-        def filter_exclusions(qs):
-            if not exclude_ids:
-                return list(qs)
-            return [u for u in qs if getattr(u, "id", None) not in exclude_ids]
-
-        chairs = filter_exclusions(chair_qs)
-        members = filter_exclusions(member_qs)
-        recorders = filter_exclusions(recorder_qs)
-
-        # ترتيب ثابت (حتمي)
-        chairs = stable_sort(chairs)
-        members = stable_sort(members)
-        recorders = stable_sort(recorders)
+        ordered = stable_sort(base)
+        chairs = [c for c in ordered if "chair" in c["roles"]]
+        members = [c for c in ordered if "member" in c["roles"]]
+        recorders = [c for c in ordered if "recorder" in c["roles"]]
 
         # اختر الرئيس
         chair_obj = chairs[0] if chairs else None
 
         # استبعد الرئيس من الأعضاء
         if chair_obj is not None:
-            members = [u for u in members if getattr(u, "id", None) != getattr(chair_obj, "id", None)]
+            members = [c for c in members if c["id"] != chair_obj["id"]]
 
         # اختر أعضاء بعدد مطلوب
         sel_members = members[:member_count] if members else []
 
         # اختر مقرر مختلف إن أمكن
-        recorder_obj = None
-        for u in recorders:
-            if getattr(u, "id", None) not in {getattr(chair_obj, "id", None)} | {
-                getattr(x, "id", None) for x in sel_members
-            }:
-                recorder_obj = u
-                break
-
-        # خريطة أسماء الموظفين (Staff.full_name) حسب user_id لإظهار أسماء الموظفين بدل أسماء المستخدمين
-        staff_name_by_user: Dict[int, str] = {}
-        try:
-            from django.apps import apps as _apps
+        taken = {chair_obj["id"] if chair_obj else None} | {c["id"] for c in sel_members}
+        recorder_obj = next((c for c in recorders if c["id"] not in taken), None)
 
-            Staff = _apps.get_model("school", "Staff")
-            rows = Staff.objects.exclude(user__isnull=True).values_list("user_id", "full_name")
-            staff_name_by_user = {int(uid): str(name) for uid, name in rows if uid}
-        except Exception:
-            staff_name_by_user = {}
-
-        def as_payload(u):
-            if not u:
+        def as_payload(c):
+            if not c:
                 return None
             return {
-                "id": getattr(u, "id", None),
-                "username": getattr(u, "username", None),
-                "full_name": full_name(u),
+                "id": c["id"],
+                "username": c["username"],
+                "full_name": c["full_name"] or c["username"],
                 # نضيف اسم الموظف من سجل Staff إن توفر، ليُعرَض في الواجهة بدلاً من اسم المستخدم
-                "staff_full_name": staff_name_by_user.get(getattr(u, "id", 0)),
+                "staff_full_name": c["staff_full_name"],
+                "committee_load": c["load"],
             }
 
         # قدرات الوصول للمستخدم الحالي (تفيد الواجهة في تفعيل الأزرار)
@@ -3282,8 +3210,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
         }
 
         # قائمة المرشحين (بعد الاستبعاد) لتغذية القوائم المنسدلة في الواجهة
-        # نستخدم المجمع الأساسي (كل الموظفين) بعد تطبيق الاستبعادات وبأسماء كاملة.
-        candidates_list = [as_payload(u) for u in stable_sort(filter_exclusions(base_qs))]
+        candidates_list = [as_payload(c) for c in ordered]
 
         payload = {
             "panel": {
@@ -3317,7 +3244,6 @@ class IncidentViewSet(viewsets.ModelViewSet):
         الوصول: incident_committee_view أو incident_committee_schedule أو incident_committee_decide
                 أو is_staff/superuser.
         """
-        User = get_user_model()
         inc = self.get_object()
         user = request.user
         if not (
@@ -3338,96 +3264,31 @@ class IncidentViewSet(viewsets.ModelViewSet):
             offset = max(0, int(request.query_params.get("offset", 0)))
         except Exception:
             offset = 0
-        # لم تعد هناك مجموعة للجنة؛ جميع المرشحين من موظفي المدرسة
-        all_staff = True
+        # لم تعد هناك مجموعة للجنة؛ جميع المرشحين من موظفي المدرسة (المجمع المخزن في الكاش)
+        from .committee_pool import candidate_search_text, get_candidate_pool, stable_key
 
-        # Build base pool
-        try:
-            from django.apps import apps as _apps
-
-            Staff = _apps.get_model("school", "Staff")
-            staff_qs = Staff.objects.exclude(user__isnull=True)
-            user_ids_from_staff = list(staff_qs.values_list("user_id", flat=True))
-        except Exception:
-            staff_qs = None
-            user_ids_from_staff = []
-
-        base_users = User.objects.filter(id__in=user_ids_from_staff)
-
-        # Apply search
+        candidates = get_candidate_pool()["candidates"]
+        # البحث: اسم الموظف، المسمى الوظيفي، الدور، اسم المستخدم، الاسم الأول/الأخير
         if q:
-            # Search by staff_full_name, job_title, role, username, first/last name
-            if staff_qs is not None:
-                matching_staff_ids = list(
-                    staff_qs.filter(
-                        Q(full_name__icontains=q) | Q(job_title__icontains=q) | Q(role__icontains=q)
-                    ).values_list("user_id", flat=True)
-                )
-            else:
-                matching_staff_ids = []
-            base_users = base_users.filter(
-                Q(id__in=matching_staff_ids)
-                | Q(username__icontains=q)
-                | Q(first_name__icontains=q)
-                | Q(last_name__icontains=q)
-            )
+            needle = q.lower()
+            candidates = [c for c in candidates if needle in candidate_search_text(c)]
 
-        # Deterministic order (stable hash by incident_id:user_id) with minor boost for search match
+        # ترتيب حتمي (stable hash by incident_id:user_id)
         key_base = str(getattr(inc, "id", "0"))
-
-        def hash_key(uid: int) -> int:
-            raw = f"{key_base}:{uid}".encode("utf-8")
-            return int.from_bytes(hashlib.sha256(raw).digest(), "big")
-
-        users_list = list(base_users)
-
-        # Staff names map
-        staff_name_by_user = {}
-        staff_title_by_user = {}
-        staff_role_by_user = {}
-        try:
-            if staff_qs is None:
-                from django.apps import apps as _apps
-
-                Staff = _apps.get_model("school", "Staff")
-                staff_qs = Staff.objects.exclude(user__isnull=True)
-            rows = staff_qs.values_list("user_id", "full_name", "job_title", "role")
-            for uid, fn, jt, rl in rows:
-                if uid:
-                    staff_name_by_user[int(uid)] = str(fn or "")
-                    staff_title_by_user[int(uid)] = str(jt or "")
-                    staff_role_by_user[int(uid)] = str(rl or "")
-        except Exception:
-            pass
-
-        def match_score(u) -> int:
-            if not q:
-                return 0
-            text = " ".join(
-                [
-                    staff_name_by_user.get(getattr(u, "id", 0), ""),
-                    staff_title_by_user.get(getattr(u, "id", 0), ""),
-                    staff_role_by_user.get(getattr(u, "id", 0), ""),
-                    getattr(u, "username", "") or "",
-                    getattr(u, "first_name", "") or "",
-                    getattr(u, "last_name", "") or "",
-                ]
-            ).lower()
-            return 1 if q.lower() in text else 0
-
-        users_list.sort(key=lambda u: (match_score(u) * -1, hash_key(getattr(u, "id", 0))))
+        users_list = sorted(candidates, key=lambda c: stable_key(key_base, c["id"]))
 
         total = len(users_list)
         page = users_list[offset : offset + limit]
 
-        def as_payload(u):
+        def as_payload(c):
             return {
-                "id": getattr(u, "id", None),
-                "username": getattr(u, "username", None),
-                "full_name": getattr(u, "get_full_name", lambda: "")() if hasattr(u, "get_full_name") else None,
-                "staff_full_name": staff_name_by_user.get(getattr(u, "id", 0)),
-                "job_title": staff_title_by_user.get(getattr(u, "id", 0)),
-                "role": staff_role_by_user.get(getattr(u, "id", 0)),
+                "id": c["id"],
+                "username": c["username"],
+                "full_name": c["full_name"],
+                "staff_full_name": c["staff_full_name"],
+                "job_title": c["job_title"],
+                "role": c["role"],
+                "committee_load": c["load"],
             }
 
         data = {
@@ -3497,11 +3358,11 @@ class IncidentViewSet(viewsets.ModelViewSet):
     def _committee_quorum_and_majority(self, inc: Incident, votes: list[dict]) -> dict:
         """حساب النصاب والأغلبية بطريقة مبسطة: النصاب = نصف + 1 من (الأعضاء + الرئيس).
         الأغلبية البسيطة تحدد القرار المقترح. في حالة التعادل، يُستخدم تصويت الرئيس ككاسر تعادل إن وُجد.
+        لعدة وقائع دفعة واحدة استخدم committee_pool.quorum_for_incidents.
         """
+        from .committee_pool import summarize_votes
+
         try:
-            # احسب العدد المتوقع للمصوتين
-            total_voters = 0
-            chair_id = None
             panel = getattr(inc, "committee_panel", None) or {}
             chair_id = panel.get("chair_id")
             members = list(panel.get("member_ids") or [])
@@ -3514,50 +3375,7 @@ class IncidentViewSet(viewsets.ModelViewSet):
                     total_voters = 1 + committee.members.count()
             except Exception:
                 pass
-
-            counts = {"approve": 0, "reject": 0, "return": 0}
-            by_user: dict[int, str] = {}
-            chair_vote = None
-            for v in votes:
-                uid = int(v.get("voter_id")) if v.get("voter_id") is not None else None
-                decision = str(v.get("decision") or "").lower()
-                if decision not in counts:
-                    continue
-                # آخر تصويت للمستخدم يغلب
-                if uid is not None:
-                    by_user[uid] = decision
-                if chair_id is not None and uid == int(chair_id):
-                    chair_vote = decision
-            # أعد الاحتساب بعد إزالة التكرارات لكل مستخدم
-            for d in by_user.values():
-                counts[d] = counts.get(d, 0) + 1
-
-            quorum = max(1, (total_voters // 2) + 1) if total_voters else 0
-            participated = len(by_user)
-            quorum_met = participated >= quorum if quorum else False
-            # حدد الأغلبية
-            maj_decision = None
-            if counts:
-                # ابحث عن أعلى عدّ
-                sorted_items = sorted(counts.items(), key=lambda x: (-x[1], x[0]))
-                top = sorted_items[0]
-                # تحقق من التعادل
-                ties = [k for k, c in counts.items() if c == top[1] and c > 0]
-                if len(ties) == 1:
-                    maj_decision = top[0]
-                else:
-                    # تعادل — استخدم صوت الرئيس إن وُجد
-                    if chair_vote in {"approve", "reject", "return"}:
-                        maj_decision = chair_vote
-            return {
-                "total_voters": total_voters,
-                "participated": participated,
-                "quorum": quorum,
-                "quorum_met": quorum_met,
-                "counts": counts,
-                "majority": maj_decision,
-                "chair_vote": chair_vote,
-            }
+            return summarize_votes(chair_id, total_voters, votes)
         except Exception:
             return {
                 "total_voters": 0,
@@ -3721,20 +3539,14 @@ class IncidentViewSet(viewsets.ModelViewSet):
         except Exception:
             pass
         try:
-            from .models import StandingCommittee, StandingCommitteeMember
+            from .committee_pool import get_candidate_pool
 
-            sc = StandingCommittee.objects.order_by("id").first()
-            if sc is not None:
-                if getattr(sc, "chair_id", None) == getattr(user, "id", None):
-                    caps["is_standing_chair"] = True
-                if getattr(sc, "recorder_id", None) == getattr(user, "id", None):
-                    caps["is_standing_recorder"] = True
-                try:
-                    caps["is_standing_member"] = StandingCommitteeMember.objects.filter(
-                        standing=sc, user_id=getattr(user, "id", None)
-                    ).exists()
-                except Exception:
-                    pass
+            sc = get_candidate_pool()["standing"]
+            uid = getattr(user, "id", None)
+            if sc.get("id") is not None and uid is not None:
+                caps["is_standing_chair"] = sc.get("chair_id") == uid
+                caps["is_standing_recorder"] = sc.get("recorder_id") == uid
+                caps["is_standing_member"] = uid in (sc.get("member_ids") or [])
         except Exception:
             pass
         return Response({"access_caps": caps})
@@ -4315,16 +4127,18 @@ class ExcuseRequestViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         payload = request.data or {}
+        upfile = request.FILES.get("file")
         data = {
             "excuse": str(obj.id),
             "category": payload.get("category") or "EXCUSE_DOC",
-            "url": payload.get("url"),
+            # عند الرفع المباشر يُضبط الرابط من وحدة التخزين بعد الحفظ
+            "url": payload.get("url") or ("pending-upload" if upfile else None),
             "checksum": payload.get("checksum") or "",
             "origin": payload.get("origin") or "",
         }
         ser = ExcuseAttachmentSerializer(data=data)
         ser.is_valid(raise_exception=True)
-        att = ExcuseAttachment.objects.create(
+        att = ExcuseAttachment(
             excuse=obj,
             category=ser.validated_data["category"],
             url=ser.validated_data["url"],
@@ -4332,6 +4146,11 @@ class ExcuseRequestViewSet(viewsets.ModelViewSet):
             origin=ser.validated_data.get("origin") or "",
             uploaded_by=request.user,
         )
+        if upfile:
+            # تخزين حسب المحتوى: الملف المتطابق لا يُكرّر، وتُملأ checksum بـ sha256
+            att.file.save(getattr(upfile, "name", "") or "excuse", upfile, save=False)
+            att.url = att.file.url
+        att.save()
         # سجل تدقيق للمرفق
         try:
             ExcuseAuditLog.objects.create(
@@ -33,10 +33,11 @@ from .models import (
     TimetableLinks,
     SiteLinks,
     TaskLog,
+    EndpointPerformance,
 )
 from .admin_filters import CurrentTermFilter
 from .services.attendance import compute_late_seconds, format_mmss, format_hhmmss
-from django.db.models import Case, When, IntegerField, Value, Subquery, OuterRef, F
+from django.db.models import Case, Count, When, IntegerField, Value, Subquery, OuterRef, F, Sum
 from django.db.models.functions import Coalesce
 
 # Ensure the top-right "View site" link in Django Admin points to the main portal
@@ -1001,6 +1002,12 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
         )
         return qs
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        from .services.late_events import reconcile_late_events
+
+        reconcile_late_events([obj.pk], recorded_by_id=request.user.id)
+
     def _format_mmss(self, total_seconds):
         try:
             s = int(total_seconds)
@@ -1096,9 +1103,12 @@ class AttendanceDailyAdmin(admin.ModelAdmin):
         "daily_absent_unexcused",
         "daily_excused",
         "daily_excused_partial",
+        "state",
+        "p1_status",
+        "p2_status",
         "locked",
     )
-    list_filter = ("date", "school_class", "wing", "term", "daily_absent_unexcused")
+    list_filter = ("date", "school_class", "wing", "term", "daily_absent_unexcused", "state")
     search_fields = ("student__full_name", "school_class__name")
     autocomplete_fields = ("student", "school_class", "wing", "term")
 
@@ -1206,61 +1216,51 @@ class StudentLateSummaryAdmin(admin.ModelAdmin):
 
     student_name_one_line.short_description = "اسم الطالب"
 
-    # cache for term policy minutes
-    _policy_cache = None
-
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        # Prefetch only late/runaway records with needed fields
-        from django.db.models import Prefetch
-
-        late_qs = AttendanceRecord.objects.filter(status__in=["late", "runaway"]).select_related("subject", "term")
-        qs = qs.select_related("class_fk").prefetch_related(
-            Prefetch("attendancerecord_set", queryset=late_qs, to_attr="_late_related")
+        # Totals are computed in the database as correlated subqueries over the student's late/runaway
+        # records (served by the (student, status) lookup), so both columns are sortable and no
+        # records are pulled into Python. Runaway counts as the term's equivalent period minutes.
+        late_records = AttendanceRecord.objects.filter(student_id=OuterRef("pk"), status__in=["late", "runaway"])
+        policy_minutes_sq = (
+            AttendancePolicy.objects.filter(term_id=OuterRef("term_id"))
+            .order_by("id")
+            .values("late_to_equivalent_period_minutes")[:1]
+        )
+        count_sq = late_records.order_by().values("student_id").annotate(c=Count("id")).values("c")
+        seconds_sq = (
+            late_records.order_by()
+            .values("student_id")
+            .annotate(
+                s=Sum(
+                    Case(
+                        When(status="runaway", then=Coalesce(Subquery(policy_minutes_sq), Value(45)) * Value(60)),
+                        default=F("late_minutes") * Value(60),
+                        output_field=IntegerField(),
+                    )
+                )
+            )
+            .values("s")
+        )
+        return qs.annotate(
+            late_incidents=Coalesce(Subquery(count_sq, output_field=IntegerField()), Value(0)),
+            late_seconds=Coalesce(Subquery(seconds_sq, output_field=IntegerField()), Value(0)),
         )
-        # Warm policy cache by terms present (optional, built lazily below as well)
-        self._policy_cache = {}
-        return qs
-
-    def _equiv_minutes_for_term(self, term):
-        if term is None:
-            return 45
-        if self._policy_cache is None:
-            self._policy_cache = {}
-        tid = getattr(term, "id", None)
-        if tid in self._policy_cache:
-            return self._policy_cache[tid]
-        try:
-            policy = AttendancePolicy.objects.filter(term=term).order_by("id").first()
-            minutes = int(policy.late_to_equivalent_period_minutes) if policy else 45
-        except Exception:
-            minutes = 45
-        self._policy_cache[tid] = minutes
-        return minutes
-
-    def _total_late_seconds(self, obj: StudentLateSummary) -> int:
-        total = 0
-        items = getattr(obj, "_late_related", None) or []
-        for rec in items:
-            if rec.status == "runaway":
-                total += self._equiv_minutes_for_term(getattr(rec, "term", None)) * 60
-            else:
-                total += int(rec.late_minutes or 0) * 60
-        return total
 
     def late_incidents_count(self, obj: StudentLateSummary):
-        return len(getattr(obj, "_late_related", []) or [])
+        return int(getattr(obj, "late_incidents", 0) or 0)
 
     late_incidents_count.short_description = "عدد الحالات"
-    late_incidents_count.admin_order_field = None
+    late_incidents_count.admin_order_field = "late_incidents"
 
     def total_late_hhmmss(self, obj: StudentLateSummary):
-        s = self._total_late_seconds(obj)
+        s = int(getattr(obj, "late_seconds", 0) or 0)
         h, rem = divmod(s, 3600)
         m, sec = divmod(rem, 60)
         return f"{h:02d}:{m:02d}:{sec:02d}"
 
     total_late_hhmmss.short_description = "إجمالي التأخر (س:د:ث)"
+    total_late_hhmmss.admin_order_field = "late_seconds"
 
 
 @admin.register(ExitEvent)
@@ -1531,6 +1531,46 @@ class TaskLogAdmin(admin.ModelAdmin):
         "created_at",
     )
     list_filter = ("status", "resource_type", "action")
-    search_fields = ("resource_type", "resource_id", "action", "message")
+    search_fields = ("resource_type", "resource_id", "action", "message", "request_id", "trace_id")
     autocomplete_fields = ("actor", "assignee")
     readonly_fields = ("created_at", "updated_at")
+
+
+@admin.register(EndpointPerformance)
+class EndpointPerformanceAdmin(admin.ModelAdmin):
+    """صفحة قراءة فقط: أبطأ نقاط الواجهة خلال نافذة زمنية (نفس بيانات أمر slow_endpoints)."""
+
+    WINDOWS = (15, 60, 360, 1440)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        from apps.common.request_metrics import SORT_KEYS, endpoint_summary, recent_samples
+
+        try:
+            minutes = int(request.GET.get("minutes") or 60)
+        except ValueError:
+            minutes = 60
+        minutes = minutes if minutes in self.WINDOWS else 60
+        sort = request.GET.get("sort") if request.GET.get("sort") in SORT_KEYS else "p95"
+        samples = recent_samples(minutes)
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "أداء نقاط الواجهة",
+            "opts": self.model._meta,
+            "minutes": minutes,
+            "windows": self.WINDOWS,
+            "sort": sort,
+            "sort_keys": SORT_KEYS,
+            "sample_count": len(samples),
+            "rows": endpoint_summary(samples, sort=sort)[:100],
+            **(extra_context or {}),
+        }
+        return render(request, "admin/endpoint_performance.html", context)
@@ -1,9 +1,6 @@
 from __future__ import annotations
 
-from typing import List
-
 from django.contrib.auth import password_validation
-from django.contrib.auth.models import Permission
 from django.http import JsonResponse
 from django.views.decorators.cache import never_cache
 from rest_framework import status
@@ -13,7 +10,7 @@ from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from ..models import Staff, TeachingAssignment, Wing, ApprovalRequest, TaskLog
+from ..models import Staff, ApprovalRequest, TaskLog
 from django.db.models import Q
 
 
@@ -21,133 +18,13 @@ from django.db.models import Q
 @permission_classes([IsAuthenticated])
 @never_cache
 def me(request: Request):
-    from apps.common.roles import normalize_roles, pick_primary_route  # type: ignore
+    """Profile, roles, permissions and UI capabilities of the current user.
 
-    user = request.user
-    # Roles from Django groups
-    roles_set = set(user.groups.values_list("name", flat=True))  # type: ignore
-    # Also include Staff.role if linked (some deployments store role code here)
-    staff_obj = None
-    try:
-        staff_obj = Staff.objects.filter(user=user).only("id", "role").first()
-        if staff_obj and staff_obj.role:
-            roles_set.add(staff_obj.role)
-    except Exception:
-        staff_obj = None
-    # Derive 'wing_supervisor' if this staff supervises any wings (even if not in group)
-    try:
-        if staff_obj and Wing.objects.filter(supervisor=staff_obj).exists():
-            roles_set.add("wing_supervisor")
-    except Exception:
-        pass
-    # Normalize roles to canonical codes
-    roles_norm = normalize_roles(roles_set)
+    Assembled and cached by services.me_profile (per user, invalidated by RBAC/Staff changes).
+    """
+    from ..services.me_profile import get_me_payload
 
-    # Determine if the user is a teacher with actual teaching assignments (has timetable classes)
-    # Also get full_name from Staff table (Arabic name)
-    has_teaching_assignments = False
-    staff_full_name = None
-    try:
-        staff = Staff.objects.filter(user=user).first()
-        if staff:
-            staff_full_name = staff.full_name
-            # Treat as teacher if actual assignments exist, regardless of group naming
-            if TeachingAssignment.objects.filter(teacher=staff).exists():
-                has_teaching_assignments = True
-                roles_norm.add("teacher")
-    except Exception:
-        has_teaching_assignments = False
-
-    # Permissions as "app_label.codename"
-    perms: List[str] = [f"{p.content_type.app_label}.{p.codename}" for p in Permission.objects.filter(user=user)]
-    # Also include group-granted permissions
-    group_perms_qs = Permission.objects.filter(group__user=user).values_list("content_type__app_label", "codename")
-    perms += [f"{app}.{code}" for app, code in group_perms_qs]
-    # Deduplicate
-    perms = sorted(set(perms))
-
-    # Capabilities derived from roles for frontend UI gating (non-authoritative; server enforces separately)
-    role_set = set(roles_norm)
-    can_manage_timetable = bool(
-        user.is_superuser or role_set.intersection({"principal", "academic_deputy", "timetable_manager"})
-    )
-    # Discipline capabilities (UI gating; server enforces separately per endpoint)
-    is_principal = "principal" in role_set
-    is_vice = "academic_deputy" in role_set or "vice_principal" in role_set
-    is_d_l1 = "discipline_l1" in role_set or "homeroom" in role_set
-    is_d_l2 = "discipline_l2" in role_set
-    is_exams = "exams" in role_set or "exams_officer" in role_set
-    is_nurse = "nurse" in role_set
-    is_counselor = "counselor" in role_set
-
-    caps = {
-        "can_manage_timetable": can_manage_timetable,
-        "can_view_general_timetable": True,  # all authenticated users may view; templates may still gate by staff
-        "can_take_attendance": bool("teacher" in role_set),
-        # Discipline
-        "discipline_l1": bool(is_d_l1),
-        "discipline_l2": bool(is_d_l2 or is_principal or is_vice),
-        # Exams governance
-        "exams_manage": bool(is_exams or is_principal or is_vice),
-        # Health privacy
-        "health_can_view_masked": bool(is_counselor or is_nurse or is_principal or is_vice),
-        # سياسة صحية صارمة: فك الإخفاء للممرض فقط
-        "health_can_unmask": bool(is_nurse),
-        # Approvals (dual control)
-        "can_propose_irreversible": bool(is_d_l2 or is_exams or is_vice or is_principal),
-        "can_approve_irreversible": bool(is_vice or is_principal),
-    }
-
-    primary_route = pick_primary_route(role_set)
-
-    # Optional cumulative history ribbon per user (lightweight, role-aware)
-    history = None
-    try:
-        if staff_obj:
-            from ..models import AttendanceRecord  # type: ignore
-
-            qs = AttendanceRecord.objects.filter(teacher_id=staff_obj.id)
-            total_entries = qs.count()
-            first_date = qs.order_by("date").values_list("date", flat=True).first()
-            last_date = qs.order_by("-date").values_list("date", flat=True).first()
-            active_days = qs.values("date").distinct().count()
-            by_status = {
-                "present": qs.filter(status="present").count(),
-                "late": qs.filter(status="late").count(),
-                "absent": qs.filter(status="absent").count(),
-                "excused": qs.filter(status="excused").count(),
-                "runaway": qs.filter(status="runaway").count(),
-            }
-            history = {
-                "scope": "teacher" if has_teaching_assignments else "staff",
-                "total_entries": int(total_entries),
-                "active_days": int(active_days),
-                "first_date": first_date.isoformat() if first_date else None,
-                "last_date": last_date.isoformat() if last_date else None,
-                "by_status": by_status,
-            }
-    except Exception:
-        history = None
-
-    # سياسة عرض الأسماء: نُفضِّل دائمًا اسم الموظف الكامل من Staff إن وُجد، ثم الاسم الكامل للمستخدم، ثم اسم المستخدم
-    display_name = staff_full_name or user.get_full_name() or user.username
-
-    data = {
-        "id": user.id,
-        "username": user.username,
-        "full_name": display_name,  # إبقاء التوافق مع الفرونت اند: full_name يُعيد الاسم الأفضل عرضًا
-        "staff_full_name": staff_full_name,  # إرجاع الاسم من Staff صراحةً عند الحاجة
-        "display_name": display_name,  # مفتاح صريح لسياسة العرض الموحّدة
-        "is_superuser": user.is_superuser,
-        "is_staff": user.is_staff,
-        "roles": sorted(roles_norm),
-        "permissions": perms,
-        "hasTeachingAssignments": has_teaching_assignments,
-        "capabilities": caps,
-        "primary_route": primary_route,
-        "history": history,
-    }
-    return JsonResponse(data)
+    return JsonResponse(get_me_payload(request.user))
 
 
 @api_view(["POST"])
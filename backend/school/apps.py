@@ -13,3 +13,22 @@ class SchoolConfig(AppConfig):
         except Exception:
             # Avoid breaking migrations if import errors occur during app loading
             pass
+        # Cached /api/me profiles follow RBAC/Staff changes
+        from .services.me_profile import connect_profile_signals
+
+        connect_profile_signals()
+        # Version counters keying the cached import name index (services.name_index)
+        from apps.common.conditional import track_models
+
+        from .services.name_index import INDEX_MODELS
+
+        track_models(INDEX_MODELS)
+        # Connection reuse counters for healthcheck / the /healthz/db diagnostics
+        from apps.common.db_stats import connect_db_stats_signals
+
+        connect_db_stats_signals()
+        # Request instrumentation: cache/serializer hooks and request ids on TaskLog rows
+        from apps.common.request_metrics import connect_request_id_signals, install
+
+        install()
+        connect_request_id_signals()
@@ -1,10 +1,19 @@
+"""
+Move attendance records older than --days into AttendanceRecordArchive (set-based, resumable).
+Usage:
+  python manage.py archive_attendance --days 365
+  python manage.py archive_attendance --days 365 --chunk-size 10000 --sleep 0.2 --max-lag 5
+  python manage.py archive_attendance --days 365 --max-chunks 50      # bounded pass; rerun to resume
+  python manage.py archive_attendance --days 365 --dry-run
+An interrupted run resumes from its last committed chunk (checkpoint stored in TaskLog).
+"""
+
 import logging
 from datetime import date, timedelta
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
 
-from school.models import AttendanceRecord, AttendanceRecordArchive
+from school.services.archiving import archive_attendance_before
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +29,34 @@ class Command(BaseCommand):
             help="The minimum age in days for attendance records to be archived.",
         )
         parser.add_argument(
+            "--before",
+            help="Archive records dated before this day YYYY-MM-DD (overrides --days).",
+        )
+        parser.add_argument(
+            "--chunk-size",
             "--batch-size",
+            dest="chunk_size",
+            type=int,
+            default=5000,
+            help="Rows moved per chunk (one transaction and checkpoint per chunk).",
+        )
+        parser.add_argument(
+            "--max-chunks",
             type=int,
-            default=1000,
-            help="The number of records to process in each batch.",
+            default=None,
+            help="Stop after this many chunks; the next run resumes from the checkpoint.",
+        )
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between chunks.")
+        parser.add_argument(
+            "--max-lag",
+            type=float,
+            default=None,
+            help="PostgreSQL: wait between chunks while replica replay lag exceeds this many seconds.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Ignore an unfinished checkpoint for the same cutoff and start a new run.",
         )
         parser.add_argument(
             "--dry-run",
@@ -32,59 +65,41 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        days_old = options["days"]
-        batch_size = options["batch_size"]
-        dry_run = options["dry_run"]
-
-        cutoff_date = date.today() - timedelta(days=days_old)
-        self.stdout.write(f"Archiving attendance records older than {cutoff_date} ({days_old} days old).")
-
-        records_to_archive = AttendanceRecord.objects.filter(date__lt=cutoff_date)
-        total_count = records_to_archive.count()
+        if options["before"]:
+            try:
+                cutoff_date = date.fromisoformat(options["before"])
+            except ValueError as e:
+                raise CommandError(f"Invalid date: {e}")
+        else:
+            cutoff_date = date.today() - timedelta(days=options["days"])
+        self.stdout.write(f"Archiving attendance records older than {cutoff_date}.")
 
-        if total_count == 0:
-            self.stdout.write(self.style.SUCCESS("No records to archive."))
+        if options["dry_run"]:
+            report = archive_attendance_before(cutoff_date, dry_run=True)
+            self.stdout.write(self.style.WARNING(f"DRY RUN - {report.remaining} record(s) would be archived."))
             return
 
-        self.stdout.write(f"Found {total_count} records to archive.")
-
-        if dry_run:
-            self.stdout.write(self.style.WARNING("This is a dry run. No data will be modified."))
-            return
+        def _progress(r):
+            self.stdout.write(f"  chunk {r.chunks}: moved {r.moved} (last id {r.last_id}, {r.rows_per_s} rows/s)")
 
-        archived_count = 0
-        with transaction.atomic():
-            for record in records_to_archive.iterator(chunk_size=batch_size):
-                AttendanceRecordArchive.objects.create(
-                    original_id=record.id,
-                    student_id=record.student_id,
-                    classroom_id=record.classroom_id,
-                    subject_id=record.subject_id,
-                    teacher_id=record.teacher_id,
-                    term_id=record.term_id,
-                    date=record.date,
-                    day_of_week=record.day_of_week,
-                    period_number=record.period_number,
-                    start_time=record.start_time,
-                    end_time=record.end_time,
-                    status=record.status,
-                    late_minutes=record.late_minutes,
-                    early_minutes=record.early_minutes,
-                    runaway_reason=record.runaway_reason,
-                    excuse_type=record.excuse_type,
-                    excuse_note=record.excuse_note,
-                    note=record.note,
-                    exit_reasons=record.exit_reasons,
-                    exit_left_at=record.exit_left_at,
-                    exit_returned_at=record.exit_returned_at,
-                    source=record.source,
-                    locked=record.locked,
-                    created_at=record.created_at,
-                    updated_at=record.updated_at,
-                )
-                archived_count += 1
-
-            # After archiving, delete the original records
-            records_to_archive.delete()
-
-        self.stdout.write(self.style.SUCCESS(f"Successfully archived and deleted {archived_count} records."))
+        report = archive_attendance_before(
+            cutoff_date,
+            chunk_size=options["chunk_size"],
+            max_chunks=options["max_chunks"],
+            sleep_s=max(0.0, options["sleep"]),
+            max_lag_s=options["max_lag"],
+            restart=options["restart"],
+            progress=_progress if options["verbosity"] > 1 else None,
+        )
+        logger.info("archive_attendance %s", report.as_dict())
+        resumed = " (resumed)" if report.resumed else ""
+        summary = (
+            f"Archived {report.moved} record(s) in {report.chunks} chunk(s){resumed}; "
+            f"{report.elapsed_s}s, {report.rows_per_s} rows/s, throttled {round(report.throttled_s, 1)}s."
+        )
+        if report.finished:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            self.stdout.write(
+                self.style.WARNING(f"{summary} {report.remaining} record(s) left; rerun to resume from the checkpoint.")
+            )
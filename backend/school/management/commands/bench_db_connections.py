@@ -0,0 +1,129 @@
+"""
+Load benchmark for database connection reuse (DB_CONN_MODE).
+
+Simulates request cycles (request_started -> one query -> request_finished) on N threads, once
+with connect-per-request (the previous behaviour) and once with the configured mode (persistent
+connections or the psycopg pool), and compares physical connects/sec and requests/sec.
+
+Usage:
+  python manage.py bench_db_connections
+  python manage.py bench_db_connections --requests 2000 --threads 8 --format json
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import threading
+import time
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.utils import load_backend
+
+
+def _scenario_settings(base: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    sd = copy.deepcopy(base)
+    if mode == "off":
+        sd["CONN_MAX_AGE"] = 0
+        sd["CONN_HEALTH_CHECKS"] = False
+        sd.get("OPTIONS", {}).pop("pool", None)
+    return sd
+
+
+def _run(settings_dict: Dict[str, Any], alias: str, requests: int, threads: int, sql: str) -> Dict[str, Any]:
+    backend = load_backend(settings_dict["ENGINE"])
+    opened: List[int] = []
+    lock = threading.Lock()
+
+    def on_connect(sender, connection, **kwargs):
+        if connection.alias == alias:
+            with lock:
+                opened.append(1)
+
+    per_thread = max(1, requests // threads)
+    wrappers = []
+
+    def worker():
+        conn = backend.DatabaseWrapper(copy.deepcopy(settings_dict), alias)
+        with lock:
+            wrappers.append(conn)
+        for _ in range(per_thread):
+            # Same calls as django.db.close_old_connections on request_started/request_finished
+            conn.close_if_unusable_or_obsolete()
+            with conn.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.fetchone()
+            conn.close_if_unusable_or_obsolete()
+        conn.close()
+
+    connection_created.connect(on_connect, dispatch_uid=f"bench-{alias}", weak=False)
+    try:
+        started = time.perf_counter()
+        pool_threads = [threading.Thread(target=worker) for _ in range(threads)]
+        for t in pool_threads:
+            t.start()
+        for t in pool_threads:
+            t.join()
+        elapsed = max(time.perf_counter() - started, 1e-9)
+    finally:
+        connection_created.disconnect(dispatch_uid=f"bench-{alias}")
+
+    physical = len(opened)
+    pool_stats = None
+    if settings_dict.get("OPTIONS", {}).get("pool") and wrappers:
+        # With a pool connection_created fires per checkout; physical connects come from the pool
+        pool = wrappers[0].pool
+        pool_stats = pool.get_stats()
+        physical = int(pool_stats.get("connections_num", 0))
+        wrappers[0].close_pool()
+    total = per_thread * threads
+    return {
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(total / elapsed, 1),
+        "connects": physical,
+        "connects_per_s": round(physical / elapsed, 1),
+        "pool": pool_stats,
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark connects/sec and requests/sec: connect-per-request vs the configured DB_CONN_MODE"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default", help="Database alias (default: default)")
+        parser.add_argument("--requests", type=int, default=500, help="Simulated requests per scenario")
+        parser.add_argument("--threads", type=int, default=4, help="Concurrent worker threads")
+        parser.add_argument("--sql", default="SELECT 1", help="Query executed per request")
+        parser.add_argument("--format", choices=["text", "json"], default="text")
+
+    def handle(self, *args, **opts):
+        base = connections[opts["database"]].settings_dict
+        configured = (
+            "pool" if base.get("OPTIONS", {}).get("pool") else ("persistent" if base.get("CONN_MAX_AGE") else "off")
+        )
+        results: Dict[str, Any] = {}
+        for mode in ("off", configured):
+            if mode in results:
+                continue
+            results[mode] = _run(
+                _scenario_settings(base, mode),
+                f"bench-{mode}",
+                max(1, opts["requests"]),
+                max(1, opts["threads"]),
+                opts["sql"],
+            )
+
+        if opts["format"] == "json":
+            self.stdout.write(json.dumps(results, indent=2, default=str))
+            return
+        self.stdout.write(f"{'mode':<12}{'requests':>10}{'req/s':>12}{'connects':>10}{'connects/s':>12}")
+        for mode, r in results.items():
+            self.stdout.write(
+                f"{mode:<12}{r['requests']:>10}{r['requests_per_s']:>12}{r['connects']:>10}{r['connects_per_s']:>12}"
+            )
+        if configured == "off":
+            self.stdout.write(self.style.WARNING("DB_CONN_MODE is off: nothing to compare against."))
@@ -0,0 +1,109 @@
+"""
+Garbage-collect content-addressed blobs (school.storage.ContentAddressedStorage).
+Usage:
+  python manage.py gc_blobs --recount            # fix reference-count drift from live rows
+  python manage.py gc_blobs --grace-hours=24     # delete blobs unreferenced for 24h
+  python manage.py gc_blobs --dry-run
+"""
+
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from school.models import StoredBlob
+from school.storage import get_blob_storage, iter_stored_files, live_blob_references
+
+
+class Command(BaseCommand):
+    help = "Recount references and delete unreferenced content-addressed blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--recount",
+            action="store_true",
+            help="Recompute ref_count for every blob from the referencing tables before collecting",
+        )
+        parser.add_argument(
+            "--grace-hours",
+            type=int,
+            default=24,
+            help="Only delete blobs unreferenced for at least this many hours (default: 24)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be changed without modifying anything",
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        grace = timedelta(hours=max(0, options["grace_hours"]))
+        storage = get_blob_storage()
+
+        if options["recount"]:
+            live = live_blob_references()
+            fixed = 0
+            for blob in StoredBlob.objects.only("id", "name", "ref_count").iterator(chunk_size=2000):
+                actual = live.pop(blob.name, 0)
+                if actual != blob.ref_count:
+                    fixed += 1
+                    if not dry_run:
+                        StoredBlob.objects.filter(id=blob.id).update(ref_count=actual, updated_at=timezone.now())
+            # Referenced files without a StoredBlob row (e.g. saved before the table existed)
+            adopted = 0
+            for name, n in live.items():
+                digest = name.rsplit("/", 1)[-1]
+                if not storage.exists(name):
+                    continue
+                adopted += 1
+                if not dry_run:
+                    StoredBlob.objects.update_or_create(
+                        sha256=digest, defaults={"name": name, "size": storage.size(name), "ref_count": n}
+                    )
+            self.stdout.write(f"Recount: corrected {fixed} blob(s), adopted {adopted} untracked blob(s)")
+
+        cutoff = timezone.now() - grace
+        orphans = StoredBlob.objects.filter(ref_count__lte=0, updated_at__lt=cutoff)
+        deleted = 0
+        freed = 0
+        for blob in orphans.iterator(chunk_size=500):
+            deleted += 1
+            freed += blob.size
+            if dry_run:
+                self.stdout.write(f"  - would delete {blob.name} ({blob.size} bytes)")
+                continue
+            with transaction.atomic():
+                # Re-check under lock: a concurrent upload may have re-referenced the blob
+                locked = StoredBlob.objects.select_for_update().filter(id=blob.id, ref_count__lte=0).first()
+                if not locked:
+                    deleted -= 1
+                    freed -= blob.size
+                    continue
+                storage.delete(locked.name)
+                locked.delete()
+
+        # Files on disk that are neither tracked nor referenced are leftovers of interrupted saves.
+        # Only scanned with --recount; files younger than the grace period may belong to in-flight uploads.
+        stray = []
+        if options["recount"]:
+            tracked = set(StoredBlob.objects.values_list("name", flat=True))
+            referenced = set(live_blob_references())
+            cutoff_ts = cutoff.timestamp()
+            for name in iter_stored_files(storage):
+                if name in tracked or name in referenced:
+                    continue
+                if os.path.getmtime(storage.path(name)) >= cutoff_ts:
+                    continue
+                stray.append(name)
+                if dry_run:
+                    self.stdout.write(f"  - would delete untracked {name}")
+                else:
+                    storage.delete(name)
+
+        prefix = "DRY RUN - " if dry_run else ""
+        self.stdout.write(
+            self.style.SUCCESS(f"{prefix}Deleted {deleted} blob(s), freed {freed} bytes; untracked files: {len(stray)}")
+        )
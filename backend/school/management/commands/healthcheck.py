@@ -70,6 +70,12 @@ class Command(BaseCommand):
             db_ok = False
             db_error = str(e)
         report["database"] = {"ok": db_ok, "error": db_error, "tables": tables}
+        try:
+            from apps.common.db_stats import connection_stats
+
+            report["database"]["connections"] = connection_stats()
+        except Exception as e:  # pragma: no cover
+            report["database"]["connections"] = {"error": str(e)}
 
         # 3) Unapplied migrations
         unapplied: List[Tuple[str, str]] = []
@@ -224,6 +230,18 @@ class Command(BaseCommand):
         if db.get("error"):
             out.write(f"Error: {db['error']}\n")
         out.write(f"User tables: {len(db.get('tables', []))}\n")
+        conns = db.get("connections") or {}
+        if conns.get("mode"):
+            out.write(
+                f"Connection reuse: {conns['mode']} (role={conns.get('role')}, "
+                f"max_age={conns.get('conn_max_age')}, connects={conns.get('connects')})\n"
+            )
+        pool = conns.get("pool") or {}
+        if pool and "error" not in pool:
+            out.write(
+                f"Pool: size={pool.get('pool_size')}/{pool.get('max_size')} "
+                f"available={pool.get('pool_available')} waiting={pool.get('requests_waiting', 0)}\n"
+            )
 
         out.write("\n== Migrations ==\n")
         mig = report["migrations"]
@@ -0,0 +1,48 @@
+"""
+Repair drift between AttendanceRecord (late/runaway) and AttendanceLateEvent.
+Usage:
+  python manage.py reconcile_late_events                              # last 7 days
+  python manage.py reconcile_late_events --from 2025-09-01 --to 2025-12-31
+  python manage.py reconcile_late_events --from 2025-09-01 --dry-run
+"""
+
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from school.services.late_events import reconcile_late_events_range
+
+
+class Command(BaseCommand):
+    help = "Create missing, fix drifted and delete stale late events for a date range"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="Start date YYYY-MM-DD (default: 7 days ago)")
+        parser.add_argument("--to", dest="date_to", help="End date YYYY-MM-DD (default: today)")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Records reconciled per batch")
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without modifying anything")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            date_to = date.fromisoformat(options["date_to"]) if options["date_to"] else today
+            date_from = (
+                date.fromisoformat(options["date_from"]) if options["date_from"] else date_to - timedelta(days=7)
+            )
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        if date_from > date_to:
+            raise CommandError("--from must be on or before --to")
+
+        report = reconcile_late_events_range(
+            date_from, date_to, dry_run=options["dry_run"], chunk_size=max(1, options["chunk_size"])
+        )
+        prefix = "DRY RUN - " if options["dry_run"] else ""
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{date_from}..{date_to}: checked {report.checked} record(s); "
+                f"created {report.created}, updated {report.updated}, deleted {report.deleted} stale, "
+                f"removed {report.duplicates} duplicate event(s)"
+            )
+        )
@@ -0,0 +1,58 @@
+"""
+Create the monthly partitions of the attendance archive ahead of time.
+Usage:
+  python manage.py roll_attendance_partitions                  # this month + 3 months ahead
+  python manage.py roll_attendance_partitions --months-ahead 6
+  python manage.py roll_attendance_partitions --from 2024-09-01 --dry-run
+No-op on databases without declarative partitioning (SQLite).
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school.partitioning import convert_archive_to_partitioned, ensure_month_partitions
+
+
+class Command(BaseCommand):
+    help = "Roll monthly partitions of the attendance archive forward (PostgreSQL only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=3, help="Months after the current one to prepare")
+        parser.add_argument("--from", dest="start", help="First month to ensure YYYY-MM-DD (default: this month)")
+        parser.add_argument(
+            "--convert", action="store_true", help="Convert the archive table first if it is not partitioned yet"
+        )
+        parser.add_argument("--dry-run", action="store_true", help="List missing partitions without creating them")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options["start"]) if options["start"] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+        months_ahead = max(0, options["months_ahead"])
+
+        if options["convert"] and not options["dry_run"]:
+            converted = convert_archive_to_partitioned(months_ahead=months_ahead)
+            if converted.converted:
+                self.stdout.write(
+                    f"Converted archive: {converted.moved_rows} row(s) into {len(converted.created)} partition(s)"
+                )
+
+        report = ensure_month_partitions(months_ahead=months_ahead, start=start, dry_run=options["dry_run"])
+        if not report.supported:
+            self.stdout.write(self.style.WARNING("Partitioning is not supported by this database; nothing to do."))
+            return
+        if not report.partitioned:
+            self.stdout.write(
+                self.style.WARNING("The archive table is not partitioned; run migrations or pass --convert.")
+            )
+            return
+        prefix = "DRY RUN - " if options["dry_run"] else ""
+        names = ", ".join(report.created) or "-"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{prefix}{len(report.created)} partition(s) {'missing' if options['dry_run'] else 'created'}: "
+                f"{names}; moved {report.moved_rows} row(s) out of the default partition"
+            )
+        )
@@ -0,0 +1,58 @@
+"""
+Slowest endpoints over a recent window, from the request samples recorded by
+core.middleware_metrics.RequestMetricsMiddleware (REQUEST_METRICS_SINK: cache ring buffer or
+Redis stream).
+
+Per endpoint (view name + method): request count, p50/p95/p99/max total time in ms, and the mean
+DB queries/DB time, cache hit rate, serializer and render time and response size.
+
+Usage:
+  python manage.py slow_endpoints
+  python manage.py slow_endpoints --minutes 1440 --sort p99 --limit 10 --min-count 5 --format json
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.common.request_metrics import SORT_KEYS, endpoint_summary, recent_samples
+
+
+def _run(minutes: float = 60, *, sort: str = "p95", limit: int = 20, min_count: int = 1) -> Dict[str, Any]:
+    samples = recent_samples(minutes)
+    rows: List[Dict[str, Any]] = endpoint_summary(samples, min_count=min_count, sort=sort)
+    return {"minutes": minutes, "samples": len(samples), "endpoints": rows[:limit] if limit else rows}
+
+
+class Command(BaseCommand):
+    help = "List p50/p95/p99 response times per endpoint over a recent window (request instrumentation samples)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--minutes", type=float, default=60, help="Window size in minutes (default 60)")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="p95")
+        parser.add_argument("--limit", type=int, default=20, help="Endpoints to show (0 = all)")
+        parser.add_argument("--min-count", type=int, default=1, help="Ignore endpoints with fewer requests")
+        parser.add_argument("--format", choices=["text", "json"], default="text")
+
+    def handle(self, *args, **opts):
+        if opts["minutes"] <= 0 or opts["limit"] < 0 or opts["min_count"] < 1:
+            raise CommandError("--minutes and --min-count must be positive, --limit >= 0")
+        report = _run(opts["minutes"], sort=opts["sort"], limit=opts["limit"], min_count=opts["min_count"])
+
+        if opts["format"] == "json":
+            self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
+            return
+        self.stdout.write(f"{report['samples']} samples over the last {report['minutes']:g} min")
+        self.stdout.write(
+            f"{'endpoint':<48}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'db_q':>7}{'db_ms':>8}{'hit%':>7}{'KB':>7}"
+        )
+        for r in report["endpoints"]:
+            hit = "-" if r["cache_hit_pct"] is None else f"{r['cache_hit_pct']:g}"
+            name = f"{r['method']} {r['view']}"[:47]
+            self.stdout.write(
+                f"{name:<48}{r['count']:>6}{r['p50']:>9.1f}{r['p95']:>9.1f}{r['p99']:>9.1f}"
+                f"{r['db_q']:>7g}{r['db_ms']:>8.1f}{hit:>7}{r['bytes'] // 1024:>7}"
+            )
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school", "0044_alter_attendancerecord_excuse_type_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoredBlob",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("sha256", models.CharField(max_length=64, unique=True)),
+                ("name", models.CharField(help_text="المسار داخل وحدة التخزين", max_length=255)),
+                ("size", models.BigIntegerField(default=0)),
+                ("ref_count", models.IntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name": "ملف مخزّن (محتوى)",
+                "verbose_name_plural": "ملفات مخزّنة (محتوى)",
+                "indexes": [models.Index(fields=["ref_count", "updated_at"], name="blob_refcount_updated_idx")],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school", "0045_storedblob"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendancerecord",
+            index=models.Index(
+                condition=models.Q(("status__in", ["late", "runaway"])),
+                fields=["student", "status"],
+                name="att_student_late_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+def _partition_archive(apps, schema_editor):
+    # PostgreSQL only; SQLite (tests/dev) keeps the plain table
+    from school.partitioning import convert_archive_to_partitioned
+
+    convert_archive_to_partitioned(connection=schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school", "0046_attendancerecord_att_student_late_idx"),
+    ]
+
+    operations = [
+        # Not reversible in place: the partitioned table keeps working with the plain-table model state
+        migrations.RunPython(_partition_archive, reverse_code=migrations.RunPython.noop),
+    ]
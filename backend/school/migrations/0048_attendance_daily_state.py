@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("school", "0047_partition_attendance_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attendancedaily",
+            name="p1_status",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+        migrations.AddField(
+            model_name="attendancedaily",
+            name="p2_status",
+            field=models.CharField(blank=True, default="", max_length=20),
+        ),
+        migrations.AddField(
+            model_name="attendancedaily",
+            name="state",
+            field=models.CharField(
+                choices=[("excused", "غياب بعذر"), ("unexcused", "غياب بدون عذر"), ("none", "لا غياب يوم كامل")],
+                default="none",
+                max_length=10,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="attendancedaily",
+            name="school_class",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="school.class"),
+        ),
+        migrations.AddIndex(
+            model_name="attendancedaily",
+            index=models.Index(fields=["date", "wing"], name="att_daily_date_wing_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="attendancedaily",
+            index=models.Index(fields=["date", "school_class"], name="att_daily_date_class_idx"),
+        ),
+    ]
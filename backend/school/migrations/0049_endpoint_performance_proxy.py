@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:42
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0048_attendance_daily_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EndpointPerformance',
+            fields=[],
+            options={
+                'verbose_name': 'أداء نقاط الواجهة',
+                'verbose_name_plural': 'أداء نقاط الواجهة',
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('school.tasklog',),
+        ),
+    ]
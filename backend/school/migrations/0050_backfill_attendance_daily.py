@@ -0,0 +1,143 @@
+from django.db import migrations, transaction
+
+BATCH = 200
+
+# نسخة مجمّدة من apps.attendance.services.daily_states.refresh_daily_states كما كانت عند 0048 —
+# لا تستورد كود الخدمة هنا حتى لا تكسر تعديلاتها اللاحقة هذه الهجرة.
+COUNTERS = {
+    "present": "present_periods",
+    "late": "present_periods",
+    "left_early": "present_periods",
+    "absent": "absent_periods",
+    "runaway": "runaway_periods",
+    "excused": "excused_periods",
+}
+UNEXCUSED = {"absent", "runaway"}
+EXCUSED = {"excused"}
+NEUTRAL = {"present", "late", "left_early"}
+
+UPDATE_FIELDS = [
+    "school_class",
+    "wing",
+    "present_periods",
+    "absent_periods",
+    "runaway_periods",
+    "excused_periods",
+    "late_minutes",
+    "early_minutes",
+    "p1_status",
+    "p2_status",
+    "state",
+    "daily_absent_unexcused",
+    "daily_excused",
+    "daily_excused_partial",
+    "locked",
+]
+
+
+def first_two_state(statuses):
+    if not statuses or any(s is None or s in NEUTRAL for s in statuses):
+        return "none"
+    if any(s in UNEXCUSED for s in statuses):
+        return "unexcused"
+    if all(s in EXCUSED for s in statuses):
+        return "excused"
+    return "none"
+
+
+def refresh_class_day(apps, class_id, dt):
+    AttendanceDaily = apps.get_model("school", "AttendanceDaily")
+    AttendancePolicy = apps.get_model("school", "AttendancePolicy")
+    AttendanceRecord = apps.get_model("school", "AttendanceRecord")
+    Class = apps.get_model("school", "Class")
+
+    per_student = {}
+    for sid, term_id, period, status, late, early, locked in AttendanceRecord.objects.filter(
+        classroom_id=class_id, date=dt
+    ).values_list("student_id", "term_id", "period_number", "status", "late_minutes", "early_minutes", "locked"):
+        row = per_student.setdefault(
+            (sid, term_id),
+            {"periods": {}, "late": 0, "early": 0, "locked": True, **{f: 0 for f in set(COUNTERS.values())}},
+        )
+        row["periods"][period] = status
+        row["late"] += int(late or 0)
+        row["early"] += int(early or 0)
+        row["locked"] = row["locked"] and bool(locked)
+        counter = COUNTERS.get(status)
+        if counter:
+            row[counter] += 1
+
+    slots = {}
+    for term_id, numbers in (
+        AttendancePolicy.objects.filter(term_id__in={term_id for _sid, term_id in per_student})
+        .order_by("term_id", "-id")
+        .values_list("term_id", "first_two_periods_numbers")
+    ):
+        if term_id not in slots:
+            slots[term_id] = sorted(numbers or [1, 2])[:2]
+    wing_id = Class.objects.filter(id=class_id).values_list("wing_id", flat=True).first()
+
+    objs = []
+    for (sid, term_id), row in per_student.items():
+        statuses = [row["periods"].get(n) for n in slots.get(term_id, [1, 2])]
+        state = first_two_state(statuses)
+        objs.append(
+            AttendanceDaily(
+                student_id=sid,
+                date=dt,
+                term_id=term_id,
+                school_class_id=class_id,
+                wing_id=wing_id,
+                present_periods=row["present_periods"],
+                absent_periods=row["absent_periods"],
+                runaway_periods=row["runaway_periods"],
+                excused_periods=row["excused_periods"],
+                late_minutes=row["late"],
+                early_minutes=row["early"],
+                p1_status=statuses[0] or "",
+                p2_status=(statuses[1] if len(statuses) > 1 else None) or "",
+                state=state,
+                daily_absent_unexcused=state == "unexcused",
+                daily_excused=state == "excused",
+                daily_excused_partial=bool(row["excused_periods"]) and state != "excused",
+                locked=row["locked"],
+            )
+        )
+
+    stale = AttendanceDaily.objects.filter(school_class_id=class_id, date=dt)
+    if per_student:
+        stale = stale.exclude(student_id__in={sid for sid, _term in per_student})
+    stale.delete()
+    if objs:
+        AttendanceDaily.objects.bulk_create(
+            objs, update_conflicts=True, unique_fields=["student", "date", "term"], update_fields=UPDATE_FIELDS
+        )
+
+
+def backfill_daily_states(apps, schema_editor):
+    """Fill AttendanceDaily (p1/p2 statuses, state) for every class-day that already has records.
+
+    Since 0048 the daily-absences view, its exports, compute_absence_days_bulk and
+    attendance_finalize_day read only AttendanceDaily, so the existing attendance is materialized
+    here with the historical models. Class-days are refreshed BATCH at a time, one transaction per batch.
+    """
+    AttendanceRecord = apps.get_model("school", "AttendanceRecord")
+    pairs = list(
+        AttendanceRecord.objects.order_by("date", "classroom_id").values_list("classroom_id", "date").distinct()
+    )
+    for start in range(0, len(pairs), BATCH):
+        with transaction.atomic():
+            for class_id, dt in pairs[start : start + BATCH]:
+                refresh_class_day(apps, class_id, dt)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("school", "0049_endpoint_performance_proxy"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_states, migrations.RunPython.noop),
+    ]
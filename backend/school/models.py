@@ -617,6 +617,12 @@ class AttendanceRecord(models.Model):
             ),
             models.Index(fields=["date", "locked"], name="att_date_locked_idx"),
             models.Index(fields=["student", "term"], name="att_student_term_idx"),
+            # Per-student late/runaway totals (StudentLateSummaryAdmin subqueries)
+            models.Index(
+                fields=["student", "status"],
+                name="att_student_late_idx",
+                condition=models.Q(status__in=["late", "runaway"]),
+            ),
         ]
         unique_together = ("student", "date", "period_number", "term")
         verbose_name = "سجل حضور حصة"
@@ -629,7 +635,7 @@ class AttendanceRecord(models.Model):
 class AttendanceDaily(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     date = models.DateField(db_index=True)
-    school_class = models.ForeignKey(Class, on_delete=models.PROTECT)
+    school_class = models.ForeignKey(Class, on_delete=models.CASCADE)  # ملخص مشتق من السجلات
     wing = models.ForeignKey(Wing, on_delete=models.SET_NULL, null=True, blank=True)
     term = models.ForeignKey(Term, on_delete=models.CASCADE)
 
@@ -644,6 +650,16 @@ class AttendanceDaily(models.Model):
     daily_excused = models.BooleanField(default=False)
     daily_excused_partial = models.BooleanField(default=False)
 
+    # الحالة العامة لليوم وفق قاعدة الحصتين الأوليين (تُحسب عند حفظ السجلات، انظر services/daily_states)
+    class State(models.TextChoices):
+        EXCUSED = "excused", "غياب بعذر"
+        UNEXCUSED = "unexcused", "غياب بدون عذر"
+        NONE = "none", "لا غياب يوم كامل"
+
+    p1_status = models.CharField(max_length=20, blank=True, default="")
+    p2_status = models.CharField(max_length=20, blank=True, default="")
+    state = models.CharField(max_length=10, choices=State.choices, default=State.NONE)
+
     locked = models.BooleanField(default=False)
 
     class Meta:
@@ -652,6 +668,8 @@ class AttendanceDaily(models.Model):
             models.Index(fields=["date"]),
             models.Index(fields=["school_class"]),
             models.Index(fields=["wing"]),
+            models.Index(fields=["date", "wing"], name="att_daily_date_wing_idx"),
+            models.Index(fields=["date", "school_class"], name="att_daily_date_class_idx"),
         ]
         verbose_name = "ملخص حضور يومي"
         verbose_name_plural = "ملخصات الحضور اليومية"
@@ -1006,3 +1024,41 @@ class TaskLog(models.Model):
 
     def __str__(self) -> str:
         return f"{self.action} [{self.status}] {self.resource_type}:{self.resource_id}"
+
+
+class EndpointPerformance(TaskLog):
+    """Proxy model لإظهار صفحة أداء نقاط الواجهة (p50/p95/p99 لكل endpoint) في لوحة الأدمن.
+
+    لا ينشئ جداول جديدة؛ البيانات من عينات RequestMetricsMiddleware (apps.common.request_metrics)."""
+
+    class Meta:
+        proxy = True
+        verbose_name = "أداء نقاط الواجهة"
+        verbose_name_plural = "أداء نقاط الواجهة"
+
+
+# --- Content-addressed file storage (تخزين الملفات حسب المحتوى) ---
+class StoredBlob(models.Model):
+    """ملف مخزّن مرة واحدة حسب بصمة sha256 مع عدّاد مراجع.
+
+    تُنشئه school.storage.ContentAddressedStorage عند كل حفظ، ويُنقص العدّاد عند حذف
+    السجلات المرجعية (مرفقات الوقائع/الأعذار وملفات تنبيهات الغياب). أمر gc_blobs يعيد
+    احتساب المراجع فعليًا ويحذف الملفات اليتيمة.
+    """
+
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, help_text="المسار داخل وحدة التخزين")
+    size = models.BigIntegerField(default=0)
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["ref_count", "updated_at"], name="blob_refcount_updated_idx"),
+        ]
+        verbose_name = "ملف مخزّن (محتوى)"
+        verbose_name_plural = "ملفات مخزّنة (محتوى)"
+
+    def __str__(self) -> str:
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
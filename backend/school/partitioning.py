@@ -0,0 +1,217 @@
+"""Monthly range partitioning of the attendance archive (PostgreSQL only).
+
+AttendanceRecord itself stays a regular table: AttendanceLateEvent and AttendanceEvidence hold
+foreign keys to it, and PostgreSQL requires the partition key in every primary/unique key of a
+partitioned table. Old rows are moved to AttendanceRecordArchive (archive_attendance) instead, so
+the live table stays small and the archive is the table that grows without bound. That table is
+range-partitioned by `date`, one partition per month plus a DEFAULT partition, which lets long
+range history/report queries prune to the months they touch.
+
+- convert_archive_to_partitioned(): one-off conversion (migration 0047), copies existing rows.
+- ensure_month_partitions(): rolls partitions forward (manage.py roll_attendance_partitions);
+  rows that already landed in the DEFAULT partition are moved into the new month partition.
+
+Every entry point is a no-op on other backends (SQLite in tests/dev).
+
+Note: the partitioned table's keys are (id, date) and (original_id, date). Django's model state
+still declares original_id unique; do not AlterField original_id without adjusting this table.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from django.db import connection as default_connection
+from django.db import transaction
+
+ARCHIVE_TABLE = "school_attendancerecordarchive"
+
+
+@dataclass
+class PartitionReport:
+    supported: bool = True
+    partitioned: bool = False
+    converted: bool = False
+    created: List[str] = field(default_factory=list)
+    moved_rows: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "supported": self.supported,
+            "partitioned": self.partitioned,
+            "converted": self.converted,
+            "created": list(self.created),
+            "moved_rows": self.moved_rows,
+        }
+
+
+def partitioning_supported(connection=None) -> bool:
+    return (connection or default_connection).vendor == "postgresql"
+
+
+def month_start(day: dt.date) -> dt.date:
+    return day.replace(day=1)
+
+
+def add_months(day: dt.date, months: int) -> dt.date:
+    idx = day.year * 12 + (day.month - 1) + months
+    return dt.date(idx // 12, idx % 12 + 1, 1)
+
+
+def partition_name(month: dt.date, table: str = ARCHIVE_TABLE) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table: str = ARCHIVE_TABLE) -> str:
+    return f"{table}_pdefault"
+
+
+def is_partitioned(table: str = ARCHIVE_TABLE, connection=None) -> bool:
+    connection = connection or default_connection
+    if not partitioning_supported(connection):
+        return False
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE c.relname = %s AND n.nspname = current_schema()",
+            [table],
+        )
+        row = cur.fetchone()
+    return bool(row and row[0] == "p")
+
+
+def existing_partitions(table: str = ARCHIVE_TABLE, connection=None) -> List[str]:
+    connection = connection or default_connection
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [table],
+        )
+        return [r[0] for r in cur.fetchall()]
+
+
+def _qn(name: str) -> str:
+    return default_connection.ops.quote_name(name)
+
+
+def _bounds(lo: dt.date, hi: dt.date) -> str:
+    # DDL does not accept bind parameters; bounds are always our own date objects
+    return f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+
+
+def _month_span(first: dt.date, last: dt.date) -> List[dt.date]:
+    months, cur = [], month_start(first)
+    while cur <= last:
+        months.append(cur)
+        cur = add_months(cur, 1)
+    return months
+
+
+def _create_month_partition(cur, table: str, month: dt.date) -> tuple[str, int]:
+    """Create (or fill from DEFAULT) and attach the partition holding `month`."""
+    name = partition_name(month, table)
+    lo, hi = month, add_months(month, 1)
+    cur.execute(f"CREATE TABLE {_qn(name)} (LIKE {_qn(table)} INCLUDING DEFAULTS)")
+    # Rows that landed in DEFAULT for this month must move before ATTACH (which would reject them)
+    cur.execute(
+        f"WITH moved AS (DELETE FROM {_qn(default_partition_name(table))} "
+        f"WHERE date >= %s AND date < %s RETURNING *) INSERT INTO {_qn(name)} SELECT * FROM moved",
+        [lo, hi],
+    )
+    moved = max(cur.rowcount or 0, 0)
+    cur.execute(f"ALTER TABLE {_qn(table)} ATTACH PARTITION {_qn(name)} {_bounds(lo, hi)}")
+    return name, moved
+
+
+def ensure_month_partitions(
+    *,
+    months_ahead: int = 3,
+    start: Optional[dt.date] = None,
+    table: str = ARCHIVE_TABLE,
+    dry_run: bool = False,
+    connection=None,
+) -> PartitionReport:
+    """Make sure a partition exists for every month from `start` (default: this month) to +months_ahead."""
+    connection = connection or default_connection
+    report = PartitionReport(supported=partitioning_supported(connection))
+    report.partitioned = report.supported and is_partitioned(table, connection)
+    if not report.partitioned:
+        return report
+    today = dt.date.today()
+    present = set(existing_partitions(table, connection))
+    wanted = _month_span(start or today, add_months(month_start(today), max(0, months_ahead)))
+    missing = [m for m in wanted if partition_name(m, table) not in present]
+    if dry_run:
+        report.created = [partition_name(m, table) for m in missing]
+        return report
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        for month in missing:
+            name, moved = _create_month_partition(cur, table, month)
+            report.created.append(name)
+            report.moved_rows += moved
+    return report
+
+
+def convert_archive_to_partitioned(
+    *, months_ahead: int = 3, table: str = ARCHIVE_TABLE, connection=None
+) -> PartitionReport:
+    """Rebuild the archive table as a monthly-partitioned table, keeping its rows, indexes and ids."""
+    connection = connection or default_connection
+    report = PartitionReport(supported=partitioning_supported(connection))
+    report.partitioned = report.supported and is_partitioned(table, connection)
+    if not report.supported or report.partitioned:
+        return report
+
+    new_table = f"{table}_new"
+    with transaction.atomic(using=connection.alias), connection.cursor() as cur:
+        cur.execute(
+            "SELECT indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s "
+            "AND indexdef NOT LIKE 'CREATE UNIQUE INDEX%%'",
+            [table],
+        )
+        index_defs = [r[0] for r in cur.fetchall()]
+        cur.execute(f"SELECT MIN(date), MAX(date) FROM {_qn(table)}")
+        first, last = cur.fetchone()
+        today = dt.date.today()
+        months = _month_span(first or today, max(last or today, add_months(month_start(today), max(0, months_ahead))))
+
+        cur.execute(
+            f"CREATE TABLE {_qn(new_table)} (LIKE {_qn(table)} INCLUDING DEFAULTS INCLUDING IDENTITY, "
+            f"CONSTRAINT {_qn(table + '_id_date_pk')} PRIMARY KEY (id, date), "
+            f"CONSTRAINT {_qn(table + '_orig_date_uniq')} UNIQUE (original_id, date)) "
+            f"PARTITION BY RANGE (date)"
+        )
+        cur.execute(f"CREATE TABLE {_qn(default_partition_name(table))} PARTITION OF {_qn(new_table)} DEFAULT")
+        for month in months:
+            name = partition_name(month, table)
+            cur.execute(
+                f"CREATE TABLE {_qn(name)} PARTITION OF {_qn(new_table)} {_bounds(month, add_months(month, 1))}"
+            )
+            report.created.append(name)
+        cur.execute(f"INSERT INTO {_qn(new_table)} OVERRIDING SYSTEM VALUE SELECT * FROM {_qn(table)}")
+        report.moved_rows = max(cur.rowcount or 0, 0)
+
+        # serial (pre-identity) ids: the copied default still points at the old table's sequence
+        cur.execute(
+            "SELECT attidentity FROM pg_attribute WHERE attrelid = %s::regclass AND attname = 'id'", [new_table]
+        )
+        identity = (cur.fetchone() or [""])[0]
+        cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        old_seq = (cur.fetchone() or [None])[0]
+        if not identity and old_seq:
+            cur.execute(f"ALTER SEQUENCE {old_seq} OWNED BY {_qn(new_table)}.id")
+
+        cur.execute(f"DROP TABLE {_qn(table)}")
+        cur.execute(f"ALTER TABLE {_qn(new_table)} RENAME TO {_qn(table)}")
+        for ddl in index_defs:
+            cur.execute(ddl)
+        if identity:
+            cur.execute(
+                f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE((SELECT MAX(id) FROM {_qn(table)}), 0) + 1, false)",
+                [table],
+            )
+    report.converted = report.partitioned = True
+    return report
@@ -0,0 +1,222 @@
+"""Set-based archiving of old AttendanceRecord rows into AttendanceRecordArchive.
+
+The old commands loaded every batch as model instances, built archive objects one by one and
+deleted the batch through the ORM collector. Here each chunk is moved with a fixed number of
+statements, whatever its size:
+
+  1. keyset scan: next `chunk_size` ids after the checkpoint (id > last_id AND date < cutoff)
+  2. INSERT INTO archive (...) SELECT ... FROM live WHERE <id range> ON CONFLICT DO NOTHING
+  3. dependents: CASCADE rows deleted / SET_NULL columns cleared with one statement per relation
+  4. DELETE FROM live WHERE <id range>
+  5. checkpoint (TaskLog payload) updated in the same transaction
+
+The checkpoint lives in a TaskLog row (resource_type="attendance_archive", resource_id=cutoff), so
+an interrupted run resumes from the last committed chunk. Between chunks the engine can sleep and,
+on PostgreSQL, wait while replicas lag more than `max_lag_s` seconds.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import time
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from ..models import AttendanceRecord, AttendanceRecordArchive, TaskLog
+
+RESOURCE_TYPE = "attendance_archive"
+
+# Archive columns copied verbatim from the live table (archive id is its own; original_id <- id)
+_SKIP = {"id", "original_id"}
+
+
+@dataclass
+class ArchiveReport:
+    cutoff: str = ""
+    task_id: Optional[int] = None
+    resumed: bool = False
+    last_id: int = 0
+    chunks: int = 0
+    moved: int = 0  # cumulative, including earlier runs resumed from the checkpoint
+    moved_this_run: int = 0
+    inserted: int = 0
+    elapsed_s: float = 0.0
+    throttled_s: float = 0.0
+    remaining: Optional[int] = None
+    finished: bool = False
+
+    @property
+    def rows_per_s(self) -> float:
+        busy = self.elapsed_s - self.throttled_s
+        # elapsed_s/throttled_s cover this run only, so the rate uses this run's rows
+        return round(self.moved_this_run / busy, 1) if busy > 0 else 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        out = asdict(self)
+        out["rows_per_s"] = self.rows_per_s
+        return out
+
+
+def _copy_columns() -> List[tuple[str, str]]:
+    """(archive column, live column) pairs for every archive field that exists on the live table."""
+    live = {f.attname: f.column for f in AttendanceRecord._meta.concrete_fields}
+    pairs = []
+    for f in AttendanceRecordArchive._meta.concrete_fields:
+        if f.attname in _SKIP:
+            continue
+        pairs.append((f.column, live[f.attname]))
+    return pairs
+
+
+def replication_lag_seconds() -> float:
+    """Worst replay lag reported by the primary (0 on SQLite or when no replica is attached)."""
+    if connection.vendor != "postgresql":
+        return 0.0
+    try:
+        with connection.cursor() as cur:
+            cur.execute("SELECT COALESCE(EXTRACT(EPOCH FROM MAX(replay_lag)), 0) FROM pg_stat_replication")
+            return float(cur.fetchone()[0] or 0)
+    except Exception:
+        return 0.0
+
+
+def _wait_for_replicas(max_lag_s: Optional[float], max_wait_s: float = 300.0) -> float:
+    if not max_lag_s:
+        return 0.0
+    waited = 0.0
+    while waited < max_wait_s and replication_lag_seconds() > max_lag_s:
+        time.sleep(1.0)
+        waited += 1.0
+    return waited
+
+
+def _checkpoint(cutoff: dt.date, restart: bool) -> tuple[TaskLog, bool]:
+    open_runs = TaskLog.objects.filter(
+        resource_type=RESOURCE_TYPE, resource_id=cutoff.isoformat(), status__in=("open", "in_progress")
+    ).order_by("-created_at", "-id")
+    if restart:
+        open_runs.update(status="canceled")
+    else:
+        task = open_runs.first()
+        if task is not None:
+            return task, True
+    task = TaskLog.objects.create(
+        resource_type=RESOURCE_TYPE,
+        resource_id=cutoff.isoformat(),
+        action="archive",
+        status="in_progress",
+        message=f"Archive attendance before {cutoff.isoformat()}",
+        payload={"last_id": 0, "chunks": 0, "moved": 0},
+    )
+    return task, False
+
+
+def _clear_dependents(lo: int, hi: int, cutoff: dt.date) -> None:
+    """Apply on_delete of every relation pointing at AttendanceRecord to the rows being moved."""
+    for rel in AttendanceRecord._meta.related_objects:
+        if rel.many_to_many:
+            continue
+        name = rel.field.name
+        related = rel.related_model._base_manager.filter(
+            **{f"{name}__id__gt": lo, f"{name}__id__lte": hi, f"{name}__date__lt": cutoff}
+        )
+        if rel.on_delete is models.CASCADE:
+            related.delete()
+        elif rel.on_delete is models.SET_NULL:
+            related.update(**{name: None})
+        # PROTECT/RESTRICT: let the DELETE fail and roll back the chunk
+
+
+def archive_attendance_before(
+    cutoff: dt.date,
+    *,
+    chunk_size: int = 5000,
+    max_chunks: Optional[int] = None,
+    sleep_s: float = 0.0,
+    max_lag_s: Optional[float] = None,
+    restart: bool = False,
+    dry_run: bool = False,
+    progress: Optional[Callable[[ArchiveReport], None]] = None,
+) -> ArchiveReport:
+    """Move every AttendanceRecord dated before `cutoff` into the archive, resuming from the last checkpoint."""
+    chunk_size = max(1, int(chunk_size))
+    report = ArchiveReport(cutoff=cutoff.isoformat())
+    pending = AttendanceRecord.objects.filter(date__lt=cutoff)
+    if dry_run:
+        report.remaining = pending.count()
+        return report
+
+    task, report.resumed = _checkpoint(cutoff, restart)
+    state = dict(task.payload or {})
+    report.task_id = task.id
+    report.last_id = int(state.get("last_id") or 0)
+    report.chunks = int(state.get("chunks") or 0)
+    report.moved = int(state.get("moved") or 0)
+    previous_elapsed = float(state.get("elapsed_s") or 0)
+
+    # Partitioned archive (PostgreSQL): make sure the months being archived have their partitions
+    oldest = pending.filter(id__gt=report.last_id).order_by("date").values_list("date", flat=True).first()
+    if oldest is not None:
+        from ..partitioning import ensure_month_partitions
+
+        ensure_month_partitions(start=oldest, months_ahead=0)
+
+    pairs = _copy_columns()
+    qn = connection.ops.quote_name
+    archive_table, live_table = qn(AttendanceRecordArchive._meta.db_table), qn(AttendanceRecord._meta.db_table)
+    insert_sql = (
+        f"INSERT INTO {archive_table} ({qn('original_id')}, {', '.join(qn(a) for a, _ in pairs)}) "
+        f"SELECT {qn('id')}, {', '.join(qn(c) for _, c in pairs)} FROM {live_table} "
+        f"WHERE {qn('id')} > %s AND {qn('id')} <= %s AND {qn('date')} < %s "
+        f"ON CONFLICT DO NOTHING"
+    )
+    delete_sql = f"DELETE FROM {live_table} WHERE {qn('id')} > %s AND {qn('id')} <= %s AND {qn('date')} < %s"
+
+    started = time.monotonic()
+    done_chunks = 0
+    while max_chunks is None or done_chunks < max_chunks:
+        ids = list(pending.filter(id__gt=report.last_id).order_by("id").values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            report.finished = True
+            break
+        lo, hi = report.last_id, ids[-1]
+        with transaction.atomic():
+            with connection.cursor() as cur:
+                cur.execute(insert_sql, [lo, hi, cutoff])
+                report.inserted += max(cur.rowcount or 0, 0)
+                _clear_dependents(lo, hi, cutoff)
+                cur.execute(delete_sql, [lo, hi, cutoff])
+                deleted = max(cur.rowcount or 0, 0)
+                report.moved += deleted
+                report.moved_this_run += deleted
+            report.last_id = hi
+            report.chunks += 1
+            done_chunks += 1
+            report.elapsed_s = round(time.monotonic() - started, 3)
+            TaskLog.objects.filter(pk=task.pk).update(
+                payload={
+                    "last_id": report.last_id,
+                    "chunks": report.chunks,
+                    "moved": report.moved,
+                    "elapsed_s": round(previous_elapsed + report.elapsed_s, 3),
+                },
+                updated_at=timezone.now(),
+            )
+        if progress is not None:
+            progress(report)
+        if sleep_s:
+            time.sleep(sleep_s)
+            report.throttled_s += sleep_s
+        report.throttled_s += _wait_for_replicas(max_lag_s)
+
+    report.elapsed_s = round(time.monotonic() - started, 3)
+    if not report.finished:
+        report.remaining = pending.filter(id__gt=report.last_id).count()
+        report.finished = report.remaining == 0
+    if report.finished:
+        TaskLog.objects.filter(pk=task.pk).update(status="done", updated_at=timezone.now())
+        report.remaining = 0
+    return report
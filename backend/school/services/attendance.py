@@ -18,6 +18,27 @@ def period_minutes_for_term(term) -> int:
     return 45
 
 
+def period_minutes_by_term(term_ids) -> dict[int, int]:
+    """Batch version of period_minutes_for_term: {term_id: minutes} with one query (first policy per term)."""
+    ids = {int(t) for t in term_ids if t}
+    out = {tid: 45 for tid in ids}
+    if not ids:
+        return out
+    seen: set[int] = set()
+    rows = (
+        AttendancePolicy.objects.filter(term_id__in=ids)
+        .order_by("term_id", "id")
+        .values_list("term_id", "late_to_equivalent_period_minutes")
+    )
+    for tid, minutes in rows:
+        if tid in seen:
+            continue
+        seen.add(tid)
+        if minutes:
+            out[tid] = int(minutes)
+    return out
+
+
 def compute_late_seconds(record: AttendanceRecord) -> int:
     """Compute late seconds for a given AttendanceRecord applying business rules.
     - For status 'runaway' treat as a full period according to policy.
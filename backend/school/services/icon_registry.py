@@ -0,0 +1,195 @@
+"""In-memory registry of the sc:* SVG icons served under /data/icons/.
+
+The icon views used to list ICON_DIRS and stat every file for the manifest, and to scan a directory
+(case-insensitively) and re-read the SVG for each icon request. The registry indexes the
+directories once per process and keeps every icon in memory with a content hash:
+
+- manifest:  {name: {"v": <content hash>}}; the registry version (hash of all icons) is its ETag
+- icon:      bytes + strong ETag; `?v=<content hash>` responses are `immutable`
+- sprite:    one <svg> holding a <symbol id="sc-<name>"> per icon, so a page loads every icon
+             with a single request (`?names=a,b` for a subset, `?v=<registry version>` to pin it)
+
+In development (ICONS_AUTORELOAD, default settings.DEBUG) the directories are re-stat'ed at most
+every ICONS_RELOAD_INTERVAL_S seconds and the index is rebuilt when a file was added, removed or
+edited. In production the index is built on first use and changes ship with a restart.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+
+def icon_dirs() -> List[str]:
+    dirs = getattr(settings, "ICON_DIRS", None)
+    if dirs:
+        return [str(d) for d in dirs]
+    return [
+        os.path.join(settings.BASE_DIR, "assets", "icons"),
+        os.path.join(settings.BASE_DIR, "backend", "static", "data", "icons"),
+    ]
+
+
+@dataclass(frozen=True)
+class Icon:
+    name: str
+    path: str
+    content: bytes
+    digest: str
+
+    @property
+    def version(self) -> str:
+        return self.digest[:12]
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.digest}"'
+
+
+_SVG_RE = re.compile(rb"<svg\b([^>]*)>(.*)</svg\s*>", re.S | re.I)
+_ATTR_RE = re.compile(rb'([\w:-]+)\s*=\s*("[^"]*"|\'[^\']*\')')
+_NUM_RE = re.compile(rb"^\s*([\d.]+)")
+
+
+def _symbol(icon: Icon) -> bytes:
+    """<svg ...>body</svg> -> <symbol id="sc-name" viewBox="...">body</symbol>."""
+    m = _SVG_RE.search(icon.content)
+    if not m:
+        return b""
+    attrs = {k.lower(): v[1:-1] for k, v in _ATTR_RE.findall(m.group(1))}
+    view_box = attrs.get(b"viewbox")
+    if not view_box:
+        w, h = _NUM_RE.match(attrs.get(b"width", b"24")), _NUM_RE.match(attrs.get(b"height", b"24"))
+        view_box = b"0 0 " + (w.group(1) if w else b"24") + b" " + (h.group(1) if h else b"24")
+    # Presentation attributes on the root (fill/stroke...) apply to the symbol's children as well
+    keep = b"".join(
+        b" " + k + b'="' + v + b'"'
+        for k, v in attrs.items()
+        if k not in (b"viewbox", b"width", b"height", b"xmlns", b"id", b"class", b"style")
+        and not k.startswith(b"xmlns:")
+    )
+    ident = re.sub(r"[^A-Za-z0-9_.-]", "-", icon.name).encode("ascii", "ignore")
+    return b'<symbol id="sc-' + ident + b'" viewBox="' + view_box + b'"' + keep + b">" + m.group(2) + b"</symbol>"
+
+
+class IconRegistry:
+    _SPRITE_MEMO = 32
+
+    def __init__(self, dirs: Optional[Iterable[str]] = None):
+        self._dirs = list(dirs) if dirs is not None else None
+        self._lock = threading.Lock()
+        self._icons: Dict[str, Icon] = {}
+        self._lower: Dict[str, Icon] = {}
+        self._signature: Optional[Tuple] = None
+        self._checked_at = 0.0
+        self._version = ""
+        self._sprites: Dict[Tuple[str, ...], Icon] = {}
+
+    # --- indexing -------------------------------------------------------------------------
+    def _scan(self) -> List[Tuple[str, str, int, int]]:
+        """(name, path, mtime_ns, size) of every SVG; the first directory wins on duplicates."""
+        out, seen = [], set()
+        for d in self._dirs if self._dirs is not None else icon_dirs():
+            try:
+                entries = sorted(os.scandir(d), key=lambda e: e.name)
+            except OSError:
+                continue
+            for entry in entries:
+                if not entry.name.lower().endswith(".svg") or not entry.is_file():
+                    continue
+                name = entry.name[:-4]
+                if name in seen:
+                    continue
+                seen.add(name)
+                st = entry.stat()
+                out.append((name, entry.path, st.st_mtime_ns, st.st_size))
+        return out
+
+    def _build(self, files: List[Tuple[str, str, int, int]]) -> None:
+        icons: Dict[str, Icon] = {}
+        for name, path, _mtime, _size in files:
+            try:
+                with open(path, "rb") as f:
+                    content = f.read()
+            except OSError:
+                continue
+            icons[name] = Icon(name, path, content, hashlib.blake2b(content, digest_size=20).hexdigest())
+        lower: Dict[str, Icon] = {}
+        for icon in icons.values():
+            lower.setdefault(icon.name.lower(), icon)
+        overall = hashlib.blake2b(digest_size=8)
+        for name in sorted(icons):
+            overall.update(name.encode("utf-8") + b"\0" + icons[name].digest.encode("ascii"))
+        self._icons, self._lower, self._version = icons, lower, overall.hexdigest()
+        self._sprites = {}
+        self._signature = tuple(files)
+
+    def _fresh(self) -> bool:
+        if self._signature is None:
+            return False
+        if not getattr(settings, "ICONS_AUTORELOAD", settings.DEBUG):
+            return True
+        return time.monotonic() - self._checked_at < float(getattr(settings, "ICONS_RELOAD_INTERVAL_S", 2.0))
+
+    def _ensure(self) -> None:
+        if self._fresh():
+            return
+        with self._lock:
+            if self._fresh():
+                return
+            files = self._scan()
+            self._checked_at = time.monotonic()
+            if tuple(files) != self._signature:
+                self._build(files)
+
+    def reload(self) -> None:
+        with self._lock:
+            self._build(self._scan())
+            self._checked_at = time.monotonic()
+
+    # --- lookups --------------------------------------------------------------------------
+    @property
+    def version(self) -> str:
+        self._ensure()
+        return self._version
+
+    def manifest(self) -> Dict[str, Dict[str, str]]:
+        self._ensure()
+        return {name: {"v": icon.version} for name, icon in self._icons.items()}
+
+    def get(self, name: str) -> Optional[Icon]:
+        self._ensure()
+        name = (name or "").strip()
+        return self._icons.get(name) or self._lower.get(name.lower())
+
+    def sprite(self, names: Optional[Iterable[str]] = None) -> Icon:
+        """Combined sprite of all icons (or of `names`, unknown names skipped), memoized per name set."""
+        self._ensure()
+        if names is None:
+            key: Tuple[str, ...] = ("*",)
+            icons = [self._icons[n] for n in sorted(self._icons)]
+        else:
+            picked = {i.name: i for i in (self.get(n) for n in names) if i is not None}
+            key = tuple(sorted(picked))
+            icons = [picked[n] for n in key]
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            content = (
+                b'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                b'style="display:none">' + b"".join(_symbol(i) for i in icons) + b"</svg>"
+            )
+            sprite = Icon("sprite", "", content, hashlib.blake2b(content, digest_size=20).hexdigest())
+            if len(self._sprites) >= self._SPRITE_MEMO:
+                self._sprites.clear()
+            self._sprites[key] = sprite
+        return sprite
+
+
+icon_registry = IconRegistry()
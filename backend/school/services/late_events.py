@@ -0,0 +1,163 @@
+"""Batch maintenance of AttendanceLateEvent.
+
+AttendanceLateEvent mirrors every late/runaway AttendanceRecord (one event per record). It used to
+be kept in sync by a post_save receiver issuing update_or_create/delete for each saved record and
+swallowing any error. Writers now call reconcile_late_events() once with the ids they changed, and
+the periodic `manage.py reconcile_late_events --from --to` command repairs whatever drifted
+(records changed through paths that don't call the reconciler, .update() calls, manual SQL).
+
+Both entry points are set-based: a fixed number of queries per chunk of records, regardless of
+how many events are created, updated or deleted.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+
+from ..models import AttendanceLateEvent, AttendanceRecord
+from .attendance import format_mmss, period_minutes_by_term
+
+LATE_STATUSES = ("late", "runaway")
+
+# Fields copied from the record onto its event
+_MIRRORED = (
+    "student_id",
+    "classroom_id",
+    "subject_id",
+    "teacher_id",
+    "date",
+    "day_of_week",
+    "period_number",
+    "start_time",
+)
+
+
+@dataclass
+class LateEventReport:
+    checked: int = 0
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    duplicates: int = 0
+
+    def add(self, other: "LateEventReport") -> None:
+        for k, v in asdict(other).items():
+            setattr(self, k, getattr(self, k) + v)
+
+    @property
+    def changed(self) -> int:
+        return self.created + self.updated + self.deleted + self.duplicates
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def _expected_seconds(rec: dict, minutes_by_term: Dict[int, int], current: Optional[int], hint: Optional[int]) -> int:
+    if rec["status"] == "runaway":
+        return minutes_by_term.get(rec["term_id"], 45) * 60
+    late_minutes = int(rec["late_minutes"] or 0)
+    if hint is not None and int(hint) // 60 == late_minutes:
+        return int(hint)
+    # Keep second-level precision recorded at entry time as long as it agrees with late_minutes
+    if current is not None and current // 60 == late_minutes:
+        return current
+    return late_minutes * 60
+
+
+def reconcile_late_events(
+    record_ids: Iterable[int],
+    *,
+    recorded_by_id: Optional[int] = None,
+    late_seconds: Optional[Dict[int, int]] = None,
+    dry_run: bool = False,
+) -> LateEventReport:
+    """Bring the events of the given records in line with the records.
+
+    - late/runaway records get exactly one event (created when missing, fields refreshed on drift)
+    - events of records in any other status (or of deleted records) are removed
+    - late_seconds: optional {record_id: seconds} measured at entry time (kept when consistent
+      with late_minutes); recorded_by_id is only used for newly created events.
+    """
+    ids = sorted({int(i) for i in record_ids if i})
+    report = LateEventReport(checked=len(ids))
+    if not ids:
+        return report
+    hints = late_seconds or {}
+
+    records = {
+        r["id"]: r
+        for r in AttendanceRecord.objects.filter(id__in=ids, status__in=LATE_STATUSES).values(
+            "id", "status", "late_minutes", "term_id", "note", *_MIRRORED
+        )
+    }
+    minutes_by_term = period_minutes_by_term(r["term_id"] for r in records.values() if r["status"] == "runaway")
+
+    events: Dict[int, AttendanceLateEvent] = {}
+    extra_ids: list[int] = []
+    stale_ids: list[int] = []
+    for ev in AttendanceLateEvent.objects.filter(attendance_record_id__in=ids).order_by("id"):
+        rid = ev.attendance_record_id
+        if rid not in records:
+            stale_ids.append(ev.id)
+        elif rid in events:
+            extra_ids.append(ev.id)
+        else:
+            events[rid] = ev
+
+    to_create: list[AttendanceLateEvent] = []
+    to_update: list[AttendanceLateEvent] = []
+    for rid, rec in records.items():
+        ev = events.get(rid)
+        seconds = _expected_seconds(rec, minutes_by_term, ev.late_seconds if ev else None, hints.get(rid))
+        wanted = {f: rec[f] for f in _MIRRORED}
+        wanted.update(late_seconds=seconds, late_mmss=format_mmss(seconds), note=(rec["note"] or "")[:300])
+        if ev is None:
+            to_create.append(AttendanceLateEvent(attendance_record_id=rid, recorded_by_id=recorded_by_id, **wanted))
+        elif any(getattr(ev, f) != v for f, v in wanted.items()):
+            for f, v in wanted.items():
+                setattr(ev, f, v)
+            to_update.append(ev)
+
+    report.created = len(to_create)
+    report.updated = len(to_update)
+    report.deleted = len(stale_ids)
+    report.duplicates = len(extra_ids)
+    if dry_run or not report.changed:
+        return report
+
+    with transaction.atomic():
+        if stale_ids or extra_ids:
+            AttendanceLateEvent.objects.filter(id__in=stale_ids + extra_ids).delete()
+        if to_create:
+            AttendanceLateEvent.objects.bulk_create(to_create, batch_size=1000)
+        if to_update:
+            fields = [f[:-3] if f.endswith("_id") else f for f in _MIRRORED]
+            AttendanceLateEvent.objects.bulk_update(
+                to_update, [*fields, "late_seconds", "late_mmss", "note"], batch_size=1000
+            )
+    return report
+
+
+def reconcile_late_events_range(
+    date_from: dt.date, date_to: dt.date, *, dry_run: bool = False, chunk_size: int = 2000
+) -> LateEventReport:
+    """Repair drift for all records/events dated within [date_from, date_to]."""
+    report = LateEventReport()
+    record_ids = set(
+        AttendanceRecord.objects.filter(date__range=[date_from, date_to], status__in=LATE_STATUSES).values_list(
+            "id", flat=True
+        )
+    )
+    record_ids.update(
+        AttendanceLateEvent.objects.filter(date__range=[date_from, date_to]).values_list(
+            "attendance_record_id", flat=True
+        )
+    )
+    ordered = sorted(record_ids)
+    for i in range(0, len(ordered), chunk_size):
+        report.add(reconcile_late_events(ordered[i : i + chunk_size], dry_run=dry_run))
+    return report
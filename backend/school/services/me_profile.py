@@ -0,0 +1,222 @@
+"""/api/me payload: built with a handful of queries and cached per user.
+
+The SPA calls /me on every route change. The profile part (roles, permissions, capabilities,
+Staff name) only changes with RBAC data, so it is cached under a global RBAC version that is bumped
+by any change to users, groups, permissions, Staff, wing supervisors or teaching assignments:
+
+    me:{rbac_version}:{user_id}  -> profile        (ME_PROFILE_TTL_S, default 1 day: a bump orphans old
+                                                     keys, the TTL lets the cache reclaim them)
+    me:hist:{user_id}            -> history ribbon (ME_HISTORY_TTL_S, follows attendance entry)
+
+Steady state is two cache reads and no query. A cold build is four queries: groups, permissions
+(user + group in one), one annotated Staff row (Exists for wing supervision / assignments) and one
+aggregate over the teacher's AttendanceRecord rows.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Exists, Max, Min, OuterRef, Q
+
+RBAC_VERSION_KEY = "me:rbac_version"
+
+_HISTORY_STATUSES = ("present", "late", "absent", "excused", "runaway")
+
+
+def _profile_ttl() -> int:
+    return int(getattr(settings, "ME_PROFILE_TTL_S", 86400) or 86400)
+
+
+def _history_ttl() -> int:
+    return int(getattr(settings, "ME_HISTORY_TTL_S", 120) or 120)
+
+
+def rbac_version() -> int:
+    ver = cache.get(RBAC_VERSION_KEY)
+    if ver is None:
+        # Clock seed: a flushed cache can not resurrect a profile cached under an old version
+        cache.add(RBAC_VERSION_KEY, int(time.time() * 1000), None)
+        ver = cache.get(RBAC_VERSION_KEY) or 0
+    return int(ver)
+
+
+def bump_rbac_version(*args, **kwargs) -> None:
+    """Signal receiver: any RBAC/Staff change invalidates every cached /me profile."""
+    try:
+        cache.incr(RBAC_VERSION_KEY)
+    except ValueError:
+        cache.add(RBAC_VERSION_KEY, int(time.time() * 1000), None)
+
+
+def _bump_on_user_change(sender, instance=None, update_fields=None, **kwargs) -> None:
+    # last_login يُحدَّث مع كل تسجيل دخول ولا يؤثر على الملف
+    if update_fields and set(update_fields) <= {"last_login"}:
+        return
+    bump_rbac_version()
+
+
+def _bump_on_m2m(sender, action="", **kwargs) -> None:
+    if action.startswith("post_"):
+        bump_rbac_version()
+
+
+def _staff_row(user) -> Optional[Dict[str, Any]]:
+    from ..models import Staff, TeachingAssignment, Wing
+
+    return (
+        Staff.objects.filter(user_id=user.id)
+        .annotate(
+            supervises_wing=Exists(Wing.objects.filter(supervisor_id=OuterRef("pk"))),
+            has_assignments=Exists(TeachingAssignment.objects.filter(teacher_id=OuterRef("pk"))),
+        )
+        .values("id", "role", "full_name", "supervises_wing", "has_assignments")
+        .order_by("id")
+        .first()
+    )
+
+
+def build_profile(user) -> Dict[str, Any]:
+    """Everything in /me except the history ribbon (see views.me for the field contract)."""
+    from django.contrib.auth.models import Permission
+
+    from apps.common.roles import normalize_roles, pick_primary_route  # type: ignore
+
+    roles_set = set(user.groups.values_list("name", flat=True))
+    staff = _staff_row(user)
+    if staff and staff["role"]:
+        roles_set.add(staff["role"])
+    # Derive 'wing_supervisor' if this staff supervises any wings (even if not in group)
+    if staff and staff["supervises_wing"]:
+        roles_set.add("wing_supervisor")
+    roles_norm = normalize_roles(roles_set)
+    # Treat as teacher if actual assignments exist, regardless of group naming
+    has_teaching_assignments = bool(staff and staff["has_assignments"])
+    if has_teaching_assignments:
+        roles_norm.add("teacher")
+
+    perms = sorted(
+        {
+            f"{app}.{code}"
+            for app, code in Permission.objects.filter(Q(user=user) | Q(group__user=user)).values_list(
+                "content_type__app_label", "codename"
+            )
+        }
+    )
+
+    role_set = set(roles_norm)
+    is_principal = "principal" in role_set
+    is_vice = "academic_deputy" in role_set or "vice_principal" in role_set
+    is_d_l1 = "discipline_l1" in role_set or "homeroom" in role_set
+    is_d_l2 = "discipline_l2" in role_set
+    is_exams = "exams" in role_set or "exams_officer" in role_set
+    is_nurse = "nurse" in role_set
+    is_counselor = "counselor" in role_set
+    caps = {
+        "can_manage_timetable": bool(
+            user.is_superuser or role_set.intersection({"principal", "academic_deputy", "timetable_manager"})
+        ),
+        "can_view_general_timetable": True,  # all authenticated users may view; templates may still gate by staff
+        "can_take_attendance": bool("teacher" in role_set),
+        # Discipline
+        "discipline_l1": bool(is_d_l1),
+        "discipline_l2": bool(is_d_l2 or is_principal or is_vice),
+        # Exams governance
+        "exams_manage": bool(is_exams or is_principal or is_vice),
+        # Health privacy
+        "health_can_view_masked": bool(is_counselor or is_nurse or is_principal or is_vice),
+        # سياسة صحية صارمة: فك الإخفاء للممرض فقط
+        "health_can_unmask": bool(is_nurse),
+        # Approvals (dual control)
+        "can_propose_irreversible": bool(is_d_l2 or is_exams or is_vice or is_principal),
+        "can_approve_irreversible": bool(is_vice or is_principal),
+    }
+
+    staff_full_name = staff["full_name"] if staff else None
+    # سياسة عرض الأسماء: نُفضِّل دائمًا اسم الموظف الكامل من Staff إن وُجد، ثم الاسم الكامل للمستخدم، ثم اسم المستخدم
+    display_name = staff_full_name or user.get_full_name() or user.username
+    return {
+        "id": user.id,
+        "username": user.username,
+        "full_name": display_name,  # إبقاء التوافق مع الفرونت اند: full_name يُعيد الاسم الأفضل عرضًا
+        "staff_full_name": staff_full_name,  # إرجاع الاسم من Staff صراحةً عند الحاجة
+        "display_name": display_name,  # مفتاح صريح لسياسة العرض الموحّدة
+        "is_superuser": user.is_superuser,
+        "is_staff": user.is_staff,
+        "roles": sorted(roles_norm),
+        "permissions": perms,
+        "hasTeachingAssignments": has_teaching_assignments,
+        "capabilities": caps,
+        "primary_route": pick_primary_route(role_set),
+        "_staff_id": staff["id"] if staff else None,
+    }
+
+
+def build_history(staff_id: int, scope: str) -> Dict[str, Any]:
+    """Cumulative attendance-entry ribbon of a staff member, in one aggregate query."""
+    from ..models import AttendanceRecord
+
+    agg = AttendanceRecord.objects.filter(teacher_id=staff_id).aggregate(
+        total_entries=Count("id"),
+        active_days=Count("date", distinct=True),
+        first_date=Min("date"),
+        last_date=Max("date"),
+        **{s: Count("id", filter=Q(status=s)) for s in _HISTORY_STATUSES},
+    )
+    return {
+        "scope": scope,
+        "total_entries": int(agg["total_entries"] or 0),
+        "active_days": int(agg["active_days"] or 0),
+        "first_date": agg["first_date"].isoformat() if agg["first_date"] else None,
+        "last_date": agg["last_date"].isoformat() if agg["last_date"] else None,
+        "by_status": {s: int(agg[s] or 0) for s in _HISTORY_STATUSES},
+    }
+
+
+def get_me_payload(user) -> Dict[str, Any]:
+    profile_key = f"me:{rbac_version()}:{user.id}"
+    history_key = f"me:hist:{user.id}"
+    found = cache.get_many([profile_key, history_key])
+    profile = found.get(profile_key)
+    if profile is None:
+        profile = build_profile(user)
+        cache.set(profile_key, profile, _profile_ttl())
+    data = dict(profile)
+    staff_id = data.pop("_staff_id", None)
+
+    history = None
+    if staff_id:
+        history = found.get(history_key)
+        if history is None:
+            try:
+                history = build_history(staff_id, "teacher" if data["hasTeachingAssignments"] else "staff")
+                cache.set(history_key, history, _history_ttl())
+            except Exception:
+                history = None
+    data["history"] = history
+    return data
+
+
+def connect_profile_signals() -> None:
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import Group
+    from django.db.models.signals import m2m_changed, post_delete, post_save
+
+    from ..models import Staff, TeachingAssignment, Wing
+
+    User = get_user_model()
+    post_save.connect(_bump_on_user_change, sender=User, dispatch_uid="me_profile_user_save", weak=False)
+    post_delete.connect(bump_rbac_version, sender=User, dispatch_uid="me_profile_user_delete", weak=False)
+    for sender in (Group, Staff, Wing, TeachingAssignment):
+        uid = f"me_profile_{sender._meta.label_lower}"
+        post_save.connect(bump_rbac_version, sender=sender, dispatch_uid=uid + "_save", weak=False)
+        post_delete.connect(bump_rbac_version, sender=sender, dispatch_uid=uid + "_delete", weak=False)
+    for through, name in (
+        (User.groups.through, "user_groups"),
+        (User.user_permissions.through, "user_permissions"),
+        (Group.permissions.through, "group_permissions"),
+    ):
+        m2m_changed.connect(_bump_on_m2m, sender=through, dispatch_uid=f"me_profile_{name}", weak=False)
@@ -0,0 +1,214 @@
+"""Shared name-resolution index for the OCR/CSV timetable imports.
+
+parse_ocr_raw_to_csv() and import_timetable_csv() each rebuilt Staff/Class/Subject dictionaries,
+re-read teacher_mapping.csv and queried TeachingAssignment once per timetable cell. The index
+holds, keyed by normalized Arabic text:
+
+- teachers (normalized full name without spaces) + teacher_mapping.csv aliases
+- classes by name and by grade-section ("7-1", "7.1", "7 - 1" share one key)
+- subjects by Arabic name
+- (teacher_id, class_id) -> [subject_id, ...] from one TeachingAssignment query
+- character trigram sets of every teacher key with an inverted index, for a fuzzy fallback
+  (Dice coefficient) when OCR garbles a letter or two
+
+It is built with four queries, stored in the cache under the version counters of the four models
+(apps.common.conditional) plus the mapping file's mtime, and memoized in the process.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.common.conditional import model_versions
+
+INDEX_MODELS = ("school.staff", "school.class", "school.subject", "school.teachingassignment")
+CACHE_PREFIX = "names:index:"
+
+_AR_NUM = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
+_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED]")
+_LETTERS = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه"})
+_PUNCT = re.compile(r"[^\w\s\u0600-\u06FF]")
+_CLASS_SEP = re.compile(r"\s*[-–_./\\]\s*")
+
+
+def normalize_ar(s) -> str:
+    """Digits to ASCII, no tatweel/diacritics, unified alef/yaa/taa marbuta, collapsed spaces, lower."""
+    if s is None:
+        return ""
+    s = str(s).translate(_AR_NUM).replace("ـ", "")
+    s = _DIACRITICS.sub("", s).translate(_LETTERS)
+    return re.sub(r"\s+", " ", s).strip().lower()
+
+
+def person_key(s) -> str:
+    """Teacher lookup key: normalized, punctuation and spaces removed."""
+    return _PUNCT.sub("", normalize_ar(s)).replace(" ", "")
+
+
+def subject_key(s) -> str:
+    return re.sub(r"\s+", " ", _PUNCT.sub("", normalize_ar(s))).strip()
+
+
+def class_key(s) -> str:
+    """Class lookup key: separators between grade and section unified to '-'."""
+    return _CLASS_SEP.sub("-", normalize_ar(s))
+
+
+def trigrams(key: str) -> FrozenSet[str]:
+    padded = f"#{key}#"
+    if len(padded) <= 3:
+        return frozenset([padded])
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def mapping_path() -> str:
+    base_dir = os.path.abspath(os.path.join(settings.BASE_DIR, "..", "DOC", "school_DATA"))
+    return os.path.join(base_dir, "teacher_mapping.csv")
+
+
+def _load_teacher_mapping(path: str) -> Dict[str, str]:
+    """Optional DOC/school_DATA/teacher_mapping.csv (ocr_name,full_name) keyed by person_key(ocr_name)."""
+    mapping: Dict[str, str] = {}
+    if not os.path.exists(path):
+        return mapping
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                ocr = person_key(row.get("ocr_name", ""))
+                full = str(row.get("full_name", "")).strip()
+                if ocr and full:
+                    mapping[ocr] = full
+    except Exception:
+        pass
+    return mapping
+
+
+@dataclass
+class NameIndex:
+    teacher_names: Dict[int, str] = field(default_factory=dict)
+    teachers_by_key: Dict[str, int] = field(default_factory=dict)
+    aliases: Dict[str, str] = field(default_factory=dict)
+    classes: Dict[int, str] = field(default_factory=dict)
+    classes_by_key: Dict[str, int] = field(default_factory=dict)
+    subjects: Dict[int, str] = field(default_factory=dict)
+    subjects_by_key: Dict[str, int] = field(default_factory=dict)
+    assignments: Dict[Tuple[int, int], List[int]] = field(default_factory=dict)
+    teacher_grams: Dict[int, FrozenSet[str]] = field(default_factory=dict)
+    gram_index: Dict[str, List[int]] = field(default_factory=dict)
+
+    # --- teachers -----------------------------------------------------------------------
+    def teacher_exact(self, name) -> Optional[int]:
+        """Staff id by exact normalized name, or through a teacher_mapping.csv alias."""
+        k = person_key(name)
+        if not k:
+            return None
+        tid = self.teachers_by_key.get(k)
+        if tid is None and k in self.aliases:
+            tid = self.teachers_by_key.get(person_key(self.aliases[k]))
+        return tid
+
+    def teacher_fuzzy(self, name, *, threshold: Optional[float] = None) -> Tuple[Optional[int], float]:
+        """Best trigram (Dice) match; (None, score) unless it clears the threshold and the runner-up."""
+        k = person_key(name)
+        if not k or not self.gram_index:
+            return None, 0.0
+        if threshold is None:
+            threshold = float(getattr(settings, "NAME_FUZZY_THRESHOLD", 0.75))
+        grams = trigrams(k)
+        shared: Counter = Counter()
+        for g in grams:
+            for tid in self.gram_index.get(g, ()):
+                shared[tid] += 1
+        if not shared:
+            return None, 0.0
+        scored = sorted(
+            ((2.0 * n / (len(grams) + len(self.teacher_grams[tid])), tid) for tid, n in shared.items()),
+            reverse=True,
+        )
+        best, tid = scored[0]
+        runner_up = scored[1][0] if len(scored) > 1 else 0.0
+        # An ambiguous best (two teachers almost equally close) is not a match
+        if best < threshold or best - runner_up < 0.05:
+            return None, best
+        return tid, best
+
+    def teacher(self, name, *, fuzzy: bool = True) -> Optional[int]:
+        tid = self.teacher_exact(name)
+        if tid is None and fuzzy:
+            tid = self.teacher_fuzzy(name)[0]
+        return tid
+
+    # --- classes / subjects -------------------------------------------------------------
+    def classroom(self, name) -> Optional[int]:
+        return self.classes_by_key.get(class_key(name))
+
+    def subject(self, name) -> Optional[int]:
+        return self.subjects_by_key.get(subject_key(name))
+
+    def subjects_for(self, teacher_id: int, class_id: int) -> List[int]:
+        """Subjects taught by the teacher in the class (TeachingAssignment order)."""
+        return self.assignments.get((teacher_id, class_id), [])
+
+
+def build_name_index(mapping_file: Optional[str] = None) -> NameIndex:
+    from ..models import Class, Staff, Subject, TeachingAssignment
+
+    idx = NameIndex(aliases=_load_teacher_mapping(mapping_file or mapping_path()))
+    for sid, full_name in Staff.objects.order_by("id").values_list("id", "full_name"):
+        k = person_key(full_name)
+        idx.teacher_names[sid] = full_name
+        if k and k not in idx.teachers_by_key:
+            idx.teachers_by_key[k] = sid
+            idx.teacher_grams[sid] = trigrams(k)
+    for sid, grams in idx.teacher_grams.items():
+        for g in grams:
+            idx.gram_index.setdefault(g, []).append(sid)
+
+    for cid, name, grade, section in Class.objects.order_by("id").values_list("id", "name", "grade", "section"):
+        idx.classes[cid] = name
+        gs = f"{grade}-{(section or '').strip()}" if section else str(grade)
+        # A class name wins over another class's grade-section spelling
+        idx.classes_by_key[class_key(name)] = cid
+        idx.classes_by_key.setdefault(class_key(gs), cid)
+
+    for sid, name_ar in Subject.objects.order_by("id").values_list("id", "name_ar"):
+        idx.subjects[sid] = name_ar
+        idx.subjects_by_key.setdefault(subject_key(name_ar), sid)
+
+    for tid, cid, sid in TeachingAssignment.objects.order_by("id").values_list(
+        "teacher_id", "classroom_id", "subject_id"
+    ):
+        idx.assignments.setdefault((tid, cid), []).append(sid)
+    return idx
+
+
+# (key, index) of the last index used by this process
+_memo: Optional[Tuple[str, NameIndex]] = None
+
+
+def get_name_index() -> NameIndex:
+    """The current index (process memo -> cache -> build)."""
+    path = mapping_path()
+    try:
+        mtime = int(os.stat(path).st_mtime_ns)
+    except OSError:
+        mtime = 0
+    key = CACHE_PREFIX + ":".join(str(v) for v in model_versions(INDEX_MODELS)) + f":{mtime}"
+    global _memo
+    memo = _memo
+    if memo is not None and memo[0] == key:
+        return memo[1]
+    idx = cache.get(key)
+    if idx is None:
+        idx = build_name_index(path)
+        cache.set(key, idx, int(getattr(settings, "NAME_INDEX_TTL_S", 3600) or 3600))
+    _memo = (key, idx)
+    return idx
@@ -1,12 +1,9 @@
 import csv
 import io
-import os
 import re
-from typing import Dict, List, Tuple
+from typing import List, Optional, Tuple
 
-from django.conf import settings
-
-from ..models import Class, Staff, Subject, TeachingAssignment
+from .name_index import NameIndex, get_name_index
 
 _AR_NUM = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
 
@@ -49,57 +46,10 @@ def _reverse_words_chars(s: str) -> str:
         return s or ""
 
 
-def _load_teacher_mapping() -> Dict[str, str]:
-    """Optional mapping file DOC/school_DATA/teacher_mapping.csv with columns:
-    ocr_name,full_name. Returns dict keyed by normalized ocr_name (no spaces)."""
-    base_dir = os.path.abspath(os.path.join(settings.BASE_DIR, "..", "DOC", "school_DATA"))
-    path = os.path.join(base_dir, "teacher_mapping.csv")
-    mapping: Dict[str, str] = {}
-    if not os.path.exists(path):
-        return mapping
-    try:
-        with open(path, "r", encoding="utf-8-sig") as f:
-            rdr = csv.DictReader(f)
-            for row in rdr:
-                ocr = _normalize_ar(row.get("ocr_name", "")).replace(" ", "")
-                full = str(row.get("full_name", "")).strip()
-                if ocr and full:
-                    mapping[ocr] = full
-    except Exception:
-        pass
-    return mapping
-
-
-def _classes_index():
-    by_name = {}
-    by_gs = {}
-    for c in Class.objects.all():
-        by_name[_normalize_ar(c.name)] = c
-        gs = f"{c.grade}-{(c.section or '').strip()}" if c.section else str(c.grade)
-        by_gs[_normalize_ar(gs)] = c
-    return by_name, by_gs
-
-
-def _staff_index():
-    by_key = {}
-    for t in Staff.objects.all():
-        k = _normalize_ar(t.full_name).replace(" ", "")
-        if k:
-            by_key[k] = t
-    return by_key
-
-
-def _subject_name(subj: Subject) -> str:
-    return subj.name_ar
-
-
-def _resolve_teacher(name_raw: str, teacher_map: Dict[str, str], staff_by_key: Dict[str, Staff]) -> Staff:
+def _resolve_teacher(name_raw: str, index: NameIndex) -> Optional[int]:
     # Try several variants to cope with mirrored OCR for Arabic text
-    candidates = []
     base = name_raw or ""
-    candidates.append(base)
-    candidates.append(_reverse_words_chars(base))  # reverse chars per word
-    candidates.append(_reverse_text(base))  # full reverse
+    candidates = [base, _reverse_words_chars(base), _reverse_text(base)]  # as-is, chars per word, full reverse
     # reverse words order + chars per word
     try:
         words = [w for w in re.split(r"\s+", base.strip()) if w]
@@ -107,23 +57,17 @@ def _resolve_teacher(name_raw: str, teacher_map: Dict[str, str], staff_by_key: D
     except Exception:
         pass
 
-    # Try mapping and direct staff match for each candidate
+    # Exact (direct or via teacher_mapping.csv) for every variant before any fuzzy guess
     for cand in candidates:
-        k = _normalize_ar(cand).replace(" ", "")
-        if not k:
-            continue
-        # Direct staff match
-        t = staff_by_key.get(k)
-        if t:
-            return t
-        # Via mapping file
-        mapped = teacher_map.get(k)
-        if mapped:
-            mk = _normalize_ar(mapped).replace(" ", "")
-            t2 = staff_by_key.get(mk)
-            if t2:
-                return t2
-    return None
+        tid = index.teacher_exact(cand)
+        if tid is not None:
+            return tid
+    best: Tuple[Optional[int], float] = (None, 0.0)
+    for cand in candidates:
+        tid, score = index.teacher_fuzzy(cand)
+        if tid is not None and score > best[1]:
+            best = (tid, score)
+    return best[0]
 
 
 def _token_to_class_code(tok: str) -> str:
@@ -154,9 +98,7 @@ def parse_ocr_raw_to_csv(text: str) -> Tuple[str, List[str]]:
     if not text or not text.strip():
         return ("teacher,class,subject,day,period\n", ["النص الخام فارغ."])
 
-    staff_by_key = _staff_index()
-    cls_by_name, cls_by_gs = _classes_index()
-    tmap = _load_teacher_mapping()
+    index = get_name_index()
 
     # Extract blocks after the marker
     blocks: List[str] = []
@@ -218,10 +160,11 @@ def parse_ocr_raw_to_csv(text: str) -> Tuple[str, List[str]]:
                 if re.search(r"[\u0600-\u06FF]", t) and not re.match(r"^\d{1,2}[\.|-]\d$", t):
                     teacher_name_raw = t
                     break
-        teacher = _resolve_teacher(teacher_name_raw, tmap, staff_by_key)
-        if not teacher:
+        teacher_id = _resolve_teacher(teacher_name_raw, index)
+        if teacher_id is None:
             warnings.append(f"تخطّي صف بسبب عدم التعرف على اسم المعلم: '{teacher_name_raw or 'غير معروف'}'")
             continue
+        teacher_name = index.teacher_names[teacher_id]
 
         # Normalize tokens length to 35 (5×7)
         # Sometimes there are more than 35 due to duplicated day groups; take the last 35 tokens (often the meaningful set for the teacher row)
@@ -238,27 +181,23 @@ def parse_ocr_raw_to_csv(text: str) -> Tuple[str, List[str]]:
             gs = _token_to_class_code(tok)
             if not gs:
                 continue
-            classroom = cls_by_name.get(_normalize_ar(gs)) or cls_by_gs.get(_normalize_ar(gs))
-            if not classroom:
-                warnings.append(f"الصف غير معروف في النظام: {gs} (المعلم: {teacher.full_name})")
+            class_id = index.classroom(gs)
+            if class_id is None:
+                warnings.append(f"الصف غير معروف في النظام: {gs} (المعلم: {teacher_name})")
                 continue
+            class_name = index.classes[class_id]
             # Day/period mapping: per group of 7 tokens in order 7..1
             day = (idx // 7) + 1  # 1..5
             offset = idx % 7
             period = 7 - offset  # 7..1
-            # Resolve subject via TeachingAssignment
-            asg_qs = TeachingAssignment.objects.filter(teacher=teacher, classroom=classroom)
-            subject = None
-            if asg_qs.count() == 1:
-                subject = asg_qs.first().subject
-            elif asg_qs.count() > 1:
-                # if multiple, try to pick the one most common for this teacher overall (fallback: first)
-                subject = asg_qs.first().subject
-                warnings.append(f"تعيينات متعددة للمادة (اختيار أول): المعلم {teacher.full_name} الصف {classroom.name}")
-            else:
-                warnings.append(f"لا توجد تعيين مادة للمعلم {teacher.full_name} في الصف {classroom.name} — تخطّي الخلية")
+            # Resolve subject via TeachingAssignment (preloaded map)
+            subject_ids = index.subjects_for(teacher_id, class_id)
+            if not subject_ids:
+                warnings.append(f"لا توجد تعيين مادة للمعلم {teacher_name} في الصف {class_name} — تخطّي الخلية")
                 continue
-            writer.writerow([teacher.full_name, classroom.name, _subject_name(subject), day, period])
+            if len(subject_ids) > 1:
+                warnings.append(f"تعيينات متعددة للمادة (اختيار أول): المعلم {teacher_name} الصف {class_name}")
+            writer.writerow([teacher_name, class_name, index.subjects[subject_ids[0]], day, period])
             total_mapped += 1
 
     if total_mapped == 0:
@@ -5,7 +5,8 @@ from typing import Any, Dict
 
 from django.db import transaction
 
-from ..models import Class, Staff, Subject, Term, TimetableEntry
+from ..models import Term, TimetableEntry
+from .name_index import get_name_index
 
 
 def _normalize_ar(s: str) -> str:
@@ -105,21 +106,9 @@ def import_timetable_csv(file_obj, *, dry_run: bool = False) -> Dict[str, Any]:
         if r not in headers:
             raise ValueError(f"Missing required header: {r}")
 
-    # Build lookup maps
-    teachers_by_key = {}
-    for t in Staff.objects.all():
-        k = _normalize_ar(t.full_name).replace(" ", "")
-        if k:
-            teachers_by_key.setdefault(k, t)
-
-    classes_by_name = {}
-    classes_by_gs = {}
-    for c in Class.objects.all():
-        classes_by_name[_normalize_ar(c.name)] = c
-        gs = f"{c.grade}-{(c.section or '').strip()}" if c.section else str(c.grade)
-        classes_by_gs[_normalize_ar(gs)] = c
-
-    subjects_by_key = {_normalize_ar(s.name_ar): s for s in Subject.objects.all()}
+    # Shared, cached lookup index (normalized names, teacher_mapping.csv aliases, fuzzy fallback)
+    index = get_name_index()
+    fuzzy_matches = []
 
     term = Term.objects.filter(is_current=True).first()
     if not term:
@@ -142,23 +131,24 @@ def import_timetable_csv(file_obj, *, dry_run: bool = False) -> Dict[str, Any]:
             day_v = row.get(headers["day"], "")
             period_v = row.get(headers["period"], "")
 
-            tkey = _normalize_ar(teacher_v).replace(" ", "")
-            teacher = teachers_by_key.get(tkey)
-            if not teacher:
+            teacher_id = index.teacher_exact(teacher_v)
+            if teacher_id is None:
+                teacher_id = index.teacher_fuzzy(teacher_v)[0]
+                if teacher_id is not None:
+                    fuzzy_matches.append(f"سطر {i}: {teacher_v} ← {index.teacher_names[teacher_id]}")
+            if teacher_id is None:
                 skipped += 1
                 errors.append(f"سطر {i}: المعلم غير معروف: {teacher_v}")
                 continue
 
-            ckey1 = _normalize_ar(class_v)
-            classroom = classes_by_name.get(ckey1) or classes_by_gs.get(ckey1)
-            if not classroom:
+            class_id = index.classroom(class_v)
+            if class_id is None:
                 skipped += 1
                 errors.append(f"سطر {i}: الصف غير معروف: {class_v}")
                 continue
 
-            skey = _normalize_ar(subject_v)
-            subject = subjects_by_key.get(skey)
-            if not subject:
+            subject_id = index.subject(subject_v)
+            if subject_id is None:
                 skipped += 1
                 errors.append(f"سطر {i}: المادة غير معروفة: {subject_v}")
                 continue
@@ -176,9 +166,11 @@ def import_timetable_csv(file_obj, *, dry_run: bool = False) -> Dict[str, Any]:
                 continue
 
             # Replace conflicts: same teacher or same class at that slot
-            q_teacher = TimetableEntry.objects.filter(term=term, day_of_week=day, period_number=period, teacher=teacher)
+            q_teacher = TimetableEntry.objects.filter(
+                term=term, day_of_week=day, period_number=period, teacher_id=teacher_id
+            )
             q_class = TimetableEntry.objects.filter(
-                term=term, day_of_week=day, period_number=period, classroom=classroom
+                term=term, day_of_week=day, period_number=period, classroom_id=class_id
             )
             rep_count = q_teacher.count() + q_class.exclude(id__in=q_teacher.values_list("id", flat=True)).count()
             if rep_count:
@@ -187,9 +179,9 @@ def import_timetable_csv(file_obj, *, dry_run: bool = False) -> Dict[str, Any]:
             q_class.delete()
 
             TimetableEntry.objects.create(
-                classroom=classroom,
-                subject=subject,
-                teacher=teacher,
+                classroom_id=class_id,
+                subject_id=subject_id,
+                teacher_id=teacher_id,
                 day_of_week=day,
                 period_number=period,
                 term=term,
@@ -208,5 +200,6 @@ def import_timetable_csv(file_obj, *, dry_run: bool = False) -> Dict[str, Any]:
         "replaced": replaced,
         "skipped": skipped,
         "errors": errors,
+        "fuzzy_matches": fuzzy_matches,
         "term": term.id if term else None,
     }
@@ -1,5 +1,28 @@
+"""Best-effort CSV extraction from timetable PDFs/images (pdfplumber / pytesseract).
+
+Extraction is CPU bound: every PDF page and both image variants (original + mirrored) are
+independent units, so they are fanned out to a process pool (OCR_WORKERS). Results are cached by
+the SHA-256 of the source file (OCR_CACHE_TTL_S), which lets the import page re-run
+parse_ocr_raw_to_csv on the raw text of a previous extraction without repeating OCR.
+
+extract_timetable_source() is what the RQ job (tasks.jobs_rq.process_extract_timetable) runs;
+try_extract_csv_from_pdf()/try_extract_csv_from_image() keep their (csv_text, warnings) contract
+and run serially by default, since they are called synchronously (pass workers to use the pool).
+"""
+
+import hashlib
 import os
-from typing import Tuple
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+CSV_HEADER = "teacher,class,subject,day,period"
+OCR_CONFIG = "--oem 1 --psm 6 -c preserve_interword_spaces=1"
+CACHE_PREFIX = "ocr:timetable:"
+# Heuristic: lines that look like they contain a class pattern like 7-1 or 9-A
+_CLASS_PAT = re.compile(r"\b\d\s*[-–]\s*[A-Za-z0-9\u0621-\u064A]+\b")
+
+Progress = Optional[Callable[[int, int], None]]
 
 
 def try_import(name: str):
@@ -11,8 +34,6 @@ def try_import(name: str):
 
 def _normalize_text(s: str) -> str:
     try:
-        import re
-
         s = re.sub(r"\s+", " ", s or "").strip()
         trans_digits = str.maketrans("٠١٢٣٤٥٦٧٨٩", "0123456789")
         s = s.translate(trans_digits)
@@ -21,70 +42,249 @@ def _normalize_text(s: str) -> str:
         return s or ""
 
 
-def try_extract_csv_from_pdf(pdf_path: str) -> Tuple[str, str]:
-    """Best-effort CSV extraction from a timetable PDF.
-    Returns (csv_text, warnings). On failure, returns ("", warning_message).
+def arabic_score(s: str) -> int:
+    # Count Arabic letters as a quick quality proxy
+    return sum(1 for ch in (s or "") if "\u0600" <= ch <= "\u06ff")
 
-    This function intentionally avoids hard dependencies. It will use pdfplumber if
-    installed, otherwise returns a helpful warning.
+
+def _workers() -> int:
+    try:
+        from django.conf import settings
+
+        configured = getattr(settings, "OCR_WORKERS", None)
+    except Exception:
+        configured = None
+    if configured is not None:
+        return max(1, int(configured))
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+def _run_units(func, args_list: List[tuple], *, workers: Optional[int] = None, progress: Progress = None) -> list:
+    """Run func(*args) for every unit, in a process pool when there is more than one unit/worker.
+
+    Results keep the order of args_list; progress(done, total) is called as units complete.
     """
-    warnings = []
-    csv_lines = ["teacher,class,subject,day,period"]
+    total = len(args_list)
+    workers = min(workers or _workers(), total)
+    results: list = [None] * total
+    if workers <= 1:
+        for i, args in enumerate(args_list):
+            results[i] = func(*args)
+            if progress:
+                progress(i + 1, total)
+        return results
+    # Units only use pdfplumber/pytesseract (no Django state), so fork-started workers are safe
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(func, *args): i for i, args in enumerate(args_list)}
+        done = 0
+        for fut in as_completed(futures):
+            results[futures[fut]] = fut.result()
+            done += 1
+            if progress:
+                progress(done, total)
+    return results
+
+
+# --- PDF --------------------------------------------------------------------------------------
+def _pdf_page_count(pdf_path: str) -> int:
+    import pdfplumber  # type: ignore
+
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _pdf_page_hints(pdf_path: str, index: int) -> List[str]:
+    """Raw table rows / candidate text lines of one page (pool worker)."""
+    import pdfplumber  # type: ignore
+
+    out: List[str] = []
+    with pdfplumber.open(pdf_path) as pdf:
+        page = pdf.pages[index]
+        # Try extracting tables first
+        try:
+            tables = page.extract_tables() or []
+        except Exception:
+            tables = []
+        if tables:
+            for tbl in tables:
+                # Heuristic: scan rows for patterns resembling timetable rows.
+                # This is highly dependent on the PDF layout; we only collect text cells.
+                for row in tbl:
+                    if not row or not any(c for c in row):
+                        continue
+                    row_text = [(_normalize_text(c) if isinstance(c, str) else "") for c in row]
+                    # We do not know exact columns; the admin can quickly edit into canonical 5 columns.
+                    out.append(f"تم التقاط صف خام من الجدول: {' | '.join(row_text)}")
+        else:
+            # Fallback: extract text lines. This won't build CSV automatically, but helps user.
+            for line in (page.extract_text() or "").splitlines():
+                line = _normalize_text(line)
+                if line and _CLASS_PAT.search(line):
+                    out.append(f"تم العثور على سطر محتمل: {line}")
+    return out
 
-    if not os.path.exists(pdf_path):
-        return "", f"الملف غير موجود: {pdf_path}"
 
-    pdfplumber = try_import("pdfplumber")
-    if not pdfplumber:
-        return "", (
-            "تعذر الاستخراج الآلي: مكتبة pdfplumber غير مثبتة.\n"
-            "يمكن تثبيتها بإحدى الطرق: pip install pdfplumber\n"
-            "بديل: استخدم زر الاستيراد اليدوي عبر نسخ CSV."
+def _extract_pdf(pdf_path: str, *, workers: Optional[int] = None, progress: Progress = None) -> Dict[str, Any]:
+    if not try_import("pdfplumber"):
+        return {
+            "csv_text": "",
+            "warnings": (
+                "تعذر الاستخراج الآلي: مكتبة pdfplumber غير مثبتة.\n"
+                "يمكن تثبيتها بإحدى الطرق: pip install pdfplumber\n"
+                "بديل: استخدم زر الاستيراد اليدوي عبر نسخ CSV."
+            ),
+            "raw_text": "",
+            "ok": False,
+        }
+    try:
+        pages = _pdf_page_count(pdf_path)
+        per_page = _run_units(
+            _pdf_page_hints, [(pdf_path, i) for i in range(pages)], workers=workers, progress=progress
         )
+    except Exception as e:
+        return {"csv_text": "", "warnings": f"فشل استخراج PDF: {e}", "raw_text": "", "ok": False}
+    lines = [line for page in per_page for line in page]
+    # The extraction is conservative: just the header; the captured rows help the admin fill quickly
+    # and are the raw input of parse_ocr_raw_to_csv.
+    return {
+        "csv_text": CSV_HEADER + "\n",
+        "warnings": "\n".join(lines),
+        "raw_text": "\n".join(lines),
+        "pages": pages,
+        "ok": True,
+    }
+
+
+# --- Image ------------------------------------------------------------------------------------
+def _ocr_variant(img_path: str, mirrored: bool) -> str:
+    """OCR one variant of the image (pool worker)."""
+    import pytesseract  # type: ignore
+    from PIL import Image, ImageFilter, ImageOps  # type: ignore
+
+    img = Image.open(img_path)
+    if mirrored:
+        # Handles sources where text appears reversed
+        img = ImageOps.mirror(img)
+    # Improve readability: convert to L, increase contrast/clarity a bit
+    g = img.convert("L")
+    try:
+        # Light unsharp mask to enhance glyph edges (safe default)
+        g = g.filter(ImageFilter.UnsharpMask(radius=1, percent=150, threshold=3))
+    except Exception:
+        pass
+    return pytesseract.image_to_string(g, lang="ara+eng", config=OCR_CONFIG)
+
 
+def _extract_image(img_path: str, *, workers: Optional[int] = None, progress: Progress = None) -> Dict[str, Any]:
+    if not (try_import("pytesseract") and try_import("PIL")):
+        return {
+            "csv_text": "",
+            "warnings": (
+                "تعذر الاستخراج الآلي من الصورة: يلزم pytesseract و Pillow.\n"
+                "يمكن التثبيت: pip install pytesseract pillow\n"
+                "بديل: استخدم زر الاستيراد اليدوي عبر نسخ CSV."
+            ),
+            "raw_text": "",
+            "ok": False,
+        }
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                # Try extracting tables first
-                tables = []
-                try:
-                    tables = page.extract_tables() or []
-                except Exception:
-                    tables = []
-                if tables:
-                    for tbl in tables:
-                        # Heuristic: scan rows for patterns resembling timetable rows.
-                        # This is highly dependent on the PDF layout; we only collect text cells.
-                        for row in tbl:
-                            # Skip empty rows
-                            if not row or not any(c for c in row):
-                                continue
-                            # Join cells for analysis; users can adjust later.
-                            row_text = [(_normalize_text(c) if isinstance(c, str) else "") for c in row]
-                            joined = " | ".join(row_text)
-                            # We do not know exact columns; append as comment for user visibility.
-                            # The admin can quickly edit into canonical 5 columns.
-                            warnings.append(f"تم التقاط صف خام من الجدول: {joined}")
-                else:
-                    # Fallback: extract text lines. This won't build CSV automatically, but helps user.
-                    text = page.extract_text() or ""
-                    for line in text.splitlines():
-                        line = _normalize_text(line)
-                        if not line:
-                            continue
-                        # Heuristic: only keep lines that look like they contain a class pattern like 7-1 or 9-A
-                        import re
-
-                        if re.search(r"\b\d\s*[-–]\s*[A-Za-z0-9\u0621-\u064A]+\b", line):
-                            warnings.append(f"تم العثور على سطر محتمل: {line}")
-        # The function is conservative: it returns just the header if it couldn't map reliably.
-        # The captured warnings will appear on the page to help the admin fill quickly.
-        return "\n".join(csv_lines) + "\n", "\n".join(warnings) if warnings else ""
+        text_orig, text_flip = _run_units(
+            _ocr_variant, [(img_path, False), (img_path, True)], workers=workers, progress=progress
+        )
     except Exception as e:
-        return "", f"فشل استخراج PDF: {e}"
+        return {"csv_text": "", "warnings": f"فشل OCR للصورة: {e}", "raw_text": "", "ok": False}
+
+    # Pick the better text
+    if arabic_score(text_flip) > max(arabic_score(text_orig), 0):
+        used, text = "mirrored", text_flip
+    else:
+        used, text = "original", text_orig
+    lines = [re.sub(r"\s+", " ", t).strip() for t in (text or "").splitlines() if t and t.strip()]
+    hints = [line for line in lines if _CLASS_PAT.search(line)]
+    variant = "المعكوسة" if used == "mirrored" else "الأصلية"
+    if hints:
+        warnings = f"تم الاعتماد على نسخة {variant} للصورة.\n" + "\n".join([f"سطر محتمل: {h}" for h in hints[:30]])
+        if len(hints) > 30:
+            warnings += f"\n(+{len(hints)-30} أسطر أخرى)"
+    else:
+        warnings = (
+            f"تم الاعتماد على نسخة {variant} للصورة، "
+            "لكن لم يتم التقاط أسطر مؤكدة تحتوي نمط صف (مثل 7-1).\n"
+            "يمكنك مع ذلك نسخ/تحرير CSV يدويًا من المعاينة."
+        )
+    return {"csv_text": CSV_HEADER + "\n", "warnings": warnings, "raw_text": text or "", "used": used, "ok": True}
+
+
+# --- Cached entry points ----------------------------------------------------------------------
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _cache():
+    from django.conf import settings
+    from django.core.cache import InvalidCacheBackendError, caches
+
+    alias = getattr(settings, "OCR_CACHE", "long_term") or "default"
+    try:
+        return caches[alias]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def _cache_ttl() -> int:
+    from django.conf import settings
+
+    return int(getattr(settings, "OCR_CACHE_TTL_S", 7 * 24 * 3600) or 0) or None
+
+
+def cached_extraction(sha: str) -> Optional[Dict[str, Any]]:
+    """Result of a previous extraction of the file with this hash (None when not cached)."""
+    if not sha or not re.fullmatch(r"[0-9a-f]{64}", sha):
+        return None
+    return _cache().get(CACHE_PREFIX + sha)
+
+
+def extract_timetable_source(
+    path: str, *, workers: Optional[int] = None, progress: Progress = None, use_cache: bool = True
+) -> Dict[str, Any]:
+    """Extract one PDF/image, returning {sha, kind, name, csv_text, warnings, raw_text, ok, cached}."""
+    if not os.path.exists(path):
+        return {"csv_text": "", "warnings": f"الملف غير موجود: {path}", "raw_text": "", "ok": False, "cached": False}
+    sha = file_sha256(path)
+    kind = "pdf" if path.lower().endswith(".pdf") else "image"
+    if use_cache:
+        hit = cached_extraction(sha)
+        if hit is not None:
+            if progress:
+                progress(1, 1)
+            return {**hit, "cached": True}
+    extract = _extract_pdf if kind == "pdf" else _extract_image
+    result = {**extract(path, workers=workers, progress=progress), "sha": sha, "kind": kind}
+    result["name"] = os.path.basename(path)
+    # Only successful runs are cached: a missing library must not pin the failure for a week
+    if result.get("ok"):
+        _cache().set(CACHE_PREFIX + sha, result, _cache_ttl())
+    return {**result, "cached": False}
 
 
-def try_extract_csv_from_image(img_path: str) -> Tuple[str, str]:
+def try_extract_csv_from_pdf(pdf_path: str, *, workers: Optional[int] = 1) -> Tuple[str, str]:
+    """Best-effort CSV extraction from a timetable PDF.
+    Returns (csv_text, warnings). On failure, returns ("", warning_message).
+
+    This function intentionally avoids hard dependencies. It will use pdfplumber if
+    installed, otherwise returns a helpful warning.
+    """
+    if not os.path.exists(pdf_path):
+        return "", f"الملف غير موجود: {pdf_path}"
+    res = extract_timetable_source(pdf_path, workers=workers)
+    return res["csv_text"], res["warnings"]
+
+
+def try_extract_csv_from_image(img_path: str, *, workers: Optional[int] = 1) -> Tuple[str, str]:
     """Attempt OCR from an image timetable with strong Arabic support.
     Handles mirrored (horizontally flipped) sources by trying both original and
     flipped variants, choosing the one with the higher Arabic character score.
@@ -92,79 +292,5 @@ def try_extract_csv_from_image(img_path: str) -> Tuple[str, str]:
     """
     if not os.path.exists(img_path):
         return "", f"الصورة غير موجودة: {img_path}"
-
-    pytesseract = try_import("pytesseract")
-    PIL = try_import("PIL")
-    if not (pytesseract and PIL):
-        return "", (
-            "تعذر الاستخراج الآلي من الصورة: يلزم pytesseract و Pillow.\n"
-            "يمكن التثبيت: pip install pytesseract pillow\n"
-            "بديل: استخدم زر الاستيراد اليدوي عبر نسخ CSV."
-        )
-
-    try:
-        import re
-
-        from PIL import Image, ImageFilter, ImageOps
-
-        def arabic_score(s: str) -> int:
-            # Count Arabic letters as a quick quality proxy
-            return sum(1 for ch in (s or "") if "\u0600" <= ch <= "\u06ff")
-
-        def ocr_image(img: "Image.Image") -> str:
-            # Improve readability: convert to L, increase contrast/clarity a bit
-            g = img.convert("L")
-            # Light unsharp mask to enhance glyph edges (safe default)
-            try:
-                g = g.filter(ImageFilter.UnsharpMask(radius=1, percent=150, threshold=3))
-            except Exception:
-                pass
-            config = "--oem 1 --psm 6 -c preserve_interword_spaces=1"
-            return pytesseract.image_to_string(g, lang="ara+eng", config=config)
-
-        img = Image.open(img_path)
-        # OCR original
-        text_orig = ocr_image(img)
-        score_orig = arabic_score(text_orig)
-        # OCR mirrored (handles sources where text appears reversed)
-        img_flip = ImageOps.mirror(img)
-        text_flip = ocr_image(img_flip)
-        score_flip = arabic_score(text_flip)
-
-        # Pick the better text
-        if score_flip > max(score_orig, 0):
-            used = "mirrored"
-            text = text_flip
-        else:
-            used = "original"
-            text = text_orig
-
-        # Normalize lines and prepare helpful hints for the admin
-        lines = [
-            re.sub(r"\s+", " ", line_text).strip()
-            for line_text in (text or "").splitlines()
-            if line_text and line_text.strip()
-        ]
-
-        # Heuristic: collect lines that look like they include a class pattern (e.g., 7-1, 9-A)
-        hints = []
-        pat = re.compile(r"\b\d\s*[-–]\s*[A-Za-z0-9\u0621-\u064A]+\b")
-        for line in lines:
-            if pat.search(line):
-                hints.append(line)
-
-        csv_text = "teacher,class,subject,day,period\n"
-        if hints:
-            head = f"تم الاعتماد على نسخة {'المعكوسة' if used == 'mirrored' else 'الأصلية'} للصورة."
-            warnings = head + "\n" + "\n".join([f"سطر محتمل: {h}" for h in hints[:30]])
-            if len(hints) > 30:
-                warnings += f"\n(+{len(hints)-30} أسطر أخرى)"
-        else:
-            warnings = (
-                f"تم الاعتماد على نسخة {'المعكوسة' if used == 'mirrored' else 'الأصلية'} للصورة، "
-                "لكن لم يتم التقاط أسطر مؤكدة تحتوي نمط صف (مثل 7-1).\n"
-                "يمكنك مع ذلك نسخ/تحرير CSV يدويًا من المعاينة."
-            )
-        return csv_text, warnings
-    except Exception as e:
-        return "", f"فشل OCR للصورة: {e}"
+    res = extract_timetable_source(img_path, workers=workers)
+    return res["csv_text"], res["warnings"]
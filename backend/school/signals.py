@@ -1,8 +1,7 @@
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
-from .models import Class, Student, AttendanceRecord, AttendanceLateEvent
-from .services.attendance import compute_late_seconds, format_mmss
+from .models import Class, Student
 
 
 @receiver(pre_save, sender=Student)
@@ -51,36 +50,26 @@ def _student_deleted(sender, instance: Student, **kwargs):
         _adjust_class_count(class_id, -1)
 
 
-@receiver(post_save, sender=AttendanceRecord)
-def _ensure_late_event(sender, instance: AttendanceRecord, **kwargs):
-    """Keep AttendanceLateEvent in sync with AttendanceRecord business rules.
-    - Create/Update when status in (late, runaway)
-    - Delete when status is anything else
-    """
+def _release_blob(sender, instance, **kwargs):
+    """Decrement StoredBlob reference counts when a content-addressed file's owner is deleted."""
+    from .storage import release_blob_reference
+
     try:
-        status = getattr(instance, "status", None)
-        if status in ("late", "runaway"):
-            seconds = compute_late_seconds(instance)
-            mmss = format_mmss(seconds)
-            AttendanceLateEvent.objects.update_or_create(
-                attendance_record=instance,
-                defaults={
-                    "student": instance.student,
-                    "classroom": instance.classroom,
-                    "subject": instance.subject,
-                    "teacher": instance.teacher,
-                    "recorded_by": None,
-                    "date": instance.date,
-                    "day_of_week": instance.day_of_week,
-                    "period_number": instance.period_number,
-                    "start_time": instance.start_time,
-                    "late_seconds": seconds,
-                    "late_mmss": mmss,
-                    "note": instance.note or "",
-                },
-            )
-        else:
-            AttendanceLateEvent.objects.filter(attendance_record=instance).delete()
+        for _app, _model, field in _BLOB_FIELDS.get(sender._meta.label, ()):
+            release_blob_reference(getattr(getattr(instance, field, None), "name", None))
     except Exception:
-        # Never block save due to synchronization issues
+        # Drift is repaired by `manage.py gc_blobs --recount`
         pass
+
+
+def _connect_blob_signals():
+    from .storage import BLOB_REFERENCES
+
+    for app_label, model_name, field in BLOB_REFERENCES:
+        label = f"{app_label}.{model_name}"
+        _BLOB_FIELDS.setdefault(label, []).append((app_label, model_name, field))
+        post_delete.connect(_release_blob, sender=label, weak=False, dispatch_uid=f"release_blob:{label}")
+
+
+_BLOB_FIELDS: dict = {}
+_connect_blob_signals()
@@ -0,0 +1,202 @@
+"""
+Content-addressed, deduplicated file storage for attachments and generated documents.
+
+Files are stored once under blobs/<aa>/<bb>/<sha256> regardless of the name passed by upload_to
+(content type and display names live on the referencing rows). Hashing happens while streaming the upload to a temporary file (one pass, constant
+memory); when the same content already exists the temporary copy is discarded. Each save bumps
+the StoredBlob reference count and deleting a referencing row decrements it. Orphans are removed
+by the gc_blobs management command, which also recounts references to fix any drift.
+
+Legacy files saved under date-based paths stay readable: the storage shares MEDIA_ROOT with the
+default FileSystemStorage and only changes where new files go.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Iterable, Optional
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
+
+BLOB_PREFIX = "blobs"
+
+_BLOB_NAME_RE = re.compile(r"^blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})$")
+
+# (app_label, model_name, file_field) for every field stored through ContentAddressedStorage.
+# gc_blobs uses this registry to recount live references with one grouped query per model.
+BLOB_REFERENCES: list[tuple[str, str, str]] = [
+    ("discipline", "IncidentAttachment", "file"),
+    ("discipline", "ExcuseAttachment", "file"),
+    ("attendance", "AbsenceAlertDocument", "file"),
+]
+
+
+def blob_name_for(digest: str) -> str:
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}"
+
+
+def blob_digest(name: Optional[str]) -> str:
+    """Return the sha256 encoded in a content-addressed name, or "" for legacy names."""
+    m = _BLOB_NAME_RE.match((name or "").replace("\\", "/"))
+    return m.group(1) if m else ""
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by their sha256 and deduplicates identical content."""
+
+    def get_available_name(self, name, max_length=None):
+        # Content-addressed names never collide with different content; skip the existence probe.
+        return name
+
+    def _save(self, name, content):
+        tmp_dir = self.path(os.path.join(BLOB_PREFIX, "tmp"))
+        os.makedirs(tmp_dir, exist_ok=True)
+        if hasattr(content, "seek"):
+            try:
+                content.seek(0)
+            except Exception:
+                pass
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode("utf-8")
+                    hasher.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+            digest = hasher.hexdigest()
+            final_name = blob_name_for(digest)
+            # Take the reference before placing the file so gc_blobs never deletes a blob being re-used
+            register_blob_reference(digest, final_name, size)
+            full_path = self.path(final_name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if os.path.exists(full_path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, full_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        return final_name
+
+
+def get_blob_storage() -> ContentAddressedStorage:
+    """Callable passed as FileField(storage=...) so migrations don't serialize MEDIA_ROOT."""
+    return _blob_storage
+
+
+_blob_storage = ContentAddressedStorage()
+
+
+def register_blob_reference(digest: str, name: str, size: int) -> None:
+    from school.models import StoredBlob
+
+    now = timezone.now()
+    if StoredBlob.objects.filter(sha256=digest).update(ref_count=F("ref_count") + 1, updated_at=now):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(sha256=digest, name=name, size=size, ref_count=1)
+    except IntegrityError:
+        StoredBlob.objects.filter(sha256=digest).update(ref_count=F("ref_count") + 1, updated_at=now)
+
+
+def release_blob_reference(name: Optional[str]) -> None:
+    """Decrement the reference count for a content-addressed name (no-op for legacy names)."""
+    digest = blob_digest(name)
+    if not digest:
+        return
+    from school.models import StoredBlob
+
+    StoredBlob.objects.filter(sha256=digest, ref_count__gt=0).update(
+        ref_count=F("ref_count") - 1, updated_at=timezone.now()
+    )
+
+
+class ContentAddressedFileField(models.FileField):
+    """FileField backed by ContentAddressedStorage.
+
+    When digest_field is given, the sha256 computed during the streaming save is copied into
+    that field, so callers no longer need a separate hashing pass over the upload. Replacing the
+    file of an existing row releases the reference held on the previous blob.
+    """
+
+    def __init__(self, *args, digest_field: Optional[str] = None, **kwargs):
+        kwargs.setdefault("storage", get_blob_storage)
+        self.digest_field = digest_field
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.digest_field:
+            kwargs["digest_field"] = self.digest_field
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        previous = None
+        if not add and model_instance.pk is not None:
+            previous = (
+                type(model_instance)
+                ._default_manager.filter(pk=model_instance.pk)
+                .values_list(self.attname, flat=True)
+                .first()
+            )
+        file = super().pre_save(model_instance, add)
+        new_name = file.name if file else None
+        if previous and previous != new_name:
+            # The row no longer points at the old blob: drop its reference once the update is committed
+            transaction.on_commit(lambda: release_blob_reference(previous), using=model_instance._state.db)
+        if self.digest_field and file:
+            digest = blob_digest(file.name)
+            if digest:
+                setattr(model_instance, self.digest_field, digest)
+        return file
+
+
+def live_blob_references() -> dict[str, int]:
+    """Count live references per blob name across BLOB_REFERENCES (one grouped query per model)."""
+    from django.apps import apps
+    from django.db.models import Count
+
+    counts: dict[str, int] = {}
+    for app_label, model_name, field in BLOB_REFERENCES:
+        try:
+            model = apps.get_model(app_label, model_name)
+        except LookupError:
+            continue
+        rows = (
+            model.objects.filter(**{f"{field}__startswith": f"{BLOB_PREFIX}/"})
+            .values(field)
+            .annotate(n=Count("pk"))
+            .values_list(field, "n")
+        )
+        for name, n in rows:
+            counts[name] = counts.get(name, 0) + n
+    return counts
+
+
+def iter_stored_files(storage: FileSystemStorage | None = None) -> Iterable[str]:
+    """Yield every blob name present on disk (used by gc_blobs to find untracked files)."""
+    storage = storage or _blob_storage
+    root = storage.path(BLOB_PREFIX)
+    if not os.path.isdir(root):
+        return
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for fn in filenames:
+            rel = os.path.relpath(os.path.join(dirpath, fn), storage.location).replace("\\", "/")
+            if blob_digest(rel):
+                yield rel
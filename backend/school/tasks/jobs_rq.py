@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from io import BytesIO
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 from backend.school.services.imports import import_teacher_loads
 
@@ -31,3 +31,47 @@ def process_import_teacher_loads(file_bytes: bytes, *, dry_run: bool = False) ->
 def enqueue_import_teacher_loads(queue, file_bytes: bytes, *, dry_run: bool = False):
     """Enqueue the import job on the provided RQ queue and return the job object."""
     return queue.enqueue(process_import_teacher_loads, file_bytes, dry_run=dry_run, job_timeout=600)
+
+
+def process_extract_timetable(paths: List[str], *, workers: Optional[int] = None) -> Dict[str, Any]:
+    """Worker job: OCR/PDF extraction of the timetable sources, first source that yields CSV wins.
+
+    workers: process-pool size (None = OCR_WORKERS); the inline fallback of the import page passes 1.
+
+    Progress ({"stage", "done", "total"}) is published in job.meta for job_status; the summary only
+    carries the file hash: the import page reads the full (cached) extraction with it.
+    """
+    from ..services.timetable_ocr import extract_timetable_source
+
+    job = get_current_job()
+
+    def report(stage: str, done: int, total: int) -> None:
+        if job is None:
+            return
+        job.meta = job.meta or {}
+        job.meta["progress"] = {"stage": stage, "done": done, "total": total}
+        job.save_meta()
+
+    summary: Dict[str, Any] = {"kind": "timetable_ocr", "ok": False, "sha": None, "warnings": ""}
+    for path in paths:
+        name = path.rsplit("/", 1)[-1]
+        res = extract_timetable_source(path, workers=workers, progress=lambda d, t, _n=name: report(_n, d, t))
+        summary.update(
+            ok=bool(res.get("ok") and res.get("csv_text")),
+            sha=res.get("sha"),
+            source=res.get("name") or name,
+            cached=bool(res.get("cached")),
+            warnings=(res.get("warnings") or "")[:2000],
+        )
+        if summary["ok"]:
+            break
+    if job is not None:
+        job.meta = job.meta or {}
+        job.meta["summary"] = summary
+        job.save_meta()
+    return summary
+
+
+def enqueue_extract_timetable(queue, paths: List[str]):
+    """Enqueue the timetable extraction on the provided RQ queue and return the job object."""
+    return queue.enqueue(process_extract_timetable, list(paths), job_timeout=900)
@@ -23,6 +23,7 @@ from .views import (
     export_table_csv,
     icon_svg,
     icons_manifest,
+    icons_sprite,
     job_status,
     logout_to_login,
     portal_home,
@@ -60,6 +61,7 @@ urlpatterns = [
     path("data/", data_overview, name="data_overview"),
     path("data/icons/", data_icons_catalog, name="data_icons_catalog"),
     path("data/icons/manifest.json", icons_manifest, name="icons_manifest"),
+    path("data/icons/sprite.svg", icons_sprite, name="icons_sprite"),
     path("data/icons/<str:name>.svg", icon_svg, name="icon_svg"),
     path("data/relations/", data_relations, name="data_relations"),
     path("data/audit/", data_db_audit, name="data_db_audit"),
@@ -64,9 +64,10 @@ from .serializers import (
     TeachingAssignmentSerializer,
 )
 from .services.imports import import_teacher_loads
+from .services.late_events import reconcile_late_events
 from .services.ocr_table_parser import parse_ocr_raw_to_csv
 from .services.timetable_import import import_timetable_csv
-from .services.timetable_ocr import try_extract_csv_from_image, try_extract_csv_from_pdf
+from .services.timetable_ocr import cached_extraction
 
 try:
     from backend.common.day_utils import iso_to_school_dow
@@ -1500,6 +1501,10 @@ def timetable_import_from_image(request):
     except Exception:
         pass
 
+    # Result of a background extraction (?ocr=<file sha256>, linked from job_status)
+    ocr_sha = (request.POST.get("ocr") or request.GET.get("ocr") or "").strip()
+    ocr_result = cached_extraction(ocr_sha)
+
     if request.method == "POST":
         action = request.POST.get("action", "import")
         if action == "auto":
@@ -1527,25 +1532,35 @@ def timetable_import_from_image(request):
                 (os.path.join(base_dir, n) for n in img_candidates if os.path.exists(os.path.join(base_dir, n))),
                 None,
             )
-            csv_text = ""
-            warn = ""
-            if pdf_path:
-                csv_text, warn = try_extract_csv_from_pdf(pdf_path)
-            if not csv_text and img_path:
-                csv_text, warn = try_extract_csv_from_image(img_path)
-            if csv_text:
-                form = TimetableImageImportForm(initial={"csv_text": csv_text})
-                messages.info(
-                    request,
-                    "تمت محاولة الاستخراج الآلي. يرجى المراجعة ثم الضغط على استيراد.",
-                )
-                if warn:
-                    messages.warning(request, warn)
+            paths = [p for p in (pdf_path, img_path) if p]
+            if not paths:
+                form = TimetableImageImportForm(initial={"csv_text": template_text})
+                messages.error(request, "تعذر الاستخراج الآلي: لا يوجد ملف PDF/صورة للجدول.")
             else:
+                # OCR is slow (pages/variants in a process pool): run it in RQ and follow it on job_status
+                from .tasks.jobs_rq import enqueue_extract_timetable, process_extract_timetable
+
+                try:
+                    from django_rq import get_queue
+
+                    job = enqueue_extract_timetable(get_queue("default"), paths)
+                except Exception:
+                    job = None
+                if job is not None:
+                    messages.info(request, f"تم إرسال الاستخراج الآلي إلى الخلفية. رقم المهمة: {job.id}")
+                    return redirect(reverse("job_status", kwargs={"job_id": job.id}))
+                # No queue available (dev without Redis): extract inline, serially (no process pool
+                # inside the web worker)
+                summary = process_extract_timetable(paths, workers=1)
+                if summary.get("ok"):
+                    return redirect(reverse("timetable_import_from_image") + f"?ocr={summary['sha']}")
                 form = TimetableImageImportForm(initial={"csv_text": template_text})
-                messages.error(request, warn or "تعذر الاستخراج الآلي. الرجاء إدخال CSV يدويًا.")
+                messages.error(request, summary.get("warnings") or "تعذر الاستخراج الآلي. الرجاء إدخال CSV يدويًا.")
         elif action == "parse_raw":
             raw_text = request.POST.get("raw_text", "")
+            if not raw_text.strip():
+                # Re-parse the raw text of a cached extraction without repeating OCR
+                raw_text = (cached_extraction(request.POST.get("ocr", "")) or {}).get("raw_text") or ""
             if not raw_text.strip():
                 form = TimetableImageImportForm(initial={"csv_text": template_text})
                 messages.error(request, "الرجاء لصق النص الخام الملتقط أولاً.")
@@ -1576,9 +1591,21 @@ def timetable_import_from_image(request):
                         )
                         if summary.get("errors"):
                             messages.warning(request, "\n".join(summary["errors"]))
+                        if summary.get("fuzzy_matches"):
+                            messages.info(
+                                request, "مطابقة تقريبية لأسماء المعلمين:\n" + "\n".join(summary["fuzzy_matches"])
+                            )
                         return redirect("teacher_week_compact")
                     except Exception as e:
                         messages.error(request, f"فشل الاستيراد: {e}")
+    elif ocr_result:
+        form = TimetableImageImportForm(initial={"csv_text": ocr_result.get("csv_text") or template_text})
+        if ocr_result.get("ok"):
+            messages.info(request, "تمت محاولة الاستخراج الآلي. يرجى المراجعة ثم الضغط على استيراد.")
+            if ocr_result.get("warnings"):
+                messages.warning(request, ocr_result["warnings"])
+        else:
+            messages.error(request, ocr_result.get("warnings") or "تعذر الاستخراج الآلي. الرجاء إدخال CSV يدويًا.")
     else:
         form = TimetableImageImportForm(initial={"csv_text": template_text})
 
@@ -1604,6 +1631,7 @@ def timetable_import_from_image(request):
         "form": form,
         "source_image_name": source_image_name,
         "source_pdf_name": source_pdf_name,
+        "ocr_sha": ocr_sha if ocr_result else "",
     }
     return render(request, "school/timetable_import_from_image.html", context)
 
@@ -2025,12 +2053,14 @@ def job_status(request, job_id: str):
         raise Http404("Job not found")
 
     state = job.get_status(refresh=True)
-    summary = (job.meta or {}).get("summary") if hasattr(job, "meta") else None
+    meta = (job.meta or {}) if hasattr(job, "meta") else {}
+    summary = meta.get("summary")
     context = {
         "title": f"حالة المهمة {job_id}",
         "job_id": job_id,
         "state": state,
         "summary": summary,
+        "progress": meta.get("progress"),
     }
     return render(request, "school/job_status.html", context)
 
@@ -4689,81 +4719,93 @@ def api_attendance_bulk_save(request):
         allowed_today = set(range(1, 13))
 
     saved = 0
-    for item in items:
-        try:
-            st_id = int(item["student_id"])
-            p = int(item["period_number"])
-            status = item["status"]
-        except Exception:
-            continue
+    saved_ids: list[int] = []
+    from apps.attendance.services.daily_states import deferred_daily_refresh
 
-        # Skip inactive students: do not record attendance for them
-        try:
-            if not Student.objects.filter(id=st_id, active=True).exists():
+    # الملخص اليومي (AttendanceDaily) يُعاد بناؤه مرة واحدة للصف/اليوم عند نهاية الحفظ
+    with deferred_daily_refresh():
+        for item in items:
+            try:
+                st_id = int(item["student_id"])
+                p = int(item["period_number"])
+                status = item["status"]
+            except Exception:
                 continue
-        except Exception:
-            pass
 
-        # 1) يجب أن تكون الحصة ضمن جدول المعلم اليوم لهذا الصف
-        if p not in allowed_today:
-            continue
-        # 2) يجب أن تكون ضمن النافذة الزمنية للتحرير
-        if p not in editable_periods:
-            continue
+            # Skip inactive students: do not record attendance for them
+            try:
+                if not Student.objects.filter(id=st_id, active=True).exists():
+                    continue
+            except Exception:
+                pass
 
-        # احترام السجلات المقفلة (ما عدا مشرف الجناح)
-        existing = AttendanceRecord.objects.filter(student_id=st_id, date=dt, period_number=p, term=term).first()
-        if existing and existing.locked and staff_role != "wing_supervisor":
-            continue
+            # 1) يجب أن تكون الحصة ضمن جدول المعلم اليوم لهذا الصف
+            if p not in allowed_today:
+                continue
+            # 2) يجب أن تكون ضمن النافذة الزمنية للتحرير
+            if p not in editable_periods:
+                continue
 
-        defaults = {
-            "classroom_id": class_id,
-            "teacher": staff,
-            "term": term,
-            "date": dt,
-            "day_of_week": iso_to_school_dow(dt),
-            "period_number": p,
-            "start_time": period_times.get(p, (_time(0, 0), _time(0, 1)))[0],
-            "end_time": period_times.get(p, (_time(0, 0), _time(0, 1)))[1],
-            "status": status,
-            "late_minutes": item.get("late_minutes", 0),
-            "early_minutes": item.get("early_minutes", 0),
-            "runaway_reason": item.get("runaway_reason", ""),
-            "excuse_type": item.get("excuse_type", ""),
-            "source": ("supervisor" if staff_role == "wing_supervisor" else "teacher"),
-        }
-        subj_id = subject_map.get(p) or get_default_subject_id()
-        if subj_id:
-            defaults["subject_id"] = subj_id
-        try:
-            AttendanceRecord.objects.update_or_create(
-                student_id=st_id,
-                date=dt,
-                period_number=p,
-                term=term,
-                defaults=defaults,
-            )
-            saved += 1
-        except Exception:
-            continue
+            # احترام السجلات المقفلة (ما عدا مشرف الجناح)
+            existing = AttendanceRecord.objects.filter(student_id=st_id, date=dt, period_number=p, term=term).first()
+            if existing and existing.locked and staff_role != "wing_supervisor":
+                continue
+
+            defaults = {
+                "classroom_id": class_id,
+                "teacher": staff,
+                "term": term,
+                "date": dt,
+                "day_of_week": iso_to_school_dow(dt),
+                "period_number": p,
+                "start_time": period_times.get(p, (_time(0, 0), _time(0, 1)))[0],
+                "end_time": period_times.get(p, (_time(0, 0), _time(0, 1)))[1],
+                "status": status,
+                "late_minutes": item.get("late_minutes", 0),
+                "early_minutes": item.get("early_minutes", 0),
+                "runaway_reason": item.get("runaway_reason", ""),
+                "excuse_type": item.get("excuse_type", ""),
+                "source": ("supervisor" if staff_role == "wing_supervisor" else "teacher"),
+            }
+            subj_id = subject_map.get(p) or get_default_subject_id()
+            if subj_id:
+                defaults["subject_id"] = subj_id
+            try:
+                rec, _ = AttendanceRecord.objects.update_or_create(
+                    student_id=st_id,
+                    date=dt,
+                    period_number=p,
+                    term=term,
+                    defaults=defaults,
+                )
+                saved += 1
+                saved_ids.append(rec.id)
+            except Exception:
+                continue
+
+        # أحداث التأخر للدفعة كاملة مرة واحدة
+        reconcile_late_events(saved_ids, recorded_by_id=request.user.id)
+
+        if submit_and_lock:
+            try:
+                from apps.attendance.services.submissions import submit_batches
+
+                # اقفل السجلات التي أنشأها هذا المعلم لهذا الصف/اليوم ضمن حصصه وسلّمها كدفعات اعتماد للمشرف
+                AttendanceRecord.objects.filter(
+                    classroom_id=class_id,
+                    date=dt,
+                    term=term,
+                    period_number__in=list(allowed_today),
+                ).update(locked=True)
+                submit_batches(class_id, dt, term=term, periods=allowed_today, user=request.user)
+            except Exception:
+                pass
 
-    if submit_and_lock:
         try:
-            # اقفل السجلات التي أنشأها هذا المعلم لهذا الصف/اليوم ضمن حصصه
-            AttendanceRecord.objects.filter(
-                classroom_id=class_id,
-                date=dt,
-                term=term,
-                period_number__in=list(allowed_today),
-            ).update(locked=True)
+            update_daily_aggregates(class_id, dt, term)
         except Exception:
             pass
 
-    try:
-        update_daily_aggregates(class_id, dt, term)
-    except Exception:
-        pass
-
     return JsonResponse({"saved": saved})
 
 
@@ -4891,8 +4933,10 @@ def get_default_subject_id():
 
 
 def update_daily_aggregates(class_id: int, dt: _date, term: Term):
-    # Placeholder لعملية التجميع اليومي لاحقاً
-    return None
+    """Rebuild the AttendanceDaily rows (daily absence state) of the class-day."""
+    from apps.attendance.services.daily_states import refresh_for_pairs
+
+    return refresh_for_pairs([(class_id, dt)])
 
 
 # --- Auth utilities (GET-friendly logout) ---
@@ -5497,101 +5541,58 @@ def api_ui_tiles_save(request):
         return JsonResponse({"detail": f"failed to save: {e}"}, status=500)
 
 
-# --- Icons API (filesystem-backed) ---
-# Minimal viable implementation to support sc:* icons with caching.
-from typing import List, Tuple
+# --- Icons API (in-memory registry, see services/icon_registry.py) ---
+from apps.common.conditional import etag_matches
 
-ICON_DIRS: List[str] = [
-    os.path.join(settings.BASE_DIR, "assets", "icons"),
-    os.path.join(settings.BASE_DIR, "backend", "static", "data", "icons"),
-]
+from .services.icon_registry import icon_registry
 
+_IMMUTABLE = "public, max-age=31536000, immutable"
 
-def _iter_icon_files() -> List[Tuple[str, str]]:
-    out: List[Tuple[str, str]] = []
-    seen = set()
-    for d in ICON_DIRS:
-        if not os.path.isdir(d):
-            continue
-        try:
-            for fn in os.listdir(d):
-                if not fn.lower().endswith(".svg"):
-                    continue
-                name = fn[:-4]
-                if name in seen:
-                    continue
-                seen.add(name)
-                out.append((name, os.path.join(d, fn)))
-        except Exception:
-            continue
-    return out
+
+def _icon_response(request, content: bytes, etag: str, content_type: str, pinned: bool):
+    if etag_matches(request, etag):
+        resp = HttpResponseNotModified()
+    else:
+        resp = HttpResponse(content, content_type=content_type)
+    resp["ETag"] = etag
+    # Versioned URLs never change; unversioned ones revalidate cheaply against the ETag
+    resp["Cache-Control"] = _IMMUTABLE if pinned else "public, max-age=60"
+    return resp
 
 
 @require_GET
 def icons_manifest(request):
-    data = {}
-    files = _iter_icon_files()
-    for name, path in files:
-        try:
-            stat = os.stat(path)
-            ver = int(stat.st_mtime)
-            data[name] = {"v": ver}
-        except Exception:
-            data[name] = {"v": 1}
-    return JsonResponse(data)
+    version = icon_registry.version
+    etag = f'"icons-{version}"'
+    if etag_matches(request, etag):
+        resp = HttpResponseNotModified()
+    else:
+        resp = JsonResponse(icon_registry.manifest())
+    resp["ETag"] = etag
+    resp["X-Icons-Version"] = version
+    resp["Cache-Control"] = "public, no-cache"
+    return resp
 
 
-def _read_icon_file(name: str) -> Tuple[bytes, str, int]:
-    name_norm = name.strip().lower()
-    for d in ICON_DIRS:
-        if not os.path.isdir(d):
-            continue
-        # try exact
-        cand = os.path.join(d, f"{name}.svg")
-        if os.path.isfile(cand):
-            with open(cand, "rb") as f:
-                b = f.read()
-            st = os.stat(cand)
-            return b, cand, int(st.st_mtime)
-        # try case-insensitive scan
-        try:
-            for fn in os.listdir(d):
-                if fn.lower() == f"{name_norm}.svg":
-                    full = os.path.join(d, fn)
-                    with open(full, "rb") as f:
-                        b = f.read()
-                    st = os.stat(full)
-                    return b, full, int(st.st_mtime)
-        except Exception:
-            pass
-    raise Http404("Icon not found")
+@require_GET
+def icons_sprite(request):
+    """All icons (or ?names=a,b) as <symbol id="sc-<name>"> in one SVG; ?v=<registry version> pins it."""
+    raw = (request.GET.get("names") or "").strip()
+    names = [n for n in (x.strip() for x in raw.split(",")) if n] if raw else None
+    sprite = icon_registry.sprite(names)
+    version = icon_registry.version
+    resp = _icon_response(
+        request, sprite.content, sprite.etag, "image/svg+xml; charset=utf-8", pinned=request.GET.get("v") == version
+    )
+    resp["X-Icons-Version"] = version
+    return resp
 
 
 @require_GET
 def icon_svg(request, name: str):
-    try:
-        content, path, ver = _read_icon_file(name)
-    except Http404:
+    icon = icon_registry.get(name)
+    if icon is None:
         return HttpResponse(status=404)
-    # ETag derived from a modern non-cryptographic hash of content (not used for security)
-    import hashlib as _hl
-
-    etag = '"' + _hl.blake2b(content, digest_size=20).hexdigest() + '"'
-    inm = request.META.get("HTTP_IF_NONE_MATCH")
-    if inm and inm.strip() == etag:
-        return HttpResponseNotModified()
-
-    # Normalize basic headers
-    resp = HttpResponse(content, content_type="image/svg+xml; charset=utf-8")
-    resp["ETag"] = etag
-    # Cache aggressively if client passes correct version
-    v = request.GET.get("v")
-    try:
-        v_int = int(v) if v else None
-    except Exception:
-        v_int = None
-    if v_int and v_int == ver:
-        resp["Cache-Control"] = "public, max-age=31536000, immutable"
-    else:
-        resp["Cache-Control"] = "public, max-age=60"
-    return resp
+    return _icon_response(
+        request, icon.content, icon.etag, "image/svg+xml; charset=utf-8", pinned=request.GET.get("v") == icon.version
+    )
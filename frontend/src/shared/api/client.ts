@@ -691,16 +691,37 @@ export async function getWingPending(params: { date?: string; class_id?: number;
       subject_name?: string | null;
       teacher_name?: string | null;
     }[];
+    batches?: {
+      id: number;
+      class_id: number;
+      class_name?: string | null;
+      date: string;
+      period_number: number;
+      status: "submitted" | "approved" | "rejected";
+      submitted_by?: string | null;
+      submitted_at?: string | null;
+      total: number;
+      absent: number;
+      late: number;
+      excused: number;
+      pending: number;
+    }[];
   };
 }
 
 export async function postWingDecide(payload: {
   action: "approve" | "reject";
-  ids: number[];
+  ids?: number[];
+  batch_ids?: number[];
   comment?: string;
 }) {
   const res = await api.post("/v1/wing/decide/", payload);
-  return res.data as { updated: number; action: "approve" | "reject" };
+  return res.data as {
+    updated: number;
+    batches?: number;
+    action: "approve" | "reject";
+    results?: { id: number; outcome: "approved" | "rejected" | "skipped" }[];
+  };
 }
 
 export async function postWingSetExcused(payload: {
@@ -721,11 +742,20 @@ export async function postWingSetExcused(payload: {
     const res = await api.post("/v1/wing/set-excused/", fd, {
       headers: { "Content-Type": "multipart/form-data" },
     });
-    return res.data as { updated: number; action: "set_excused"; evidence_saved?: number };
+    return res.data as {
+      updated: number;
+      action: "set_excused";
+      results?: { id: number; outcome: "excused" | "skipped" }[];
+      evidence_saved?: number;
+    };
   } else {
     const { evidenceFile, evidenceNote, ...json } = payload as any;
     const res = await api.post("/v1/wing/set-excused/", json);
-    return res.data as { updated: number; action: "set_excused" };
+    return res.data as {
+      updated: number;
+      action: "set_excused";
+      results?: { id: number; outcome: "excused" | "skipped" }[];
+    };
   }
 }
 
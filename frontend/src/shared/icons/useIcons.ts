@@ -8,13 +8,34 @@ const ICON_BASE = (import.meta as any).env?.VITE_BACKEND_ORIGIN
 const manifest = ref<Record<string, { v?: string | number }>>({});
 const ready = ref(false);
 const LS_MANIFEST = "sc_icons_manifest_v1";
+const LS_VERSION = "sc_icons_version_v1";
+// Registry version (X-Icons-Version): pins the sprite URL so the browser may cache it as immutable
+const registryVersion = ref("");
+// lower-case name -> manifest name, for the same case-insensitive lookup as the backend registry
+let lowerNames: Record<string, string> = {};
+
+function setManifest(data: Record<string, { v?: string | number }>) {
+  manifest.value = data || {};
+  lowerNames = {};
+  for (const n of Object.keys(manifest.value)) {
+    if (!(n.toLowerCase() in lowerNames)) lowerNames[n.toLowerCase()] = n;
+  }
+}
+
+/** Registry name: exact match first, then case-insensitive (like IconRegistry.get). */
+function canonicalName(name: string): string {
+  const n = (name || "").trim();
+  if (manifest.value?.[n]) return n;
+  return lowerNames[n.toLowerCase()] || n;
+}
 
 async function loadManifest() {
   if (ready.value) return;
   try {
     const cached = localStorage.getItem(LS_MANIFEST);
     if (cached) {
-      manifest.value = JSON.parse(cached);
+      setManifest(JSON.parse(cached));
+      registryVersion.value = localStorage.getItem(LS_VERSION) || "";
       ready.value = true;
     }
   } catch {}
@@ -22,9 +43,11 @@ async function loadManifest() {
     const res = await fetch(`${ICON_BASE}/manifest.json`, { credentials: "include" });
     if (res.ok) {
       const data = await res.json();
-      manifest.value = data || {};
+      setManifest(data);
+      registryVersion.value = res.headers.get("X-Icons-Version") || "";
       try {
         localStorage.setItem(LS_MANIFEST, JSON.stringify(manifest.value));
+        localStorage.setItem(LS_VERSION, registryVersion.value);
       } catch {}
       ready.value = true;
     }
@@ -38,22 +61,29 @@ function cacheKey(name: string) {
 
 export async function getSchoolIconSvg(name: string): Promise<string | null> {
   await loadManifest();
+  name = canonicalName(name);
   const key = cacheKey(name);
   try {
     const fromLs = localStorage.getItem(key);
     if (fromLs) return fromLs;
   } catch {}
 
-  // Direct fetch fallback even without manifest
-  const url = `${ICON_BASE}/${encodeURIComponent(name)}.svg`;
+  // Icons requested in the same tick share one sprite request
+  if (manifest.value?.[name]) {
+    await queueSpriteLoad(name);
+    try {
+      const fromSprite = localStorage.getItem(key);
+      if (fromSprite) return fromSprite;
+    } catch {}
+  }
+
+  // Direct fetch fallback even without manifest; the content version makes the URL immutable
+  const v = manifest.value?.[name]?.v;
+  const url = `${ICON_BASE}/${encodeURIComponent(name)}.svg${v ? `?v=${encodeURIComponent(String(v))}` : ""}`;
   try {
     const res = await fetch(url, { credentials: "include" });
     if (!res.ok) return null;
-    const svg = await res.text();
-    // Normalize to currentColor if not explicitly none/currentColor
-    const normalized = svg
-      .replace(/fill=\"(?!none|currentColor)[^\"]*\"/g, 'fill="currentColor"')
-      .replace(/stroke=\"(?!none|currentColor)[^\"]*\"/g, 'stroke="currentColor"');
+    const normalized = normalizeSvg(await res.text());
     try {
       localStorage.setItem(key, normalized);
     } catch {}
@@ -63,6 +93,77 @@ export async function getSchoolIconSvg(name: string): Promise<string | null> {
   }
 }
 
+// Normalize to currentColor if not explicitly none/currentColor
+function normalizeSvg(svg: string): string {
+  return svg
+    .replace(/fill=\"(?!none|currentColor)[^\"]*\"/g, 'fill="currentColor"')
+    .replace(/stroke=\"(?!none|currentColor)[^\"]*\"/g, 'stroke="currentColor"');
+}
+
+// <symbol id="sc-x" viewBox fill stroke...>body</symbol> -> standalone <svg>; the root
+// presentation attributes (fill, stroke, stroke-width...) are kept, only the sprite id is dropped
+function symbolToSvg(symbol: Element): string {
+  const esc = (v: string) => v.replace(/&/g, "&amp;").replace(/"/g, "&quot;").replace(/</g, "&lt;");
+  let attrs = symbol.hasAttribute("viewBox") ? "" : ' viewBox="0 0 24 24"';
+  for (const attr of Array.from(symbol.attributes)) {
+    if (attr.name === "id" || attr.name === "xmlns") continue;
+    attrs += ` ${attr.name}="${esc(attr.value)}"`;
+  }
+  return `<svg xmlns="http://www.w3.org/2000/svg"${attrs}>${symbol.innerHTML}</svg>`;
+}
+
+let spriteQueue: string[] = [];
+let spriteBatch: Promise<void> | null = null;
+
+function queueSpriteLoad(name: string): Promise<void> {
+  spriteQueue.push(name);
+  if (!spriteBatch) {
+    spriteBatch = new Promise<void>((resolve) => setTimeout(resolve, 0)).then(() => {
+      const names = spriteQueue;
+      spriteQueue = [];
+      spriteBatch = null;
+      return preloadSchoolIcons(names);
+    });
+  }
+  return spriteBatch;
+}
+
+/**
+ * Load many icons with one request: the backend sprite holds a <symbol id="sc-<name>"> per icon.
+ * Each symbol is stored under the same per-icon cache key getSchoolIconSvg() reads.
+ */
+export async function preloadSchoolIcons(names: string[]): Promise<void> {
+  await loadManifest();
+  const missing = Array.from(new Set(names.map(canonicalName))).filter((n) => {
+    try {
+      return !localStorage.getItem(cacheKey(n));
+    } catch {
+      return true;
+    }
+  });
+  if (!missing.length) return;
+  try {
+    const qs = new URLSearchParams({ names: missing.join(",") });
+    if (registryVersion.value) qs.set("v", registryVersion.value);
+    const res = await fetch(`${ICON_BASE}/sprite.svg?${qs}`, { credentials: "include" });
+    if (!res.ok) return;
+    const doc = new DOMParser().parseFromString(await res.text(), "image/svg+xml");
+    // The sprite ids carry the registry's canonical name, which may differ in case from the request
+    const symbols = new Map<string, Element>();
+    for (const s of Array.from(doc.getElementsByTagName("symbol"))) {
+      const id = (s.getAttribute("id") || "").toLowerCase();
+      if (!symbols.has(id)) symbols.set(id, s);
+    }
+    for (const name of missing) {
+      const symbol = symbols.get(`sc-${name.replace(/[^A-Za-z0-9_.-]/g, "-")}`.toLowerCase());
+      if (!symbol) continue;
+      try {
+        localStorage.setItem(cacheKey(name), normalizeSvg(symbolToSvg(symbol)));
+      } catch {}
+    }
+  } catch {}
+}
+
 export async function ensureIconsReady() {
   await loadManifest();
 }
@@ -0,0 +1,133 @@
+import datetime as _dt
+
+import pytest
+
+
+def _mark(data, student, day, period, status):
+    from school.models import AttendanceRecord
+
+    AttendanceRecord.objects.create(
+        student=student,
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        term=data["term"],
+        date=day,
+        day_of_week=1,
+        period_number=period,
+        start_time=_dt.time(7, 0),
+        end_time=_dt.time(7, 45),
+        status=status,
+    )
+
+
+@pytest.fixture()
+def wing_absences(minimal_school_data):
+    from school.models import Student
+
+    data = minimal_school_data
+    s1, s2 = data["students"]
+    s3 = Student.objects.create(sid="S-BULK-3", full_name="طالب 3", class_fk=data["classroom"])
+    d1, d2 = _dt.date(2024, 9, 1), _dt.date(2024, 9, 2)
+    for day in (d1, d2):
+        for p in (1, 2):
+            _mark(data, s1, day, p, "absent")
+            _mark(data, s3, day, p, "excused")
+    _mark(data, s2, d1, 1, "absent")
+    _mark(data, s2, d1, 2, "present")
+    return {**data, "s3": s3, "start": d1, "end": _dt.date(2024, 9, 5)}
+
+
+@pytest.mark.django_db
+def test_bulk_absence_days_match_single_computation(wing_absences):
+    from apps.attendance.services.absence_days import compute_absence_days, compute_absence_days_bulk
+
+    s1, s2 = wing_absences["students"]
+    s3 = wing_absences["s3"]
+    ids = [s1.id, s2.id, s3.id]
+    bulk = compute_absence_days_bulk(ids, wing_absences["start"], wing_absences["end"])
+    assert bulk[s1.id] == (0, 2)
+    assert bulk[s2.id] == (0, 0)
+    assert bulk[s3.id] == (2, 0)
+    for sid in ids:
+        assert bulk[sid] == compute_absence_days(sid, wing_absences["start"], wing_absences["end"])
+
+
+@pytest.mark.django_db
+def test_reserve_block_is_contiguous():
+    from apps.attendance.models_alerts import AlertNumberSequence
+
+    assert AlertNumberSequence.next_number("2099-2100") == 1
+    assert AlertNumberSequence.reserve_block("2099-2100", 5) == 2
+    assert AlertNumberSequence.next_number("2099-2100") == 7
+
+
+@pytest.mark.django_db
+def test_bulk_issue_endpoint_creates_alerts_and_is_idempotent(client, django_user_model, wing_absences):
+    from apps.attendance.models_alerts import AbsenceAlert
+
+    admin = django_user_model.objects.create_superuser(username="bulk_admin", email="b@example.com", password="x")
+    client.force_login(admin)
+    body = {
+        "wing": wing_absences["wing"].id,
+        "period_start": wing_absences["start"].isoformat(),
+        "period_end": wing_absences["end"].isoformat(),
+        "min_unexcused": 1,
+        "sync": True,
+    }
+    resp = client.post("/api/v1/absence-alerts/bulk-issue/", body, content_type="application/json")
+    assert resp.status_code == 201, resp.content
+    summary = resp.json()["summary"]
+    assert summary["created"] == 1
+    assert summary["below_threshold"] == 2
+
+    s1 = wing_absences["students"][0]
+    alert = AbsenceAlert.objects.get(student=s1)
+    assert (alert.unexcused_days, alert.excused_days, alert.status) == (2, 0, "issued")
+    assert alert.wing_id == wing_absences["wing"].id
+    assert alert.class_name == wing_absences["classroom"].name
+
+    # Re-running for the same week skips students that already have an alert
+    resp = client.post("/api/v1/absence-alerts/bulk-issue/", body, content_type="application/json")
+    assert resp.status_code == 200
+    assert resp.json()["summary"]["skipped_existing"] == 1
+    assert AbsenceAlert.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_issue_rechecks_under_lock_and_rejects_zero_threshold(
+    client, django_user_model, monkeypatch, wing_absences
+):
+    from apps.attendance.models_alerts import AbsenceAlert
+    from apps.attendance.services import bulk_alerts
+
+    admin = django_user_model.objects.create_superuser(username="bulk_lock", email="l@example.com", password="x")
+    client.force_login(admin)
+    body = {
+        "wing": wing_absences["wing"].id,
+        "period_start": wing_absences["start"].isoformat(),
+        "period_end": wing_absences["end"].isoformat(),
+        "min_unexcused": 0,
+        "sync": True,
+    }
+    assert client.post("/api/v1/absence-alerts/bulk-issue/", body, content_type="application/json").status_code == 400
+    with pytest.raises(ValueError):
+        bulk_alerts.issue_wing_alerts(
+            wing_absences["wing"].id, wing_absences["start"], wing_absences["end"], user_id=admin.id, min_unexcused=0
+        )
+
+    # A concurrent run issues s1's alert between the first read and the locked insert
+    s1 = wing_absences["students"][0]
+    real = bulk_alerts.compute_absence_days_bulk
+
+    def concurrent(ids, start, end):
+        monkeypatch.setattr(bulk_alerts, "compute_absence_days_bulk", real)
+        bulk_alerts.issue_wing_alerts(wing_absences["wing"].id, start, end, user_id=admin.id)
+        return real(ids, start, end)
+
+    monkeypatch.setattr(bulk_alerts, "compute_absence_days_bulk", concurrent)
+    summary = bulk_alerts.issue_wing_alerts(
+        wing_absences["wing"].id, wing_absences["start"], wing_absences["end"], user_id=admin.id
+    )
+    assert (summary["created"], summary["skipped_existing"]) == (0, 1)
+    assert AbsenceAlert.objects.filter(student=s1).count() == 1
@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.fixture()
+def alert_env(db, tmp_path, monkeypatch, settings):
+    from docx import Document
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from school.models import Student
+    from apps.attendance.models_alerts import AbsenceAlert
+    from apps.attendance.services import word_renderer
+
+    template = tmp_path / "tanbih.docx"
+    d = Document()
+    d.add_paragraph("تنبيه رقم {{ number }} - {{ student_name }} - {{ unexcused_days }}")
+    d.save(str(template))
+    monkeypatch.setattr(word_renderer, "TEMPLATE_PATH", template)
+    settings.ABSENCE_ALERT_DOCX_CACHE = "default"
+    cache.clear()
+
+    user = get_user_model().objects.create_user(username="docx_user", password="x")
+    student = Student.objects.create(full_name="طالب تنبيه")
+    alert = AbsenceAlert.objects.create(
+        number=1,
+        academic_year="2025-2026",
+        student=student,
+        class_name="10/1",
+        period_start=date(2025, 9, 1),
+        period_end=date(2025, 9, 30),
+        unexcused_days=3,
+        status="issued",
+        created_by=user,
+    )
+    return {"template": template, "alert": alert, "user": user, "student": student}
+
+
+@pytest.mark.django_db
+def test_second_render_is_served_from_cache(alert_env, monkeypatch):
+    from apps.attendance.services import docx_cache, word_renderer
+
+    first = docx_cache.get_alert_docx(alert_env["alert"])
+    assert not first.cached
+    assert first.template_hash
+
+    def _boom(*a, **k):
+        raise AssertionError("should not re-render")
+
+    monkeypatch.setattr(word_renderer, "render_alert_docx", _boom)
+    second = docx_cache.get_alert_docx(alert_env["alert"])
+    assert second.cached
+    assert second.content == first.content
+    assert second.template_hash == first.template_hash
+
+
+@pytest.mark.django_db
+def test_alert_update_or_template_change_misses_cache(alert_env):
+    from apps.attendance.models_alerts import AbsenceAlert
+    from apps.attendance.services import docx_cache
+    from docx import Document
+
+    alert = alert_env["alert"]
+    first = docx_cache.get_alert_docx(alert)
+    AbsenceAlert.objects.filter(pk=alert.pk).update(updated_at=alert.updated_at + timedelta(seconds=1))
+    alert.refresh_from_db()
+    assert not docx_cache.get_alert_docx(alert).cached
+
+    d = Document()
+    d.add_paragraph("قالب معدل {{ number }}")
+    d.save(str(alert_env["template"]))
+    changed = docx_cache.get_alert_docx(alert)
+    assert not changed.cached
+    assert changed.template_hash != first.template_hash
+
+
+@pytest.mark.django_db
+def test_prerender_warms_cache_and_skips_cached(alert_env):
+    from apps.attendance.models_alerts import AbsenceAlert
+    from apps.attendance.services import docx_cache
+
+    a1 = alert_env["alert"]
+    a2 = AbsenceAlert.objects.create(
+        number=2,
+        academic_year="2025-2026",
+        student=alert_env["student"],
+        class_name="10/1",
+        period_start=date(2025, 10, 1),
+        period_end=date(2025, 10, 31),
+        created_by=alert_env["user"],
+    )
+    summary = docx_cache.prerender_alerts([a1.id, a2.id], workers=1)
+    assert summary["rendered"] == 2 and summary["failed"] == 0
+    assert docx_cache.get_alert_docx(a1).cached
+    assert docx_cache.get_alert_docx(a2).cached
+    again = docx_cache.prerender_alerts([a1.id, a2.id], workers=1)
+    assert again["already_cached"] == 2 and again["rendered"] == 0
+
+
+@pytest.mark.django_db
+def test_docx_endpoint_reports_cache_status(client, alert_env):
+    from django.contrib.auth import get_user_model
+
+    admin = get_user_model().objects.create_superuser(username="docx_admin", email="d@example.com", password="x")
+    client.force_login(admin)
+    url = f"/api/v1/absence-alerts/{alert_env['alert'].id}/docx/"
+    r1 = client.get(url)
+    assert r1.status_code == 200, r1.content[:200]
+    assert r1["X-Docx-Cache"] == "miss"
+    r2 = client.get(url)
+    assert r2["X-Docx-Cache"] == "hit"
+    assert r2.content == r1.content
+
+
+@pytest.mark.django_db
+def test_prerender_endpoint_renders_serially_without_queue(client, alert_env, monkeypatch):
+    import django_rq
+    from django.contrib.auth import get_user_model
+
+    from apps.attendance.services import docx_cache
+
+    def no_queue(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    calls = []
+    monkeypatch.setattr(django_rq, "get_queue", no_queue)
+    monkeypatch.setattr(docx_cache, "prerender_wing_alerts", lambda wing_id, **kw: calls.append(kw) or {"rendered": 0})
+    client.force_login(get_user_model().objects.create_superuser(username="pre_admin", password="x"))
+    resp = client.post("/api/v1/absence-alerts/docx/prerender/", {"wing": 1}, content_type="application/json")
+    assert resp.status_code == 200, resp.content
+    assert resp.json()["queued"] is False and calls == [{"status": "issued", "workers": 1}]
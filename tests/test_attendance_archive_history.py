@@ -0,0 +1,88 @@
+import datetime as dt
+
+import pytest
+from django.core.management import call_command
+
+
+def _archive(rec, **overrides):
+    from school.models import AttendanceRecordArchive
+
+    fields = {
+        f.attname: getattr(rec, f.attname)
+        for f in rec._meta.concrete_fields
+        if f.attname != "id" and hasattr(AttendanceRecordArchive, f.attname)
+    }
+    fields["original_id"] = rec.id
+    fields.update(overrides)
+    return AttendanceRecordArchive.objects.create(**fields)
+
+
+@pytest.mark.django_db
+def test_history_unions_live_and_archived_rows(client, django_user_model, minimal_school_data):
+    from school.models import AttendanceRecord
+
+    data = minimal_school_data
+    live = AttendanceRecord.objects.get()
+    # An older record that was moved to the archive (and removed from the live table)
+    old = AttendanceRecord.objects.create(
+        student=data["students"][1],
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        term=data["term"],
+        date=dt.date(2023, 12, 25),
+        day_of_week=2,
+        period_number=2,
+        start_time=dt.time(9, 0),
+        end_time=dt.time(9, 45),
+        status="absent",
+    )
+    _archive(old)
+    old.delete()
+
+    user = django_user_model.objects.create_superuser(username="hist_arch", email="h@example.com", password="x")
+    client.force_login(user)
+    params = {"class_id": data["classroom"].id, "from": "2023-12-01", "to": "2024-12-31"}
+
+    for url in ("/api/v1/attendance/history/", "/api/v1/attendance/history-strict/"):
+        resp = client.get(url, params)
+        assert resp.status_code == 200, resp.content
+        body = resp.json()
+        assert body["count"] == 2
+        first, second = body["results"]
+        assert (first["date"], first["status"], first["student_name"]) == ("2023-12-25", "absent", "طالب 2")
+        assert first["subject_name"] == data["subject"].name_ar
+        assert (second["date"], second["student_id"]) == (live.date.isoformat(), live.student_id)
+
+    # Paging walks across both sources
+    resp = client.get("/api/v1/attendance/history/", {**params, "page": 2, "page_size": 1})
+    assert [r["date"] for r in resp.json()["results"]] == [live.date.isoformat()]
+
+
+@pytest.mark.django_db
+def test_history_teacher_scope_applies_to_archive(client, minimal_school_data):
+    from school.models import AttendanceRecord, Subject
+
+    data = minimal_school_data
+    rec = AttendanceRecord.objects.get()
+    other = Subject.objects.create(name_ar="علوم")
+    _archive(rec, date=dt.date(2023, 12, 20), original_id=10_001)
+    _archive(rec, date=dt.date(2023, 12, 21), original_id=10_002, subject_id=other.id)
+
+    client.force_login(data["teacher_user"])
+    resp = client.get(
+        "/api/v1/attendance/history/",
+        {"class_id": data["classroom"].id, "from": "2023-12-01", "to": "2024-12-31"},
+    )
+    assert resp.status_code == 200, resp.content
+    assert [r["date"] for r in resp.json()["results"]] == ["2023-12-20", rec.date.isoformat()]
+
+
+@pytest.mark.django_db
+def test_roll_partitions_is_noop_without_postgres(capsys):
+    from school.partitioning import ensure_month_partitions
+
+    report = ensure_month_partitions(months_ahead=2)
+    assert report.supported is False and report.created == []
+    call_command("roll_attendance_partitions", months_ahead=2, convert=True)
+    assert "not supported" in capsys.readouterr().out
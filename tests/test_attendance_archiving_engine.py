@@ -0,0 +1,86 @@
+import datetime as dt
+
+import pytest
+from django.core.management import call_command
+
+
+def _records(data, days):
+    from school.models import AttendanceRecord
+
+    base = dict(
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        term=data["term"],
+        day_of_week=1,
+        period_number=1,
+        start_time=dt.time(8, 0),
+        end_time=dt.time(8, 45),
+        status="late",
+        late_minutes=3,
+        source="teacher",
+    )
+    return [
+        AttendanceRecord.objects.create(student=data["students"][i % 2], date=day, **base) for i, day in enumerate(days)
+    ]
+
+
+@pytest.mark.django_db
+def test_chunks_move_rows_and_resume_from_checkpoint(minimal_school_data):
+    from school.models import AttendanceLateEvent, AttendanceRecord, AttendanceRecordArchive, ExitEvent, TaskLog
+    from school.services.archiving import archive_attendance_before
+    from school.services.late_events import reconcile_late_events
+
+    data = minimal_school_data
+    fixture_rec = AttendanceRecord.objects.get()
+    old = _records(data, [dt.date(2024, 9, d) for d in (1, 2, 3, 4, 5)])
+    recent = _records(data, [dt.date(2024, 11, 3)])
+    reconcile_late_events([r.id for r in old + recent])
+    exit_ev = ExitEvent.objects.create(
+        student=old[0].student, classroom=data["classroom"], date=old[0].date, reason="admin", attendance_record=old[0]
+    )
+    cutoff = dt.date(2024, 10, 1)
+    assert fixture_rec.date < cutoff
+    old = [fixture_rec] + old
+
+    # Interrupted pass: two chunks of two rows
+    first = archive_attendance_before(cutoff, chunk_size=2, max_chunks=2)
+    assert (first.moved, first.chunks, first.finished, first.remaining) == (4, 2, False, 2)
+    task = TaskLog.objects.get(pk=first.task_id)
+    assert task.status == "in_progress" and task.payload["last_id"] == first.last_id
+
+    # Next run picks up the checkpoint and finishes
+    second = archive_attendance_before(cutoff, chunk_size=2)
+    assert second.resumed and second.task_id == first.task_id
+    assert (second.moved, second.chunks, second.finished) == (6, 3, True)
+    # The rate counts only the rows of this run
+    assert second.moved_this_run == 2
+    if second.elapsed_s > second.throttled_s:
+        assert second.rows_per_s == round(2 / (second.elapsed_s - second.throttled_s), 1)
+    assert TaskLog.objects.get(pk=first.task_id).status == "done"
+
+    assert list(AttendanceRecord.objects.values_list("id", flat=True)) == [recent[0].id]
+    archived = AttendanceRecordArchive.objects.order_by("original_id")
+    assert [a.original_id for a in archived] == [r.id for r in old]
+    assert archived[1].status == "late" and archived[1].late_minutes == 3
+    assert archived[1].created_at == old[1].created_at
+    # Dependents follow on_delete: late events cascade, exit events are detached
+    assert list(AttendanceLateEvent.objects.values_list("attendance_record_id", flat=True)) == [recent[0].id]
+    exit_ev.refresh_from_db()
+    assert exit_ev.attendance_record_id is None
+
+
+@pytest.mark.django_db
+def test_command_dry_run_and_alias(minimal_school_data, capsys):
+    from school.models import AttendanceRecord, AttendanceRecordArchive
+
+    _records(minimal_school_data, [dt.date(2024, 9, 1), dt.date(2024, 9, 2)])
+    call_command("archive_attendance", before="2024-10-01", dry_run=True)
+    # the fixture's own record is older than the cutoff as well
+    assert "3 record(s) would be archived" in capsys.readouterr().out
+    assert AttendanceRecordArchive.objects.count() == 0
+
+    call_command("archive_old_attendance", before="2024-10-01", chunk_size=1)
+    out = capsys.readouterr().out
+    assert "Archived 3 record(s) in 3 chunk(s)" in out and "rows/s" in out
+    assert not AttendanceRecord.objects.filter(date__lt=dt.date(2024, 10, 1)).exists()
@@ -0,0 +1,109 @@
+import datetime as dt
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture()
+def report_data(client, django_user_model, minimal_school_data):
+    """Supervisor-approved absences for two students over ~10 weeks spanning two terms."""
+    from school.models import AttendanceRecord, Class, Student, Term
+
+    data = minimal_school_data
+    Term.objects.create(
+        name="Term 2",
+        start_date=dt.date(2025, 1, 1),
+        end_date=dt.date(2025, 3, 31),
+        academic_year=data["term"].academic_year,
+    )
+    other = Class.objects.create(name="10-2", wing=data["wing"])
+    s3 = Student.objects.create(full_name="طالب 3", class_fk=other, sid="1003")
+    first = AttendanceRecord.objects.get()
+    s1, s2 = data["students"]
+    day = dt.date(2024, 12, 1)
+    while day <= dt.date(2025, 2, 10):
+        for student, classroom, status in ((s1, data["classroom"], "absent"), (s2, data["classroom"], "excused")):
+            AttendanceRecord.objects.create(
+                student=student,
+                classroom=classroom,
+                subject=first.subject,
+                teacher=first.teacher,
+                term=data["term"],
+                date=day,
+                day_of_week=day.isoweekday() % 7 + 1,
+                period_number=1,
+                start_time=dt.time(8, 0),
+                end_time=dt.time(8, 45),
+                status=status,
+                source="supervisor",
+                locked=True,
+            )
+        AttendanceRecord.objects.create(
+            student=s3,
+            classroom=other,
+            subject=first.subject,
+            teacher=first.teacher,
+            term=data["term"],
+            date=day,
+            day_of_week=day.isoweekday() % 7 + 1,
+            period_number=1,
+            start_time=dt.time(8, 0),
+            end_time=dt.time(8, 45),
+            status="runaway",
+            source="supervisor",
+            locked=True,
+        )
+        day += dt.timedelta(days=7)
+    client.force_login(django_user_model.objects.create_superuser(username="rep", password="x"))
+    return client, data
+
+
+def _get(client, kind, **params):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get(f"/api/v1/wing/reports/{kind}/", params)
+    assert resp.status_code == 200, resp.content
+    return resp.json(), len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_reports_rows_per_bucket_with_constant_queries(report_data):
+    client, data = report_data
+
+    short, short_q = _get(client, "classes", **{"from": "2024-12-01", "to": "2024-12-08", "group_by": "day"})
+    long, long_q = _get(client, "classes", **{"from": "2024-12-01", "to": "2025-02-28", "group_by": "day"})
+    assert len(long["items"]) > len(short["items"]) == 4
+    assert long_q == short_q
+
+    row = next(r for r in short["items"] if r["class_name"] == "10-1" and r["date_bucket"] == "2024-12-01")
+    assert (row["total_students"], row["absent_excused"], row["absent_unexcused"]) == (2, 1, 1)
+    assert row["present"] == 0 and row["absent_pct"] == 100.0
+
+    weeks, _ = _get(client, "classes", **{"from": "2024-12-01", "to": "2025-02-28", "group_by": "week"})
+    assert {r["date_bucket"] for r in weeks["items"]} >= {"2024-11-25", "2025-02-03"}
+
+    terms, term_q = _get(client, "classes", **{"from": "2024-12-01", "to": "2025-02-28", "group_by": "term"})
+    # one extra query reads the terms; no per-term aggregation
+    assert term_q <= long_q + 1
+    by_term = {(r["class_name"], r["date_bucket"]): r for r in terms["items"]}
+    assert set(by_term) == {(c, t) for c in ("10-1", "10-2") for t in ("Term 1", "Term 2")}
+    assert by_term[("10-2", "Term 2")]["absent_unexcused"] == 1
+
+
+@pytest.mark.django_db
+def test_wing_and_school_rows_roll_up_from_classes(report_data):
+    client, data = report_data
+    params = {"from": "2024-12-01", "to": "2025-02-28", "group_by": "month", "include_pending": "1"}
+
+    classes, class_q = _get(client, "classes", **params)
+    wings, wing_q = _get(client, "wings", **params)
+    school, school_q = _get(client, "school", **params)
+    assert class_q == wing_q == school_q
+
+    months = sorted({r["date_bucket"] for r in classes["items"]})
+    assert [r["date_bucket"] for r in school["items"]] == months == ["2024-12-01", "2025-01-01", "2025-02-01"]
+    for month, srow in zip(months, school["items"]):
+        crows = [r for r in classes["items"] if r["date_bucket"] == month]
+        assert srow["absent_total"] == sum(r["absent_total"] for r in crows) == 3
+        assert srow["total_students"] == 3
+    assert [(w["wing_id"], w["total_students"]) for w in wings["items"]] == [(data["wing"].id, 3)] * 3
@@ -0,0 +1,173 @@
+import datetime as dt
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture()
+def submitted_day(client, django_user_model, minimal_school_data):
+    """Teacher submits two periods (3 records) of the fixture day; returns a logged-in wing supervisor."""
+    from school.models import AttendanceRecord, Staff
+
+    data = minimal_school_data
+    first = AttendanceRecord.objects.get()
+    base = {
+        "classroom": data["classroom"],
+        "subject": first.subject,
+        "teacher": first.teacher,
+        "term": data["term"],
+        "date": first.date,
+        "day_of_week": first.day_of_week,
+        "start_time": dt.time(8, 0),
+        "end_time": dt.time(8, 45),
+        "note": "",
+        "source": "teacher",
+    }
+    s1, s2 = data["students"]
+    AttendanceRecord.objects.create(student=s2, period_number=1, status="absent", **base)
+    AttendanceRecord.objects.create(student=s1, period_number=2, status="late", **base)
+
+    client.force_login(data["teacher_user"])
+    resp = client.post(
+        "/api/v1/attendance/submit/",
+        {"class_id": data["classroom"].id, "date": first.date.isoformat()},
+        content_type="application/json",
+    )
+    assert resp.status_code == 200, resp.content
+    assert resp.json()["submitted"] == 3 and resp.json()["periods"] == [1, 2]
+
+    sup_user = django_user_model.objects.create_user(username="wing_sup", password="x")
+    data["wing"].supervisor = Staff.objects.create(user=sup_user, full_name="Supervisor A")
+    data["wing"].save()
+    client.force_login(sup_user)
+    return client, data, first.date
+
+
+def _pending(client, day):
+    resp = client.get("/api/v1/wing/pending/", {"date": day.isoformat()})
+    assert resp.status_code == 200, resp.content
+    return resp.json()
+
+
+@pytest.mark.django_db
+def test_pending_lists_batches_and_decides_them_set_based(submitted_day):
+    from apps.attendance.models import AttendanceSubmission
+    from school.models import AttendanceRecord
+
+    client, data, day = submitted_day
+    pending = _pending(client, day)
+    assert pending["count"] == 3
+    batches = {b["period_number"]: b for b in pending["batches"]}
+    assert batches[1]["total"] == 2 and batches[1]["absent"] == 1 and batches[1]["pending"] == 2
+    assert batches[2]["late"] == 1
+    # No more note tagging
+    assert not AttendanceRecord.objects.filter(note__icontains="[SUBMITTED").exists()
+
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.post(
+            "/api/v1/wing/decide/",
+            {"action": "approve", "batch_ids": [batches[1]["id"]], "comment": "ok"},
+            content_type="application/json",
+        )
+    assert resp.status_code == 200, resp.content
+    assert resp.json()["updated"] == 2 and resp.json()["batches"] == 1
+    writes = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+    assert len(writes) == 2
+
+    approved = AttendanceRecord.objects.filter(period_number=1)
+    assert all(
+        r.locked and r.source == "supervisor" and r.note.startswith("[APPROVED by Supervisor A") for r in approved
+    )
+    assert AttendanceSubmission.objects.get(id=batches[1]["id"]).status == "approved"
+
+    after = _pending(client, day)
+    assert [b["period_number"] for b in after["batches"]] == [2]
+    assert {i["period_number"] for i in after["items"]} == {2}
+
+
+@pytest.mark.django_db
+def test_record_level_decisions_and_resubmission(submitted_day):
+    from apps.attendance.models import AttendanceSubmission
+    from school.models import AttendanceRecord
+
+    client, data, day = submitted_day
+    p1 = list(AttendanceRecord.objects.filter(period_number=1).order_by("id"))
+
+    # Approving one record of a batch leaves the batch pending for the other
+    resp = client.post(
+        "/api/v1/wing/decide/", {"action": "approve", "ids": [p1[0].id]}, content_type="application/json"
+    )
+    assert resp.json() == {
+        "updated": 1,
+        "batches": 0,
+        "action": "approve",
+        "results": [{"id": p1[0].id, "outcome": "approved"}],
+    }
+    assert [i["id"] for i in _pending(client, day)["items"] if i["period_number"] == 1] == [p1[1].id]
+
+    # Rejecting a record returns its batch to the teacher
+    p2 = AttendanceRecord.objects.get(period_number=2)
+    resp = client.post(
+        "/api/v1/wing/decide/",
+        {"action": "reject", "ids": [p2.id], "comment": "راجع التأخير"},
+        content_type="application/json",
+    )
+    assert resp.json()["batches"] == 1
+    batch = AttendanceSubmission.objects.get(period_number=2)
+    assert batch.status == "rejected" and batch.comment == "راجع التأخير" and batch.decided_by is not None
+    p2.refresh_from_db()
+    assert not p2.locked and p2.source == "teacher" and "REJECTED" in p2.note
+
+    # Re-submitting reopens the batch
+    client.force_login(data["teacher_user"])
+    client.post(
+        "/api/v1/attendance/submit/",
+        {"class_id": data["classroom"].id, "date": day.isoformat(), "period_number": 2},
+        content_type="application/json",
+    )
+    batch.refresh_from_db()
+    assert batch.status == "submitted" and batch.decided_by is None and batch.comment == ""
+
+
+@pytest.mark.django_db
+def test_malformed_ids_are_rejected_with_400(submitted_day):
+    client, _data, _day = submitted_day
+    for url, body in (
+        ("/api/v1/wing/decide/", {"action": "approve", "ids": ["1x"]}),
+        ("/api/v1/wing/decide/", {"action": "reject", "batch_ids": [None]}),
+        ("/api/v1/wing/set-excused/", {"ids": [1, {"id": 2}]}),
+    ):
+        resp = client.post(url, body, content_type="application/json")
+        assert resp.status_code == 400, (url, resp.content)
+
+
+@pytest.mark.django_db
+def test_backfill_opens_batches_only_for_unlocked_tagged_records(minimal_school_data):
+    import importlib
+
+    from django.apps import apps
+    from apps.attendance.models import AttendanceSubmission
+    from school.models import AttendanceRecord
+
+    first = AttendanceRecord.objects.get()
+    AttendanceRecord.objects.filter(pk=first.pk).update(note="[SUBMITTED @ 2024-08-19] متأخر", locked=False)
+    history = AttendanceRecord.objects.create(
+        **{
+            f.attname: getattr(first, f.attname)
+            for f in AttendanceRecord._meta.concrete_fields
+            if not f.primary_key and f.attname not in ("period_number", "note", "locked", "source")
+        },
+        period_number=2,
+        note="",
+        locked=True,
+        source="teacher",
+    )
+    migration = importlib.import_module("apps.attendance.migrations.0006_attendance_submissions")
+    migration.backfill_submissions(apps, None)
+
+    assert list(AttendanceSubmission.objects.values_list("period_number", flat=True)) == [first.period_number]
+    first.refresh_from_db()
+    assert first.note == "متأخر"
+    history.refresh_from_db()
+    assert history.locked and history.note == ""
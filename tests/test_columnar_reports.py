@@ -0,0 +1,96 @@
+import datetime as dt
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+DAY = dt.date(2024, 8, 19)
+
+
+def _rows(body):
+    """Columnar payload back to row dicts."""
+    cols = [body["columns"][f] for f in body["fields"]]
+    assert all(len(c) == body["count"] for c in cols)
+    return [dict(zip(body["fields"], values)) for values in zip(*cols)]
+
+
+@pytest.fixture()
+def supervisor_client(client, django_user_model, minimal_school_data):
+    from school.models import AttendanceRecord
+
+    data = minimal_school_data
+    first = AttendanceRecord.objects.get()
+    for period, status in ((1, "absent"), (2, "absent")):
+        AttendanceRecord.objects.create(
+            student=data["students"][1],
+            classroom=data["classroom"],
+            subject=first.subject,
+            teacher=first.teacher,
+            term=data["term"],
+            date=DAY,
+            day_of_week=2,
+            period_number=period,
+            start_time=dt.time(8, 0),
+            end_time=dt.time(8, 45),
+            status=status,
+            note="ملاحظة",
+            source="supervisor",
+            locked=True,
+        )
+    client.force_login(django_user_model.objects.create_superuser(username="col", password="x"))
+    return client, data
+
+
+@pytest.mark.django_db
+def test_columnar_mode_matches_the_dict_rows(supervisor_client):
+    client, data = supervisor_client
+    params = {"date": DAY.isoformat()}
+    for url, key in (
+        ("/api/v1/wing/reports/classes/", "items"),
+        ("/api/v1/wing/reports/wings/", "items"),
+        ("/api/v1/wing/reports/school/", "items"),
+        ("/api/v1/wing/daily-absences/", "items"),
+        ("/api/v1/attendance/history-strict/", "results"),
+    ):
+        if "history" in url:
+            params = {"class_id": data["classroom"].id, "from": DAY.isoformat(), "to": DAY.isoformat()}
+        plain = client.get(url, params)
+        columnar = client.get(url, {**params, "format": "columnar"})
+        assert plain.status_code == columnar.status_code == 200, (url, columnar.content)
+        assert columnar["Content-Type"].startswith("application/json")
+        body = columnar.json()
+        assert _rows(body) == plain.json()[key], url
+        assert body["count"] == len(plain.json()[key]) > 0, url
+
+    # Extra keys of each endpoint are kept next to the columns
+    body = client.get("/api/v1/wing/daily-absences/", {"date": DAY.isoformat(), "format": "columnar"}).json()
+    assert body["date"] == DAY.isoformat() and body["counts"]["unexcused"] == 1
+    body = client.get(
+        "/api/v1/attendance/history-strict/",
+        {"class_id": data["classroom"].id, "from": DAY.isoformat(), "to": DAY.isoformat(), "format": "columnar"},
+    ).json()
+    assert (body["total"], body["page"], body["class_id"]) == (3, 1, data["classroom"].id)
+    assert body["columns"]["note"].count("ملاحظة") == 2
+
+    # Empty scope still answers with (empty) columns
+    body = client.get("/api/v1/wing/reports/classes/", {"date": "2024-08-25", "format": "columnar"}).json()
+    assert body["count"] == 0 and set(body["columns"]) == set(body["fields"])
+
+
+def test_encoding_benchmark_columnar_is_smaller():
+    from apps.common import fastjson
+
+    assert fastjson.loads(fastjson.dumps({"d": DAY, "n": {1, 2}, "ar": "غياب"})) == {
+        "d": "2024-08-19",
+        "n": [1, 2],
+        "ar": "غياب",
+    }
+    assert "غياب".encode() in fastjson.dumps("غياب")
+
+    out = io.StringIO()
+    call_command("bench_report_encoding", "--sizes", "200", "--repeat", "1", "--format", "json", stdout=out)
+    report = json.loads(out.getvalue())
+    (row,) = report["rows"]
+    assert report["encoder"] in {"orjson", "stdlib"}
+    assert row["rows"] == 200 and row["columnar"]["bytes"] < row["dict"]["bytes"] / 2
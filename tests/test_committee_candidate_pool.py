@@ -0,0 +1,112 @@
+import pytest
+from django.utils import timezone
+
+
+@pytest.fixture()
+def committee_env(db):
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from school.models import Staff, Student
+    from discipline.models import BehaviorLevel, Violation, Incident
+
+    cache.clear()
+    User = get_user_model()
+    admin = User.objects.create_superuser(username="cp_admin", email="cp@example.com", password="x")
+    staff_users = []
+    for n in range(5):
+        u = User.objects.create_user(username=f"cp_staff{n}", password="x", first_name=f"م{n}")
+        Staff.objects.create(user=u, full_name=f"موظف {n}", role="teacher", job_title="معلم")
+        staff_users.append(u)
+    student = Student.objects.create(sid="CP-1", full_name="طالب لجنة")
+    lvl, _ = BehaviorLevel.objects.get_or_create(code=3, defaults={"name": "الدرجة الثالثة"})
+    viol = Violation.objects.create(level=lvl, code="T-CP", category="اختبار", severity=3)
+    inc = Incident.objects.create(
+        violation=viol,
+        student=student,
+        reporter=staff_users[0],
+        occurred_at=timezone.now(),
+        severity=3,
+        committee_required=True,
+        status="under_review",
+    )
+    return {"admin": admin, "staff_users": staff_users, "inc": inc}
+
+
+@pytest.mark.django_db
+def test_suggest_uses_cached_pool_and_excludes_reporter(client, committee_env, django_assert_max_num_queries):
+    client.force_login(committee_env["admin"])
+    url = f"/api/discipline/incidents/{committee_env['inc'].id}/committee-suggest/"
+    first = client.get(url, {"member_count": 2})
+    assert first.status_code == 200, first.content
+    data = first.json()
+    reporter_id = committee_env["staff_users"][0].id
+    ids = {c["id"] for c in data["candidates"]}
+    assert reporter_id not in ids and len(ids) == 4
+    assert data["panel"]["chair"]["id"] not in {m["id"] for m in data["panel"]["members"]}
+
+    # Pool served from cache: no Staff/User scans on repeat calls
+    with django_assert_max_num_queries(6):
+        again = client.get(url, {"member_count": 2})
+    assert again.json()["panel"] == data["panel"]
+
+
+@pytest.mark.django_db
+def test_pool_is_invalidated_on_staff_change(client, committee_env):
+    from django.contrib.auth import get_user_model
+    from school.models import Staff
+
+    client.force_login(committee_env["admin"])
+    url = f"/api/discipline/incidents/{committee_env['inc'].id}/committee-candidates/"
+    assert client.get(url).json()["total"] == 5
+    u = get_user_model().objects.create_user(username="cp_new", password="x")
+    Staff.objects.create(user=u, full_name="موظف جديد بحث", role="teacher")
+    resp = client.get(url, {"q": "جديد"})
+    assert resp.json()["total"] == 1
+    assert resp.json()["items"][0]["id"] == u.id
+
+
+@pytest.mark.django_db
+def test_dashboard_reports_quorum_per_scheduled_incident(client, committee_env):
+    from discipline.models import IncidentAuditLog, IncidentCommittee, IncidentCommitteeMember
+
+    chair, m1, m2 = committee_env["staff_users"][1:4]
+    inc = committee_env["inc"]
+    committee = IncidentCommittee.objects.create(incident=inc, chair=chair)
+    IncidentCommitteeMember.objects.create(committee=committee, user=m1)
+    IncidentCommitteeMember.objects.create(committee=committee, user=m2)
+    for voter in (chair, m1):
+        IncidentAuditLog.objects.create(
+            incident=inc, actor=voter, action="update", meta={"action": "committee_vote", "decision": "approve"}
+        )
+
+    client.force_login(committee_env["admin"])
+    resp = client.get("/api/discipline/incidents/committee-dashboard/")
+    assert resp.status_code == 200, resp.content
+    items = resp.json()["queues"]["scheduled_pending_decision"]
+    assert len(items) == 1
+    quorum = items[0]["quorum"]
+    assert quorum["total_voters"] == 3
+    assert quorum["quorum"] == 2 and quorum["quorum_met"] is True
+    assert quorum["majority"] == "approve"
+
+
+@pytest.mark.django_db
+def test_pool_load_follows_incident_status(committee_env, django_assert_num_queries):
+    from discipline.committee_pool import get_candidate_pool
+    from discipline.models import IncidentCommittee
+
+    chair = committee_env["staff_users"][1]
+    inc = committee_env["inc"]
+    IncidentCommittee.objects.create(incident=inc, chair=chair)
+
+    def load():
+        return next(c["load"] for c in get_candidate_pool()["candidates"] if c["id"] == chair.id)
+
+    assert load() == 1
+    inc.severity = 2
+    inc.save(update_fields=["severity"])  # no status change: the cached pool is kept
+    with django_assert_num_queries(0):
+        assert load() == 1
+    inc.status = "closed"
+    inc.save()
+    assert load() == 0
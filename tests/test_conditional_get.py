@@ -0,0 +1,88 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture()
+def teacher_client(client, minimal_school_data):
+    from school.models import TeachingAssignment
+
+    data = minimal_school_data
+    assignment = TeachingAssignment.objects.get(teacher=data["teacher_staff"], classroom=data["classroom"])
+    client.force_login(data["teacher_user"])
+    return client, data, assignment
+
+
+@pytest.mark.django_db
+def test_teacher_classes_answers_304_until_an_assignment_changes(teacher_client):
+    client, data, assignment = teacher_client
+    url = "/api/v1/attendance/teacher/classes/"
+
+    first = client.get(url)
+    assert first.status_code == 200, first.content
+    etag = first["ETag"]
+    assert etag.startswith('W/"') and "no-cache" in first["Cache-Control"]
+
+    with CaptureQueriesContext(connection) as ctx:
+        cached = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert cached.status_code == 304 and cached["ETag"] == etag
+    # Only session/user loading: the view body is skipped entirely
+    assert len(ctx.captured_queries) <= 2
+
+    assignment.no_classes_weekly += 1
+    assignment.save()
+    fresh = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert fresh.status_code == 200 and fresh["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_teacher_weekly_etag_follows_timetable_edits(teacher_client):
+    from school.models import TimetableEntry
+
+    client, data, _ = teacher_client
+    url = "/api/v1/attendance/timetable/teacher/weekly/"
+
+    first = client.get(url)
+    assert first.status_code == 200, first.content
+    etag = first["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    TimetableEntry.objects.create(
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        day_of_week=2,
+        period_number=3,
+        term=data["term"],
+    )
+    again = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert again.status_code == 200 and again["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_violation_catalog_revalidates_and_invalidates_on_save(client, django_user_model):
+    from discipline.models import BehaviorLevel, Violation
+
+    level = BehaviorLevel.objects.create(code=1, name="L1")
+    Violation.objects.create(level=level, code="V-1", category="تأخر", severity=1)
+    user = django_user_model.objects.create_user(username="cond_get", password="x")
+    client.force_login(user)
+
+    url = "/api/discipline/violations/"
+    first = client.get(url)
+    assert first.status_code == 200, first.content
+    etag = first["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    # The catalog is not user-specific: another user's cached copy stays valid
+    other = django_user_model.objects.create_user(username="cond_get_2", password="x")
+    client.force_login(other)
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    level.name = "المستوى الأول"
+    level.save()
+    after = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert after.status_code == 200 and after["ETag"] != etag
+    assert after.json()
+
+    levels = client.get("/api/discipline/behavior-levels/")
+    assert levels.status_code == 200 and levels["ETag"] != after["ETag"]
@@ -0,0 +1,100 @@
+import hashlib
+import os
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.utils import timezone
+
+
+@pytest.fixture()
+def incident(db, settings, tmp_path):
+    from django.contrib.auth import get_user_model
+    from school.models import Student
+    from discipline.models import BehaviorLevel, Violation, Incident
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    user = get_user_model().objects.create_user(username="cas_user", password="x")
+    student = Student.objects.create(full_name="طالب تخزين")
+    lvl, _ = BehaviorLevel.objects.get_or_create(code=1, defaults={"name": "الدرجة الأولى"})
+    viol = Violation.objects.create(level=lvl, code="T-CAS", category="اختبار", severity=1)
+    return Incident.objects.create(
+        violation=viol, student=student, reporter=user, occurred_at=timezone.now(), severity=1
+    )
+
+
+def _attach(incident, payload: bytes, name: str = "scan.pdf"):
+    from discipline.models import IncidentAttachment
+
+    att = IncidentAttachment(incident=incident, kind="other", mime="application/pdf", size=len(payload))
+    att.file.save(name, ContentFile(payload), save=False)
+    att.save()
+    return att
+
+
+@pytest.mark.django_db
+def test_identical_uploads_share_one_blob_and_fill_sha256(incident):
+    from school.models import StoredBlob
+
+    payload = b"%PDF-1.4 same scanned pledge"
+    digest = hashlib.sha256(payload).hexdigest()
+    a1 = _attach(incident, payload, "a.pdf")
+    a2 = _attach(incident, payload, "b.pdf")
+
+    assert a1.file.name == a2.file.name == f"blobs/{digest[:2]}/{digest[2:4]}/{digest}"
+    assert a1.sha256 == a2.sha256 == digest
+    blob = StoredBlob.objects.get(sha256=digest)
+    assert blob.ref_count == 2
+    assert blob.size == len(payload)
+    assert os.path.exists(a1.file.path)
+
+
+@pytest.mark.django_db
+def test_delete_releases_reference_and_gc_removes_orphan(incident):
+    from school.models import StoredBlob
+
+    a1 = _attach(incident, b"one copy")
+    a2 = _attach(incident, b"one copy")
+    path = a1.file.path
+
+    a1.delete()
+    assert StoredBlob.objects.get(name=a2.file.name).ref_count == 1
+    call_command("gc_blobs", grace_hours=0)
+    assert os.path.exists(path)
+
+    a2.delete()
+    assert StoredBlob.objects.get(name=a2.file.name).ref_count == 0
+    call_command("gc_blobs", grace_hours=0, dry_run=True)
+    assert os.path.exists(path)
+    call_command("gc_blobs", grace_hours=0)
+    assert not os.path.exists(path)
+    assert not StoredBlob.objects.exists()
+
+
+@pytest.mark.django_db
+def test_gc_recount_repairs_drift(incident):
+    from school.models import StoredBlob
+
+    att = _attach(incident, b"drifted")
+    StoredBlob.objects.filter(name=att.file.name).update(ref_count=0)
+    call_command("gc_blobs", recount=True, grace_hours=0)
+    assert StoredBlob.objects.get(name=att.file.name).ref_count == 1
+    assert os.path.exists(att.file.path)
+
+
+@pytest.mark.django_db
+def test_replacing_file_releases_previous_blob(incident, django_capture_on_commit_callbacks):
+    from school.models import StoredBlob
+
+    att = _attach(incident, b"first scan")
+    old_name = att.file.name
+    with django_capture_on_commit_callbacks(execute=True):
+        att.file.save("second.pdf", ContentFile(b"second scan"), save=False)
+        att.save()
+    assert StoredBlob.objects.get(name=old_name).ref_count == 0
+    assert StoredBlob.objects.get(name=att.file.name).ref_count == 1
+
+    # Saving again without touching the file keeps the count
+    with django_capture_on_commit_callbacks(execute=True):
+        att.save()
+    assert StoredBlob.objects.get(name=att.file.name).ref_count == 1
@@ -0,0 +1,142 @@
+import datetime as dt
+import io
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+DAY = dt.date(2024, 8, 19)
+
+
+def _record(data, student, day, period, status):
+    from school.models import AttendanceRecord
+
+    return AttendanceRecord.objects.create(
+        student=student,
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        term=data["term"],
+        date=day,
+        day_of_week=day.isoweekday() % 7 + 1,
+        period_number=period,
+        start_time=dt.time(8, 0),
+        end_time=dt.time(8, 45),
+        status=status,
+    )
+
+
+@pytest.fixture()
+def day_data(minimal_school_data):
+    data = minimal_school_data
+    s1, s2 = data["students"]
+    _record(data, s1, DAY, 2, "absent")  # period 1 is "present" in the fixture
+    _record(data, s2, DAY, 1, "absent")
+    _record(data, s2, DAY, 2, "runaway")
+    _record(data, s2, DAY, 5, "present")
+    for day in (DAY + dt.timedelta(days=1), DAY + dt.timedelta(days=2)):
+        _record(data, s2, day, 1, "excused")
+        _record(data, s2, day, 2, "excused")
+    return data
+
+
+@pytest.mark.django_db
+def test_states_are_materialized_on_save_and_read_in_one_query(client, django_user_model, day_data):
+    from school.models import AttendanceDaily
+
+    s1, s2 = day_data["students"]
+    rows = {r.student_id: r for r in AttendanceDaily.objects.filter(date=DAY)}
+    assert (rows[s1.id].p1_status, rows[s1.id].p2_status, rows[s1.id].state) == ("present", "absent", "none")
+    assert (rows[s2.id].state, rows[s2.id].absent_periods, rows[s2.id].present_periods) == ("unexcused", 1, 1)
+    assert rows[s2.id].wing_id == day_data["wing"].id
+
+    client.force_login(django_user_model.objects.create_superuser(username="sup", password="x"))
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get("/api/v1/wing/daily-absences/", {"date": DAY.isoformat()})
+    assert resp.status_code == 200, resp.content
+    body = resp.json()
+    assert body["counts"] == {"excused": 0, "unexcused": 1, "none": 1}
+    assert [(i["student_id"], i["p1"], i["p2"], i["state"]) for i in body["items"]] == [
+        (s2.id, "absent", "runaway", "unexcused"),
+        (s1.id, "present", "absent", "none"),
+    ]
+    assert sum("attendancerecord" in q["sql"] for q in ctx.captured_queries) == 0
+    assert sum("school_attendancedaily" in q["sql"] for q in ctx.captured_queries) == 1
+
+    csv_body = client.get("/api/v1/wing/daily-absences/export/", {"date": DAY.isoformat()}).content.decode("utf-8-sig")
+    assert csv_body.splitlines()[1].endswith("absent,runaway,unexcused")
+
+    # Supervisor excuse through the API flips the materialized state
+    ids = list(s2.attendancerecord_set.filter(date=DAY, period_number__in=[1, 2]).values_list("id", flat=True))
+    resp = client.post("/api/v1/wing/set-excused/", {"ids": ids}, content_type="application/json")
+    assert resp.status_code == 200, resp.content
+    assert AttendanceDaily.objects.get(student=s2, date=DAY).state == "excused"
+
+
+@pytest.mark.django_db
+def test_absence_days_and_finalize_read_the_daily_states(day_data):
+    from discipline.models import Absence
+    from school.models import AttendanceDaily, AttendancePolicy, SchoolHoliday
+
+    from apps.attendance.services.absence_days import compute_absence_days
+
+    _s1, s2 = day_data["students"]
+    end = DAY + dt.timedelta(days=6)
+    assert compute_absence_days(s2.id, DAY, end) == (2, 1)
+    SchoolHoliday.objects.create(title="عطلة", start=DAY + dt.timedelta(days=2), end=end)
+    assert compute_absence_days(s2.id, DAY, end) == (1, 1)
+
+    call_command("attendance_finalize_day", "--date", DAY.isoformat(), stdout=io.StringIO())
+    assert list(Absence.objects.filter(date=DAY).values_list("student_id", flat=True)) == [s2.id]
+
+    # A policy change (first two periods = 2 and 5) applies after a rebuild
+    AttendancePolicy.objects.create(
+        term=day_data["term"], first_two_periods_numbers=[2, 5], working_days=[1, 2, 3, 4, 5]
+    )
+    call_command("rebuild_attendance_daily", "--from", DAY.isoformat(), "--to", DAY.isoformat(), stdout=io.StringIO())
+    row = AttendanceDaily.objects.get(student=s2, date=DAY)
+    assert (row.p1_status, row.p2_status, row.state) == ("runaway", "present", "none")
+
+
+@pytest.mark.django_db
+def test_bulk_save_refreshes_each_class_day_once(monkeypatch, minimal_school_data):
+    from school.models import AttendanceDaily
+
+    from apps.attendance.services import daily_states
+    from apps.attendance.services.attendance import bulk_save_attendance
+
+    calls = []
+    real = daily_states.refresh_daily_states
+    monkeypatch.setattr(daily_states, "refresh_daily_states", lambda c, d: calls.append((c, d)) or real(c, d))
+    s1, s2 = minimal_school_data["students"]
+    classroom = minimal_school_data["classroom"]
+    bulk_save_attendance(
+        class_id=classroom.id,
+        dt=DAY,
+        records=[{"student_id": s1.id, "status": "absent"}, {"student_id": s2.id, "status": "excused"}],
+        actor_user_id=minimal_school_data["teacher_user"].id,
+        period_number=2,
+    )
+    assert calls == [(classroom.id, DAY)]
+    assert AttendanceDaily.objects.filter(date=DAY).count() == 2
+
+
+@pytest.mark.django_db
+def test_migration_backfills_existing_records(day_data):
+    import importlib
+
+    from django.apps import apps
+    from school.models import AttendanceDaily
+
+    _s1, s2 = day_data["students"]
+    AttendanceDaily.objects.all().delete()  # records saved before the daily states existed
+    migration = importlib.import_module("school.migrations.0050_backfill_attendance_daily")
+    migration.backfill_daily_states(apps, None)
+
+    assert AttendanceDaily.objects.filter(date__gte=DAY).count() == 4
+    assert [r.state for r in AttendanceDaily.objects.filter(student=s2).order_by("date")] == [
+        "unexcused",
+        "excused",
+        "excused",
+    ]
@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connections
+
+from core import settings_base
+
+PG = {"ENGINE": "django.db.backends.postgresql", "NAME": "sh_school", "OPTIONS": {"connect_timeout": 5}}
+
+
+def test_connection_reuse_modes_and_role_sizing(monkeypatch):
+    monkeypatch.setattr(settings_base, "DB_CONN_MODE", "persistent")
+    db = settings_base._db_connection_reuse({**PG, "OPTIONS": {}})
+    assert db["CONN_MAX_AGE"] == 60 and db["CONN_HEALTH_CHECKS"] is True
+
+    monkeypatch.setattr(settings_base, "DB_CONN_MODE", "pool")
+    monkeypatch.setattr(settings_base, "DB_ROLE", "worker")
+    monkeypatch.setattr(settings_base.importlib.util, "find_spec", lambda name: object())
+    db = settings_base._db_connection_reuse({**PG, "OPTIONS": {}})
+    assert db["CONN_MAX_AGE"] == 0
+    assert (db["OPTIONS"]["pool"]["min_size"], db["OPTIONS"]["pool"]["max_size"]) == (1, 4)
+
+    # Without psycopg_pool installed the pool mode degrades to connect-per-request (ASGI-safe),
+    # never to persistent connections
+    monkeypatch.setattr(settings_base.importlib.util, "find_spec", lambda name: None)
+    db = settings_base._db_connection_reuse({**PG, "OPTIONS": {}})
+    assert "pool" not in db["OPTIONS"] and db["CONN_MAX_AGE"] == 0
+
+    sqlite = {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+    assert settings_base._db_connection_reuse(dict(sqlite)) == sqlite
+
+
+@pytest.mark.django_db
+def test_benchmark_counts_fewer_connects_with_persistent_connections(tmp_path):
+    from school.management.commands.bench_db_connections import _run, _scenario_settings
+
+    # A file database: SQLite never really closes in-memory connections
+    base = {**connections["default"].settings_dict, "NAME": str(tmp_path / "bench.sqlite3")}
+    off = _run(_scenario_settings(base, "off"), "bench-off", 40, 2, "SELECT 1")
+    persistent = _run({**_scenario_settings(base, "off"), "CONN_MAX_AGE": 60}, "bench-persistent", 40, 2, "SELECT 1")
+    assert off["connects"] == 40
+    assert persistent["connects"] == 2  # one per thread
+
+    out = io.StringIO()
+    call_command("bench_db_connections", "--requests", "10", "--threads", "1", "--format", "json", stdout=out)
+    assert json.loads(out.getvalue())["off"]["requests"] == 10
+
+
+@pytest.mark.django_db
+def test_stats_in_healthcheck_and_diagnostics_endpoint(client, django_user_model):
+    out = io.StringIO()
+    call_command("healthcheck", "--format", "json", stdout=out)
+    stats = json.loads(out.getvalue())["database"]["connections"]
+    assert stats["alias"] == "default" and stats["mode"] in ("off", "persistent", "pool")
+
+    client.force_login(django_user_model.objects.create_user(username="ops", password="x", is_staff=True))
+    resp = client.get("/healthz/db")
+    assert resp.status_code == 200
+    body = resp.json()["default"]
+    assert {"mode", "role", "connects", "pool"} <= set(body)
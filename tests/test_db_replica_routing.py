@@ -0,0 +1,75 @@
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+from apps.common import db_routing
+
+
+@pytest.fixture()
+def replica(settings):
+    settings.DATABASE_REPLICA_ALIAS = "replica"
+    settings.DATABASE_REPLICA_STICKY_S = 30
+    db_routing.reset_routing_state()
+    yield
+    db_routing.reset_routing_state()
+
+
+def _reports(client):
+    with CaptureQueriesContext(connections["replica"]) as rep:
+        resp = client.get("/api/discipline/incidents/overview/", {"days": 30})
+    assert resp.status_code == 200, resp.content
+    return resp.json(), [q["sql"] for q in rep.captured_queries]
+
+
+# transaction=True: the mirror alias is a second SQLite connection and only sees committed rows
+@pytest.mark.django_db(databases=["default", "replica"], transaction=True)
+def test_report_reads_go_to_replica_until_the_user_writes(replica, client, django_user_model, minimal_school_data):
+    from django.core.cache import cache
+
+    admin = django_user_model.objects.create_superuser(username="rep_admin", password="x")
+    client.force_login(admin)
+    cache.delete(f"{db_routing.STICKY_PREFIX}{admin.pk}")
+
+    _, replica_sql = _reports(client)
+    assert any("discipline_incident" in sql for sql in replica_sql)
+
+    # A write by the same user pins them to the primary (read-your-writes)
+    resp = client.post(
+        "/api/v1/attendance/submit/",
+        {"class_id": minimal_school_data["classroom"].id, "date": "2024-08-19"},
+        content_type="application/json",
+    )
+    assert resp.status_code == 200, resp.content
+    assert db_routing.is_pinned_to_primary(type("R", (), {"user": admin})())
+    _, replica_sql = _reports(client)
+    assert replica_sql == []
+
+
+@pytest.mark.django_db
+def test_router_falls_back_to_primary(settings, minimal_school_data):
+    from school.models import AttendanceRecord
+
+    settings.DATABASE_REPLICA_ALIAS = None
+    db_routing.reset_routing_state()
+    assert db_routing.replica_reads(lambda: AttendanceRecord.objects.all().db)() == "default"
+
+    settings.DATABASE_REPLICA_ALIAS = "replica"
+    assert db_routing.replica_reads(lambda: AttendanceRecord.objects.all().db)() == "replica"
+    assert AttendanceRecord.objects.all().db == "default"
+    # A write inside the request sends the following reads back to the primary
+    minimal_school_data["wing"].save()
+    assert db_routing.replica_reads(lambda: AttendanceRecord.objects.all().db)() == "default"
+    db_routing.reset_routing_state()
+
+
+@pytest.mark.django_db
+def test_write_outside_a_request_pins_reads_only_for_the_sticky_window(replica, monkeypatch, minimal_school_data):
+    from school.models import AttendanceRecord
+
+    # RQ job / management command: no middleware resets the write marker
+    now = [1000.0]
+    monkeypatch.setattr(db_routing.time, "monotonic", lambda: now[0])
+    minimal_school_data["wing"].save()
+    assert db_routing.replica_reads(lambda: AttendanceRecord.objects.all().db)() == "default"
+    now[0] += 31  # DATABASE_REPLICA_STICKY_S = 30
+    assert db_routing.replica_reads(lambda: AttendanceRecord.objects.all().db)() == "replica"
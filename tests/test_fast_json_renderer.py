@@ -0,0 +1,94 @@
+import datetime as dt
+import io
+import json
+import uuid
+from decimal import Decimal
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+
+def test_fast_renderer_matches_drf_json_for_api_types():
+    from rest_framework.exceptions import ErrorDetail
+    from rest_framework.renderers import JSONRenderer
+
+    from core.renderers import FastJSONRenderer, iter_json_list
+
+    data = {
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "at": timezone.make_aware(dt.datetime(2024, 8, 19, 7, 30, 15, 250000), dt.timezone.utc),
+        "date": dt.date(2024, 8, 19),
+        "points": Decimal("2.50"),
+        "label": gettext_lazy("غياب"),
+        "detail": ErrorDetail("غير مسموح", code="denied"),
+        "items": [{"n": 1, "name": "طالب"}],
+    }
+    fast = FastJSONRenderer().render(data)
+    assert json.loads(fast) == json.loads(JSONRenderer().render(data))
+    assert "طالب".encode() in fast
+    assert FastJSONRenderer().render(None) == b""
+    assert b"\n  " in FastJSONRenderer().render(data, "application/json; indent=2")
+
+    rows = [{"i": i, "name": f"طالب {i}"} for i in range(7)]
+    for envelope in ({}, {"date": dt.date(2024, 8, 19)}):
+        chunks = list(iter_json_list(envelope, "items", rows, chunk_size=3))
+        assert len(chunks) == 5
+        assert json.loads(b"".join(chunks)) == json.loads(FastJSONRenderer().render({**envelope, "items": rows}))
+    assert json.loads(b"".join(iter_json_list({"a": 1}, "items", []))) == {"a": 1, "items": []}
+
+
+@pytest.mark.django_db
+def test_large_lists_are_streamed_with_the_same_body(settings, client, django_user_model, minimal_school_data):
+    from asgiref.sync import async_to_sync
+    from django.http import StreamingHttpResponse
+    from django.test import AsyncClient
+
+    client.force_login(django_user_model.objects.create_superuser(username="stream", password="x"))
+    url, params = "/api/v1/wing/daily-absences/", {"date": "2024-08-19"}
+
+    settings.JSON_STREAM_THRESHOLD = 0
+    plain = client.get(url, params)
+    settings.JSON_STREAM_THRESHOLD = 1
+    streamed = client.get(url, params)
+    assert plain.status_code == streamed.status_code == 200
+    assert not isinstance(plain, StreamingHttpResponse) and isinstance(streamed, StreamingHttpResponse)
+    assert streamed["Content-Type"] == "application/json"
+    assert json.loads(b"".join(streamed.streaming_content)) == plain.json()
+    assert len(plain.json()["items"]) == 1
+    # APIView.finalize_response still applies the view headers to the streamed response
+    assert streamed["Vary"] == plain["Vary"] and streamed["Allow"] == plain["Allow"]
+
+    # Under ASGI the body is an async iterator (a sync one would be buffered whole by Django)
+    asgi_client = AsyncClient()
+    asgi_client.force_login(django_user_model.objects.get(username="stream"))
+
+    async def fetch_asgi():
+        response = await asgi_client.get(url, params)
+        return response, b"".join([chunk async for chunk in response.streaming_content])
+
+    asgi, body = async_to_sync(fetch_asgi)()
+    assert asgi.is_async and json.loads(body) == plain.json()
+
+    # Browsable API and errors keep the regular rendering path
+    assert "text/html" in client.get(url, {**params, "format": "api"})["Content-Type"]
+    assert client.get(url, {"date": "bad"}).status_code == 400
+
+
+def test_json_encoding_benchmark():
+    out = io.StringIO()
+    call_command("bench_json_encoding", "--sizes", "50", "--repeat", "1", "--format", "json", stdout=out)
+    report = json.loads(out.getvalue())
+    by_key = {(r["payload"], r["encoder"]): r for r in report["rows"]}
+    assert set(by_key) == {
+        ("incidents", "drf"),
+        ("incidents", "fast"),
+        ("incidents", "stream"),
+        ("timetable", "drf"),
+        ("timetable", "fast"),
+        ("reports", "drf"),
+        ("reports", "fast"),
+        ("reports", "stream"),
+    }
+    assert by_key[("reports", "fast")]["bytes"] == by_key[("reports", "stream")]["bytes"]
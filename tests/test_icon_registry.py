@@ -0,0 +1,49 @@
+import pytest
+
+BELL = '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 16 16" fill="none"><path d="M1 1h14"/></svg>'
+STAR = '<svg xmlns="http://www.w3.org/2000/svg" width="24" height="24"><circle r="4"/></svg>'
+
+
+@pytest.fixture()
+def icon_dir(tmp_path, settings):
+    (tmp_path / "Bell.svg").write_text(BELL)
+    (tmp_path / "star.svg").write_text(STAR)
+    settings.ICON_DIRS = [str(tmp_path)]
+    settings.ICONS_AUTORELOAD = True
+    settings.ICONS_RELOAD_INTERVAL_S = 0
+    return tmp_path
+
+
+def test_icons_are_served_from_memory_with_immutable_versioned_urls(client, icon_dir):
+    manifest = client.get("/data/icons/manifest.json")
+    assert manifest.status_code == 200
+    versions = manifest.json()
+    assert set(versions) == {"Bell", "star"}
+    assert client.get("/data/icons/manifest.json", HTTP_IF_NONE_MATCH=manifest["ETag"]).status_code == 304
+
+    # Case-insensitive lookup, versioned URL is immutable
+    resp = client.get("/data/icons/bell.svg", {"v": versions["Bell"]["v"]})
+    assert resp.status_code == 200 and resp.content == BELL.encode()
+    assert "immutable" in resp["Cache-Control"]
+    assert client.get("/data/icons/bell.svg", HTTP_IF_NONE_MATCH=resp["ETag"]).status_code == 304
+    assert "immutable" not in client.get("/data/icons/star.svg")["Cache-Control"]
+    assert client.get("/data/icons/missing.svg").status_code == 404
+
+    # Edits are picked up in autoreload mode and change the versions
+    (icon_dir / "star.svg").write_text(STAR.replace('r="4"', 'r="6"'))
+    after = client.get("/data/icons/manifest.json").json()
+    assert after["star"]["v"] != versions["star"]["v"] and after["Bell"] == versions["Bell"]
+
+
+def test_sprite_combines_icons_into_symbols(client, icon_dir):
+    version = client.get("/data/icons/manifest.json")["X-Icons-Version"]
+
+    sprite = client.get("/data/icons/sprite.svg", {"v": version})
+    assert sprite.status_code == 200 and "immutable" in sprite["Cache-Control"]
+    body = sprite.content.decode()
+    assert '<symbol id="sc-Bell" viewBox="0 0 16 16" fill="none"><path d="M1 1h14"/></symbol>' in body
+    assert '<symbol id="sc-star" viewBox="0 0 24 24"><circle r="4"/></symbol>' in body
+    assert client.get("/data/icons/sprite.svg", HTTP_IF_NONE_MATCH=sprite["ETag"]).status_code == 304
+
+    subset = client.get("/data/icons/sprite.svg", {"names": "star,unknown"}).content.decode()
+    assert "sc-star" in subset and "sc-Bell" not in subset
@@ -0,0 +1,106 @@
+import hashlib
+
+import pytest
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+
+@pytest.fixture()
+def attachment(db, settings, tmp_path):
+    from django.contrib.auth import get_user_model
+    from school.models import Student
+    from discipline.models import BehaviorLevel, Violation, Incident, IncidentAttachment
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    User = get_user_model()
+    admin = User.objects.create_superuser(username="att_admin", email="a@example.com", password="x")
+    student = Student.objects.create(full_name="طالب مرفقات")
+    lvl, _ = BehaviorLevel.objects.get_or_create(code=1, defaults={"name": "الدرجة الأولى"})
+    viol = Violation.objects.create(level=lvl, code="T-ATT", category="اختبار", severity=1)
+    inc = Incident.objects.create(
+        violation=viol,
+        student=student,
+        reporter=admin,
+        occurred_at=timezone.now(),
+        severity=1,
+    )
+    payload = bytes(range(256)) * 40  # 10240 bytes
+    att = IncidentAttachment(
+        incident=inc,
+        kind="pledge",
+        mime="application/pdf",
+        size=len(payload),
+        sha256=hashlib.sha256(payload).hexdigest(),
+        created_by=admin,
+    )
+    att.file.save("scan.pdf", ContentFile(payload), save=False)
+    att.save()
+    url = f"/api/discipline/incidents/{inc.id}/attachments/{att.id}/download/"
+    return {"admin": admin, "inc": inc, "att": att, "payload": payload, "url": url}
+
+
+def _body(resp):
+    return b"".join(resp.streaming_content) if getattr(resp, "streaming", False) else resp.content
+
+
+@pytest.mark.django_db
+def test_download_sets_etag_and_returns_304_on_match(client, attachment):
+    client.force_login(attachment["admin"])
+    resp = client.get(attachment["url"])
+    assert resp.status_code == 200
+    assert _body(resp) == attachment["payload"]
+    assert resp["ETag"] == f'"{attachment["att"].sha256}"'
+    assert resp["Accept-Ranges"] == "bytes"
+
+    resp2 = client.get(attachment["url"], HTTP_IF_NONE_MATCH=resp["ETag"])
+    assert resp2.status_code == 304
+    assert resp2["ETag"] == resp["ETag"]
+
+
+@pytest.mark.django_db
+def test_download_supports_single_range_and_rejects_unsatisfiable(client, attachment):
+    client.force_login(attachment["admin"])
+    payload = attachment["payload"]
+
+    resp = client.get(attachment["url"], HTTP_RANGE="bytes=100-199")
+    assert resp.status_code == 206
+    assert resp["Content-Range"] == f"bytes 100-199/{len(payload)}"
+    assert _body(resp) == payload[100:200]
+
+    resp = client.get(attachment["url"], HTTP_RANGE="bytes=-10")
+    assert resp.status_code == 206
+    assert _body(resp) == payload[-10:]
+
+    resp = client.get(attachment["url"], HTTP_RANGE=f"bytes={len(payload)}-")
+    assert resp.status_code == 416
+    assert resp["Content-Range"] == f"bytes */{len(payload)}"
+
+    # If-Range mismatch -> full body
+    resp = client.get(attachment["url"], HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+    assert resp.status_code == 200
+    assert _body(resp) == payload
+
+
+@pytest.mark.django_db
+def test_download_audit_is_coalesced_per_user_and_attachment(client, attachment, settings):
+    from django.core.cache import cache
+    from discipline.models import IncidentAuditLog
+
+    cache.clear()
+    settings.DISCIPLINE_ATTACHMENT_AUDIT_WINDOW_S = 600
+    client.force_login(attachment["admin"])
+    for _ in range(3):
+        assert client.get(attachment["url"], HTTP_RANGE="bytes=0-1023").status_code == 206
+    logs = IncidentAuditLog.objects.filter(incident=attachment["inc"], meta__action="attachment_download")
+    assert logs.count() == 1
+
+
+@pytest.mark.django_db
+def test_download_nginx_offload_mode(client, attachment, settings):
+    settings.DISCIPLINE_ATTACHMENT_SENDFILE = "nginx"
+    settings.DISCIPLINE_ATTACHMENT_ACCEL_PREFIX = "/protected-media/"
+    client.force_login(attachment["admin"])
+    resp = client.get(attachment["url"])
+    assert resp.status_code == 200
+    assert resp["X-Accel-Redirect"] == "/protected-media/" + attachment["att"].file.name
+    assert resp.content == b""
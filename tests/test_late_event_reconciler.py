@@ -0,0 +1,106 @@
+import datetime as _dt
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def _record(data, student, day, period, status, minutes=0):
+    from school.models import AttendanceRecord
+
+    return AttendanceRecord.objects.create(
+        student=student,
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        term=data["term"],
+        date=day,
+        day_of_week=1,
+        period_number=period,
+        start_time=_dt.time(7, 0),
+        end_time=_dt.time(7, 45),
+        status=status,
+        late_minutes=minutes,
+    )
+
+
+@pytest.fixture()
+def late_records(minimal_school_data):
+    from school.models import AttendancePolicy
+
+    data = minimal_school_data
+    AttendancePolicy.objects.create(term=data["term"], late_to_equivalent_period_minutes=40)
+    s1, s2 = data["students"]
+    day = _dt.date(2024, 9, 1)
+    recs = [
+        _record(data, s1, day, 1, "late", minutes=7),
+        _record(data, s1, day, 2, "runaway"),
+        _record(data, s2, day, 1, "present"),
+    ]
+    return {**data, "records": recs, "day": day}
+
+
+@pytest.mark.django_db
+def test_batch_reconcile_creates_one_event_per_late_record(late_records):
+    from school.models import AttendanceLateEvent
+    from school.services.late_events import reconcile_late_events
+
+    late, runaway, present = late_records["records"]
+    # Saving records alone no longer touches the event table
+    assert not AttendanceLateEvent.objects.exists()
+
+    report = reconcile_late_events([r.id for r in late_records["records"]], late_seconds={late.id: 7 * 60 + 12})
+    assert (report.created, report.updated, report.deleted) == (2, 0, 0)
+    by_rec = {e.attendance_record_id: e for e in AttendanceLateEvent.objects.all()}
+    assert set(by_rec) == {late.id, runaway.id}
+    assert by_rec[late.id].late_mmss == "07:12"
+    assert by_rec[runaway.id].late_seconds == 40 * 60
+
+    # Idempotent
+    assert reconcile_late_events([r.id for r in late_records["records"]]).changed == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_query_count_does_not_grow_with_batch(late_records):
+    from school.models import Student
+    from school.services.late_events import reconcile_late_events
+
+    small = [r.id for r in late_records["records"]]
+    with CaptureQueriesContext(connection) as q_small:
+        reconcile_late_events(small)
+    ids = []
+    for n in range(15):
+        s = Student.objects.create(sid=f"LE-{n}", full_name=f"طالب {n}", class_fk=late_records["classroom"])
+        ids.append(_record(late_records, s, late_records["day"], 1, "late", minutes=n + 1).id)
+        ids.append(_record(late_records, s, late_records["day"], 2, "runaway").id)
+    with CaptureQueriesContext(connection) as q_large:
+        reconcile_late_events(ids)
+    assert len(q_large.captured_queries) <= len(q_small.captured_queries) + 1
+
+
+@pytest.mark.django_db
+def test_reconcile_command_repairs_drift(late_records, capsys):
+    from school.models import AttendanceLateEvent, AttendanceRecord
+    from school.services.late_events import reconcile_late_events
+
+    late, runaway, present = late_records["records"]
+    reconcile_late_events([late.id, runaway.id, present.id])
+    # Drift: status changed through .update(), minutes edited, a duplicate event and a stale event
+    AttendanceRecord.objects.filter(id=runaway.id).update(status="present")
+    AttendanceRecord.objects.filter(id=late.id).update(late_minutes=10)
+    dup = AttendanceLateEvent.objects.get(attendance_record=late)
+    dup.pk = None
+    dup.save()
+
+    day = late_records["day"].isoformat()
+    call_command("reconcile_late_events", "--from", day, "--to", day, "--dry-run")
+    assert "DRY RUN" in capsys.readouterr().out
+    assert AttendanceLateEvent.objects.count() == 3
+
+    call_command("reconcile_late_events", "--from", day, "--to", day)
+    out = capsys.readouterr().out
+    assert "updated 1, deleted 1 stale, removed 1 duplicate" in out
+    events = list(AttendanceLateEvent.objects.all())
+    assert len(events) == 1
+    assert events[0].attendance_record_id == late.id and events[0].late_seconds == 600
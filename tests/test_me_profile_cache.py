@@ -0,0 +1,83 @@
+import pytest
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture()
+def teacher_me(client, minimal_school_data):
+    client.force_login(minimal_school_data["teacher_user"])
+    return client, minimal_school_data
+
+
+def _queries(client):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get("/api/me/")
+    assert resp.status_code == 200, resp.content
+    return resp.json(), [q["sql"] for q in ctx.captured_queries]
+
+
+@pytest.mark.django_db
+def test_me_is_built_with_few_queries_then_served_from_cache(teacher_me):
+    client, data = teacher_me
+
+    cold, cold_sql = _queries(client)
+    assert cold["hasTeachingAssignments"] is True and "teacher" in cold["roles"]
+    assert cold["staff_full_name"] == data["teacher_staff"].full_name
+    assert cold["history"]["total_entries"] == 1
+    # session + user + groups + permissions + staff + history
+    assert len(cold_sql) <= 6
+
+    warm, warm_sql = _queries(client)
+    assert warm == cold
+    assert not any("school_staff" in sql or "auth_permission" in sql for sql in warm_sql)
+
+
+@pytest.mark.django_db
+def test_me_follows_group_staff_and_wing_changes(teacher_me):
+    client, data = teacher_me
+    user, staff = data["teacher_user"], data["teacher_staff"]
+
+    before, _ = _queries(client)
+    assert "wing_supervisor" not in before["roles"]
+
+    user.groups.add(Group.objects.create(name="principal"))
+    assert "principal" in _queries(client)[0]["roles"]
+
+    data["wing"].supervisor = staff
+    data["wing"].save()
+    assert "wing_supervisor" in _queries(client)[0]["roles"]
+
+    staff.full_name = "اسم جديد"
+    staff.save()
+    assert _queries(client)[0]["display_name"] == "اسم جديد"
+
+    # Logging in again only touches last_login and keeps the cached profile
+    _queries(client)
+    client.force_login(user)
+    _, sql = _queries(client)
+    assert not any("school_staff" in q for q in sql)
+
+
+@pytest.mark.django_db
+def test_me_profile_key_expires_after_me_profile_ttl(teacher_me, monkeypatch, settings):
+    from django.core.cache import cache
+    from school.services import me_profile
+
+    class RecordingCache:
+        timeouts = {}
+
+        def __getattr__(self, name):
+            return getattr(cache, name)
+
+        def set(self, key, value, timeout=None):
+            self.timeouts[key] = timeout
+            cache.set(key, value, timeout)
+
+    settings.ME_PROFILE_TTL_S = 3600
+    recording = RecordingCache()
+    monkeypatch.setattr(me_profile, "cache", recording)
+    client, data = teacher_me
+    _queries(client)
+    # Keys orphaned by an RBAC version bump are reclaimed once the TTL expires
+    assert recording.timeouts[f"me:{me_profile.rbac_version()}:{data['teacher_user'].id}"] == 3600
@@ -0,0 +1,137 @@
+import io
+import json
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture()
+def metrics_buffer(settings):
+    settings.REQUEST_METRICS_SINK = "cache"
+    settings.REQUEST_METRICS_SAMPLE_RATE = 1.0
+    settings.REQUEST_METRICS_BUFFER_SIZE = 50
+    cache.clear()
+
+
+@pytest.mark.django_db
+def test_requests_are_sampled_with_query_cache_and_size_counters(client, metrics_buffer, minimal_school_data):
+    from apps.common.request_metrics import recent_samples
+
+    data = minimal_school_data
+    client.force_login(data["teacher_user"])
+    url = "/api/v1/attendance/students/"
+    params = {"class_id": data["classroom"].id, "date": "2024-08-19"}
+    client.get(url, params)  # warms the roster cache
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get(url, params, HTTP_X_REQUEST_ID="client-req-0001")
+    queries = len(ctx.captured_queries)  # the query log is reset by the next request
+    assert resp.status_code == 200
+    assert resp["X-Request-ID"] == "client-req-0001"
+    assert len(client.get(url, params, HTTP_X_REQUEST_ID="bad id")["X-Request-ID"]) == 32
+
+    samples = [s for s in recent_samples(5) if s["rid"] == "client-req-0001"]
+    assert len(samples) == 1
+    (sample,) = samples
+    assert sample["view"].endswith("students") and sample["method"] == "GET" and sample["status"] == 200
+    assert sample["db_q"] == queries
+    assert sample["cache_hits"] >= 1 and sample["bytes"] == len(resp.content)
+    assert sample["render_ms"] > 0 and sample["ms"] >= sample["db_ms"]
+
+    # Unresolved URLs and static files are not sampled
+    client.get("/no-such-page/")
+    assert all(s["view"] for s in recent_samples(5))
+
+
+@pytest.mark.django_db
+def test_samples_are_written_after_the_response_is_sent(settings, metrics_buffer, rf):
+    from types import SimpleNamespace
+
+    from django.http import HttpResponse, StreamingHttpResponse
+
+    from apps.common.request_metrics import recent_samples
+    from core.middleware_metrics import RequestMetricsMiddleware
+
+    def view(body):
+        def get_response(request):
+            request.resolver_match = SimpleNamespace(view_name="v")
+            return body()
+
+        return RequestMetricsMiddleware(get_response)
+
+    response = view(lambda: HttpResponse(b"ok"))(rf.get("/x/"))
+    assert recent_samples(5) == []
+    response.close()
+    assert [(s["view"], s["bytes"]) for s in recent_samples(5)] == [("v", 2)]
+
+    def chunks():
+        for _ in range(3):
+            sum(range(20000))
+            yield b"abc"
+
+    cache.clear()
+    response = view(lambda: StreamingHttpResponse(chunks()))(rf.get("/x/"))
+    assert recent_samples(5) == []
+    assert b"".join(response.streaming_content) == b"abcabcabc"
+    (sample,) = recent_samples(5)
+    assert sample["bytes"] == 9 and sample["render_ms"] > 0
+
+    settings.REQUEST_METRICS_SAMPLE_RATE = 0
+    view(lambda: HttpResponse(b"ok"))(rf.get("/x/")).close()
+    assert len(recent_samples(5)) == 1
+
+
+@pytest.mark.django_db
+def test_request_id_is_propagated_to_task_log(client, django_user_model, metrics_buffer):
+    from school.models import TaskLog
+
+    client.force_login(django_user_model.objects.create_user(username="tl", password="x"))
+    resp = client.post(
+        "/api/tasks/log/",
+        {"resource_type": "incident", "resource_id": "1", "action": "review"},
+        content_type="application/json",
+        HTTP_X_REQUEST_ID="req-tasklog-42",
+        HTTP_TRACEPARENT="00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01",
+    )
+    assert resp.status_code in (200, 201), resp.content
+    task = TaskLog.objects.get()
+    assert (task.request_id, task.trace_id) == ("req-tasklog-42", "4bf92f3577b34da6a3ce929d0e0e4736")
+
+    # Outside a request nothing is filled in
+    assert TaskLog.objects.create(resource_type="x", resource_id="1", action="a").request_id == ""
+
+
+@pytest.mark.django_db
+def test_slow_endpoints_percentiles_command_and_admin_page(client, django_user_model, metrics_buffer, monkeypatch):
+    from apps.common import request_metrics
+    from apps.common.request_metrics import endpoint_summary, record
+
+    for i in range(1, 101):
+        record({"ts": 1e12, "rid": str(i), "view": "slow", "method": "GET", "status": 200, "ms": float(i), "db_q": 4})
+    record({"ts": 1e12, "rid": "f", "view": "fast", "method": "GET", "status": 500, "ms": 1.0, "cache_hits": 1})
+    record({"ts": 1.0, "rid": "old", "view": "old", "method": "GET", "status": 200, "ms": 999.0})
+
+    out = io.StringIO()
+    call_command("slow_endpoints", "--minutes", "60", "--format", "json", stdout=out)
+    report = json.loads(out.getvalue())
+    # The ring buffer keeps the last REQUEST_METRICS_BUFFER_SIZE (50) samples; "old" is outside the window
+    assert report["samples"] == 49
+    slow, fast = report["endpoints"]
+    assert slow["view"] == "slow" and (slow["count"], slow["p50"], slow["p95"], slow["p99"]) == (48, 76.0, 98.0, 100.0)
+    assert (fast["errors"], fast["cache_hit_pct"]) == (1, 100.0)
+    assert [r["view"] for r in endpoint_summary([{"view": "a", "ms": 1}], min_count=2)] == []
+
+    # Read back newest first in batches: "old" (the newest slot) does not stop the scan
+    monkeypatch.setattr(request_metrics, "READ_BATCH", 7)
+    assert len(request_metrics.recent_samples(60)) == 49
+
+    text = io.StringIO()
+    call_command("slow_endpoints", stdout=text)
+    assert "GET slow" in text.getvalue()
+
+    client.force_login(django_user_model.objects.create_superuser(username="perf", password="x"))
+    page = client.get("/admin/school/endpointperformance/", {"minutes": 60, "sort": "p99"})
+    assert page.status_code == 200
+    assert "أداء نقاط الواجهة" in page.content.decode() and "slow" in page.content.decode()
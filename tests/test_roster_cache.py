@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def _students(client, class_id):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get("/api/v1/attendance/students/", {"class_id": class_id, "date": "2024-08-19"})
+    assert resp.status_code == 200, resp.content
+    return resp.json()["students"], [q["sql"] for q in ctx.captured_queries if "school_student" in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_roster_is_a_cache_read_invalidated_by_student_changes(client, minimal_school_data):
+    from school.models import Class
+
+    data = minimal_school_data
+    s1, s2 = data["students"]
+    cid = data["classroom"].id
+    client.force_login(data["teacher_user"])
+
+    first, _ = _students(client, cid)
+    assert first == [
+        {"id": s1.id, "sid": "1001", "full_name": "طالب 1", "class_fk_id": cid, "active": True},
+        {"id": s2.id, "sid": "1002", "full_name": "طالب 2", "class_fk_id": cid, "active": True},
+    ]
+    again, student_sql = _students(client, cid)
+    assert again == first and student_sql == []
+
+    s2.active = False
+    s2.save()
+    roster, student_sql = _students(client, cid)
+    assert [r["active"] for r in roster] == [True, False] and len(student_sql) == 1
+
+    # Moving a student invalidates the roster of both classes
+    other = Class.objects.create(name="10-2", wing=data["wing"])
+    from apps.attendance.services.rosters import get_class_roster
+
+    assert get_class_roster(other.id) == []
+    s1.class_fk = other
+    s1.save()
+    assert [r[0] for r in get_class_roster(other.id)] == [s1.id]
+    assert [r["id"] for r in _students(client, cid)[0]] == [s2.id]
+
+
+@pytest.mark.django_db
+def test_bulk_save_rejects_inactive_students_from_the_roster(minimal_school_data):
+    from apps.attendance.services.attendance import bulk_save_attendance
+    from apps.attendance.services.rosters import get_class_roster
+
+    data = minimal_school_data
+    s1, s2 = data["students"]
+    s2.active = False
+    s2.save()
+    get_class_roster(data["classroom"].id)
+
+    with CaptureQueriesContext(connection) as ctx, pytest.raises(ValueError, match=str(s2.id)):
+        bulk_save_attendance(
+            class_id=data["classroom"].id,
+            dt=data["term"].start_date,
+            records=[{"student_id": s1.id, "status": "present"}, {"student_id": s2.id, "status": "absent"}],
+            actor_user_id=data["teacher_user"].id,
+            period_number=1,
+        )
+    assert not any('FROM "school_student"' in q["sql"] for q in ctx.captured_queries)
@@ -0,0 +1,78 @@
+import datetime as _dt
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+URL = "/admin/school/studentlatesummary/"
+
+
+def _late(data, student, day, period, status, minutes=0):
+    from school.models import AttendanceRecord
+
+    AttendanceRecord.objects.create(
+        student=student,
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        term=data["term"],
+        date=day,
+        day_of_week=1,
+        period_number=period,
+        start_time=_dt.time(7, 0),
+        end_time=_dt.time(7, 45),
+        status=status,
+        late_minutes=minutes,
+    )
+
+
+@pytest.fixture()
+def late_data(minimal_school_data):
+    from school.models import AttendancePolicy
+
+    data = minimal_school_data
+    AttendancePolicy.objects.create(term=data["term"], late_to_equivalent_period_minutes=40)
+    s1, s2 = data["students"]
+    day = _dt.date(2024, 9, 1)
+    _late(data, s1, day, 1, "late", minutes=5)
+    _late(data, s1, day, 2, "runaway")
+    _late(data, s2, day, 1, "late", minutes=3)
+    return data
+
+
+@pytest.mark.django_db
+def test_late_summary_totals_are_annotated_and_sortable(admin_client, late_data):
+    from school.models import StudentLateSummary
+    from django.contrib import admin
+
+    model_admin = admin.site._registry[StudentLateSummary]
+    s1, s2 = late_data["students"]
+    rows = {o.id: o for o in model_admin.get_queryset(None)}
+    assert rows[s1.id].late_incidents == 2
+    assert rows[s1.id].late_seconds == 5 * 60 + 40 * 60
+    assert model_admin.total_late_hhmmss(rows[s1.id]) == "00:45:00"
+    assert rows[s2.id].late_seconds == 180
+
+    ordered = list(model_admin.get_queryset(None).order_by("-late_seconds").values_list("id", flat=True))
+    assert ordered[:2] == [s1.id, s2.id]
+
+    # Both columns are sortable from the changelist (o=4 -> late_incidents_count, o=5 -> total_late_hhmmss)
+    resp = admin_client.get(URL, {"o": "-5"})
+    assert resp.status_code == 200
+    assert "00:45:00" in resp.content.decode()
+
+
+@pytest.mark.django_db
+def test_late_summary_changelist_query_count_is_constant(admin_client, late_data):
+    from school.models import Student
+
+    with CaptureQueriesContext(connection) as small:
+        assert admin_client.get(URL).status_code == 200
+    day = _dt.date(2024, 9, 2)
+    for n in range(10):
+        s = Student.objects.create(sid=f"LATE-{n}", full_name=f"طالب متأخر {n}", class_fk=late_data["classroom"])
+        _late(late_data, s, day, 1, "late", minutes=n + 1)
+        _late(late_data, s, day, 2, "runaway")
+    with CaptureQueriesContext(connection) as large:
+        assert admin_client.get(URL).status_code == 200
+    assert len(large.captured_queries) == len(small.captured_queries)
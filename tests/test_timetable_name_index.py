@@ -0,0 +1,65 @@
+import io
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture()
+def named_staff(minimal_school_data):
+    from school.models import Staff, TeachingAssignment
+
+    data = minimal_school_data
+    ali = Staff.objects.create(full_name="أحمد محمد العلي")
+    Staff.objects.create(full_name="أحمد محمود السيد")
+    TeachingAssignment.objects.create(
+        teacher=ali, classroom=data["classroom"], subject=data["subject"], no_classes_weekly=4
+    )
+    return data, ali
+
+
+def _raw_row(teacher_name: str) -> str:
+    tokens = ["10.1"] + [""] * 34
+    return "تم التقاط صف خام من الجدول: " + " | ".join(tokens) + " | " + teacher_name
+
+
+@pytest.mark.django_db
+def test_ocr_parse_uses_one_cached_index(named_staff):
+    from school.services.ocr_table_parser import parse_ocr_raw_to_csv
+
+    data, ali = named_staff
+    with CaptureQueriesContext(connection) as cold:
+        csv_text, warnings = parse_ocr_raw_to_csv(_raw_row("احمد محمد العلى"))
+    assert "أحمد محمد العلي,10-1,رياضيات,1,7" in csv_text, warnings
+    # staff + classes + subjects + assignments, however many cells
+    assert len(cold.captured_queries) <= 4
+
+    with CaptureQueriesContext(connection) as warm:
+        again, _ = parse_ocr_raw_to_csv(_raw_row("احمد محمد العلى") + "\n" + _raw_row("أحمد محمد العلي"))
+    assert again.count("رياضيات") == 2
+    assert warm.captured_queries == []
+
+    # Garbled OCR falls back to the trigram match; an edit rebuilds the index
+    assert "أحمد محمد العلي" in parse_ocr_raw_to_csv(_raw_row("احمد محمد العلل"))[0]
+    ali.assignments.all().delete()
+    _, warnings = parse_ocr_raw_to_csv(_raw_row("أحمد محمد العلي"))
+    assert any("لا توجد تعيين مادة" in w for w in warnings)
+
+
+@pytest.mark.django_db
+def test_csv_import_resolves_through_the_index(named_staff):
+    from school.models import TimetableEntry
+    from school.services.name_index import get_name_index
+    from school.services.timetable_import import import_timetable_csv
+
+    data, ali = named_staff
+    csv_text = "teacher,class,subject,day,period\nاحمد محمد العلل,10 - 1,رياضيات,2,3\nمجهول,10-1,رياضيات,2,4\n"
+    summary = import_timetable_csv(io.StringIO(csv_text))
+
+    assert summary["created"] == 1 and summary["skipped"] == 1
+    assert len(summary["fuzzy_matches"]) == 1
+    entry = TimetableEntry.objects.get(day_of_week=2, period_number=3)
+    assert entry.teacher_id == ali.id and entry.classroom_id == data["classroom"].id
+
+    # Two equally close teachers: no guess
+    assert get_name_index().teacher_fuzzy("احمد مح")[0] is None
@@ -0,0 +1,90 @@
+import pytest
+
+from school.services import timetable_ocr
+
+
+def _two_page_pdf(path):
+    canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+    c = canvas.Canvas(str(path))
+    for line in ("Math 7-1 Sunday", "Science 9-2 Monday"):
+        c.drawString(72, 720, line)
+        c.showPage()
+    c.save()
+
+
+def test_pdf_pages_are_extracted_in_a_pool_and_cached_by_hash(tmp_path):
+    pytest.importorskip("pdfplumber")
+    pdf = tmp_path / "time_table.pdf"
+    _two_page_pdf(pdf)
+    seen = []
+
+    first = timetable_ocr.extract_timetable_source(str(pdf), workers=2, progress=lambda d, t: seen.append((d, t)))
+    assert first["ok"] and first["pages"] == 2 and not first["cached"]
+    assert seen[-1] == (2, 2)
+    lines = first["raw_text"].splitlines()
+    assert [line.split(": ", 1)[1] for line in lines] == ["Math 7-1 Sunday", "Science 9-2 Monday"]
+
+    again = timetable_ocr.extract_timetable_source(str(pdf))
+    assert again["cached"] and again["sha"] == first["sha"] == timetable_ocr.file_sha256(str(pdf))
+    assert timetable_ocr.cached_extraction(first["sha"])["raw_text"] == first["raw_text"]
+    assert timetable_ocr.cached_extraction("../not-a-hash") is None
+
+
+@pytest.mark.django_db
+def test_background_extraction_feeds_the_import_page_without_repeating_ocr(
+    client, django_user_model, tmp_path, monkeypatch
+):
+    from school.tasks.jobs_rq import process_extract_timetable
+
+    img = tmp_path / "time_table.png"
+    img.write_bytes(b"not really a png")
+    calls = []
+
+    def fake_ocr(path, *, workers=None, progress=None):
+        calls.append(path)
+        return {
+            "csv_text": "teacher,class,subject,day,period\n",
+            "warnings": "سطر محتمل: 7-1",
+            "raw_text": "7-1",
+            "ok": True,
+        }
+
+    monkeypatch.setattr(timetable_ocr, "_extract_image", fake_ocr)
+    summary = process_extract_timetable([str(img)])
+    assert summary["ok"] and summary["kind"] == "timetable_ocr" and summary["source"] == "time_table.png"
+    assert process_extract_timetable([str(img)])["cached"] is True
+    assert len(calls) == 1
+
+    user = django_user_model.objects.create_user(username="ocr_admin", password="x", is_staff=True)
+    client.force_login(user)
+    page = client.get("/timetable/import/from_image/", {"ocr": summary["sha"]})
+    assert page.status_code == 200
+    assert page.context["ocr_sha"] == summary["sha"]
+
+    # parse_raw with an empty textarea re-parses the cached raw text
+    monkeypatch.setattr("school.views.parse_ocr_raw_to_csv", lambda text: (f"parsed:{text}\n", []))
+    parsed = client.post(
+        "/timetable/import/from_image/", {"action": "parse_raw", "raw_text": "", "ocr": summary["sha"]}
+    )
+    assert parsed.status_code == 200
+    assert parsed.context["form"].initial["csv_text"] == "parsed:7-1\n"
+    assert len(calls) == 1
+
+
+@pytest.mark.django_db
+def test_synchronous_extraction_paths_do_not_start_a_pool(tmp_path, monkeypatch):
+    from school.tasks.jobs_rq import process_extract_timetable
+
+    seen = []
+
+    def fake_ocr(path, *, workers=None, progress=None):
+        seen.append(workers)
+        return {"csv_text": "", "warnings": "لا شيء", "raw_text": "", "ok": False}
+
+    monkeypatch.setattr(timetable_ocr, "_extract_image", fake_ocr)
+    img = tmp_path / "time_table.png"
+    img.write_bytes(b"sync extraction")
+    timetable_ocr.try_extract_csv_from_image(str(img))
+    process_extract_timetable([str(img)], workers=1)  # inline fallback of the import page
+    process_extract_timetable([str(img)])  # RQ job: OCR_WORKERS
+    assert seen == [1, 1, None]
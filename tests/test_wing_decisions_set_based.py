@@ -0,0 +1,108 @@
+import datetime as dt
+import io
+import json
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+DAY = dt.date(2024, 8, 19)
+
+
+@pytest.fixture()
+def wing_records(client, django_user_model, minimal_school_data):
+    """12 absent records in the supervisor's wing, 1 in another wing; returns a logged-in supervisor."""
+    from school.models import AttendanceRecord, Class, Staff, Student, Wing
+
+    data = minimal_school_data
+    first = AttendanceRecord.objects.get()
+    other = Class.objects.create(name="11-1", wing=Wing.objects.create(name="B"))
+    outsider = Student.objects.create(full_name="طالب آخر", class_fk=other, sid="2001")
+    base = {
+        "subject": first.subject,
+        "teacher": first.teacher,
+        "term": data["term"],
+        "date": DAY,
+        "day_of_week": 2,
+        "start_time": dt.time(8, 0),
+        "end_time": dt.time(8, 45),
+        "status": "absent",
+    }
+    ids = [
+        AttendanceRecord.objects.create(student=s, classroom=data["classroom"], period_number=p, note=n, **base).id
+        for s in data["students"]
+        for p, n in zip(range(2, 8), ("", "old", "", "", "", ""))
+    ]
+    foreign = AttendanceRecord.objects.create(student=outsider, classroom=other, period_number=1, **base).id
+
+    sup_user = django_user_model.objects.create_user(username="wing_sup", password="x")
+    data["wing"].supervisor = Staff.objects.create(user=sup_user, full_name="Supervisor A")
+    data["wing"].save()
+    client.force_login(sup_user)
+    return client, data, ids, foreign
+
+
+def _excuse(client, ids, **extra):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.post(
+            "/api/v1/wing/set-excused/",
+            {"ids": ids, **extra},
+            **({} if extra else {"content_type": "application/json"}),
+        )
+    assert resp.status_code == 200, resp.content
+    return resp.json(), len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_set_excused_is_set_based_with_per_record_outcome(settings, tmp_path, wing_records):
+    from apps.attendance.models import AttendanceEvidence
+    from school.models import AttendanceDaily, AttendanceRecord
+
+    settings.MEDIA_ROOT = str(tmp_path)
+    client, data, ids, foreign = wing_records
+
+    small, small_q = _excuse(client, ids[:2])
+    large, large_q = _excuse(client, ids[2:] + [foreign, 999999])
+    assert small_q == large_q
+    assert small["updated"] == 2 and large["updated"] == 10
+    assert large["results"][-2:] == [{"id": foreign, "outcome": "skipped"}, {"id": 999999, "outcome": "skipped"}]
+    assert {r["outcome"] for r in large["results"][:-2]} == {"excused"}
+
+    rec = AttendanceRecord.objects.get(id=ids[1])
+    assert (rec.status, rec.locked, rec.source) == ("excused", True, "supervisor")
+    assert rec.note.startswith("[EXCUSED by Supervisor A @") and rec.note.endswith(" | old")
+    assert AttendanceRecord.objects.get(id=ids[0]).note.endswith("]")
+    assert AttendanceRecord.objects.get(id=foreign).status == "absent"
+    s1, _s2 = data["students"]
+    assert AttendanceDaily.objects.get(student=s1, date=DAY).excused_periods == 6
+
+    # Evidence: one stored file shared by every evidence row
+    upload = SimpleUploadedFile("proof.pdf", b"%PDF-1.4 proof", content_type="application/pdf")
+    body, _ = _excuse(client, json.dumps(ids[:3]), evidence=upload, evidence_note="شهادة")
+    assert body["evidence_saved"] == 3
+    assert AttendanceEvidence.objects.filter(record_id__in=ids[:3]).values("file").distinct().count() == 1
+    assert len(list((tmp_path / "attendance" / "evidence").rglob("*"))) >= 1
+
+
+@pytest.mark.django_db
+def test_decide_outcomes_and_benchmark_scaling(wing_records):
+    from apps.attendance.management.commands.bench_wing_decisions import _run
+
+    client, data, ids, foreign = wing_records
+    resp = client.post(
+        "/api/v1/wing/decide/", {"action": "approve", "ids": [ids[0], foreign]}, content_type="application/json"
+    )
+    assert resp.status_code == 200, resp.content
+    assert resp.json()["results"] == [{"id": ids[0], "outcome": "approved"}, {"id": foreign, "outcome": "skipped"}]
+
+    results = _run([10, 240])
+    for scenario in ("approve", "set_excused"):
+        small, large = results[scenario]
+        assert small["queries"] == large["queries"], scenario
+
+    out = io.StringIO()
+    call_command("bench_wing_decisions", "--sizes", "30", "--per-row", "--format", "json", stdout=out)
+    report = json.loads(out.getvalue())
+    assert report["set_excused_per_row"][0]["queries"] > report["set_excused"][0]["queries"]
@@ -0,0 +1,97 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.fixture()
+def wing_grid(client, django_user_model, minimal_school_data):
+    from school.models import TimetableEntry
+
+    data = minimal_school_data
+    data["term"].__class__.objects.filter(pk=data["term"].pk).update(is_current=True)
+    entry = TimetableEntry.objects.create(
+        classroom=data["classroom"],
+        subject=data["subject"],
+        teacher=data["teacher_staff"],
+        day_of_week=1,
+        period_number=2,
+        term=data["term"],
+    )
+    user = django_user_model.objects.create_superuser(username="wtt_cache", email="w@example.com", password="x")
+    client.force_login(user)
+    # 2024-09-01 is a Sunday (school day 1)
+    params = {"wing_id": data["wing"].id, "date": "2024-09-01", "mode": "daily"}
+    return client, params, entry
+
+
+@pytest.mark.django_db
+def test_daily_grid_is_cached_and_revalidated_with_etag(wing_grid):
+    client, params, entry = wing_grid
+
+    with CaptureQueriesContext(connection) as cold:
+        first = client.get("/api/v1/wing/timetable/", params)
+    assert first.status_code == 200, first.content
+    body = first.json()
+    assert body["date"] == "2024-09-01"
+    assert [(i["class_id"], i["period_number"]) for i in body["items"]] == [(entry.classroom_id, 2)]
+    etag = first["ETag"]
+    assert etag.startswith('W/"wtt-')
+
+    # Same school day next week: served from the cached grid with its own date
+    with CaptureQueriesContext(connection) as warm:
+        again = client.get("/api/v1/wing/timetable/", {**params, "date": "2024-09-08"})
+    assert again.json()["date"] == "2024-09-08" and again.json()["items"] == body["items"]
+    assert len(warm.captured_queries) < len(cold.captured_queries)
+
+    not_modified = client.get("/api/v1/wing/timetable/", params, HTTP_IF_NONE_MATCH=etag)
+    assert not_modified.status_code == 304
+    assert not_modified["ETag"] == etag
+
+
+@pytest.mark.django_db
+def test_revalidation_does_not_build_the_grid(wing_grid, monkeypatch):
+    from apps.attendance.services import wing_timetable
+
+    client, params, _entry = wing_grid
+    etag = client.get("/api/v1/wing/timetable/", params)["ETag"]
+
+    # Grid evicted from the cache (or never built by this process): a 304 still needs no build
+    def no_build(*args, **kwargs):
+        raise AssertionError("grid built for a 304")
+
+    monkeypatch.setattr(wing_timetable, "build_wing_timetable", no_build)
+    monkeypatch.setattr(wing_timetable, "_cache_key", lambda *a: "wing_tt:evicted")
+    assert client.get("/api/v1/wing/timetable/", params, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+@pytest.mark.django_db
+def test_timetable_edit_bumps_version_and_rebuilds(wing_grid):
+    client, params, entry = wing_grid
+
+    first = client.get("/api/v1/wing/timetable/", params)
+    weekly = client.get("/api/v1/wing/timetable/", {**params, "mode": "weekly"})
+    assert weekly.status_code == 200 and len(weekly.json()["days"]["1"]) == 1
+
+    entry.period_number = 5
+    entry.save()
+
+    changed = client.get("/api/v1/wing/timetable/", params, HTTP_IF_NONE_MATCH=first["ETag"])
+    assert changed.status_code == 200
+    assert changed["ETag"] != first["ETag"]
+    assert [i["period_number"] for i in changed.json()["items"]] == [5]
+    weekly2 = client.get("/api/v1/wing/timetable/", {**params, "mode": "weekly"})
+    assert [i["period_number"] for i in weekly2.json()["days"]["1"]] == [5]
+
+
+@pytest.mark.django_db
+def test_prewarm_builds_every_wing(wing_grid):
+    from apps.attendance.services.wing_timetable import prewarm_wing_timetables
+
+    summary = prewarm_wing_timetables()
+    assert summary["wings"] == 1 and summary["payloads"] == 6
+
+    client, params, _ = wing_grid
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get("/api/v1/wing/timetable/", params)
+    assert resp.status_code == 200
+    assert not any("school_templateslot" in q["sql"] for q in ctx.captured_queries)